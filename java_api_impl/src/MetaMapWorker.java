@@ -0,0 +1,218 @@
+import gov.nih.nlm.nls.metamap.Ev;
+import gov.nih.nlm.nls.metamap.Mapping;
+import gov.nih.nlm.nls.metamap.MetaMapApi;
+import gov.nih.nlm.nls.metamap.MetaMapApiImpl;
+import gov.nih.nlm.nls.metamap.PCM;
+import gov.nih.nlm.nls.metamap.Position;
+import gov.nih.nlm.nls.metamap.Result;
+import gov.nih.nlm.nls.metamap.Utterance;
+
+import com.google.gson.Gson;
+import com.google.gson.JsonElement;
+import com.google.gson.JsonObject;
+import com.google.gson.JsonParser;
+
+import java.io.BufferedReader;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.List;
+
+/**
+ * Long-lived MetaMap worker driven by JSON lines on stdin.
+ *
+ * One JVM serves many documents so the JVM start-up and classpath loading
+ * are paid once per pool slot instead of once per file (see
+ * pymm.processing.java_bridge.JavaWorker for the client side).
+ *
+ * Requests, one per line:
+ *   {"id": 1, "op": "file", "path": "/notes/a.txt"}
+ *   {"id": 2, "op": "text", "text": "heart attack", "options": "-y"}
+ *   {"id": 3, "op": "ping"}
+ *   {"op": "shutdown"}
+ *
+ * Responses: {"event": "ready"} once at start-up, then per request zero or
+ * more {"id": 1, "concept": {...}} lines followed by a final
+ * {"id": 1, "ok": true, "concepts": n} or {"id": 1, "ok": false, "error": "..."}.
+ */
+public class MetaMapWorker {
+
+    private final MetaMapApi api;
+    private final String defaultOptions;
+    private final PrintStream out;
+    private final Gson gson = new Gson();
+
+    MetaMapWorker(MetaMapApi api, String defaultOptions, PrintStream out) {
+        this.api = api;
+        this.defaultOptions = defaultOptions;
+        this.out = out;
+    }
+
+    public static void main(String[] args) throws Exception {
+        String host = "localhost";
+        int port = 8066;
+        int timeout = 0;
+        String options = "";
+        for (int i = 0; i + 1 < args.length; i += 2) {
+            switch (args[i]) {
+                case "--host": host = args[i + 1]; break;
+                case "--port": port = Integer.parseInt(args[i + 1]); break;
+                case "--timeout": timeout = Integer.parseInt(args[i + 1]); break;
+                case "--options": options = args[i + 1]; break;
+                default: System.err.println("Ignoring unknown argument " + args[i]);
+            }
+        }
+
+        // The protocol owns stdout; library chatter goes to stderr
+        PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), false, "UTF-8");
+        System.setOut(System.err);
+
+        MetaMapApi api = new MetaMapApiImpl(host, port);
+        if (timeout > 0) {
+            api.setTimeout(timeout * 1000);
+        }
+        MetaMapWorker worker = new MetaMapWorker(api, options, out);
+        worker.setOptions(options);
+        worker.run();
+        api.disconnect();
+    }
+
+    void run() throws Exception {
+        JsonObject ready = new JsonObject();
+        ready.addProperty("event", "ready");
+        send(ready);
+        out.flush();
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.trim().isEmpty()) {
+                continue;
+            }
+            JsonObject request;
+            try {
+                request = JsonParser.parseString(line).getAsJsonObject();
+            } catch (RuntimeException e) {
+                fail(null, "Malformed request: " + e.getMessage());
+                continue;
+            }
+            JsonElement id = request.get("id");
+            String op = request.has("op") ? request.get("op").getAsString() : "";
+            if ("shutdown".equals(op)) {
+                break;
+            }
+            handle(id, op, request);
+        }
+    }
+
+    private void handle(JsonElement id, String op, JsonObject request) {
+        try {
+            String text;
+            switch (op) {
+                case "ping":
+                    succeed(id, 0);
+                    return;
+                case "file":
+                    text = new String(Files.readAllBytes(Paths.get(request.get("path").getAsString())),
+                                      StandardCharsets.UTF_8);
+                    break;
+                case "text":
+                    text = request.get("text").getAsString();
+                    break;
+                default:
+                    fail(id, "Unknown op: " + op);
+                    return;
+            }
+
+            boolean customOptions = request.has("options");
+            if (customOptions) {
+                setOptions(request.get("options").getAsString());
+            }
+            try {
+                succeed(id, process(id, text));
+            } finally {
+                if (customOptions) {
+                    setOptions(defaultOptions);
+                }
+            }
+        } catch (Exception e) {
+            fail(id, e.getClass().getSimpleName() + ": " + e.getMessage());
+        }
+    }
+
+    private void setOptions(String options) {
+        api.resetOptions();
+        if (options != null && !options.trim().isEmpty()) {
+            api.setOptions(options);
+        }
+    }
+
+    private int process(JsonElement id, String text) throws Exception {
+        int count = 0;
+        for (Result result : api.processCitationsFromString(text)) {
+            for (Utterance utterance : result.getUtteranceList()) {
+                for (PCM pcm : utterance.getPCMList()) {
+                    String phrase = pcm.getPhrase().getPhraseText();
+                    for (Mapping mapping : pcm.getMappingList()) {
+                        for (Ev ev : mapping.getEvList()) {
+                            JsonObject message = new JsonObject();
+                            message.add("id", id);
+                            message.add("concept", concept(ev, phrase));
+                            send(message);
+                            count++;
+                        }
+                    }
+                }
+            }
+        }
+        return count;
+    }
+
+    private JsonObject concept(Ev ev, String phrase) throws Exception {
+        JsonObject concept = new JsonObject();
+        concept.addProperty("cui", ev.getConceptId());
+        concept.addProperty("score", ev.getScore());
+        concept.addProperty("concept_name", ev.getConceptName());
+        concept.addProperty("preferred_name", ev.getPreferredName());
+        concept.addProperty("phrase", phrase);
+        concept.add("sem_types", gson.toJsonTree(ev.getSemanticTypes()));
+        concept.add("sources", gson.toJsonTree(ev.getSources()));
+
+        StringBuilder position = new StringBuilder();
+        List<Position> positions = ev.getPositionalInfo();
+        for (Position p : positions) {
+            if (position.length() > 0) {
+                position.append(';');
+            }
+            position.append(p.getX()).append(':').append(p.getY());
+        }
+        concept.addProperty("position", position.toString());
+        return concept;
+    }
+
+    private void succeed(JsonElement id, int concepts) {
+        JsonObject message = new JsonObject();
+        message.add("id", id);
+        message.addProperty("ok", true);
+        message.addProperty("concepts", concepts);
+        send(message);
+        out.flush();
+    }
+
+    private void fail(JsonElement id, String error) {
+        JsonObject message = new JsonObject();
+        message.add("id", id);
+        message.addProperty("ok", false);
+        message.addProperty("error", error);
+        send(message);
+        out.flush();
+    }
+
+    private void send(JsonObject message) {
+        out.println(gson.toJson(message));
+    }
+}
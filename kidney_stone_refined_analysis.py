@@ -2,15 +2,20 @@
 """
 Refined Kidney Stone Analysis - Percentages, Co-occurrences, and Filtered Concepts
 For admission notes only
+
+Needs pymm importable (e.g. pip install -e . from this repository) for
+concept normalization and output loading.
 """
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from pathlib import Path
 from collections import Counter, defaultdict
 from itertools import combinations
 
+from pymm.analysis.normalize import ConceptNormalizer
+from pymm.io import load_outputs
+
 # Professional medical presentation style
 plt.style.use('seaborn-v0_8-whitegrid')
 plt.rcParams['figure.facecolor'] = 'white'
@@ -18,7 +23,10 @@ plt.rcParams['axes.facecolor'] = 'white'
 plt.rcParams['font.size'] = 12
 
 class RefinedKidneyStoneAnalyzer:
-    def __init__(self):
+    def __init__(self, normalizer=None):
+        # Concept variant table; pass ConceptNormalizer.from_file(...) to customize
+        self.normalizer = normalizer or ConceptNormalizer()
+        
         # Noise concepts to filter out
         self.noise_concepts = {
             'Finding', 'Disorder', 'Disease', 'Procedure', 'Patient', 'History',
@@ -62,111 +70,19 @@ class RefinedKidneyStoneAnalyzer:
         # Create a copy to avoid modifying original
         df_norm = df.copy()
         
-        # First pass: case-insensitive normalization for exact matches
-        normalization_map = {
-            # Kidney stone as primary concept
-            'Kidney Stone': ['kidney stone', 'kidney stones', 'renal stone', 'renal stones', 
-                            'renal calculus', 'renal calculi', 'nephrolithiasis', 'stone, kidney'],
-            
-            # Ureteral concepts
-            'Ureteral': ['ureter', 'ureteric', 'ureteral'],
-            'Ureteral Stone': ['ureteral stone', 'ureteric stone', 'ureter stone', 
-                              'ureteral calculus', 'ureteric calculus'],
-            'Ureteral Stent': ['stent', 'ureteral stent', 'ureteric stent', 'ureter stent',
-                              'stent placement', 'stent ureter', 'stent, ureter'],
-            
-            # Procedures
-            'Ureteroscopy': ['ureteroscopy', 'urs'],
-            'Lithotripsy': ['lithotripsy', 'eswl', 'swl', 'shock wave lithotripsy'],
-            'PCNL': ['pcnl', 'percutaneous nephrolithotomy', 'percutaneous nephrolithotripsy'],
-            'Nephrostomy': ['nephrostomy', 'nephrostomy tube', 'percutaneous nephrostomy'],
-            
-            # Symptoms
-            'Flank Pain': ['flank pain', 'flank', 'side pain', 'loin pain'],
-            'Hematuria': ['hematuria', 'blood in urine', 'bloody urine'],
-            'Renal Colic': ['renal colic', 'ureteral colic', 'ureteric colic'],
-            'Hydronephrosis': ['hydronephrosis', 'hydro'],
-            
-            # Complications/Conditions
-            'Obstruction': ['obstruction', 'obstructive', 'obstructed'],
-            'UTI': ['uti', 'urinary tract infection', 'cystitis', 'pyelonephritis'],
-            'Hypertension': ['hypertension', 'htn', 'high blood pressure'],
-            'Diabetes': ['diabetes', 'dm', 'diabetes mellitus', 'iddm', 'niddm'],
-            
-            # Stone composition
-            'Calcium Oxalate': ['calcium oxalate', 'calcium oxalate stone'],
-            'Calcium': ['calcium', 'ca'],
-            'Uric Acid': ['uric acid', 'urate'],
-            'Struvite': ['struvite', 'infection stone', 'triple phosphate'],
-            
-            # Imaging
-            'CT Scan': ['ct', 'ct scan', 'cat scan', 'computed tomography', 'ct urogram'],
-            'Ultrasound': ['ultrasound', 'us', 'ultrasonography'],
-            
-            # Pain management
-            'Pain': ['pain', 'painful', 'ache'],
-            'Morphine': ['morphine', 'ms'],
-            'NSAID': ['nsaid', 'nsaids', 'toradol', 'ketorolac', 'ibuprofen'],
-            
-            # Other
-            'Emergency': ['emergency', 'emergent', 'urgent', 'ed', 'er'],
-            'Acute': ['acute', 'sudden onset', 'new onset'],
-            'Severe': ['severe', 'significant', 'marked']
-        }
-        
-        # Apply case-insensitive normalization
-        for canonical, variations in normalization_map.items():
-            for variant in variations:
-                # Case-insensitive exact match
-                mask = df_norm['ConceptName'].str.lower() == variant.lower()
-                df_norm.loc[mask, 'ConceptName'] = canonical
-        
-        # Second pass: Remove standalone generic terms that are part of compound concepts
-        # This prevents "Kidney", "Stone" from appearing separately when we have "Kidney Stone"
-        generic_terms_to_check = {
-            'kidney': 'Kidney Stone',
-            'stone': 'Kidney Stone',
-            'renal': 'Kidney Stone',
-            'calculus': 'Kidney Stone',
-            'calculi': 'Kidney Stone',
-            'ureter': 'Ureteral',
-            'ureteric': 'Ureteral'
-        }
-        
-        for term, replacement in generic_terms_to_check.items():
-            # Only replace if it's a standalone term (case-insensitive)
-            mask = df_norm['ConceptName'].str.lower() == term.lower()
-            df_norm.loc[mask, 'ConceptName'] = replacement
-        
-        # Third pass: Handle NOS and other suffix variations
-        # Remove common suffixes that don't add clinical meaning
-        suffixes_to_remove = [', nos', ' nos', ', unspecified', ' - unspecified', ' (disorder)', ' (finding)']
-        for suffix in suffixes_to_remove:
-            df_norm['ConceptName'] = df_norm['ConceptName'].str.replace(suffix, '', case=False, regex=False)
-        
-        # Final cleanup: strip whitespace and standardize
-        df_norm['ConceptName'] = df_norm['ConceptName'].str.strip()
+        # One lookup per distinct name plus a single suffix regex pass
+        # (see pymm.analysis.normalize for the variant table)
+        df_norm['ConceptName'] = self.normalizer.normalize_series(df_norm['ConceptName'])
         
         return df_norm
     
     def load_and_filter_data(self, output_dir="./pymm_data/output"):
         """Load MetaMap output and filter noise"""
-        csv_files = list(Path(output_dir).glob("*.csv"))  # Load ALL files
-        
-        all_concepts = []
-        for csv_file in csv_files:
-            try:
-                df = pd.read_csv(csv_file)
-                df['source_file'] = csv_file.stem
-                all_concepts.append(df)
-            except:
-                continue
-        
-        if not all_concepts:
+        # Load ALL files: typed, categorical and without marker rows
+        df = load_outputs(output_dir, columns=['CUI', 'Score', 'ConceptName', 'PrefName', 'SemTypes'])
+        if df.empty:
             return pd.DataFrame()
         
-        df = pd.concat(all_concepts, ignore_index=True)
-        
         # Filter out noise concepts
         df = df[~df['ConceptName'].isin(self.noise_concepts)]
         
@@ -201,7 +117,7 @@ class RefinedKidneyStoneAnalyzer:
         co_occurrences = defaultdict(int)
         
         # Group by source file
-        for file, group in df_filtered.groupby('source_file'):
+        for file, group in df_filtered.groupby('source_file', observed=True):
             concepts = group['ConceptName'].unique()
             # Only consider meaningful concepts
             concepts = [c for c in concepts if len(c) > 3 and c not in self.noise_concepts]
@@ -38,7 +38,9 @@ from .processing import (
     RetryManager,
     MetaMapInstancePool,
     AdaptivePoolManager,
-    FileProcessor
+    FileProcessor,
+    StreamProcessor,
+    process_stream
 )
 
 # Import CLI
@@ -79,6 +81,8 @@ __all__ = [
     'MetaMapInstancePool',
     'AdaptivePoolManager',
     'FileProcessor',
+    'StreamProcessor',
+    'process_stream',
     
     # CLI
     'cli',
@@ -0,0 +1,37 @@
+"""Analysis engines for PythonMetaMap output"""
+from .cooccurrence import SparseCooccurrence, build_cooccurrence, REPORT_MAX_PAIRS
+from .ingest import ingest_files, list_output_csvs, tree_reduce
+from .index import AnalysisIndex, IndexedFile, IndexedTerm, parse_sem_types
+from .query import Query, Leaf, And, Or, Not, QueryError, parse_query
+from .normalize import ConceptNormalizer, DEFAULT_NORMALIZATION
+from .sketches import (
+    RunningStats, HyperLogLog, CountMinSketch, PairSketch, ReservoirSample, stable_hash
+)
+
+__all__ = [
+    'SparseCooccurrence',
+    'build_cooccurrence',
+    'REPORT_MAX_PAIRS',
+    'ingest_files',
+    'list_output_csvs',
+    'tree_reduce',
+    'AnalysisIndex',
+    'IndexedFile',
+    'IndexedTerm',
+    'parse_sem_types',
+    'Query',
+    'Leaf',
+    'And',
+    'Or',
+    'Not',
+    'QueryError',
+    'parse_query',
+    'ConceptNormalizer',
+    'DEFAULT_NORMALIZATION',
+    'RunningStats',
+    'HyperLogLog',
+    'CountMinSketch',
+    'PairSketch',
+    'ReservoirSample',
+    'stable_hash'
+]
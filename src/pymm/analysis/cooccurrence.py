@@ -0,0 +1,261 @@
+"""Sparse concept co-occurrence engine
+
+Co-occurrence is computed from a note x CUI incidence matrix ``A`` as the
+sparse product ``A.T @ A`` instead of looping over every CUI pair of every
+note in Python. SciPy is used when installed; otherwise an equivalent
+NumPy implementation encodes pairs as integer keys and counts them in
+bounded-size chunks.
+
+Only the upper triangle (cui1 < cui2 by index) is stored, as parallel
+``rows``/``cols``/``counts`` arrays.
+"""
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+try:
+    import scipy.sparse as sp
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on pair keys materialized at once by the NumPy fallback
+PAIR_CHUNK_SIZE = 5_000_000
+
+# Pairs kept when a report needs the nested-dict form
+REPORT_MAX_PAIRS = 10_000
+
+
+class SparseCooccurrence:
+    """Symmetric CUI x CUI co-occurrence counts stored as an upper triangle"""
+
+    def __init__(self, cuis: Sequence[str], doc_freq: np.ndarray,
+                 rows: np.ndarray, cols: np.ndarray, counts: np.ndarray):
+        self.cuis = list(cuis)
+        self.index = {cui: i for i, cui in enumerate(self.cuis)}
+        self.doc_freq = doc_freq
+        self.rows = rows
+        self.cols = cols
+        self.counts = counts
+
+        # Pair lookup by (row, col) key, built on first use
+        self._lookup: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def empty(cls) -> 'SparseCooccurrence':
+        none = np.empty(0, dtype=np.int64)
+        return cls([], none, none, none, none)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __bool__(self) -> bool:
+        return len(self.counts) > 0
+
+    def _pair_key(self, i: int, j: int) -> int:
+        if i > j:
+            i, j = j, i
+        return i * len(self.cuis) + j
+
+    def count(self, cui1: str, cui2: str) -> int:
+        """Number of notes containing both CUIs"""
+        i, j = self.index.get(cui1), self.index.get(cui2)
+        if i is None or j is None or i == j:
+            return 0
+        if self._lookup is None:
+            n = len(self.cuis)
+            keys = self.rows.astype(np.int64) * n + self.cols
+            self._lookup = dict(zip(keys.tolist(), self.counts.tolist()))
+        return self._lookup.get(self._pair_key(i, j), 0)
+
+    def items(self) -> Iterable[Tuple[str, str, int]]:
+        """Iterate (cui1, cui2, count) once per unordered pair"""
+        cuis = self.cuis
+        for i, j, c in zip(self.rows.tolist(), self.cols.tolist(), self.counts.tolist()):
+            yield cuis[i], cuis[j], c
+
+    def top_pairs(self, n: int = 10, min_count: int = 1) -> List[Tuple[str, str, int]]:
+        """The n most frequent pairs with at least min_count notes"""
+        mask = self.counts >= min_count
+        rows, cols, counts = self.rows[mask], self.cols[mask], self.counts[mask]
+        if n < len(counts):
+            order = np.argpartition(-counts, n)[:n]
+        else:
+            order = np.arange(len(counts))
+        order = order[np.argsort(-counts[order], kind='stable')]
+        return [(self.cuis[rows[k]], self.cuis[cols[k]], int(counts[k])) for k in order]
+
+    def submatrix(self, cuis: Sequence[str]) -> np.ndarray:
+        """Dense symmetric counts for a small list of CUIs (e.g. a heatmap)"""
+        n = len(cuis)
+        matrix = np.zeros((n, n))
+        positions = {self.index[c]: k for k, c in enumerate(cuis) if c in self.index}
+        if not positions:
+            return matrix
+
+        selected = np.fromiter(positions.keys(), dtype=np.int64)
+        mask = np.isin(self.rows, selected) & np.isin(self.cols, selected)
+        for i, j, c in zip(self.rows[mask].tolist(), self.cols[mask].tolist(),
+                           self.counts[mask].tolist()):
+            a, b = positions[i], positions[j]
+            matrix[a, b] = matrix[b, a] = c
+        return matrix
+
+    def aggregate(self, groups: Mapping[str, str], labels: Sequence[str],
+                  min_count: int = 1) -> np.ndarray:
+        """Sum pair counts into a label x label matrix (e.g. by semantic type)
+
+        Args:
+            groups: CUI -> group label
+            labels: Group labels defining the matrix order
+            min_count: Ignore pairs seen in fewer notes
+        """
+        label_index = {label: k for k, label in enumerate(labels)}
+        cui_group = np.full(len(self.cuis), -1, dtype=np.int64)
+        for cui, label in groups.items():
+            i, k = self.index.get(cui), label_index.get(label)
+            if i is not None and k is not None:
+                cui_group[i] = k
+
+        g1, g2 = cui_group[self.rows], cui_group[self.cols]
+        mask = (self.counts >= min_count) & (g1 >= 0) & (g2 >= 0)
+        n = len(labels)
+        matrix = np.zeros((n, n), dtype=np.int64)
+        np.add.at(matrix, (g1[mask], g2[mask]), self.counts[mask])
+        np.add.at(matrix, (g2[mask], g1[mask]), self.counts[mask])
+        return matrix
+
+    def group_totals(self, groups: Mapping[str, str], min_count: int = 1) -> Dict[str, int]:
+        """Total co-occurrence count per group label (row sums of ``aggregate``)"""
+        labels = sorted(set(groups.values()))
+        totals = self.aggregate(groups, labels, min_count).sum(axis=1)
+        return {label: int(total) for label, total in zip(labels, totals)}
+
+    def to_dict(self, max_pairs: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Nested symmetric {cui1: {cui2: count}} dict (optionally top pairs only)"""
+        if max_pairs is not None and max_pairs < len(self.counts):
+            pairs = self.top_pairs(max_pairs)
+        else:
+            pairs = self.items()
+
+        result: Dict[str, Dict[str, int]] = {}
+        for cui1, cui2, count in pairs:
+            result.setdefault(cui1, {})[cui2] = count
+            result.setdefault(cui2, {})[cui1] = count
+        return result
+
+
+def _incidence(doc_concepts: Iterable[Iterable[str]],
+               allowed: Optional[Set[str]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Build CSR index arrays (indptr, indices) of the note x CUI matrix"""
+    index: Dict[str, int] = {}
+    indptr = [0]
+    indices: List[int] = []
+
+    for concepts in doc_concepts:
+        for cui in concepts:
+            if allowed is not None and cui not in allowed:
+                continue
+            i = index.get(cui)
+            if i is None:
+                i = index[cui] = len(index)
+            indices.append(i)
+        indptr.append(len(indices))
+
+    cuis = [None] * len(index)
+    for cui, i in index.items():
+        cuis[i] = cui
+    return cuis, np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64)
+
+
+def _pairs_scipy(indptr: np.ndarray, indices: np.ndarray,
+                 n_cuis: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    data = np.ones(len(indices), dtype=np.int32)
+    incidence = sp.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, n_cuis))
+    product = sp.triu(incidence.T.dot(incidence), k=1).tocoo()
+    return (product.row.astype(np.int64), product.col.astype(np.int64),
+            product.data.astype(np.int64))
+
+
+def _pairs_numpy(indptr: np.ndarray, indices: np.ndarray,
+                 n_cuis: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    keys_acc = np.empty(0, dtype=np.int64)
+    counts_acc = np.empty(0, dtype=np.int64)
+    pending: List[np.ndarray] = []
+    pending_size = 0
+
+    def flush():
+        nonlocal keys_acc, counts_acc, pending, pending_size
+        if not pending:
+            return
+        keys, counts = np.unique(np.concatenate(pending), return_counts=True)
+        keys = np.concatenate([keys_acc, keys])
+        counts = np.concatenate([counts_acc, counts])
+        keys_acc, inverse = np.unique(keys, return_inverse=True)
+        counts_acc = np.bincount(inverse, weights=counts).astype(np.int64)
+        pending, pending_size = [], 0
+
+    triu_cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+    for d in range(len(indptr) - 1):
+        doc = np.sort(indices[indptr[d]:indptr[d + 1]])
+        k = len(doc)
+        if k < 2:
+            continue
+        if k not in triu_cache:
+            triu_cache[k] = np.triu_indices(k, 1)
+        a, b = triu_cache[k]
+        pending.append(doc[a] * n_cuis + doc[b])
+        pending_size += len(a)
+        if pending_size >= PAIR_CHUNK_SIZE:
+            flush()
+    flush()
+
+    return keys_acc // n_cuis, keys_acc % n_cuis, counts_acc
+
+
+def build_cooccurrence(file_concepts: Mapping[str, Iterable[str]],
+                       min_count: int = 1,
+                       top_n: Optional[int] = None) -> SparseCooccurrence:
+    """Compute CUI co-occurrence across notes
+
+    Args:
+        file_concepts: Note id -> CUIs found in that note
+        min_count: Drop pairs seen together in fewer notes
+        top_n: Keep only the top_n CUIs by note frequency before pairing
+
+    Returns:
+        SparseCooccurrence with note frequencies and pair counts
+    """
+    doc_concepts = [set(concepts) for concepts in file_concepts.values()]
+
+    allowed = None
+    if top_n is not None:
+        freq: Dict[str, int] = {}
+        for concepts in doc_concepts:
+            for cui in concepts:
+                freq[cui] = freq.get(cui, 0) + 1
+        allowed = set(sorted(freq, key=lambda c: (-freq[c], c))[:top_n])
+
+    cuis, indptr, indices = _incidence(doc_concepts, allowed)
+    n_cuis = len(cuis)
+    doc_freq = np.bincount(indices, minlength=n_cuis)
+
+    if n_cuis < 2:
+        none = np.empty(0, dtype=np.int64)
+        return SparseCooccurrence(cuis, doc_freq, none, none, none)
+
+    if HAS_SCIPY:
+        rows, cols, counts = _pairs_scipy(indptr, indices, n_cuis)
+    else:
+        rows, cols, counts = _pairs_numpy(indptr, indices, n_cuis)
+
+    if min_count > 1:
+        mask = counts >= min_count
+        rows, cols, counts = rows[mask], cols[mask], counts[mask]
+
+    logger.debug(f"Co-occurrence: {len(doc_concepts)} notes, {n_cuis} CUIs, "
+                 f"{len(counts)} pairs")
+    return SparseCooccurrence(cuis, doc_freq, rows, cols, counts)
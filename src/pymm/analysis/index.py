@@ -0,0 +1,489 @@
+"""Persistent, incrementally updated index of MetaMap output CSVs
+
+Output directories only grow, yet every analysis command used to re-read
+every CSV. ``AnalysisIndex`` keeps the parsed contents of the outputs in a
+SQLite database inside the output directory (``.pymm_index.sqlite``):
+
+- ``files``: one row per output CSV with its mtime, size, row count,
+  batch markers and read error
+- ``terms``: each distinct (CUI, concept name, preferred name, semantic
+  types) combination, with the parsed semantic types in ``term_semtypes``
+- ``mentions``: one row per concept row of a CSV (file, row, term, score)
+- ``term_tokens``: normalized name tokens of each term
+
+Together with ``term_semtypes`` these form an inverted index from CUI,
+semantic type and name token to notes and row offsets, which
+``pymm.analysis.query`` uses for boolean cohort queries.
+
+``update`` re-scans only new or changed files (by mtime and size), drops
+removed ones and reads files in parallel shards through ``ingest_files``.
+Queries then run against the database without touching the CSVs.
+"""
+import io
+import csv
+import sqlite3
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .ingest import ingest_files, list_output_csvs
+from .query import name_tokens, run_query
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = ".pymm_index.sqlite"
+SCHEMA_VERSION = 2
+
+# Files scanned per ingest round; bounds the rows held in memory at once
+INDEX_BATCH_SIZE = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    has_start INTEGER NOT NULL DEFAULT 0,
+    has_end INTEGER NOT NULL DEFAULT 0,
+    has_error INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    cui TEXT NOT NULL,
+    concept_name TEXT NOT NULL,
+    pref_name TEXT NOT NULL,
+    sem_types TEXT NOT NULL,
+    UNIQUE (cui, concept_name, pref_name, sem_types)
+);
+CREATE TABLE IF NOT EXISTS term_semtypes (
+    term_id INTEGER NOT NULL,
+    semtype TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS term_tokens (
+    token TEXT NOT NULL,
+    term_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mentions (
+    file_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    term_id INTEGER NOT NULL,
+    score REAL
+);
+CREATE INDEX IF NOT EXISTS mentions_file ON mentions (file_id);
+CREATE INDEX IF NOT EXISTS mentions_term ON mentions (term_id, file_id);
+CREATE INDEX IF NOT EXISTS terms_cui ON terms (cui);
+CREATE INDEX IF NOT EXISTS term_semtypes_term ON term_semtypes (term_id);
+CREATE INDEX IF NOT EXISTS term_semtypes_semtype ON term_semtypes (semtype);
+CREATE INDEX IF NOT EXISTS term_tokens_token ON term_tokens (token);
+"""
+
+
+@dataclass
+class IndexedFile:
+    """Per-file summary stored in the index"""
+    name: str
+    mtime: float
+    size: int
+    rows: int
+    has_start: bool
+    has_end: bool
+    has_error: bool
+    error: Optional[str] = None
+
+
+@dataclass
+class IndexedTerm:
+    """A distinct concept as it appears in output rows"""
+    id: int
+    cui: str
+    concept_name: str
+    pref_name: str
+    sem_types: Tuple[str, ...]
+
+
+def parse_sem_types(value: str) -> List[str]:
+    """Split a SemTypes cell such as "[dsyn,sosy]" into semantic types"""
+    result = []
+    for st in value.strip('[]').split(','):
+        st = st.strip().strip("'\"")
+        if st:
+            result.append(st)
+    return result
+
+
+def scan_output_csv(csv_file: Path) -> Dict[str, Any]:
+    """Parse one output CSV into the fields stored by the index
+
+    Rows are (cui, concept_name, pref_name, sem_types, score). A read error
+    keeps the rows parsed so far and is recorded in ``error``.
+    """
+    stat = csv_file.stat()
+    result = {
+        "name": csv_file.name,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "rows": [],
+        "has_start": False,
+        "has_end": False,
+        "has_error": False,
+        "error": None
+    }
+
+    try:
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        result["has_start"] = "META_BATCH_START_NOTE_ID:" in content
+        result["has_end"] = "META_BATCH_END_NOTE_ID:" in content
+        result["has_error"] = ":ERROR" in content
+
+        with io.StringIO(content) as f:
+            # Skip the start marker line if present
+            first_line = f.readline()
+            if not first_line.startswith("META_BATCH_START"):
+                f.seek(0)
+
+            for row in csv.DictReader(f):
+                # Skip empty rows or end marker
+                if not row or 'META_BATCH' in str(row.get('CUI', '')):
+                    continue
+
+                score = row.get('Score', '').strip()
+                try:
+                    score = float(score) if score and score != '-' else None
+                except ValueError:
+                    score = None
+
+                result["rows"].append((
+                    row.get('CUI', '').strip(),
+                    row.get('ConceptName', '').strip(),
+                    row.get('PrefName', row.get('preferred_name', '')).strip(),
+                    row.get('SemTypes', row.get('semantic_types', '')).strip(),
+                    score
+                ))
+    except Exception as e:
+        result["error"] = str(e)
+
+    return result
+
+
+def _scan_shard(files: List[Path]) -> List[Dict[str, Any]]:
+    return [scan_output_csv(f) for f in files]
+
+
+def _concat(a: List, b: List) -> List:
+    a.extend(b)
+    return a
+
+
+class AnalysisIndex:
+    """SQLite index over the CSVs of an output directory"""
+
+    def __init__(self, output_dir: Path, path: Optional[Path] = None):
+        """
+        Args:
+            output_dir: Directory of MetaMap output CSVs
+            path: Index database (default: <output_dir>/.pymm_index.sqlite)
+        """
+        self.output_dir = Path(output_dir)
+        self.path = Path(path) if path else self.output_dir / INDEX_FILENAME
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self._term_ids: Optional[Dict[Tuple[str, str, str, str], int]] = None
+
+    def _init_schema(self):
+        conn = self.conn
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row and int(row[0]) == SCHEMA_VERSION:
+            return
+
+        # New index, or one written by another version: start from scratch
+        if row:
+            logger.info(f"Rebuilding analysis index {self.path} (schema changed)")
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'meta'")]
+        with conn:
+            for table in tables:
+                conn.execute(f"DROP TABLE {table}")
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                         (str(SCHEMA_VERSION),))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # Updating
+
+    def stale_files(self) -> Tuple[List[Path], List[str]]:
+        """Files to (re-)scan and names of indexed files that were removed"""
+        indexed = {name: (mtime, size) for name, mtime, size in
+                   self.conn.execute("SELECT name, mtime, size FROM files")}
+
+        changed = []
+        for csv_file in list_output_csvs(self.output_dir):
+            try:
+                stat = csv_file.stat()
+            except OSError:
+                continue
+            if indexed.pop(csv_file.name, None) != (stat.st_mtime, stat.st_size):
+                changed.append(csv_file)
+
+        return changed, list(indexed)
+
+    def update(self, workers: Optional[int] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """Bring the index up to date with the output directory
+
+        Args:
+            workers: Worker processes for scanning (default: CPU count)
+            on_progress: Called with (files scanned, files to scan)
+
+        Returns:
+            Counts of scanned, removed and indexed files
+        """
+        changed, removed = self.stale_files()
+
+        if removed:
+            with self.conn:
+                for name in removed:
+                    self._delete_file(name)
+
+        done = 0
+        if on_progress:
+            on_progress(done, len(changed))
+
+        for start in range(0, len(changed), INDEX_BATCH_SIZE):
+            batch = changed[start:start + INDEX_BATCH_SIZE]
+            scans = ingest_files(batch, _scan_shard, _concat, workers=workers) or []
+            with self.conn:
+                for scan in scans:
+                    self._store(scan)
+            done += len(batch)
+            if on_progress:
+                on_progress(done, len(changed))
+
+        indexed = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        if changed or removed:
+            logger.info(f"Analysis index: scanned {len(changed)}, removed {len(removed)}, "
+                        f"{indexed} files indexed")
+        return {"scanned": len(changed), "removed": len(removed), "indexed": indexed}
+
+    def _delete_file(self, name: str):
+        row = self.conn.execute("SELECT id FROM files WHERE name = ?", (name,)).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM mentions WHERE file_id = ?", (row[0],))
+            self.conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+    def _term_id(self, cui: str, concept_name: str, pref_name: str, sem_types: str) -> int:
+        if self._term_ids is None:
+            self._term_ids = {tuple(r[1:]): r[0] for r in self.conn.execute(
+                "SELECT id, cui, concept_name, pref_name, sem_types FROM terms")}
+
+        key = (cui, concept_name, pref_name, sem_types)
+        term_id = self._term_ids.get(key)
+        if term_id is None:
+            term_id = self.conn.execute(
+                "INSERT INTO terms (cui, concept_name, pref_name, sem_types) VALUES (?, ?, ?, ?)",
+                key).lastrowid
+            self.conn.executemany(
+                "INSERT INTO term_semtypes (term_id, semtype) VALUES (?, ?)",
+                [(term_id, st) for st in parse_sem_types(sem_types)])
+            tokens = set(name_tokens(pref_name)) | set(name_tokens(concept_name))
+            self.conn.executemany(
+                "INSERT INTO term_tokens (token, term_id) VALUES (?, ?)",
+                [(token, term_id) for token in tokens])
+            self._term_ids[key] = term_id
+        return term_id
+
+    def _store(self, scan: Dict[str, Any]):
+        self._delete_file(scan["name"])
+        file_id = self.conn.execute(
+            "INSERT INTO files (name, mtime, size, rows, has_start, has_end, has_error, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (scan["name"], scan["mtime"], scan["size"], len(scan["rows"]),
+             scan["has_start"], scan["has_end"], scan["has_error"], scan["error"])).lastrowid
+
+        self.conn.executemany(
+            "INSERT INTO mentions (file_id, row, term_id, score) VALUES (?, ?, ?, ?)",
+            [(file_id, i, self._term_id(*row[:4]), row[4]) for i, row in enumerate(scan["rows"])])
+
+    # Queries
+
+    def files(self) -> List[IndexedFile]:
+        """Summaries of all indexed files"""
+        return [
+            IndexedFile(name, mtime, size, rows, bool(has_start), bool(has_end),
+                        bool(has_error), error)
+            for name, mtime, size, rows, has_start, has_end, has_error, error in
+            self.conn.execute("SELECT name, mtime, size, rows, has_start, has_end, "
+                              "has_error, error FROM files ORDER BY name")
+        ]
+
+    def terms(self) -> Dict[int, IndexedTerm]:
+        """All distinct terms by id"""
+        sem_types: Dict[int, List[str]] = {}
+        for term_id, semtype in self.conn.execute("SELECT term_id, semtype FROM term_semtypes"):
+            sem_types.setdefault(term_id, []).append(semtype)
+
+        return {
+            term_id: IndexedTerm(term_id, cui, concept_name, pref_name,
+                                 tuple(sem_types.get(term_id, ())))
+            for term_id, cui, concept_name, pref_name in
+            self.conn.execute("SELECT id, cui, concept_name, pref_name FROM terms")
+        }
+
+    def postings(self, term_ids: Optional[Iterable[int]] = None,
+                 file_ids: Optional[Iterable[int]] = None
+                 ) -> Iterator[Tuple[int, str, int, List[float]]]:
+        """Yield (term id, file name, row count, scores) per term and file
+
+        Args:
+            term_ids: Restrict to these terms (default: all)
+            file_ids: Restrict to these files (default: all)
+        """
+        query = ("SELECT m.term_id, f.name, COUNT(*), GROUP_CONCAT(m.score) "
+                 "FROM mentions m JOIN files f ON f.id = m.file_id WHERE 1 ")
+        if term_ids is not None:
+            self._load_temp_ids("selected_terms", term_ids)
+            query += "AND m.term_id IN (SELECT id FROM selected_terms) "
+        if file_ids is not None:
+            self._load_temp_ids("selected_files", file_ids)
+            query += "AND m.file_id IN (SELECT id FROM selected_files) "
+        query += "GROUP BY m.term_id, m.file_id ORDER BY m.file_id"
+
+        for term_id, name, count, scores in self.conn.execute(query):
+            yield term_id, name, count, [float(s) for s in scores.split(',')] if scores else []
+
+    def _load_temp_ids(self, table: str, ids: Iterable[int]):
+        self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY)")
+        self.conn.execute(f"DELETE FROM {table}")
+        self.conn.executemany(f"INSERT OR IGNORE INTO {table} (id) VALUES (?)",
+                              ((i,) for i in ids))
+
+    def concept_counts(self) -> Counter:
+        """Occurrences per "preferred name (CUI)" over all files"""
+        return Counter({
+            f"{pref_name} ({cui})": count for cui, pref_name, count in self.conn.execute(
+                "SELECT t.cui, t.pref_name, COUNT(*) FROM mentions m "
+                "JOIN terms t ON t.id = m.term_id "
+                "WHERE t.cui != '' AND t.pref_name != '' GROUP BY t.cui, t.pref_name")
+        })
+
+    def semantic_type_counts(self) -> Counter:
+        """Occurrences per semantic type over all files"""
+        return Counter(dict(self.conn.execute(
+            "SELECT s.semtype, COUNT(*) FROM mentions m "
+            "JOIN term_semtypes s ON s.term_id = m.term_id GROUP BY s.semtype")))
+
+    def files_with_concepts(self) -> int:
+        """Number of files with at least one CUI with a preferred name"""
+        return self.conn.execute(
+            "SELECT COUNT(DISTINCT m.file_id) FROM mentions m JOIN terms t ON t.id = m.term_id "
+            "WHERE t.cui != '' AND t.pref_name != ''").fetchone()[0]
+
+    def concept_file_counts(self, file_names: Optional[Iterable[str]] = None) -> Counter:
+        """Number of files containing each "preferred name (CUI)"
+
+        Args:
+            file_names: Restrict to these files (default: all)
+        """
+        query = ("SELECT t.cui, t.pref_name, COUNT(DISTINCT m.file_id) FROM mentions m "
+                 "JOIN terms t ON t.id = m.term_id ")
+        if file_names is not None:
+            self._load_temp_ids("selected_files", self.file_ids(file_names))
+            query += "WHERE m.file_id IN (SELECT id FROM selected_files) AND "
+        else:
+            query += "WHERE "
+        query += "t.cui != '' AND t.pref_name != '' GROUP BY t.cui, t.pref_name"
+
+        return Counter({f"{pref_name} ({cui})": count
+                        for cui, pref_name, count in self.conn.execute(query)})
+
+    # Inverted index lookups used by pymm.analysis.query
+
+    def file_ids(self, file_names: Iterable[str]) -> Set[int]:
+        """Ids of the given file names"""
+        names = set(file_names)
+        return {file_id for file_id, name in self.conn.execute("SELECT id, name FROM files")
+                if name in names}
+
+    def file_names(self, file_ids: Iterable[int]) -> List[str]:
+        """Sorted names of the given file ids"""
+        ids = set(file_ids)
+        return sorted(name for file_id, name in self.conn.execute("SELECT id, name FROM files")
+                      if file_id in ids)
+
+    def all_file_ids(self) -> Set[int]:
+        return {file_id for (file_id,) in self.conn.execute("SELECT id FROM files")}
+
+    def term_ids_for_cui(self, cui: str) -> Set[int]:
+        return {term_id for (term_id,) in
+                self.conn.execute("SELECT id FROM terms WHERE cui = ?", (cui,))}
+
+    def term_ids_for_semtype(self, semtype: str) -> Set[int]:
+        return {term_id for (term_id,) in self.conn.execute(
+            "SELECT term_id FROM term_semtypes WHERE semtype = ?", (semtype,))}
+
+    def term_ids_for_token_prefix(self, prefix: str) -> Set[int]:
+        """Terms with a name token starting with prefix (an index range scan)"""
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return {term_id for (term_id,) in self.conn.execute(
+            "SELECT term_id FROM term_tokens WHERE token >= ? AND token < ?", (prefix, upper))}
+
+    def file_ids_for_terms(self, term_ids: Iterable[int]) -> Set[int]:
+        """Files mentioning any of the terms"""
+        term_ids = list(term_ids)
+        if not term_ids:
+            return set()
+        self._load_temp_ids("query_terms", term_ids)
+        return {file_id for (file_id,) in self.conn.execute(
+            "SELECT DISTINCT m.file_id FROM query_terms q "
+            "JOIN mentions m ON m.term_id = q.id")}
+
+    def search(self, query) -> List[str]:
+        """Names of the files matching a query (string or Query)
+
+        Example:
+            index.search('"kidney stone" AND hydroneph')
+        """
+        _, file_ids, _ = run_query(self, query)
+        return self.file_names(file_ids)
+
+    def matching_rows(self, query, limit: Optional[int] = None
+                      ) -> List[Tuple[str, int, str, str, Optional[float]]]:
+        """Rows of the matching files that satisfy a positive query condition
+
+        Returns:
+            (file name, row offset, CUI, preferred name, score) tuples
+        """
+        query, file_ids, cache = run_query(self, query)
+        term_ids = set()
+        for leaf in query.leaves():
+            term_ids |= leaf.term_ids(self, cache)
+        if not file_ids or not term_ids:
+            return []
+
+        self._load_temp_ids("selected_files", file_ids)
+        self._load_temp_ids("selected_terms", term_ids)
+        sql = ("SELECT f.name, m.row, t.cui, t.pref_name, m.score FROM mentions m "
+               "JOIN files f ON f.id = m.file_id JOIN terms t ON t.id = m.term_id "
+               "WHERE m.file_id IN (SELECT id FROM selected_files) "
+               "AND m.term_id IN (SELECT id FROM selected_terms) ORDER BY f.name, m.row")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return list(self.conn.execute(sql))
@@ -0,0 +1,127 @@
+"""Parallel ingestion of MetaMap output CSVs
+
+Analysis commands aggregate tens of thousands of output CSVs. Instead of
+reading them one after another, ``ingest_files`` splits the file list into
+shards, hands each shard to a worker process that returns a partial
+aggregate, and merges the partials with a pairwise tree reduction.
+
+Callers supply two picklable, module-level functions:
+
+- ``shard_func(files, *args)`` builds the partial aggregate for a shard
+- ``merge_func(a, b)`` merges partial ``b`` into ``a`` and returns it
+
+Small inputs (or ``workers=1``) are processed in-process with the same
+functions, so results never depend on the execution mode.
+
+With ``fold=True`` each partial is merged into a running total as soon as
+it arrives instead of being kept for the tree reduction, which bounds
+memory to one total plus the partials in flight. Use it when partials are
+large and ``merge_func`` is order-independent (e.g. sketches).
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Below this many files a process pool costs more than it saves
+MIN_PARALLEL_FILES = 200
+
+# Shards per worker; more shards give smoother progress and load balancing
+SHARDS_PER_WORKER = 8
+MAX_SHARD_SIZE = 500
+
+
+def list_output_csvs(output_dir: Path) -> List[Path]:
+    """Output CSVs of a directory, skipping hidden files"""
+    return [f for f in Path(output_dir).glob("*.csv") if not f.name.startswith('.')]
+
+
+def shard_files(files: Sequence[Path], workers: int) -> List[List[Path]]:
+    """Split files into roughly equal shards for the given worker count"""
+    if not files:
+        return []
+    target = max(1, workers * SHARDS_PER_WORKER)
+    size = max(1, min(MAX_SHARD_SIZE, -(-len(files) // target)))
+    return [list(files[i:i + size]) for i in range(0, len(files), size)]
+
+
+def tree_reduce(partials: List[Any], merge_func: Callable[[Any, Any], Any]) -> Any:
+    """Merge partial aggregates pairwise until one remains"""
+    if not partials:
+        return None
+    while len(partials) > 1:
+        merged = [merge_func(partials[i], partials[i + 1])
+                  for i in range(0, len(partials) - 1, 2)]
+        if len(partials) % 2:
+            merged.append(partials[-1])
+        partials = merged
+    return partials[0]
+
+
+def _run_sequential(shards, shard_func, merge_func, args, on_progress, fold=False) -> Any:
+    partials = []
+    for shard in shards:
+        partial = shard_func(shard, *args)
+        if fold and partials:
+            partials[0] = merge_func(partials[0], partial)
+        else:
+            partials.append(partial)
+        if on_progress:
+            on_progress(len(shard))
+    return tree_reduce(partials, merge_func)
+
+
+def ingest_files(files: Sequence[Path],
+                 shard_func: Callable[..., Any],
+                 merge_func: Callable[[Any, Any], Any],
+                 args: Tuple = (),
+                 workers: Optional[int] = None,
+                 on_progress: Optional[Callable[[int], None]] = None,
+                 fold: bool = False) -> Any:
+    """Aggregate files in parallel shards
+
+    Args:
+        files: Files to ingest
+        shard_func: Module-level function (files, *args) -> partial aggregate
+        merge_func: Module-level function (a, b) -> merged aggregate
+        args: Extra arguments passed to shard_func
+        workers: Worker processes (default: CPU count)
+        on_progress: Called with the number of files finished by each shard
+        fold: Merge partials as they arrive (bounded memory, arrival order)
+
+    Returns:
+        The merged aggregate, or None if there were no files
+    """
+    files = list(files)
+    workers = workers or os.cpu_count() or 1
+    if not files:
+        return None
+
+    shards = shard_files(files, workers)
+    if workers <= 1 or len(files) < MIN_PARALLEL_FILES:
+        return _run_sequential(shards, shard_func, merge_func, args, on_progress, fold)
+
+    # Partials are kept in shard order so merges are deterministic
+    partials = [None] * len(shards)
+    total = None
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+            futures = {executor.submit(shard_func, shard, *args): i
+                       for i, shard in enumerate(shards)}
+            for future in as_completed(futures):
+                index = futures[future]
+                partials[index] = future.result()
+                if fold:
+                    total = partials[index] if total is None else merge_func(total, partials[index])
+                    partials[index] = None
+                if on_progress:
+                    on_progress(len(shards[index]))
+    except (OSError, RuntimeError, ImportError) as e:
+        # e.g. BrokenProcessPool or no multiprocessing support on this platform
+        logger.warning(f"Parallel ingestion unavailable ({e}), reading sequentially")
+        return _run_sequential(shards, shard_func, merge_func, args, None, fold)
+
+    return total if fold else tree_reduce(partials, merge_func)
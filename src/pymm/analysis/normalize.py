@@ -0,0 +1,187 @@
+"""Concept name normalization
+
+Maps spelling variants of concept names (e.g. "renal calculi",
+"nephrolithiasis") to one canonical form ("Kidney Stone") and strips
+suffixes such as ", NOS" that carry no clinical meaning.
+
+The variant table is data: the built-in default can be replaced or
+extended from a JSON file of the form::
+
+    {
+        "canonical": {"Kidney Stone": ["kidney stones", "renal calculi"]},
+        "generic_terms": {"stone": "Kidney Stone"},
+        "suffixes": [", nos", " (disorder)"]
+    }
+
+All variants are folded into a single lower-case lookup, so a pandas
+column is normalized with one ``map`` over its unique values (as a
+categorical) and one compiled regex pass for the suffixes, instead of a
+full-column comparison per variant.
+"""
+import re
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Canonical concept name -> variants (matched case-insensitively)
+DEFAULT_NORMALIZATION: Dict[str, List[str]] = {
+    # Kidney stone as primary concept
+    'Kidney Stone': ['kidney stone', 'kidney stones', 'renal stone', 'renal stones',
+                     'renal calculus', 'renal calculi', 'nephrolithiasis', 'stone, kidney'],
+
+    # Ureteral concepts
+    'Ureteral': ['ureter', 'ureteric', 'ureteral'],
+    'Ureteral Stone': ['ureteral stone', 'ureteric stone', 'ureter stone',
+                       'ureteral calculus', 'ureteric calculus'],
+    'Ureteral Stent': ['stent', 'ureteral stent', 'ureteric stent', 'ureter stent',
+                       'stent placement', 'stent ureter', 'stent, ureter'],
+
+    # Procedures
+    'Ureteroscopy': ['ureteroscopy', 'urs'],
+    'Lithotripsy': ['lithotripsy', 'eswl', 'swl', 'shock wave lithotripsy'],
+    'PCNL': ['pcnl', 'percutaneous nephrolithotomy', 'percutaneous nephrolithotripsy'],
+    'Nephrostomy': ['nephrostomy', 'nephrostomy tube', 'percutaneous nephrostomy'],
+
+    # Symptoms
+    'Flank Pain': ['flank pain', 'flank', 'side pain', 'loin pain'],
+    'Hematuria': ['hematuria', 'blood in urine', 'bloody urine'],
+    'Renal Colic': ['renal colic', 'ureteral colic', 'ureteric colic'],
+    'Hydronephrosis': ['hydronephrosis', 'hydro'],
+
+    # Complications/Conditions
+    'Obstruction': ['obstruction', 'obstructive', 'obstructed'],
+    'UTI': ['uti', 'urinary tract infection', 'cystitis', 'pyelonephritis'],
+    'Hypertension': ['hypertension', 'htn', 'high blood pressure'],
+    'Diabetes': ['diabetes', 'dm', 'diabetes mellitus', 'iddm', 'niddm'],
+
+    # Stone composition
+    'Calcium Oxalate': ['calcium oxalate', 'calcium oxalate stone'],
+    'Calcium': ['calcium', 'ca'],
+    'Uric Acid': ['uric acid', 'urate'],
+    'Struvite': ['struvite', 'infection stone', 'triple phosphate'],
+
+    # Imaging
+    'CT Scan': ['ct', 'ct scan', 'cat scan', 'computed tomography', 'ct urogram'],
+    'Ultrasound': ['ultrasound', 'us', 'ultrasonography'],
+
+    # Pain management
+    'Pain': ['pain', 'painful', 'ache'],
+    'Morphine': ['morphine', 'ms'],
+    'NSAID': ['nsaid', 'nsaids', 'toradol', 'ketorolac', 'ibuprofen'],
+
+    # Other
+    'Emergency': ['emergency', 'emergent', 'urgent', 'ed', 'er'],
+    'Acute': ['acute', 'sudden onset', 'new onset'],
+    'Severe': ['severe', 'significant', 'marked']
+}
+
+# Standalone generic terms folded into the compound concept they belong to,
+# so "Kidney" and "Stone" do not appear separately next to "Kidney Stone"
+DEFAULT_GENERIC_TERMS: Dict[str, str] = {
+    'kidney': 'Kidney Stone',
+    'stone': 'Kidney Stone',
+    'renal': 'Kidney Stone',
+    'calculus': 'Kidney Stone',
+    'calculi': 'Kidney Stone',
+    'ureter': 'Ureteral',
+    'ureteric': 'Ureteral'
+}
+
+# Suffixes that don't add clinical meaning (removed case-insensitively)
+DEFAULT_SUFFIXES: List[str] = [
+    ', nos', ' nos', ', unspecified', ' - unspecified', ' (disorder)', ' (finding)'
+]
+
+
+class ConceptNormalizer:
+    """Normalizes concept names with a variant lookup and suffix stripping"""
+
+    def __init__(self, canonical: Optional[Mapping[str, Iterable[str]]] = None,
+                 generic_terms: Optional[Mapping[str, str]] = None,
+                 suffixes: Optional[Iterable[str]] = None):
+        """
+        Args:
+            canonical: Canonical name -> variants (default: DEFAULT_NORMALIZATION)
+            generic_terms: Standalone term -> canonical name (default:
+                DEFAULT_GENERIC_TERMS); applied after, and overriding, canonical
+            suffixes: Substrings removed after mapping (default: DEFAULT_SUFFIXES)
+        """
+        canonical = DEFAULT_NORMALIZATION if canonical is None else canonical
+        generic_terms = DEFAULT_GENERIC_TERMS if generic_terms is None else generic_terms
+        suffixes = DEFAULT_SUFFIXES if suffixes is None else list(suffixes)
+
+        # Later entries win, as when each variant was applied in turn
+        self.lookup: Dict[str, str] = {}
+        for name, variants in canonical.items():
+            for variant in variants:
+                self.lookup[variant.lower()] = name
+        for term, name in generic_terms.items():
+            self.lookup[term.lower()] = name
+
+        self.suffixes = suffixes
+        self.suffix_regex = re.compile(
+            '|'.join(re.escape(s) for s in suffixes), re.IGNORECASE) if suffixes else None
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], extend: bool = True) -> 'ConceptNormalizer':
+        """Load a normalization table from JSON
+
+        Args:
+            path: JSON file with optional "canonical", "generic_terms" and
+                "suffixes" entries
+            extend: Merge with the defaults instead of replacing them
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        canonical = data.get('canonical')
+        generic_terms = data.get('generic_terms')
+        suffixes = data.get('suffixes')
+        if extend:
+            canonical = {**DEFAULT_NORMALIZATION, **(canonical or {})}
+            generic_terms = {**DEFAULT_GENERIC_TERMS, **(generic_terms or {})}
+            suffixes = DEFAULT_SUFFIXES + [s for s in suffixes or [] if s not in DEFAULT_SUFFIXES]
+
+        logger.info(f"Loaded concept normalization table from {path}")
+        return cls(canonical, generic_terms, suffixes)
+
+    @classmethod
+    def from_config(cls, config=None) -> 'ConceptNormalizer':
+        """Normalizer for the concept_normalization_file config key (or defaults)"""
+        path = config.get('concept_normalization_file') if config else None
+        return cls.from_file(path) if path else cls()
+
+    def normalize(self, name: str) -> str:
+        """Normalize a single concept name"""
+        name = self.lookup.get(name.lower(), name)
+        if self.suffix_regex:
+            name = self.suffix_regex.sub('', name)
+        return name.strip()
+
+    def normalize_series(self, series):
+        """Normalize a pandas Series of concept names
+
+        The column is converted to a categorical so the lookup, suffix regex
+        and strip run once per distinct name; the results are then spread
+        back over the rows by category code. Missing values are kept.
+        """
+        categorical = series.astype('category')
+        categories = categorical.cat.categories.astype(str)
+        if not len(categories):
+            return series.copy()
+
+        mapped = categories.str.lower().map(self.lookup)
+        names = mapped.where(mapped.notna(), categories)
+        if self.suffix_regex:
+            names = names.str.replace(self.suffix_regex, '', regex=True)
+        names = names.str.strip()
+
+        codes = categorical.cat.codes.to_numpy()
+        values = np.asarray(names, dtype=object)[codes]
+        return series.__class__(values, index=series.index, name=series.name).where(
+            codes != -1, series)
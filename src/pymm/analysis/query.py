@@ -0,0 +1,230 @@
+"""Boolean concept queries over the analysis index
+
+Queries select notes (output files) by the concepts they contain, using the
+inverted index kept by ``AnalysisIndex`` (CUI, semantic type and preferred
+name token -> terms -> notes and rows) instead of scanning CSV rows.
+
+Leaves:
+
+- ``cui:C0022650`` - notes with the CUI
+- ``sem:dsyn`` - notes with a concept of the semantic type
+- ``term:kidney`` or a bare word - notes with a concept whose name has a
+  token starting with the word; a quoted phrase (``"kidney stone"``)
+  requires every word to prefix-match a token of the same concept
+
+Leaves combine with ``AND`` (also implicit), ``OR``, ``NOT`` and
+parentheses, e.g. ``"kidney stone" AND hydroneph NOT cui:C0041952``.
+The same queries can be built in Python with ``&``, ``|`` and ``~``::
+
+    Leaf('term', 'kidney stone') & ~Leaf('cui', 'C0041952')
+"""
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+FIELDS = ('cui', 'sem', 'term')
+
+_TOKEN_RE = re.compile(r'\(|\)|\w+:"[^"]*"|"[^"]*"|[^\s()]+')
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def name_tokens(text: str) -> List[str]:
+    """Normalized tokens of a concept name (lower-cased alphanumeric runs)"""
+    return _WORD_RE.findall(text.lower())
+
+
+class QueryError(ValueError):
+    """Raised for malformed query strings"""
+
+
+class Query:
+    """Base class of query nodes"""
+
+    def __and__(self, other: 'Query') -> 'Query':
+        return And(self, other)
+
+    def __or__(self, other: 'Query') -> 'Query':
+        return Or(self, other)
+
+    def __invert__(self) -> 'Query':
+        return Not(self)
+
+    def leaves(self) -> List['Leaf']:
+        return []
+
+    def evaluate(self, index, cache: Dict) -> Set[int]:
+        """Ids of the matching files"""
+        raise NotImplementedError
+
+
+class Leaf(Query):
+    """A single cui, sem or term condition"""
+
+    def __init__(self, field: str, value: str):
+        if field not in FIELDS:
+            raise QueryError(f"Unknown query field '{field}' (expected one of {', '.join(FIELDS)})")
+        if field == 'term' and not name_tokens(value):
+            raise QueryError(f"Empty term '{value}'")
+        self.field = field
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"{self.field}:{self.value!r}"
+
+    def leaves(self) -> List['Leaf']:
+        return [self]
+
+    def term_ids(self, index, cache: Dict) -> Set[int]:
+        """Ids of the index terms matching this leaf"""
+        key = ('terms', self.field, self.value)
+        if key not in cache:
+            if self.field == 'cui':
+                cache[key] = index.term_ids_for_cui(self.value.upper())
+            elif self.field == 'sem':
+                cache[key] = index.term_ids_for_semtype(self.value)
+            else:
+                ids = None
+                for word in name_tokens(self.value):
+                    matches = index.term_ids_for_token_prefix(word)
+                    ids = matches if ids is None else ids & matches
+                    if not ids:
+                        break
+                cache[key] = ids or set()
+        return cache[key]
+
+    def evaluate(self, index, cache: Dict) -> Set[int]:
+        key = ('files', self.field, self.value)
+        if key not in cache:
+            cache[key] = index.file_ids_for_terms(self.term_ids(index, cache))
+        return cache[key]
+
+
+class And(Query):
+    def __init__(self, *children: Query):
+        self.children = children
+
+    def __repr__(self) -> str:
+        return '(' + ' AND '.join(map(repr, self.children)) + ')'
+
+    def leaves(self) -> List[Leaf]:
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+    def evaluate(self, index, cache: Dict) -> Set[int]:
+        # Positive children first so NOT only ever narrows a candidate set
+        children = sorted(self.children, key=lambda c: isinstance(c, Not))
+        result = None
+        for child in children:
+            if isinstance(child, Not) and result is not None:
+                result = result - child.child.evaluate(index, cache)
+            else:
+                ids = child.evaluate(index, cache)
+                result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+
+class Or(Query):
+    def __init__(self, *children: Query):
+        self.children = children
+
+    def __repr__(self) -> str:
+        return '(' + ' OR '.join(map(repr, self.children)) + ')'
+
+    def leaves(self) -> List[Leaf]:
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+    def evaluate(self, index, cache: Dict) -> Set[int]:
+        result = set()
+        for child in self.children:
+            result |= child.evaluate(index, cache)
+        return result
+
+
+class Not(Query):
+    def __init__(self, child: Query):
+        self.child = child
+
+    def __repr__(self) -> str:
+        return f"NOT {self.child!r}"
+
+    def leaves(self) -> List[Leaf]:
+        # Negated conditions have no matching rows to report
+        return []
+
+    def evaluate(self, index, cache: Dict) -> Set[int]:
+        return index.all_file_ids() - self.child.evaluate(index, cache)
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def parse_query(text: str) -> Query:
+    """Parse a query string such as ``"kidney stone" AND NOT cui:C0041952``"""
+    tokens = _tokenize(text)
+    pos = 0
+
+    def peek() -> Optional[str]:
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take() -> str:
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or() -> Query:
+        children = [parse_and()]
+        while peek() is not None and peek().upper() == 'OR':
+            take()
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else Or(*children)
+
+    def parse_and() -> Query:
+        children = [parse_not()]
+        while peek() is not None and peek() != ')' and peek().upper() != 'OR':
+            if peek().upper() == 'AND':
+                take()
+            children.append(parse_not())
+        return children[0] if len(children) == 1 else And(*children)
+
+    def parse_not() -> Query:
+        if peek() is not None and peek().upper() == 'NOT':
+            take()
+            return Not(parse_not())
+        return parse_atom()
+
+    def parse_atom() -> Query:
+        token = peek()
+        if token is None:
+            raise QueryError(f"Unexpected end of query: {text!r}")
+        take()
+        if token == '(':
+            node = parse_or()
+            if peek() != ')':
+                raise QueryError(f"Missing ')' in query: {text!r}")
+            take()
+            return node
+        if token == ')' or token.upper() in ('AND', 'OR'):
+            raise QueryError(f"Unexpected '{token}' in query: {text!r}")
+
+        field, sep, value = token.partition(':')
+        if not sep or field.startswith('"'):
+            field, value = 'term', token
+        return Leaf(field.lower(), value.strip('"'))
+
+    query = parse_or()
+    if peek() is not None:
+        raise QueryError(f"Unexpected '{peek()}' in query: {text!r}")
+    return query
+
+
+def run_query(index, query) -> Tuple[Query, Set[int], Dict]:
+    """Evaluate a query (string or Query) against an index
+
+    Returns:
+        The parsed query, the matching file ids and the lookup cache
+    """
+    if isinstance(query, str):
+        query = parse_query(query)
+    cache: Dict = {}
+    return query, query.evaluate(index, cache), cache
@@ -0,0 +1,453 @@
+"""Fixed-memory streaming summaries
+
+Exact per-concept structures (a set of every file name, a list of every
+score, the concept set of every note) grow with the corpus. The sketches
+here have a size fixed at construction, can be merged (so worker shards
+combine through ``ingest_files``) and have known error bounds:
+
+- ``RunningStats`` - count, mean and variance (Welford); exact up to
+  floating point rounding
+- ``HyperLogLog`` - distinct counts; exact up to ``SPARSE_LIMIT`` items,
+  then a relative standard error of ``1.04 / sqrt(2 ** precision)``
+  (about 2.3% at the default precision of 11, 2 KB per sketch)
+- ``CountMinSketch`` - frequencies that are never under-estimated and are
+  over-estimated by at most ``e / width * total`` with probability at
+  least ``1 - exp(-depth)``
+- ``PairSketch`` - co-occurring concept pairs: a count-min sketch over all
+  pairs plus a bounded set of heavy-hitter candidates for the top K
+- ``ReservoirSample`` - a uniform fixed-size sample (e.g. for histograms)
+
+Items are hashed with 64-bit BLAKE2b rather than ``hash()``, which is
+salted per process, so sketches built in different workers merge.
+"""
+import math
+import random
+import hashlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Sketch defaults: ~2 KB per HyperLogLog, 16 MB per count-min sketch
+DEFAULT_HLL_PRECISION = 11
+DEFAULT_CMS_WIDTH = 1 << 20
+DEFAULT_CMS_DEPTH = 4
+DEFAULT_TOP_PAIRS = 1000
+
+
+def stable_hash(value: str) -> int:
+    """64-bit hash of a string that is the same in every process"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class RunningStats:
+    """Streaming count, mean, variance, min and max"""
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def update(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Combine with another summary (Chan et al. parallel update)"""
+        if not other.count:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance (as ``np.var``)"""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def __getstate__(self):
+        return (self.count, self.mean, self._m2, self.min, self.max)
+
+    def __setstate__(self, state):
+        self.count, self.mean, self._m2, self.min, self.max = state
+
+
+class HyperLogLog:
+    """Distinct-count sketch, exact while small"""
+
+    # Hashes kept exactly before switching to registers
+    SPARSE_LIMIT = 64
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 16, got {precision}")
+        self.precision = precision
+        self._exact: Optional[set] = set()
+        self._registers: Optional[bytearray] = None
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error once the sketch is no longer exact"""
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def add(self, value: str):
+        self.add_hash(stable_hash(value))
+
+    def add_hash(self, h: int):
+        if self._exact is not None:
+            self._exact.add(h)
+            if len(self._exact) > self.SPARSE_LIMIT:
+                self._densify()
+        else:
+            self._insert(h)
+
+    def _insert(self, h: int):
+        bits = 64 - self.precision
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        index = h >> bits
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def _densify(self):
+        self._registers = bytearray(1 << self.precision)
+        for h in self._exact:
+            self._insert(h)
+        self._exact = None
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        if other._exact is not None:
+            for h in other._exact:
+                self.add_hash(h)
+            return self
+        if self._exact is not None:
+            self._densify()
+        merged = np.maximum(np.frombuffer(self._registers, dtype=np.uint8),
+                            np.frombuffer(other._registers, dtype=np.uint8))
+        self._registers = bytearray(merged.tobytes())
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct items"""
+        if self._exact is not None:
+            return len(self._exact)
+
+        m = 1 << self.precision
+        registers = np.frombuffer(self._registers, dtype=np.uint8)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -registers.astype(np.int32))))
+
+        # Linear counting is more accurate for small cardinalities
+        zeros = int(np.count_nonzero(registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self) -> int:
+        return self.count()
+
+
+class CountMinSketch:
+    """Frequency sketch over 64-bit integer keys"""
+
+    def __init__(self, width: int = DEFAULT_CMS_WIDTH, depth: int = DEFAULT_CMS_DEPTH):
+        bits = max(1, int(width - 1).bit_length())
+        self.width = 1 << bits
+        self.depth = depth
+        self.total = 0
+        self.table = np.zeros((depth, self.width), dtype=np.uint32)
+
+        # Fixed odd multipliers (multiply-shift hashing), so sketches merge
+        rng = np.random.default_rng(0x5EED)
+        self._multipliers = rng.integers(1, 1 << 62, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._shift = np.uint64(64 - bits)
+
+    @property
+    def error_bound(self) -> float:
+        """Maximum over-count of an estimate with probability ``confidence``"""
+        return math.e / self.width * self.total
+
+    @property
+    def confidence(self) -> float:
+        return 1 - math.exp(-self.depth)
+
+    def _columns(self, keys: np.ndarray) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.uint64)
+        return (keys[None, :] * self._multipliers[:, None]) >> self._shift
+
+    def add(self, keys: np.ndarray):
+        """Count each key once (repeated keys are counted repeatedly)"""
+        if not len(keys):
+            return
+        columns = self._columns(keys)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(columns[row], minlength=self.width).astype(np.uint32)
+        self.total += len(keys)
+
+    def estimate(self, keys: np.ndarray) -> np.ndarray:
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        columns = self._columns(keys)
+        rows = np.arange(self.depth)[:, None]
+        return self.table[rows, columns].min(axis=0).astype(np.int64)
+
+    def merge(self, other: 'CountMinSketch') -> 'CountMinSketch':
+        if other.table.shape != self.table.shape:
+            raise ValueError("Cannot merge count-min sketches of different shape")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+
+def _pair_keys(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Mix two arrays of 64-bit item hashes into pair keys (splitmix64 finalizer)"""
+    key = first * np.uint64(0x9E3779B97F4A7C15) ^ second
+    key ^= key >> np.uint64(30)
+    key *= np.uint64(0xBF58476D1CE4E5B9)
+    key ^= key >> np.uint64(27)
+    key *= np.uint64(0x94D049BB133111EB)
+    key ^= key >> np.uint64(31)
+    return key
+
+
+class PairSketch:
+    """Top-K co-occurring item pairs in bounded memory
+
+    Every unordered pair of items in a note is counted in a count-min
+    sketch. Pairs whose estimate beats the current K-th candidate are kept
+    (with their item names) as heavy-hitter candidates; up to ``4 * k``
+    candidates survive each batch. Reported counts are count-min estimates,
+    so they never undercount and carry its error bound.
+
+    Exposes the read API of ``SparseCooccurrence`` (``top_pairs``,
+    ``items``, ``count``, ``submatrix``, ``to_dict``), so reports and plots
+    work with either.
+    """
+
+    # Pairs buffered before they are hashed and counted as one batch
+    BATCH_PAIRS = 200_000
+
+    def __init__(self, k: int = DEFAULT_TOP_PAIRS, width: int = DEFAULT_CMS_WIDTH,
+                 depth: int = DEFAULT_CMS_DEPTH):
+        self.k = k
+        self.capacity = 4 * k
+        self.sketch = CountMinSketch(width, depth)
+        self.notes = 0
+        self.candidates: Dict[int, Tuple[str, str]] = {}
+        self._floor = 0
+        self._pending: List[List[str]] = []
+        self._pending_pairs = 0
+        self._hashes: Dict[str, int] = {}
+        self._triu: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __getstate__(self):
+        self.flush()
+        state = self.__dict__.copy()
+        state['_hashes'] = {}
+        state['_triu'] = {}
+        return state
+
+    def _hash(self, item: str) -> int:
+        h = self._hashes.get(item)
+        if h is None:
+            h = self._hashes[item] = stable_hash(item)
+        return h
+
+    def _pairs(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        pairs = self._triu.get(n)
+        if pairs is None:
+            pairs = self._triu[n] = np.triu_indices(n, 1)
+        return pairs
+
+    def _keys(self, first: Sequence[str], second: Sequence[str]) -> np.ndarray:
+        a = np.fromiter((self._hash(x) for x in first), dtype=np.uint64, count=len(first))
+        b = np.fromiter((self._hash(x) for x in second), dtype=np.uint64, count=len(second))
+        return _pair_keys(a, b)
+
+    def add_note(self, items: Iterable[str]):
+        """Count every pair of the distinct items of one note"""
+        items = sorted(set(items))
+        self.notes += 1
+        if len(items) < 2:
+            return
+        self._pending.append(items)
+        self._pending_pairs += len(items) * (len(items) - 1) // 2
+        if self._pending_pairs >= self.BATCH_PAIRS:
+            self.flush()
+
+    def flush(self):
+        """Count buffered notes and refresh the candidates"""
+        if not self._pending:
+            return
+
+        names: List[str] = []
+        keys, firsts, seconds = [], [], []
+        for items in self._pending:
+            offset = len(names)
+            hashes = np.fromiter((self._hash(x) for x in items), dtype=np.uint64, count=len(items))
+            i, j = self._pairs(len(items))
+            keys.append(_pair_keys(hashes[i], hashes[j]))
+            firsts.append(i + offset)
+            seconds.append(j + offset)
+            names.extend(items)
+        self._pending = []
+        self._pending_pairs = 0
+
+        keys = np.concatenate(keys)
+        firsts = np.concatenate(firsts)
+        seconds = np.concatenate(seconds)
+        self.sketch.add(keys)
+
+        unique, first_seen = np.unique(keys, return_index=True)
+        estimates = self.sketch.estimate(unique)
+        selected = np.flatnonzero(estimates > self._floor)
+        if len(selected) > self.capacity:
+            selected = selected[np.argpartition(-estimates[selected], self.capacity)[:self.capacity]]
+        for s in selected.tolist():
+            position = first_seen[s]
+            self.candidates[int(unique[s])] = (names[firsts[position]], names[seconds[position]])
+        self._prune()
+
+    def _prune(self):
+        """Keep the best ``capacity`` candidates by current estimate"""
+        if len(self.candidates) <= self.capacity:
+            self._floor = 0
+            return
+        keys = np.fromiter(self.candidates.keys(), dtype=np.uint64, count=len(self.candidates))
+        estimates = self.sketch.estimate(keys)
+        keep = np.argpartition(-estimates, self.capacity - 1)[:self.capacity]
+        self.candidates = {int(keys[i]): self.candidates[int(keys[i])] for i in keep.tolist()}
+        self._floor = int(estimates[keep].min())
+
+    def merge(self, other: 'PairSketch') -> 'PairSketch':
+        self.flush()
+        other.flush()
+        self.sketch.merge(other.sketch)
+        self.notes += other.notes
+        self.candidates.update(other.candidates)
+        self._prune()
+        return self
+
+    @property
+    def error_bound(self) -> float:
+        return self.sketch.error_bound
+
+    @property
+    def confidence(self) -> float:
+        return self.sketch.confidence
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def __bool__(self) -> bool:
+        return bool(self.candidates) or bool(self._pending)
+
+    def count(self, first: str, second: str) -> int:
+        """Estimated number of notes containing both items"""
+        if first == second:
+            return 0
+        first, second = sorted((first, second))
+        return int(self.sketch.estimate(self._keys([first], [second]))[0])
+
+    def top_pairs(self, n: int = 10, min_count: int = 1) -> List[Tuple[str, str, int]]:
+        """The n pairs with the highest estimated counts"""
+        self.flush()
+        if not self.candidates:
+            return []
+        keys = np.fromiter(self.candidates.keys(), dtype=np.uint64, count=len(self.candidates))
+        estimates = self.sketch.estimate(keys)
+        order = np.argsort(-estimates, kind='stable')
+        pairs = []
+        for i in order[:min(n, self.k)].tolist():
+            if estimates[i] < min_count:
+                break
+            first, second = self.candidates[int(keys[i])]
+            pairs.append((first, second, int(estimates[i])))
+        return pairs
+
+    def items(self) -> Iterable[Tuple[str, str, int]]:
+        """The top K pairs (not every pair: the rest are only in the sketch)"""
+        return iter(self.top_pairs(self.k))
+
+    def submatrix(self, items: Sequence[str]) -> np.ndarray:
+        """Dense symmetric estimated counts for a small list of items"""
+        n = len(items)
+        matrix = np.zeros((n, n))
+        if n < 2:
+            return matrix
+        i, j = np.triu_indices(n, 1)
+        first = [min(items[a], items[b]) for a, b in zip(i.tolist(), j.tolist())]
+        second = [max(items[a], items[b]) for a, b in zip(i.tolist(), j.tolist())]
+        estimates = self.sketch.estimate(self._keys(first, second))
+        matrix[i, j] = estimates
+        matrix[j, i] = estimates
+        return matrix
+
+    def to_dict(self, max_pairs: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Nested symmetric {item1: {item2: count}} dict of the top pairs"""
+        result: Dict[str, Dict[str, int]] = {}
+        for first, second, count in self.top_pairs(min(max_pairs or self.k, self.k)):
+            result.setdefault(first, {})[second] = count
+            result.setdefault(second, {})[first] = count
+        return result
+
+
+class ReservoirSample:
+    """Uniform random sample of at most ``size`` values from a stream"""
+
+    def __init__(self, size: int = 10_000, seed: Optional[int] = None):
+        self.size = size
+        self.seen = 0
+        self.values: List[float] = []
+        self._random = random.Random(seed)
+
+    def add(self, value: float):
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            slot = self._random.randrange(self.seen)
+            if slot < self.size:
+                self.values[slot] = value
+
+    def update(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'ReservoirSample') -> 'ReservoirSample':
+        """Combine two samples, keeping each stream's share of the result"""
+        total = self.seen + other.seen
+        if not other.seen:
+            return self
+        size = min(self.size, len(self.values) + len(other.values))
+        # Values drawn from this sample follow the hypergeometric split of the streams
+        take = int(np.random.default_rng(self._random.getrandbits(32)).hypergeometric(
+            self.seen, other.seen, size))
+        take = max(size - len(other.values), min(take, len(self.values)))
+        self.values = (self._random.sample(self.values, take)
+                       + self._random.sample(other.values, size - take))
+        self.seen = total
+        return self
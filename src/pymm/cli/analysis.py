@@ -2,10 +2,12 @@
 import os
 import csv
 import json
+import sqlite3
+import functools
 from pathlib import Path
 from collections import Counter, defaultdict
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Set, Tuple, Optional
 import pandas as pd
 import numpy as np
 
@@ -15,6 +17,16 @@ from rich.table import Table
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich import box
+
+from ..analysis.cooccurrence import SparseCooccurrence, build_cooccurrence, REPORT_MAX_PAIRS
+from ..analysis.ingest import ingest_files, list_output_csvs
+from ..analysis.index import AnalysisIndex
+from ..analysis.query import QueryError
+from ..analysis.normalize import ConceptNormalizer
+from ..analysis.sketches import (
+    DEFAULT_TOP_PAIRS, HyperLogLog, PairSketch, ReservoirSample, RunningStats, stable_hash
+)
+from ..core.config import PyMMConfig
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -56,32 +68,68 @@ FILTER_PRESETS = {
 class ConceptAnalyzer:
     """Advanced concept analysis similar to kidney stone analysis"""
     
-    def __init__(self, output_dir: Path):
+    # Merge shard results as they arrive rather than all at the end
+    fold_partials = False
+    
+    def __init__(self, output_dir: Path, normalizer: Optional[ConceptNormalizer] = None):
         self.output_dir = Path(output_dir)
+        self.normalizer = normalizer  # Optional concept name normalization
         self.concepts = Counter()
         self.semantic_types = Counter()
         self.concept_details = defaultdict(dict)
         self.file_count = 0
         self.total_rows = 0
         self.failed_files = []
-        self.cooccurrence_matrix = defaultdict(Counter)
+        self.cooccurrence_matrix = SparseCooccurrence.empty()
         self.file_concepts = defaultdict(set)  # Track concepts per file
         
     def analyze_directory(self, filter_terms: Optional[List[str]] = None, 
                          filter_cuis: Optional[List[str]] = None,
-                         preset: Optional[str] = None):
-        """Analyze all CSV files in the output directory"""
-        # Apply preset filters if specified
-        if preset and preset in FILTER_PRESETS:
-            preset_config = FILTER_PRESETS[preset]
-            if not filter_terms:
-                filter_terms = preset_config.get('terms', [])
-            if not filter_cuis:
-                filter_cuis = preset_config.get('cuis', [])
-        
-        csv_files = list(self.output_dir.glob("*.csv"))
-        csv_files = [f for f in csv_files if not f.name.startswith('.')]
+                         preset: Optional[str] = None,
+                         workers: Optional[int] = None,
+                         use_index: bool = True,
+                         query: Optional[str] = None):
+        """Analyze all CSV files in the output directory
+        
+        By default results come from the persistent analysis index, which
+        only re-scans new or changed files. Otherwise (or if the index
+        cannot be opened) files are read in parallel shards across worker
+        processes (default: one per CPU) and the partial results merged.
+        
+        A query (see ``pymm.analysis.query``) restricts the analysis to the
+        matching notes; it requires the index.
+        """
+        filter_terms, filter_cuis = _apply_preset(filter_terms, filter_cuis, preset)
+        
+        partial = None
+        if use_index or query:
+            try:
+                partial = self._analyze_index(filter_terms, filter_cuis, workers, query)
+            except (sqlite3.Error, OSError) as e:
+                if query:
+                    raise
+                console.print(f"[yellow]Analysis index unavailable ({e}), reading files[/yellow]")
         
+        if partial is None:
+            partial = self._analyze_files(list_output_csvs(self.output_dir),
+                                          filter_terms, filter_cuis, workers)
+        
+        if partial is not None:
+            self.merge(partial)
+        
+        # Calculate co-occurrences
+        self._calculate_cooccurrences()
+        
+        return self._generate_report()
+    
+    def _shard_factory(self) -> Callable[[], 'ConceptAnalyzer']:
+        """Picklable constructor of empty analyzers for worker shards"""
+        return functools.partial(ConceptAnalyzer, self.output_dir, self.normalizer)
+    
+    def _analyze_files(self, csv_files: List[Path], filter_terms: Optional[List[str]],
+                       filter_cuis: Optional[List[str]],
+                       workers: Optional[int]) -> Optional['ConceptAnalyzer']:
+        """Analyze CSV files in parallel shards and return the merged partial"""
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -89,24 +137,148 @@ class ConceptAnalyzer:
         ) as progress:
             task = progress.add_task(f"Analyzing {len(csv_files)} files...", total=len(csv_files))
             
-            for csv_file in csv_files:
-                try:
-                    self._analyze_file(csv_file, filter_terms, filter_cuis)
-                    self.file_count += 1
-                    progress.update(task, advance=1)
-                except Exception as e:
-                    self.failed_files.append((csv_file.name, str(e)))
-                    progress.update(task, advance=1)
+            return ingest_files(
+                csv_files, _analyze_concept_shard, _merge_analyzers,
+                args=(self._shard_factory(), filter_terms, filter_cuis),
+                workers=workers,
+                on_progress=lambda n: progress.update(task, advance=n),
+                fold=self.fold_partials
+            )
+    
+    def _analyze_index(self, filter_terms: Optional[List[str]],
+                       filter_cuis: Optional[List[str]],
+                       workers: Optional[int],
+                       query: Optional[str] = None) -> 'ConceptAnalyzer':
+        """Build the analysis from the persistent index instead of the CSVs"""
+        partial = ConceptAnalyzer(self.output_dir, self.normalizer)
+        
+        with AnalysisIndex(self.output_dir) as index:
+            with console.status("Updating analysis index..."):
+                index.update(workers=workers)
+            
+            terms = index.terms()
+            selected = None
+            if filter_terms or filter_cuis:
+                selected = [term_id for term_id, term in terms.items()
+                            if _matches_filter(term.cui, term.concept_name, term.pref_name,
+                                               filter_terms, filter_cuis)]
+            
+            cohort = None
+            if query:
+                cohort = set(index.search(query))
+            
+            failed = set()
+            for indexed in index.files():
+                if cohort is not None and indexed.name not in cohort:
+                    continue
+                partial.total_rows += indexed.rows
+                if indexed.error:
+                    partial.failed_files.append((indexed.name, indexed.error))
+                    failed.add(indexed.name)
+                else:
+                    partial.file_count += 1
+                    partial.file_concepts[indexed.name] = set()
+            
+            seen = set()
+            cohort_ids = index.file_ids(cohort) if cohort is not None else None
+            for term_id, name, count, scores in index.postings(selected, cohort_ids):
+                term = terms[term_id]
+                seen.add(term_id)
+                if term.cui and term.pref_name:
+                    pref_name = term.pref_name
+                    if self.normalizer:
+                        pref_name = self.normalizer.normalize(pref_name)
+                    partial.concepts[f"{pref_name} ({term.cui})"] += count
+                    if name not in failed:
+                        partial.file_concepts[name].add(term.cui)
+                    partial._add_mentions(term.cui, pref_name, term.concept_name, name,
+                                          count, scores)
+                
+                for st in term.sem_types:
+                    partial.semantic_types[st] += count
+            
+            for term_id in seen:
+                term = terms[term_id]
+                if term.cui in partial.concept_details:
+                    partial.concept_details[term.cui]['semantic_types'].update(term.sem_types)
         
-        # Calculate co-occurrences
-        self._calculate_cooccurrences()
+        return partial
+    
+    def merge(self, other: 'ConceptAnalyzer') -> 'ConceptAnalyzer':
+        """Merge the per-file results of another (partial) analyzer into this one"""
+        self.concepts.update(other.concepts)
+        self.semantic_types.update(other.semantic_types)
+        self.file_count += other.file_count
+        self.total_rows += other.total_rows
+        self.failed_files.extend(other.failed_files)
+        self.file_concepts.update(other.file_concepts)
+        
+        for cui, details in other.concept_details.items():
+            mine = self.concept_details.get(cui)
+            if not mine:
+                self.concept_details[cui] = details
+            else:
+                self._merge_details(mine, details)
         
-        return self._generate_report()
+        return self
+    
+    def _new_details(self, pref_name: str, concept_name: str) -> Dict:
+        """Empty per-CUI details record"""
+        return {
+            'preferred_name': pref_name,
+            'concept_name': concept_name,
+            'semantic_types': set(),
+            'scores': [],
+            'count': 0,
+            'files': set()
+        }
+    
+    def _add_mentions(self, cui: str, pref_name: str, concept_name: str, file_name: str,
+                      count: int, scores: List[float], sem_types: Set[str] = frozenset()):
+        """Record the mentions of a CUI in one file"""
+        details = self.concept_details.get(cui)
+        if not details:
+            details = self.concept_details[cui] = self._new_details(pref_name, concept_name)
+        details['count'] += count
+        details['files'].add(file_name)
+        details['scores'].extend(scores)
+        details['semantic_types'] |= sem_types
+    
+    def _merge_details(self, mine: Dict, other: Dict):
+        mine['count'] += other['count']
+        mine['scores'].extend(other['scores'])
+        mine['files'] |= other['files']
+        mine['semantic_types'] |= other['semantic_types']
+    
+    def _add_file(self, file_name: str, cuis: Set[str]):
+        """Record the concepts of one file for co-occurrence analysis"""
+        self.file_concepts[file_name] = cuis
+    
+    def _score_summary(self, details: Dict) -> Tuple[float, float]:
+        """Mean and standard deviation of a CUI's scores"""
+        if details['scores']:
+            return np.mean(details['scores']), np.std(details['scores'])
+        return 0, 0
+    
+    def _file_count(self, details: Dict) -> int:
+        """Number of files mentioning a CUI"""
+        return len(details['files'])
+    
+    def _all_scores(self) -> List[float]:
+        """Scores for the score distribution plot"""
+        all_scores = []
+        for details in self.concept_details.values():
+            all_scores.extend(details['scores'])
+        return all_scores
     
     def _analyze_file(self, csv_file: Path, filter_terms: Optional[List[str]] = None,
                      filter_cuis: Optional[List[str]] = None):
         """Analyze a single CSV file"""
-        file_concepts = set()
+        # Per-file aggregates, recorded once the file has been read
+        file_counts = Counter()
+        file_scores = defaultdict(list)
+        file_sem_types = defaultdict(set)
+        names = {}
         
         with open(csv_file, 'r', encoding='utf-8') as f:
             # Skip the start marker line if present
@@ -144,27 +316,19 @@ class ConceptAnalyzer:
                     # If CUI matches, include it regardless of term filter
                 
                 if cui and pref_name:
+                    if self.normalizer:
+                        pref_name = self.normalizer.normalize(pref_name)
+                    
                     # Count concept occurrences
                     concept_key = f"{pref_name} ({cui})"
                     self.concepts[concept_key] += 1
-                    file_concepts.add(cui)
-                    
-                    # Store concept details
-                    if cui not in self.concept_details:
-                        self.concept_details[cui] = {
-                            'preferred_name': pref_name,
-                            'concept_name': concept_name,
-                            'semantic_types': set(),
-                            'scores': [],
-                            'count': 0,
-                            'files': set()
-                        }
+                    file_counts[cui] += 1
+                    if cui not in names:
+                        names[cui] = (pref_name, concept_name)
                     
-                    self.concept_details[cui]['count'] += 1
-                    self.concept_details[cui]['files'].add(csv_file.name)
                     if score and score != '-':
                         try:
-                            self.concept_details[cui]['scores'].append(float(score))
+                            file_scores[cui].append(float(score))
                         except ValueError:
                             pass
                 
@@ -175,32 +339,29 @@ class ConceptAnalyzer:
                         st = st.strip().strip("'\"")
                         if st:
                             self.semantic_types[st] += 1
-                            if cui in self.concept_details:
-                                self.concept_details[cui]['semantic_types'].add(st)
+                            if cui in names or cui in self.concept_details:
+                                file_sem_types[cui].add(st)
+        
+        # Store concept details
+        for cui, count in file_counts.items():
+            pref_name, concept_name = names[cui]
+            self._add_mentions(cui, pref_name, concept_name, csv_file.name, count,
+                               file_scores.get(cui, []), file_sem_types.pop(cui, frozenset()))
+        for cui, sem_types in file_sem_types.items():
+            self.concept_details[cui]['semantic_types'] |= sem_types
         
         # Store file concepts for co-occurrence analysis
-        self.file_concepts[csv_file.name] = file_concepts
+        self._add_file(csv_file.name, set(file_counts))
     
     def _calculate_cooccurrences(self):
-        """Calculate concept co-occurrences across files"""
-        # For each file, count co-occurrences
-        for file_name, concepts in self.file_concepts.items():
-            concept_list = list(concepts)
-            for i, cui1 in enumerate(concept_list):
-                for cui2 in concept_list[i+1:]:
-                    self.cooccurrence_matrix[cui1][cui2] += 1
-                    self.cooccurrence_matrix[cui2][cui1] += 1
+        """Calculate concept co-occurrences across files as a sparse product"""
+        self.cooccurrence_matrix = build_cooccurrence(self.file_concepts)
     
     def _generate_report(self) -> Dict:
         """Generate analysis report"""
         # Calculate average scores
         for cui, details in self.concept_details.items():
-            if details['scores']:
-                details['avg_score'] = np.mean(details['scores'])
-                details['score_std'] = np.std(details['scores'])
-            else:
-                details['avg_score'] = 0
-                details['score_std'] = 0
+            details['avg_score'], details['score_std'] = self._score_summary(details)
         
         return {
             'summary': {
@@ -216,7 +377,7 @@ class ConceptAnalyzer:
             'semantic_types': self.semantic_types.most_common(20),
             'concept_details': dict(self.concept_details),
             'failed_files': self.failed_files,
-            'cooccurrence_matrix': dict(self.cooccurrence_matrix)
+            'cooccurrence_matrix': self.cooccurrence_matrix.to_dict(max_pairs=REPORT_MAX_PAIRS)
         }
     
     def generate_visualizations(self, output_path: Path, filter_name: str = ""):
@@ -287,17 +448,10 @@ class ConceptAnalyzer:
             return
         
         # Get top concepts for visualization
-        top_concepts = [cui for concept, _ in self.concepts.most_common(15)]
         top_cuis = [concept.split('(')[1].rstrip(')') for concept, _ in self.concepts.most_common(15)]
         
         # Create adjacency matrix
-        n = len(top_cuis)
-        adj_matrix = np.zeros((n, n))
-        
-        for i, cui1 in enumerate(top_cuis):
-            for j, cui2 in enumerate(top_cuis):
-                if cui1 in self.cooccurrence_matrix and cui2 in self.cooccurrence_matrix[cui1]:
-                    adj_matrix[i, j] = self.cooccurrence_matrix[cui1][cui2]
+        adj_matrix = self.cooccurrence_matrix.submatrix(top_cuis)
         
         # Create heatmap
         plt.figure(figsize=(12, 10))
@@ -371,9 +525,7 @@ Average Concepts/File: {sum(self.concepts.values()) / self.file_count if self.fi
         
         # 4. Score distribution (middle center)
         ax4 = fig.add_subplot(gs[1, 1])
-        all_scores = []
-        for details in self.concept_details.values():
-            all_scores.extend(details['scores'])
+        all_scores = self._all_scores()
         
         if all_scores:
             ax4.hist(all_scores, bins=30, color='green', alpha=0.7, edgecolor='black')
@@ -386,7 +538,7 @@ Average Concepts/File: {sum(self.concepts.values()) / self.file_count if self.fi
         
         # 5. Files per concept distribution (middle right)
         ax5 = fig.add_subplot(gs[1, 2])
-        files_per_concept = [len(details['files']) for details in self.concept_details.values()]
+        files_per_concept = [self._file_count(details) for details in self.concept_details.values()]
         if files_per_concept:
             ax5.hist(files_per_concept, bins=20, color='orange', alpha=0.7, edgecolor='black')
             ax5.set_xlabel('Number of Files')
@@ -397,16 +549,11 @@ Average Concepts/File: {sum(self.concepts.values()) / self.file_count if self.fi
         ax6 = fig.add_subplot(gs[2, :])
         
         # Get top co-occurring pairs
-        cooccur_pairs = []
-        for cui1, others in self.cooccurrence_matrix.items():
-            for cui2, count in others.items():
-                if cui1 < cui2:  # Avoid duplicates
-                    name1 = self.concept_details.get(cui1, {}).get('preferred_name', cui1)[:20]
-                    name2 = self.concept_details.get(cui2, {}).get('preferred_name', cui2)[:20]
-                    cooccur_pairs.append((f"{name1} - {name2}", count))
-        
-        cooccur_pairs.sort(key=lambda x: x[1], reverse=True)
-        top_pairs = cooccur_pairs[:10]
+        top_pairs = []
+        for cui1, cui2, count in self.cooccurrence_matrix.top_pairs(10):
+            name1 = self.concept_details.get(cui1, {}).get('preferred_name', cui1)[:20]
+            name2 = self.concept_details.get(cui2, {}).get('preferred_name', cui2)[:20]
+            top_pairs.append((f"{name1} - {name2}", count))
         
         if top_pairs:
             pairs, counts = zip(*top_pairs)
@@ -441,7 +588,7 @@ Average Concepts/File: {sum(self.concepts.values()) / self.file_count if self.fi
                     'CUI': cui,
                     'Count': count,
                     'Avg Score': details.get('avg_score', 0),
-                    'Files': len(details.get('files', [])),
+                    'Files': self._file_count(details) if details else 0,
                     'Semantic Types': ', '.join(details.get('semantic_types', []))
                 })
             
@@ -455,16 +602,14 @@ Average Concepts/File: {sum(self.concepts.values()) / self.file_count if self.fi
             
             # Co-occurrences sheet
             cooccur_data = []
-            for cui1, others in self.cooccurrence_matrix.items():
-                for cui2, count in others.items():
-                    if cui1 < cui2:
-                        cooccur_data.append({
-                            'Concept 1': self.concept_details.get(cui1, {}).get('preferred_name', cui1),
-                            'CUI 1': cui1,
-                            'Concept 2': self.concept_details.get(cui2, {}).get('preferred_name', cui2),
-                            'CUI 2': cui2,
-                            'Co-occurrence Count': count
-                        })
+            for cui1, cui2, count in self.cooccurrence_matrix.items():
+                cooccur_data.append({
+                    'Concept 1': self.concept_details.get(cui1, {}).get('preferred_name', cui1),
+                    'CUI 1': cui1,
+                    'Concept 2': self.concept_details.get(cui2, {}).get('preferred_name', cui2),
+                    'CUI 2': cui2,
+                    'Co-occurrence Count': count
+                })
             
             if cooccur_data:
                 cooccur_df = pd.DataFrame(cooccur_data)
@@ -479,6 +624,183 @@ Average Concepts/File: {sum(self.concepts.values()) / self.file_count if self.fi
         console.print(f"[green]✓ Analysis exported to {output_file}[/green]")
 
 
+def _matches_filter(cui: str, concept_name: str, pref_name: str,
+                    filter_terms: Optional[List[str]],
+                    filter_cuis: Optional[List[str]]) -> bool:
+    """Row filter of ``ConceptAnalyzer._analyze_file`` applied to one term"""
+    if filter_cuis and cui not in filter_cuis:
+        if not filter_terms:
+            return False
+        names = concept_name.lower() + ' ' + pref_name.lower()
+        return any(term.lower() in names for term in filter_terms)
+    return True
+
+
+def _apply_preset(filter_terms: Optional[List[str]], filter_cuis: Optional[List[str]],
+                  preset: Optional[str]) -> Tuple[Optional[List[str]], Optional[List[str]]]:
+    """Fill in filter terms and CUIs from a preset unless given explicitly"""
+    if preset and preset in FILTER_PRESETS:
+        preset_config = FILTER_PRESETS[preset]
+        if not filter_terms:
+            filter_terms = preset_config.get('terms', [])
+        if not filter_cuis:
+            filter_cuis = preset_config.get('cuis', [])
+    return filter_terms, filter_cuis
+
+
+def _analyze_concept_shard(files: List[Path], factory: Callable[[], ConceptAnalyzer],
+                           filter_terms: Optional[List[str]],
+                           filter_cuis: Optional[List[str]]) -> ConceptAnalyzer:
+    """Analyze one shard of files in a worker process"""
+    analyzer = factory()
+    for csv_file in files:
+        try:
+            analyzer._analyze_file(csv_file, filter_terms, filter_cuis)
+            analyzer.file_count += 1
+        except Exception as e:
+            analyzer.failed_files.append((csv_file.name, str(e)))
+    return analyzer
+
+
+def _merge_analyzers(a, b):
+    return a.merge(b)
+
+
+class SketchConceptAnalyzer(ConceptAnalyzer):
+    """Concept analysis in bounded memory
+    
+    Instead of every file name and score per CUI and the concept set of
+    every file, this keeps running score statistics and a HyperLogLog file
+    count per CUI, streams each file's concepts into a count-min pair
+    sketch with top-K candidates, and samples scores for the histogram.
+    Memory grows with the concept vocabulary, not the number of files.
+    
+    Concept and semantic type counts stay exact; files per CUI and
+    co-occurrence counts are estimates within the bounds reported under
+    ``sketch`` (see ``pymm.analysis.sketches``).
+    """
+    
+    fold_partials = True
+    
+    def __init__(self, output_dir: Path, normalizer: Optional[ConceptNormalizer] = None,
+                 top_pairs: int = DEFAULT_TOP_PAIRS):
+        super().__init__(output_dir, normalizer)
+        self.top_pairs = top_pairs
+        self.cooccurrence_matrix = PairSketch(k=top_pairs)
+        self.score_sample = ReservoirSample()
+        self._file_hash = (None, 0)
+    
+    def analyze_directory(self, filter_terms: Optional[List[str]] = None,
+                          filter_cuis: Optional[List[str]] = None,
+                          preset: Optional[str] = None,
+                          workers: Optional[int] = None,
+                          use_index: bool = True,
+                          query: Optional[str] = None):
+        """Stream all CSV files through the sketches
+        
+        The analysis index is only used to resolve a query to its notes;
+        the notes themselves are always read from the CSVs.
+        """
+        filter_terms, filter_cuis = _apply_preset(filter_terms, filter_cuis, preset)
+        
+        csv_files = list_output_csvs(self.output_dir)
+        if query:
+            with AnalysisIndex(self.output_dir) as index:
+                with console.status("Updating analysis index..."):
+                    index.update(workers=workers)
+                cohort = set(index.search(query))
+            csv_files = [f for f in csv_files if f.name in cohort]
+        
+        partial = self._analyze_files(csv_files, filter_terms, filter_cuis, workers)
+        if partial is not None:
+            self.merge(partial)
+        
+        self._calculate_cooccurrences()
+        
+        return self._generate_report()
+    
+    def _shard_factory(self) -> Callable[[], ConceptAnalyzer]:
+        return functools.partial(SketchConceptAnalyzer, self.output_dir, self.normalizer,
+                                 self.top_pairs)
+    
+    def merge(self, other: 'SketchConceptAnalyzer') -> 'SketchConceptAnalyzer':
+        super().merge(other)
+        self.cooccurrence_matrix.merge(other.cooccurrence_matrix)
+        self.score_sample.merge(other.score_sample)
+        return self
+    
+    def _new_details(self, pref_name: str, concept_name: str) -> Dict:
+        return {
+            'preferred_name': pref_name,
+            'concept_name': concept_name,
+            'semantic_types': set(),
+            'count': 0,
+            'score_stats': RunningStats(),
+            'file_sketch': HyperLogLog()
+        }
+    
+    def _add_mentions(self, cui: str, pref_name: str, concept_name: str, file_name: str,
+                      count: int, scores: List[float], sem_types: Set[str] = frozenset()):
+        details = self.concept_details.get(cui)
+        if not details:
+            details = self.concept_details[cui] = self._new_details(pref_name, concept_name)
+        # All CUIs of a file are recorded together; hash its name once
+        if self._file_hash[0] != file_name:
+            self._file_hash = (file_name, stable_hash(file_name))
+        details['count'] += count
+        details['file_sketch'].add_hash(self._file_hash[1])
+        details['score_stats'].update(scores)
+        details['semantic_types'] |= sem_types
+        self.score_sample.update(scores)
+    
+    def _merge_details(self, mine: Dict, other: Dict):
+        mine['count'] += other['count']
+        mine['score_stats'].merge(other['score_stats'])
+        mine['file_sketch'].merge(other['file_sketch'])
+        mine['semantic_types'] |= other['semantic_types']
+    
+    def _add_file(self, file_name: str, cuis: Set[str]):
+        self.cooccurrence_matrix.add_note(cuis)
+    
+    def _calculate_cooccurrences(self):
+        self.cooccurrence_matrix.flush()
+    
+    def _score_summary(self, details: Dict) -> Tuple[float, float]:
+        stats = details['score_stats']
+        return (stats.mean, stats.std) if stats.count else (0, 0)
+    
+    def _file_count(self, details: Dict) -> int:
+        return details['file_sketch'].count()
+    
+    def _all_scores(self) -> List[float]:
+        return self.score_sample.values
+    
+    def _generate_report(self) -> Dict:
+        report = super()._generate_report()
+        
+        # Replace the sketch objects with their estimates
+        report['concept_details'] = {
+            cui: {
+                'preferred_name': details['preferred_name'],
+                'concept_name': details['concept_name'],
+                'semantic_types': details['semantic_types'],
+                'count': details['count'],
+                'files': details['file_sketch'].count(),
+                'avg_score': details['avg_score'],
+                'score_std': details['score_std']
+            }
+            for cui, details in self.concept_details.items()
+        }
+        report['sketch'] = {
+            'file_count_relative_error': HyperLogLog().relative_error,
+            'file_count_exact_below': HyperLogLog.SPARSE_LIMIT,
+            'pair_overcount_bound': self.cooccurrence_matrix.error_bound,
+            'pair_confidence': self.cooccurrence_matrix.confidence,
+            'top_pairs': self.top_pairs
+        }
+        return report
+
+
 class ProcessingSessionAnalyzer:
     """Analyze processing sessions with detailed statistics"""
     
@@ -687,7 +1009,19 @@ def analysis_group():
 @click.option('--export', '-e', type=click.Path(), help='Export detailed report to JSON')
 @click.option('--excel', '-x', type=click.Path(), help='Export to Excel file')
 @click.option('--top', '-n', default=20, help='Number of top concepts to show')
-def analyze_concepts(output_dir, filter, preset, visualize, export, excel, top):
+@click.option('--workers', '-j', type=int, help='Worker processes for reading files (default: CPU count)')
+@click.option('--no-index', is_flag=True, help='Read every CSV instead of using the analysis index')
+@click.option('--query', '-q', help='Only analyze notes matching a concept query, '
+              'e.g. \'"kidney stone" AND hydronephrosis\'')
+@click.option('--normalize', '-N', is_flag=True, help='Merge concept name variants (e.g. renal calculi -> Kidney Stone)')
+@click.option('--normalization-file', type=click.Path(exists=True),
+              help='JSON table of concept name variants (implies --normalize)')
+@click.option('--sketch', is_flag=True,
+              help='Bounded-memory analysis: estimated files per concept and co-occurrences')
+@click.option('--top-pairs', type=int, default=DEFAULT_TOP_PAIRS, show_default=True,
+              help='Co-occurring pairs tracked with --sketch')
+def analyze_concepts(output_dir, filter, preset, visualize, export, excel, top, workers, no_index, query,
+                     normalize, normalization_file, sketch, top_pairs):
     """Perform advanced concept analysis on output files
     
     Examples:
@@ -703,8 +1037,22 @@ def analyze_concepts(output_dir, filter, preset, visualize, export, excel, top):
         
         # Multiple analyses
         pymm analysis concepts output_csvs/ --preset kidney_symptoms --visualize --excel symptoms.xlsx
+        
+        # Cohort of kidney stone notes mentioning hydronephrosis
+        pymm analysis concepts output_csvs/ -q '"kidney stone" AND hydronephrosis'
+        
+        # Very large corpus in bounded memory
+        pymm analysis concepts output_csvs/ --sketch
     """
-    analyzer = ConceptAnalyzer(Path(output_dir))
+    normalizer = None
+    if normalization_file:
+        normalizer = ConceptNormalizer.from_file(normalization_file)
+    elif normalize:
+        normalizer = ConceptNormalizer.from_config(PyMMConfig())
+    if sketch:
+        analyzer = SketchConceptAnalyzer(Path(output_dir), normalizer, top_pairs)
+    else:
+        analyzer = ConceptAnalyzer(Path(output_dir), normalizer)
     
     filter_terms = list(filter) if filter else None
     filter_name = preset if preset else ("_".join(filter) if filter else "all")
@@ -720,7 +1068,12 @@ def analyze_concepts(output_dir, filter, preset, visualize, export, excel, top):
     else:
         console.print(f"\n[bold cyan]Analyzing all concepts...[/bold cyan]")
     
-    report = analyzer.analyze_directory(filter_terms, preset=preset)
+    try:
+        report = analyzer.analyze_directory(filter_terms, preset=preset, workers=workers,
+                                            use_index=not no_index, query=query)
+    except QueryError as e:
+        console.print(f"[red]Invalid query: {e}[/red]")
+        return
     
     # Display summary
     summary = report['summary']
@@ -737,6 +1090,13 @@ def analyze_concepts(output_dir, filter, preset, visualize, export, excel, top):
     
     console.print(summary_table)
     
+    if 'sketch' in report:
+        bounds = report['sketch']
+        console.print(f"[dim]Sketch estimates: files per concept ±{bounds['file_count_relative_error']:.1%} "
+                      f"(exact up to {bounds['file_count_exact_below']}), co-occurrences over-counted by "
+                      f"at most {bounds['pair_overcount_bound']:.0f} with {bounds['pair_confidence']:.0%} "
+                      f"confidence[/dim]")
+    
     # Display top concepts
     if report['top_concepts']:
         console.print(f"\n[bold]Top {min(top, len(report['top_concepts']))} Concepts[/bold]")
@@ -5,7 +5,6 @@ import time
 from pathlib import Path
 from typing import List, Dict, Any
 from datetime import datetime
-from concurrent.futures import ProcessPoolExecutor, as_completed
 import multiprocessing as mp
 
 from rich.console import Console
@@ -16,7 +15,8 @@ from rich.live import Live
 from rich.layout import Layout
 
 from ..core.config import PyMMConfig
-from ..cli.ultra_fast_batch import process_file_simple
+from ..cli.ultra_fast_batch import run_note_queue
+from ..core.inputs import InputRecord, collect_input_records
 
 console = Console()
 
@@ -31,18 +31,16 @@ class CleanBatchProcessor:
         
         # Get config
         config = PyMMConfig()
+        self.config = config
         self.mm_path = config.get("metamap_binary_path")
         
         # Calculate workers
         cpu_count = mp.cpu_count()
         self.workers = min(int(cpu_count * 0.8), 16)
     
-    def collect_files(self) -> List[Path]:
-        """Collect input files"""
-        files = []
-        for pattern in ['*.txt', '*.text']:
-            files.extend(self.input_dir.glob(pattern))
-        return sorted(files)
+    def collect_files(self) -> List[InputRecord]:
+        """Collect input notes (note files or corpus records)"""
+        return collect_input_records(self.input_dir, self.config)
     
     def process(self) -> Dict[str, Any]:
         """Process files with clean UI"""
@@ -59,12 +57,6 @@ class CleanBatchProcessor:
             title="⚡ Batch Processing ⚡"
         ))
         
-        # Prepare tasks
-        tasks = []
-        for f in files:
-            output_path = self.output_dir / f"{f.stem}.csv"
-            tasks.append((str(f), str(output_path), self.mm_path, 0))
-        
         # Process with clean progress
         results = {
             "processed": 0,
@@ -90,31 +82,25 @@ class CleanBatchProcessor:
                 total=len(files)
             )
             
-            # Simple progress without complex layout
-            # Process files
-            with ProcessPoolExecutor(max_workers=self.workers) as executor:
-                futures = {executor.submit(process_file_simple, task): task[0] for task in tasks}
+            def on_note(item, success, elapsed, error):
+                if success:
+                    results["processed"] += 1
+                else:
+                    results["failed"] += 1
+                
+                # Update progress
+                progress.update(main_task, advance=1)
                 
-                completed = 0
-                for future in as_completed(futures):
-                    try:
-                        _, success, elapsed, concepts = future.result()
-                        if success:
-                            results["processed"] += 1
-                        else:
-                            results["failed"] += 1
-                    except:
-                        results["failed"] += 1
-                    
-                    completed += 1
-                    # Update progress
-                    progress.update(main_task, advance=1)
-                    
-                    # Update description with rate
-                    elapsed_total = (datetime.now() - results["start_time"]).total_seconds()
-                    if elapsed_total > 0:
-                        rate = completed / elapsed_total
-                        progress.update(main_task, description=f"[cyan]Processing files ({rate:.1f}/sec)")
+                # Update description with rate
+                completed = results["processed"] + results["failed"]
+                elapsed_total = (datetime.now() - results["start_time"]).total_seconds()
+                if elapsed_total > 0:
+                    rate = completed / elapsed_total
+                    progress.update(main_task, description=f"[cyan]Processing files ({rate:.1f}/sec)")
+            
+            # Worker processes fed from the priority work queue; failed notes
+            # are retried within the run
+            run_note_queue(files, self.output_dir, self.mm_path, self.workers, self.config, on_note)
         
         # Final results
         elapsed = (datetime.now() - results["start_time"]).total_seconds()
@@ -2,6 +2,7 @@
 import click
 import sys
 import os
+import sqlite3
 from rich.console import Console
 from rich.table import Table
 from rich.prompt import Prompt, Confirm
@@ -476,33 +477,20 @@ def config_validate():
 
 # The setup and install_metamap commands will be defined in main.py where cli is available
 
-# Add concept statistics command group
-@click.group()
-def stats_group():
-    """View processing statistics and insights"""
-    pass
-
-@stats_group.command(name='concepts')
-@click.argument('output_dir', type=click.Path(exists=True))
-@click.option('--top', '-n', default=20, help='Number of top concepts to show')
-@click.option('--min-count', '-m', default=2, help='Minimum occurrence count')
-def concept_stats(output_dir, top, min_count):
-    """Show top extracted concepts from processed files"""
+def _concept_stats_shard(files):
+    """Count concepts and semantic types for one shard of output CSVs"""
     from collections import Counter
     import csv
-    from pathlib import Path
     
-    output_path = Path(output_dir)
-    concept_counter = Counter()
-    semantic_type_counter = Counter()
-    file_count = 0
-    total_rows = 0
+    stats = {
+        'concepts': Counter(),
+        'semantic_types': Counter(),
+        'file_count': 0,
+        'total_rows': 0,
+        'errors': []
+    }
     
-    # Read all CSV files
-    for csv_file in output_path.glob("*.csv"):
-        if csv_file.name.startswith('.'):
-            continue
-            
+    for csv_file in files:
         try:
             with open(csv_file, 'r', encoding='utf-8') as f:
                 # Skip the start marker line
@@ -518,15 +506,14 @@ def concept_stats(output_dir, top, min_count):
                     if not row or 'META_BATCH' in str(row.get('CUI', '')):
                         continue
                     
-                    total_rows += 1
+                    stats['total_rows'] += 1
                     
                     # Get concept info - check both possible column names
                     cui = row.get('CUI', '').strip()
                     pref_name = row.get('PrefName', row.get('preferred_name', '')).strip()
                     
                     if cui and pref_name:
-                        concept = f"{pref_name} ({cui})"
-                        concept_counter[concept] += 1
+                        stats['concepts'][f"{pref_name} ({cui})"] += 1
                         file_has_concepts = True
                     
                     # Get semantic types - check both possible column names
@@ -537,13 +524,77 @@ def concept_stats(output_dir, top, min_count):
                         for st in sem_types.split(','):
                             st = st.strip().strip("'\"")
                             if st:
-                                semantic_type_counter[st] += 1
+                                stats['semantic_types'][st] += 1
                 
                 if file_has_concepts:
-                    file_count += 1
+                    stats['file_count'] += 1
                     
         except Exception as e:
-            console.print(f"[yellow]Warning: Error reading {csv_file.name}: {e}[/yellow]")
+            stats['errors'].append((csv_file.name, str(e)))
+    
+    return stats
+
+def _concept_stats_from_index(output_path, workers=None):
+    """Concept statistics answered by the persistent analysis index"""
+    from ..analysis.index import AnalysisIndex
+    
+    with AnalysisIndex(output_path) as index:
+        with console.status("Updating analysis index..."):
+            index.update(workers=workers)
+        files = index.files()
+        return {
+            'concepts': index.concept_counts(),
+            'semantic_types': index.semantic_type_counts(),
+            'file_count': index.files_with_concepts(),
+            'total_rows': sum(f.rows for f in files),
+            'errors': [(f.name, f.error) for f in files if f.error]
+        }
+
+def _merge_concept_stats(a, b):
+    a['concepts'].update(b['concepts'])
+    a['semantic_types'].update(b['semantic_types'])
+    a['file_count'] += b['file_count']
+    a['total_rows'] += b['total_rows']
+    a['errors'].extend(b['errors'])
+    return a
+
+# Add concept statistics command group
+@click.group()
+def stats_group():
+    """View processing statistics and insights"""
+    pass
+
+@stats_group.command(name='concepts')
+@click.argument('output_dir', type=click.Path(exists=True))
+@click.option('--top', '-n', default=20, help='Number of top concepts to show')
+@click.option('--min-count', '-m', default=2, help='Minimum occurrence count')
+@click.option('--workers', '-j', type=int, help='Worker processes for reading files (default: CPU count)')
+@click.option('--no-index', is_flag=True, help='Read every CSV instead of using the analysis index')
+def concept_stats(output_dir, top, min_count, workers, no_index):
+    """Show top extracted concepts from processed files"""
+    from ..analysis.ingest import ingest_files, list_output_csvs
+    
+    output_path = Path(output_dir)
+    
+    stats = None
+    if not no_index:
+        try:
+            stats = _concept_stats_from_index(output_path, workers)
+        except (sqlite3.Error, OSError) as e:
+            console.print(f"[yellow]Analysis index unavailable ({e}), reading files[/yellow]")
+    
+    if stats is None:
+        # Read all CSV files in parallel shards
+        stats = ingest_files(list_output_csvs(output_path), _concept_stats_shard,
+                             _merge_concept_stats, workers=workers)
+        stats = stats or _concept_stats_shard([])
+    concept_counter = stats['concepts']
+    semantic_type_counter = stats['semantic_types']
+    file_count = stats['file_count']
+    total_rows = stats['total_rows']
+    
+    for name, error in stats['errors']:
+        console.print(f"[yellow]Warning: Error reading {name}: {error}[/yellow]")
     
     if not concept_counter:
         console.print("[yellow]No concepts found in output files[/yellow]")
@@ -599,11 +650,71 @@ def concept_stats(output_dir, top, min_count):
     console.print(f"  • Average concepts per file: {total_concepts/file_count:.1f}")
     console.print(f"  • Total semantic types: {len(semantic_type_counter)}")
 
+@stats_group.command(name='query')
+@click.argument('output_dir', type=click.Path(exists=True))
+@click.argument('query')
+@click.option('--limit', '-n', default=20, help='Number of matching notes to list')
+@click.option('--rows', '-r', is_flag=True, help='Show the matching concept rows')
+@click.option('--output', '-o', type=click.Path(), help='Write all matching note names to a file')
+@click.option('--workers', '-j', type=int, help='Worker processes for indexing files (default: CPU count)')
+def query_notes(output_dir, query, limit, rows, output, workers):
+    """Select notes by concepts using the analysis index
+    
+    QUERY combines cui:CUI, sem:TYPE and term words (prefix matched on
+    concept names, quote phrases) with AND, OR, NOT and parentheses.
+    
+    Examples:
+    
+        pymm stats query output_csvs/ '"kidney stone" AND hydroneph'
+        
+        pymm stats query output_csvs/ 'cui:C0022650 AND NOT sem:inpo' -r
+    """
+    from ..analysis.index import AnalysisIndex
+    from ..analysis.query import QueryError
+    
+    with AnalysisIndex(Path(output_dir)) as index:
+        with console.status("Updating analysis index..."):
+            index.update(workers=workers)
+        
+        start = time.time()
+        try:
+            names = index.search(query)
+        except QueryError as e:
+            console.print(f"[red]Invalid query: {e}[/red]")
+            sys.exit(1)
+        elapsed = time.time() - start
+        
+        total = len(index.all_file_ids())
+        console.print(f"\n[bold]{len(names):,}[/bold] of {total:,} notes match "
+                      f"[dim]({elapsed * 1000:.0f} ms)[/dim]\n")
+        
+        if rows:
+            row_table = Table(title="Matching Rows", box=box.ROUNDED)
+            row_table.add_column("Note", style="cyan")
+            row_table.add_column("Row", style="dim")
+            row_table.add_column("Concept (CUI)", style="green")
+            row_table.add_column("Score", style="yellow")
+            for name, row, cui, pref_name, score in index.matching_rows(query, limit=limit):
+                row_table.add_row(name, str(row), f"{pref_name} ({cui})",
+                                  f"{score:.0f}" if score is not None else "-")
+            console.print(row_table)
+        else:
+            for name in names[:limit]:
+                console.print(f"  • {name}")
+            if len(names) > limit:
+                console.print(f"[dim]... and {len(names) - limit} more[/dim]")
+    
+    if output:
+        Path(output).write_text("\n".join(names) + ("\n" if names else ""))
+        console.print(f"\n[green]✓ Wrote {len(names)} note names to {output}[/green]")
+
 @stats_group.command(name='explore')
 @click.argument('output_dir', type=click.Path(exists=True))
 @click.option('--detailed', '-d', is_flag=True, help='Show detailed file analysis')
 @click.option('--concepts', '-c', is_flag=True, help='Include concept analysis')
-def explore_output(output_dir, detailed, concepts):
+@click.option('--workers', '-j', type=int, help='Worker processes for indexing files (default: CPU count)')
+@click.option('--no-index', is_flag=True, help='Read every CSV instead of using the analysis index')
+def explore_output(output_dir, detailed, concepts, workers, no_index):
     """Comprehensive exploration of output directory"""
     from pathlib import Path
     import csv
@@ -634,7 +745,43 @@ def explore_output(output_dir, detailed, concepts):
     concept_counter = Counter()
     semantic_type_counter = Counter()
     
+    # File summaries and concept counts from the analysis index when available
+    index = None
+    indexed_files = {}
+    if not no_index:
+        from ..analysis.index import AnalysisIndex
+        try:
+            index = AnalysisIndex(output_path)
+            with console.status("Updating analysis index..."):
+                index.update(workers=workers)
+            indexed_files = {f.name: f for f in index.files()}
+            if concepts:
+                concept_counter = index.concept_counts()
+                semantic_type_counter = index.semantic_type_counts()
+        except (sqlite3.Error, OSError) as e:
+            console.print(f"[yellow]Analysis index unavailable ({e}), reading files[/yellow]")
+            index = None
+    
     for csv_file in csv_files:
+        indexed = indexed_files.get(csv_file.name)
+        if indexed:
+            file_size = indexed.size
+            total_size += file_size
+            total_concepts += indexed.rows
+            
+            if indexed.error:
+                failed_files.append((csv_file, file_size, 0))
+                console.print(f"[yellow]Warning: Error reading {csv_file.name}: {indexed.error}[/yellow]")
+            elif file_size < 100:
+                empty_files.append((csv_file, file_size))
+            elif indexed.has_error or (indexed.has_start and not indexed.has_end):
+                failed_files.append((csv_file, file_size, indexed.rows))
+            elif indexed.has_start and indexed.has_end:
+                complete_files.append((csv_file, file_size, indexed.rows))
+            else:
+                partial_files.append((csv_file, file_size, indexed.rows))
+            continue
+        
         file_size = csv_file.stat().st_size
         total_size += file_size
         
@@ -753,27 +900,31 @@ def explore_output(output_dir, detailed, concepts):
         concept_table.add_column("Files", style="dim")
         
         # Track which files contain each concept
-        concept_files = Counter()
-        for csv_file in complete_files + partial_files:
-            try:
-                with open(csv_file[0], 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    file_concepts = set()
+        if index:
+            concept_files = index.concept_file_counts(
+                [f[0].name for f in complete_files + partial_files])
+        else:
+            concept_files = Counter()
+            for csv_file in complete_files + partial_files:
+                try:
+                    with open(csv_file[0], 'r', encoding='utf-8') as f:
+                        reader = csv.DictReader(f)
+                        file_concepts = set()
                     
-                    for row in reader:
-                        if not row or 'META_BATCH' in str(row.get('CUI', '')):
-                            continue
-                        cui = row.get('CUI', '').strip()
-                        pref_name = row.get('PrefName', '').strip()
-                        if cui and pref_name:
-                            concept_key = f"{pref_name} ({cui})"
-                            file_concepts.add(concept_key)
+                        for row in reader:
+                            if not row or 'META_BATCH' in str(row.get('CUI', '')):
+                                continue
+                            cui = row.get('CUI', '').strip()
+                            pref_name = row.get('PrefName', '').strip()
+                            if cui and pref_name:
+                                concept_key = f"{pref_name} ({cui})"
+                                file_concepts.add(concept_key)
                     
-                    for concept in file_concepts:
-                        concept_files[concept] += 1
+                        for concept in file_concepts:
+                            concept_files[concept] += 1
                         
-            except:
-                pass
+                except:
+                    pass
         
         for i, (concept, count) in enumerate(concept_counter.most_common(15), 1):
             file_count = concept_files.get(concept, 0)
@@ -795,6 +946,9 @@ def explore_output(output_dir, detailed, concepts):
             
             console.print(sem_table)
     
+    if index:
+        index.close()
+    
     # Check state file
     state_file = output_path / ".pymm_state.json"
     if state_file.exists():
@@ -836,6 +990,57 @@ def explore_output(output_dir, detailed, concepts):
         if empty_files:
             console.print(f"  • Check {len(empty_files)} empty input files")
 
+# Per-stage latency traces recorded with `pymm process --trace`
+@click.group()
+def trace_group():
+    """Inspect and export per-stage processing traces"""
+    pass
+
+@trace_group.command(name='summary')
+@click.argument('trace_file', type=click.Path(exists=True, dir_okay=False))
+def trace_summary(trace_file):
+    """Show where processing time goes, per stage"""
+    from ..core.tracing import read_spans, summarize_spans
+    
+    summary = summarize_spans(read_spans(trace_file))
+    if not summary:
+        console.print("[yellow]No spans recorded in this trace[/yellow]")
+        return
+    
+    documents = summary.get("process_file", {}).get("total", 0)
+    table = Table(title="Stage Latency", box=box.ROUNDED)
+    table.add_column("Stage", style="cyan", no_wrap=True)
+    table.add_column("Count", justify="right")
+    table.add_column("Errors", justify="right", style="red")
+    table.add_column("Mean", justify="right", style="green")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right", style="yellow")
+    table.add_column("Max", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("% of Docs", justify="right", style="magenta")
+    
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        share = f"{stats['total'] / documents * 100:.1f}%" if documents else "-"
+        table.add_row(
+            name, f"{stats['count']:,}", str(stats['errors'] or ""),
+            f"{stats['mean']:.3f}s", f"{stats['p50']:.3f}s", f"{stats['p95']:.3f}s",
+            f"{stats['max']:.3f}s", f"{stats['total']:.1f}s", share
+        )
+    console.print(table)
+    console.print("[dim]Nested stages overlap their parents; % is relative to total process_file time[/dim]")
+
+@trace_group.command(name='export')
+@click.argument('trace_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', type=click.Path(dir_okay=False), required=True, help='Destination file')
+@click.option('--format', '-f', 'fmt', type=click.Choice(['chrome', 'otlp']), default='chrome',
+              help='chrome: trace-event JSON for chrome://tracing / Perfetto; otlp: OTLP/JSON request for an OpenTelemetry collector')
+def trace_export(trace_file, output, fmt):
+    """Export a trace for timeline or flame graph viewers"""
+    from ..core.tracing import export_trace
+    
+    count = export_trace(trace_file, output, format=fmt)
+    console.print(f"[green]✓ Exported {count:,} spans to {output}[/green]")
+
 @click.command()
 @click.option('--output-dir', '-o', type=click.Path(exists=True), 
               help='Output directory to monitor (deprecated - use job monitor instead)')
@@ -1002,12 +1207,16 @@ def retry(ctx, output_dir, max_attempts, workers):
         else:
             return runner._process_file_direct(file)
     
-    results = retry_manager.retry_failed_files(failed_files, process_func)
+    def bisect_func(file_path):
+        return runner._process_file_with_pool(Path(file_path), bisect=True)
+    
+    results = retry_manager.retry_failed_files(failed_files, process_func, bisect_func=bisect_func)
     
     # Show results
     click.echo(f"\nRetry Results:")
     click.echo(f"  Attempted: {results['attempted']}")
     click.echo(f"  Recovered: {results['recovered']}")
+    click.echo(f"  Bisected: {results.get('bisected', 0)}")
     click.echo(f"  Still Failed: {len(results['still_failed'])}")
     click.echo(f"  Skipped: {len(results['skipped'])}")
     
@@ -1046,7 +1255,7 @@ def retry_failed(output_dir, config, max_attempts, delay, filter_error, dry_run)
     import json
     import time
     from ..processing.batch_runner import BatchRunner
-    from ..core.config import Config
+    from ..processing.bisect_retry import is_timeout_error
     
     output_path = Path(output_dir)
     state_file = output_path / ".pymm_state.json"
@@ -1123,35 +1332,33 @@ def retry_failed(output_dir, config, max_attempts, delay, filter_error, dry_run)
         return
     
     # Load config
+    cfg = PyMMConfig()
     if config:
-        cfg = Config.from_file(config)
-    else:
-        cfg = Config()
-        # Try to use config from original session
-        if 'config' in state:
-            for key, value in state['config'].items():
-                setattr(cfg, key, value)
+        with open(config, 'r') as f:
+            cfg._config.update(json.load(f))
     
-    # Get input directory from state
+    # Get input directory from state, falling back to the failed files' location
     input_dir = state.get('input_dir')
-    if not input_dir or not Path(input_dir).exists():
+    if not input_dir:
+        input_dir = str(Path(retry_candidates[0]['path']).parent)
+    if not Path(input_dir).exists():
         console.print("[red]Original input directory not found in state or doesn't exist[/red]")
         return
     
-    # Create list of files to retry
-    retry_files = [candidate['path'] for candidate in retry_candidates]
+    runner = BatchRunner(input_dir, output_dir, cfg)
     
-    # Initialize batch runner with retry files
-    runner = BatchRunner(
-        input_dir=input_dir,
-        output_dir=output_dir,
-        config=cfg,
-        retry_files=retry_files  # Only process these specific files
-    )
+    if not (runner.server_manager.is_tagger_server_running() and
+            runner.server_manager.is_wsd_server_running()):
+        with console.status("Starting MetaMap servers..."):
+            if not runner.server_manager.start_all():
+                console.print("[red]Failed to start MetaMap servers[/red]")
+                return
     
     console.print(f"\n[cyan]Starting retry with {delay}s delay between files...[/cyan]")
     
-    # Run with retry logic
+    recovered = 0
+    still_failing = []
+    
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -1160,51 +1367,45 @@ def retry_failed(output_dir, config, max_attempts, delay, filter_error, dry_run)
         TimeRemainingColumn(),
         console=console
     ) as progress:
-        task = progress.add_task("Retrying failed files...", total=len(retry_files))
+        task = progress.add_task("Retrying failed files...", total=len(retry_candidates))
         
-        for i, file_path in enumerate(retry_files):
-            try:
+        try:
+            for i, candidate in enumerate(retry_candidates):
+                file_path = candidate['path']
+                
                 # Add delay between retries
                 if i > 0:
                     time.sleep(delay)
                 
-                # Update progress
-                progress.update(task, description=f"Retrying {Path(file_path).name}...")
+                progress.update(task, description=f"Retrying {candidate['name']}...")
                 
-                # Process file
-                runner.process_single_file(file_path)
-                
-                # Update state to mark as completed
-                if file_path in failed_files:
-                    del failed_files[file_path]
-                    
-                progress.update(task, advance=1)
+                # Timed-out documents are bisected instead of re-run whole
+                try:
+                    success, _, error = runner._process_file_with_pool(
+                        Path(file_path), bisect=is_timeout_error(candidate['error']))
+                except Exception as e:
+                    success, error = False, str(e)
                 
-            except Exception as e:
-                # Update attempt count
-                if file_path not in failed_files:
-                    failed_files[file_path] = {}
-                    
-                failed_files[file_path]['attempts'] = failed_files[file_path].get('attempts', 1) + 1
-                failed_files[file_path]['error'] = str(e)
-                failed_files[file_path]['timestamp'] = datetime.now().isoformat()
+                if success:
+                    runner.state_manager.mark_completed(file_path)
+                    recovered += 1
+                else:
+                    runner.state_manager.mark_failed(file_path, error or "Unknown error")
+                    with runner.state_manager._lock:
+                        runner.state_manager._state['failed_files'][file_path]['attempts'] = candidate['attempts'] + 1
+                        runner.state_manager.save()
+                    still_failing.append(file_path)
                 
                 progress.update(task, advance=1)
-    
-    # Save updated state
-    state['failed_files'] = failed_files
-    state['last_updated'] = datetime.now().isoformat()
-    
-    with open(state_file, 'w') as f:
-        json.dump(state, f, indent=2)
+        finally:
+            runner.worker_processors.close()
     
     # Show final results
-    successful = len(retry_candidates) - len(failed_files)
     console.print(f"\n[bold]Retry Results:[/bold]")
-    console.print(f"  [green]✓ Successfully processed: {successful}[/green]")
-    console.print(f"  [red]✗ Still failing: {len(failed_files)}[/red]")
+    console.print(f"  [green]✓ Successfully processed: {recovered}[/green]")
+    console.print(f"  [red]✗ Still failing: {len(still_failing)}[/red]")
     
-    if failed_files:
+    if still_failing:
         console.print("\n[yellow]Some files still failing. Run again to retry or check logs for details.[/yellow]")
 
 @click.command(name="process")
@@ -1218,8 +1419,10 @@ def retry_failed(output_dir, config, max_attempts, delay, filter_error, dry_run)
 @click.option("-m", "--interactive-monitor", is_flag=True, help="Enable interactive monitoring during processing")
 @click.option("-b", "--background", is_flag=True, help="Run in background mode (for nohup)")
 @click.option("--job-id", type=str, help="Job ID for tracking (used internally)")
+@click.option("--distributed/--no-distributed", default=None, help="Share the input/output directories with other nodes, claiming files via leases")
+@click.option("--node-id", type=str, help="Node id for distributed mode (defaults to host-pid)")
 @click.pass_context
-def process_cmd(ctx, input_dir, output_dir, workers, timeout, retry, instance_pool, start_servers, interactive_monitor, background, job_id):
+def process_cmd(ctx, input_dir, output_dir, workers, timeout, retry, instance_pool, start_servers, interactive_monitor, background, job_id, distributed, node_id):
     """Process files through MetaMap
     
     Examples:
@@ -1230,6 +1433,9 @@ def process_cmd(ctx, input_dir, output_dir, workers, timeout, retry, instance_po
         
         # Run in background
         nohup pymm process input_notes/ output_csvs/ --background &
+        
+        # Run the same job on several machines sharing an NFS directory
+        pymm process /shared/notes/ /shared/csvs/ --distributed
     """
     config = ctx.obj
     
@@ -1265,6 +1471,12 @@ def process_cmd(ctx, input_dir, output_dir, workers, timeout, retry, instance_po
     if job_id:
         config.set("job_id", job_id)
     
+    # Distributed mode across machines sharing the directories
+    if distributed is not None:
+        config.set("distributed", distributed)
+    if node_id:
+        config.set("node_id", node_id)
+    
     # Import and use chunked batch runner
     from ..processing.batch_runner import BatchRunner
     
@@ -1,4 +1,5 @@
 """Enhanced analysis features for PythonMetaMap based on clinical feedback"""
+import io
 import os
 import csv
 import json
@@ -21,6 +22,9 @@ from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich import box
 
+from ..analysis.cooccurrence import SparseCooccurrence, build_cooccurrence, REPORT_MAX_PAIRS
+from ..analysis.ingest import ingest_files, list_output_csvs
+
 console = Console()
 
 # Common noise terms to filter out
@@ -54,6 +58,10 @@ NOISE_CUIS = [
     'C0205161',  # Abnormal
 ]
 
+# Lower-cased sets for constant-time noise checks
+NOISE_TERM_SET = frozenset(term.lower() for term in NOISE_TERMS)
+NOISE_CUI_SET = frozenset(NOISE_CUIS)
+
 # Enhanced filter presets with note type specificity
 ENHANCED_FILTER_PRESETS = {
     'kidney_stone_comprehensive': {
@@ -130,6 +138,24 @@ DEMOGRAPHIC_PATTERNS = {
     ]
 }
 
+# Precompiled forms of the patterns above. Note types get one alternation
+# each (checked in order) over lower-cased text, so patterns containing
+# capitals (e.g. 'ED note') can never match and are left out. Leading
+# number groups only start at the beginning of a digit run, which finds
+# the same matches without retrying inside every number of the CSV.
+NOTE_TYPE_REGEXES = [
+    (note_type, re.compile('|'.join(re.escape(p) for p in patterns if p == p.lower())))
+    for note_type, patterns in NOTE_TYPE_PATTERNS.items()
+    if any(p == p.lower() for p in patterns)
+]
+DEMOGRAPHIC_REGEXES = {
+    key: [re.compile(re.sub(r'^\(\\d\+\)', r'(?<!\\d)(\\d+)', p), re.IGNORECASE)
+          for p in patterns]
+    for key, patterns in DEMOGRAPHIC_PATTERNS.items()
+}
+STONE_SIZE_REGEX = re.compile(r'(\d+(?:\.\d+)?)\s*mm')
+STONE_HU_REGEX = re.compile(r'(\d+)\s*HU|hounsfield', re.IGNORECASE)
+
 class EnhancedConceptAnalyzer:
     """Enhanced analyzer with clinical feedback implementations"""
     
@@ -141,7 +167,7 @@ class EnhancedConceptAnalyzer:
         self.file_count = 0
         self.total_rows = 0
         self.failed_files = []
-        self.cooccurrence_matrix = defaultdict(Counter)
+        self.cooccurrence_matrix = SparseCooccurrence.empty()
         self.file_concepts = defaultdict(set)
         
         # New features
@@ -172,10 +198,9 @@ class EnhancedConceptAnalyzer:
         
         # Fallback to content-based classification
         content_lower = content.lower()
-        for note_type, patterns in NOTE_TYPE_PATTERNS.items():
-            for pattern in patterns:
-                if pattern in content_lower:
-                    return note_type
+        for note_type, regex in NOTE_TYPE_REGEXES:
+            if regex.search(content_lower):
+                return note_type
         
         return 'unclassified'
     
@@ -184,15 +209,15 @@ class EnhancedConceptAnalyzer:
         demographics = {}
         
         # Extract age
-        for pattern in DEMOGRAPHIC_PATTERNS['age']:
-            match = re.search(pattern, content, re.IGNORECASE)
+        for regex in DEMOGRAPHIC_REGEXES['age']:
+            match = regex.search(content)
             if match:
                 demographics['age'] = match.group(1)
                 break
         
         # Extract sex
-        for pattern in DEMOGRAPHIC_PATTERNS['sex']:
-            match = re.search(pattern, content, re.IGNORECASE)
+        for regex in DEMOGRAPHIC_REGEXES['sex']:
+            match = regex.search(content)
             if match:
                 sex = match.group(1).lower()
                 if sex in ['m', 'male', 'man']:
@@ -242,7 +267,7 @@ class EnhancedConceptAnalyzer:
             pref_name = concept.get('PrefName', '').lower()
             
             # Size extraction (look for mm measurements)
-            size_match = re.search(r'(\d+(?:\.\d+)?)\s*mm', concept_text + ' ' + pref_name)
+            size_match = STONE_SIZE_REGEX.search(concept_text + ' ' + pref_name)
             if size_match:
                 phenotype['size'] = float(size_match.group(1))
             
@@ -273,7 +298,7 @@ class EnhancedConceptAnalyzer:
                 phenotype['multiplicity'] = 'single'
             
             # Hounsfield units
-            hu_match = re.search(r'(\d+)\s*HU|hounsfield', concept_text + ' ' + pref_name, re.IGNORECASE)
+            hu_match = STONE_HU_REGEX.search(concept_text + ' ' + pref_name)
             if hu_match:
                 phenotype['hounsfield_units'] = int(hu_match.group(1))
         
@@ -282,8 +307,13 @@ class EnhancedConceptAnalyzer:
     def analyze_directory_enhanced(self, filter_terms: Optional[List[str]] = None, 
                                   filter_cuis: Optional[List[str]] = None,
                                   preset: Optional[str] = None,
-                                  sample_size: int = 100):
-        """Enhanced analysis with all new features"""
+                                  sample_size: int = 100,
+                                  workers: Optional[int] = None):
+        """Enhanced analysis with all new features
+        
+        Files are read in parallel shards across worker processes (default:
+        one per CPU) and the partial results merged.
+        """
         
         # Apply preset filters if specified
         if preset and preset in ENHANCED_FILTER_PRESETS:
@@ -293,13 +323,12 @@ class EnhancedConceptAnalyzer:
             if not filter_cuis:
                 filter_cuis = preset_config.get('cuis', [])
         
-        csv_files = list(self.output_dir.glob("*.csv"))
-        csv_files = [f for f in csv_files if not f.name.startswith('.')]
+        csv_files = list_output_csvs(self.output_dir)
         
         # Random sampling for validation
         import random
-        validation_indices = set(random.sample(range(len(csv_files)), 
-                                             min(sample_size, len(csv_files))))
+        validation_files = {csv_files[i].name for i in
+                            random.sample(range(len(csv_files)), min(sample_size, len(csv_files)))}
         
         with Progress(
             SpinnerColumn(),
@@ -309,36 +338,58 @@ class EnhancedConceptAnalyzer:
             task = progress.add_task(f"Enhanced analysis of {len(csv_files)} files...", 
                                    total=len(csv_files))
             
-            for idx, csv_file in enumerate(csv_files):
-                try:
-                    # Store filename for note type detection
-                    self._current_filename = csv_file.stem
-                    
-                    # Check if this file should be in validation sample
-                    is_validation = idx in validation_indices
-                    
-                    self._analyze_file_enhanced(csv_file, filter_terms, filter_cuis, 
-                                              is_validation)
-                    self.file_count += 1
-                    progress.update(task, advance=1)
-                except Exception as e:
-                    self.failed_files.append((csv_file.name, str(e)))
-                    progress.update(task, advance=1)
+            partial = ingest_files(
+                csv_files, _analyze_enhanced_shard, _merge_enhanced_analyzers,
+                args=(self.output_dir, filter_terms, filter_cuis, validation_files),
+                workers=workers,
+                on_progress=lambda n: progress.update(task, advance=n)
+            )
+        
+        if partial is not None:
+            self.merge(partial)
         
         # Calculate co-occurrences
         self._calculate_cooccurrences()
         
         return self._generate_enhanced_report()
     
+    def merge(self, other: 'EnhancedConceptAnalyzer') -> 'EnhancedConceptAnalyzer':
+        """Merge the per-file results of another (partial) analyzer into this one"""
+        self.concepts.update(other.concepts)
+        self.semantic_types.update(other.semantic_types)
+        self.note_types.update(other.note_types)
+        self.file_count += other.file_count
+        self.total_rows += other.total_rows
+        self.failed_files.extend(other.failed_files)
+        self.file_concepts.update(other.file_concepts)
+        self.validation_samples.extend(other.validation_samples)
+        self.stone_phenotypes.update(other.stone_phenotypes)
+        
+        for note_type, counts in other.note_type_concepts.items():
+            self.note_type_concepts[note_type].update(counts)
+        for patient_id, notes in other.patient_notes.items():
+            self.patient_notes[patient_id].extend(notes)
+        for key, values in other.demographics.items():
+            self.demographics[key].update(values)
+        for proc_type, procedures in other.procedure_classifications.items():
+            self.procedure_classifications[proc_type].extend(procedures)
+        
+        for cui, details in other.concept_details.items():
+            mine = self.concept_details.get(cui)
+            if not mine:
+                self.concept_details[cui] = details
+                continue
+            mine['count'] += details['count']
+            mine['scores'].extend(details['scores'])
+            mine['files'] |= details['files']
+            mine['semantic_types'] |= details['semantic_types']
+            mine['note_types'].update(details['note_types'])
+        
+        return self
+    
     def _calculate_cooccurrences(self):
-        """Calculate concept co-occurrences across files"""
-        # For each file, count co-occurrences
-        for file_name, concepts in self.file_concepts.items():
-            concept_list = list(concepts)
-            for i, cui1 in enumerate(concept_list):
-                for cui2 in concept_list[i+1:]:
-                    self.cooccurrence_matrix[cui1][cui2] += 1
-                    self.cooccurrence_matrix[cui2][cui1] += 1
+        """Calculate concept co-occurrences across files as a sparse product"""
+        self.cooccurrence_matrix = build_cooccurrence(self.file_concepts)
     
     def _analyze_file_enhanced(self, csv_file: Path, filter_terms: Optional[List[str]] = None,
                               filter_cuis: Optional[List[str]] = None, 
@@ -351,27 +402,32 @@ class EnhancedConceptAnalyzer:
         file_parts = csv_file.stem.split('_')
         patient_id = file_parts[2] if len(file_parts) > 2 else 'unknown'
         
-        # Read file content for note type classification
+        # Lower-case filter terms once per file rather than per row
+        filter_terms_lower = [term.lower() for term in filter_terms] if filter_terms else None
+        
+        # Read the file once; the text feeds the classifiers and the CSV parser
         with open(csv_file, 'r', encoding='utf-8') as f:
             content = f.read()
-            note_type = self.classify_note_type(content)
-            self.note_types[note_type] += 1
-            
-            # Extract demographics
-            demo = self.extract_demographics(content)
-            if demo:
-                for key, value in demo.items():
-                    self.demographics[key][value] += 1
+            timestamp = os.fstat(f.fileno()).st_mtime
+        
+        note_type = self.classify_note_type(content)
+        self.note_types[note_type] += 1
+        
+        # Extract demographics
+        demo = self.extract_demographics(content)
+        if demo:
+            for key, value in demo.items():
+                self.demographics[key][value] += 1
         
         # Track patient notes
         self.patient_notes[patient_id].append({
             'file': csv_file.name,
             'note_type': note_type,
-            'timestamp': csv_file.stat().st_mtime
+            'timestamp': timestamp
         })
         
         # Process concepts
-        with open(csv_file, 'r', encoding='utf-8') as f:
+        with io.StringIO(content) as f:
             # Skip the start marker line if present
             first_line = f.readline()
             if not first_line.startswith("META_BATCH_START"):
@@ -394,18 +450,13 @@ class EnhancedConceptAnalyzer:
                 score = row.get('Score', '').strip()
                 
                 # Filter out noise
-                if cui in NOISE_CUIS:
+                if cui in NOISE_CUI_SET:
                     continue
                 
                 # Check if concept is too generic/noisy
-                is_noise = False
-                for noise_term in NOISE_TERMS:
-                    if (pref_name.lower() == noise_term.lower() or 
-                        concept_name.lower() == noise_term.lower()):
-                        is_noise = True
-                        break
-                
-                if is_noise:
+                pref_lower = pref_name.lower()
+                concept_lower = concept_name.lower()
+                if pref_lower in NOISE_TERM_SET or concept_lower in NOISE_TERM_SET:
                     continue
                 
                 # Apply filters if specified
@@ -413,9 +464,9 @@ class EnhancedConceptAnalyzer:
                     # Check CUI filter
                     if filter_cuis and cui not in filter_cuis:
                         # Check term filter
-                        if filter_terms:
-                            if not any(term.lower() in (concept_name.lower() + ' ' + pref_name.lower()) 
-                                      for term in filter_terms):
+                        if filter_terms_lower:
+                            names = concept_lower + ' ' + pref_lower
+                            if not any(term in names for term in filter_terms_lower):
                                 continue
                         else:
                             continue
@@ -523,7 +574,7 @@ class EnhancedConceptAnalyzer:
             'semantic_types': self.semantic_types.most_common(20),
             'concept_details': dict(self.concept_details),
             'failed_files': self.failed_files,
-            'cooccurrence_matrix': dict(self.cooccurrence_matrix),
+            'cooccurrence_matrix': self.cooccurrence_matrix.to_dict(max_pairs=REPORT_MAX_PAIRS),
             'stone_phenotypes': dict(self.stone_phenotypes),
             'validation_samples': self.validation_samples[:10]  # First 10 for display
         }
@@ -543,42 +594,21 @@ class EnhancedConceptAnalyzer:
                 semantic_groups[sem_type].add(cui)
                 concept_to_semantic[cui] = sem_type
         
-        # Create co-occurrence matrix by semantic type
-        semantic_cooccur = defaultdict(lambda: defaultdict(int))
-        
-        for cui1, others in self.cooccurrence_matrix.items():
-            if cui1 not in concept_to_semantic:
-                continue
-            sem1 = concept_to_semantic[cui1]
-            
-            for cui2, count in others.items():
-                if cui2 not in concept_to_semantic or count < min_cooccurrence:
-                    continue
-                sem2 = concept_to_semantic[cui2]
-                
-                # Aggregate co-occurrences by semantic type
-                semantic_cooccur[sem1][sem2] += count
+        # Aggregate co-occurrences by semantic type straight from the sparse counts
+        sem_totals = self.cooccurrence_matrix.group_totals(
+            concept_to_semantic, min_count=min_cooccurrence)
         
         # Select top semantic types by total co-occurrences
-        sem_totals = {}
-        for sem1, others in semantic_cooccur.items():
-            total = sum(others.values())
-            if total > 0:
-                sem_totals[sem1] = total
-        
-        top_semantics = sorted(sem_totals.items(), key=lambda x: x[1], reverse=True)[:top_n]
+        top_semantics = sorted(
+            ((sem, total) for sem, total in sem_totals.items() if total > 0),
+            key=lambda x: x[1], reverse=True)[:top_n]
         selected_sems = [sem for sem, _ in top_semantics]
         
         # Create matrix for chord diagram
-        matrix = []
-        for sem1 in selected_sems:
-            row = []
-            for sem2 in selected_sems:
-                if sem1 == sem2:
-                    row.append(0)
-                else:
-                    row.append(semantic_cooccur.get(sem1, {}).get(sem2, 0))
-            matrix.append(row)
+        sem_matrix = self.cooccurrence_matrix.aggregate(
+            concept_to_semantic, selected_sems, min_count=min_cooccurrence)
+        np.fill_diagonal(sem_matrix, 0)
+        matrix = sem_matrix.tolist()
         
         # Generate HTML with D3.js chord diagram
         html_content = self._generate_chord_html(selected_sems, matrix)
@@ -2453,6 +2483,28 @@ class EnhancedConceptAnalyzer:
             console.print(f"[cyan]Total concepts to review: {len(detailed_samples)}[/cyan]")
 
 
+def _analyze_enhanced_shard(files: List[Path], output_dir: Path,
+                            filter_terms: Optional[List[str]],
+                            filter_cuis: Optional[List[str]],
+                            validation_files: Set[str]) -> EnhancedConceptAnalyzer:
+    """Analyze one shard of files in a worker process"""
+    analyzer = EnhancedConceptAnalyzer(output_dir)
+    for csv_file in files:
+        try:
+            # Store filename for note type detection
+            analyzer._current_filename = csv_file.stem
+            analyzer._analyze_file_enhanced(csv_file, filter_terms, filter_cuis,
+                                            csv_file.name in validation_files)
+            analyzer.file_count += 1
+        except Exception as e:
+            analyzer.failed_files.append((csv_file.name, str(e)))
+    return analyzer
+
+
+def _merge_enhanced_analyzers(a, b):
+    return a.merge(b)
+
+
 # CLI Commands
 @click.group()
 def enhanced_analysis_group():
@@ -2471,7 +2523,8 @@ def enhanced_analysis_group():
 @click.option('--excel', '-x', type=click.Path(), help='Export to Excel file')
 @click.option('--validation', '-val', type=click.Path(), help='Export validation set')
 @click.option('--html', '-h', type=click.Path(), help='Generate comprehensive HTML report')
-def analyze_enhanced(output_dir, filter, preset, visualize, chord, sample_size, export, excel, validation, html):
+@click.option('--workers', '-j', type=int, help='Worker processes for reading files (default: CPU count)')
+def analyze_enhanced(output_dir, filter, preset, visualize, chord, sample_size, export, excel, validation, html, workers):
     """Perform enhanced clinical analysis on output files
     
     Examples:
@@ -2503,7 +2556,8 @@ def analyze_enhanced(output_dir, filter, preset, visualize, chord, sample_size,
         console.print(f"\n[bold cyan]Performing comprehensive enhanced analysis...[/bold cyan]")
     
     # Run enhanced analysis
-    report = analyzer.analyze_directory_enhanced(filter_terms, preset=preset, sample_size=sample_size)
+    report = analyzer.analyze_directory_enhanced(filter_terms, preset=preset, sample_size=sample_size,
+                                                 workers=workers)
     
     # Display enhanced summary
     summary = report['summary']
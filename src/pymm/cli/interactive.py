@@ -29,10 +29,12 @@ from rich.syntax import Syntax
 
 from ..core.config import PyMMConfig
 from ..core.enhanced_state import AtomicStateManager
+from ..core.resources import ResourceSample, get_resource_sampler
 from ..server.manager import ServerManager
 from ..processing.unified_processor import UnifiedProcessor
 from ..processing.pool_manager import AdaptivePoolManager
 from .unified_batch import UnifiedBatchProcessor
+from ..analysis.ingest import ingest_files
 try:
     from .analysis import ConceptAnalyzer
     HAS_ANALYSIS = True
@@ -124,61 +126,42 @@ class EnhancedResourceMonitor:
         self.disk_history = deque(maxlen=60)
         self.network_history = deque(maxlen=60)
         self.monitoring = False
-        self.monitor_thread = None
-        self.last_net_recv = 0
-        self.last_net_sent = 0
+        # Readings come from the shared sampler, which never blocks on CPU
+        self.sampler = get_resource_sampler()
 
     def start(self):
         """Start background monitoring"""
-        self.monitoring = True
-        self.monitor_thread = threading.Thread(
-            target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        if not self.monitoring:
+            self.monitoring = True
+            self.sampler.subscribe(self._record_sample)
+            self.sampler.acquire()
 
     def stop(self):
         """Stop monitoring"""
-        self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=2)
-
-    def _monitor_loop(self):
-        """Background monitoring loop"""
-        while self.monitoring:
-            try:
-                # CPU and Memory
-                self.cpu_history.append(psutil.cpu_percent(interval=0.1))
-                self.memory_history.append(psutil.virtual_memory().percent)
-
-                # Disk I/O
-                disk_io = psutil.disk_io_counters()
-                if disk_io:
-                    self.disk_history.append({
-                        'read': disk_io.read_bytes,
-                        'write': disk_io.write_bytes
-                    })
-
-                # Network
-                net_io = psutil.net_io_counters()
-                if net_io:
-                    recv_rate = net_io.bytes_recv - self.last_net_recv if self.last_net_recv else 0
-                    sent_rate = net_io.bytes_sent - self.last_net_sent if self.last_net_sent else 0
-                    self.last_net_recv = net_io.bytes_recv
-                    self.last_net_sent = net_io.bytes_sent
-
-                    self.network_history.append({
-                        'recv': recv_rate,
-                        'sent': sent_rate
-                    })
-
-                time.sleep(1)
-            except Exception:
-                pass
+        if self.monitoring:
+            self.monitoring = False
+            self.sampler.unsubscribe(self._record_sample)
+            self.sampler.release()
+
+    def _record_sample(self, sample: ResourceSample):
+        """Append a sample from the shared sampler to the history"""
+        self.cpu_history.append(sample.cpu_percent)
+        self.memory_history.append(sample.memory_percent)
+        self.disk_history.append({
+            'read': sample.disk_read_rate,
+            'write': sample.disk_write_rate
+        })
+        self.network_history.append({
+            'recv': sample.net_recv_rate,
+            'sent': sample.net_sent_rate
+        })
 
     def get_compact_status_panel(self) -> Panel:
         """Get compact status panel"""
         cpu = self.cpu_history[-1] if self.cpu_history else 0
         mem = self.memory_history[-1] if self.memory_history else 0
-        disk = psutil.disk_usage('/').percent
+        usage = self.sampler.latest().disk('/')
+        disk = usage.percent if usage else 0
 
         # Compact bars
         cpu_bar = self._create_mini_bar(cpu, 10)
@@ -1061,6 +1044,33 @@ Skipped:    [yellow]{self.stats['skipped']:>6}[/yellow]
         return path
 
 
+def _column_counts_shard(files: List[Path], columns, split: bool) -> Dict[str, Counter]:
+    """Count non-empty values of columns across a shard of output CSVs
+
+    With split, comma separated values are counted individually.
+    """
+    counts = {column: Counter() for column in columns}
+    for csv_file in files:
+        try:
+            df = pd.read_csv(csv_file, usecols=lambda c: c in counts)
+        except Exception:
+            continue
+        for column in counts:
+            if column not in df:
+                continue
+            values = df[column].dropna()
+            if split:
+                values = values.astype(str).str.split(',').explode().str.strip()
+            counts[column].update(values[values != ''].value_counts().to_dict())
+    return counts
+
+
+def _merge_column_counts(a, b):
+    for column, counter in b.items():
+        a[column].update(counter)
+    return a
+
+
 class AnalysisTools:
     """Advanced analysis tools for medical concepts"""
 
@@ -1072,11 +1082,7 @@ class AnalysisTools:
 
     def concept_frequency_analysis(self) -> Table:
         """Analyze concept frequencies across all files"""
-        concepts = defaultdict(int)
-        semantic_types = defaultdict(int)
-        sources = defaultdict(int)
-
-        # Process all CSV files
+        # Process all CSV files in parallel shards
         csv_files = list(self.output_dir.glob("*.csv"))
 
         with Progress() as progress:
@@ -1084,28 +1090,12 @@ class AnalysisTools:
                 "Analyzing concepts...",
                 total=len(csv_files))
 
-            for csv_file in csv_files:
-                try:
-                    import pandas as pd
-                    df = pd.read_csv(csv_file)
-
-                    for _, row in df.iterrows():
-                        concept = row.get('Preferred_Name', '')
-                        if concept:
-                            concepts[concept] += 1
-
-                        sem_type = row.get('Semantic_Types', '')
-                        if sem_type:
-                            semantic_types[sem_type] += 1
+            counts = ingest_files(
+                csv_files, _column_counts_shard, _merge_column_counts,
+                args=(('Preferred_Name',), False),
+                on_progress=lambda n: progress.advance(task, n))
 
-                        source = row.get('Sources', '')
-                        if source:
-                            sources[source] += 1
-
-                except Exception:
-                    pass
-
-                progress.advance(task)
+        concepts = (counts or {}).get('Preferred_Name', Counter())
 
         # Create frequency table
         table = Table(title="Top Concepts by Frequency", box=box.ROUNDED)
@@ -1129,20 +1119,10 @@ class AnalysisTools:
 
     def semantic_type_distribution(self) -> Panel:
         """Analyze semantic type distribution"""
-        semantic_types = defaultdict(int)
-
         csv_files = list(self.output_dir.glob("*.csv"))
-        for csv_file in csv_files:
-            try:
-                import pandas as pd
-                df = pd.read_csv(csv_file)
-
-                for sem_types in df['Semantic_Types'].dropna():
-                    for sem_type in sem_types.split(','):
-                        semantic_types[sem_type.strip()] += 1
-
-            except Exception:
-                pass
+        counts = ingest_files(csv_files, _column_counts_shard, _merge_column_counts,
+                              args=(('Semantic_Types',), True))
+        semantic_types = (counts or {}).get('Semantic_Types', Counter())
 
         # Create visual distribution
         sorted_types = sorted(
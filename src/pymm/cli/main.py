@@ -12,7 +12,7 @@ from rich import print as rprint
 from ..core.config import PyMMConfig
 from ..server.manager import ServerManager
 from ..processing.unified_processor import UnifiedProcessor, ProcessingMode
-from .commands import server_group, config_group, stats_group, monitor, retry, retry_failed, chunked_process_cmd
+from .commands import server_group, config_group, stats_group, trace_group, monitor, retry, retry_failed, chunked_process_cmd
 from .interactive import interactive_ultimate as interactive_mode
 try:
     from .analysis import analysis_group
@@ -56,7 +56,7 @@ def cli(ctx, interactive):
         console.print("Or use [bold]pymm -i[/bold] for interactive mode")
 
 @cli.command()
-@click.argument('input_dir', type=click.Path(exists=True, file_okay=False, dir_okay=True))
+@click.argument('input_dir', type=click.Path(exists=True, file_okay=True, dir_okay=True))
 @click.argument('output_dir', type=click.Path(file_okay=False, dir_okay=True))
 @click.option('--workers', '-w', type=int, help='Number of parallel workers')
 @click.option('--timeout', '-t', type=int, help='Processing timeout per file (seconds)')
@@ -70,17 +70,42 @@ def cli(ctx, interactive):
 @click.option('--background', '-b', is_flag=True,
               help='Run in background mode (for nohup)')
 @click.option('--job-id', type=str, help='Job ID for tracking (used internally)')
-def process(input_dir, output_dir, workers, timeout, retry, instance_pool, start_servers, interactive_monitor, background, job_id):
-    """Process files through MetaMap
+@click.option('--trace', 'trace_file', type=click.Path(dir_okay=False),
+              help='Record per-stage latency spans to this JSONL file')
+@click.option('--metrics-port', type=int,
+              help='Serve Prometheus metrics on this port while processing')
+@click.option('--input-format', type=click.Choice(['jsonl', 'csv', 'parquet', 'tar', 'zip', 'delimited']),
+              help='Corpus format of INPUT_DIR (detected from the suffix by default); for a directory, read its files of this format')
+@click.option('--id-field', help='Field or column holding note ids (default: id)')
+@click.option('--text-field', help='Field or column holding note text (default: text)')
+@click.option('--delimiter', help='Separator between the notes of one large text file, e.g. "\\f"')
+def process(input_dir, output_dir, workers, timeout, retry, instance_pool, start_servers, interactive_monitor, background, job_id, trace_file, metrics_port,
+            input_format, id_field, text_field, delimiter):
+    """Process notes through MetaMap
+    
+    INPUT_DIR is a directory of note files or a corpus file: JSON Lines,
+    CSV/TSV, Parquet, a tar/zip archive of notes (read without extracting),
+    or one large text file of notes separated by --delimiter.
     
     Examples:
     
         pymm process input_notes/ output_csvs/
         
+        pymm process notes.jsonl output_csvs/ --id-field note_id --text-field body
+        
+        pymm process all_notes.txt output_csvs/ --delimiter '\\f'
+        
         pymm process data/notes/ results/ --workers 8 --timeout 600
         
         # Run in background
         nohup pymm process input_notes/ output_csvs/ --background &
+        
+        # Find out where the time goes
+        pymm process notes/ out/ --trace out/trace.jsonl
+        pymm trace summary out/trace.jsonl
+        
+        # Expose progress to a Prometheus scraper
+        nohup pymm process notes/ out/ --background --metrics-port 9464 &
     """
     # In background mode, skip banner and use simpler output
     if not background:
@@ -120,13 +145,29 @@ def process(input_dir, output_dir, workers, timeout, retry, instance_pool, start
         job_manager = get_job_manager()
         job_manager.start_job(job_id, os.getpid())
     
+    # Per-stage tracing for this run only (not saved to the config)
+    if trace_file:
+        from ..core.tracing import enable_tracing
+        enable_tracing(trace_file)
+    
+    # Metrics endpoint for this run only (not saved to the config)
+    if metrics_port:
+        from ..monitoring.metrics import METRICS_ENV_VAR
+        os.environ[METRICS_ENV_VAR] = str(metrics_port)
+    
+    # Corpus layout for this run only (read through the config's env fallback)
+    for key, value in (("INPUT_FORMAT", input_format), ("INPUT_ID_FIELD", id_field),
+                       ("INPUT_TEXT_FIELD", text_field), ("INPUT_DELIMITER", delimiter)):
+        if value:
+            os.environ[key] = value
+    
     # Show configuration (skip in background mode)
     if not background:
         table = Table(title="Processing Configuration")
         table.add_column("Setting", style="cyan")
         table.add_column("Value", style="green")
         
-        table.add_row("Input Directory", input_dir)
+        table.add_row("Input", input_dir)
         table.add_row("Output Directory", output_dir)
         table.add_row("Max Workers", str(config.get("max_parallel_workers")))
         table.add_row("Timeout (seconds)", str(config.get("pymm_timeout")))
@@ -187,6 +228,13 @@ def process(input_dir, output_dir, workers, timeout, retry, instance_pool, start
             with console.status("Processing files...") as status:
                 results = runner.run()
         
+        if trace_file:
+            from ..core.tracing import disable_tracing
+            disable_tracing()
+            if not background:
+                console.print(f"[dim]Trace written to {trace_file} "
+                              f"(pymm trace summary {trace_file})[/dim]")
+        
         # Show results
         if results.get("success"):
             if background:
@@ -203,6 +251,12 @@ def process(input_dir, output_dir, workers, timeout, retry, instance_pool, start
                 summary.add_row("Failed", str(results.get("failed", 0)))
                 summary.add_row("Time Elapsed", f"{results.get('elapsed_time', 0):.1f}s")
                 summary.add_row("Throughput", f"{results.get('throughput', 0):.2f} files/s")
+                usage = results.get("resource_usage") or {}
+                if usage.get("attempts"):
+                    summary.add_row("MetaMap CPU", f"{usage['cpu_seconds']:.1f}s "
+                                    f"({usage['cpu_seconds_mean']:.2f}s/file)")
+                    summary.add_row("MetaMap Peak RSS", f"{usage['peak_rss_max'] / (1024 * 1024):.0f} MB "
+                                    f"(p95 {usage['peak_rss_p95'] / (1024 * 1024):.0f} MB)")
                 
                 console.print(summary)
             
@@ -327,10 +381,82 @@ def interactive():
     """Launch interactive mode with intuitive menu navigation"""
     interactive_mode()
 
+@cli.command()
+@click.option('--host', default='127.0.0.1', show_default=True,
+              help='Address to listen on (0.0.0.0 for other machines)')
+@click.option('--port', '-p', type=int, help='Port to listen on (default: service_port or 8765)')
+@click.option('--workers', '-w', type=int, help='Parallel MetaMap runs')
+@click.option('--timeout', '-t', type=int, help='MetaMap timeout per run (seconds)')
+@click.option('--request-timeout', type=float, help='Default seconds a request waits for its result')
+@click.option('--batch-window', type=float,
+              help='Seconds to wait for more small requests to map together (default 0.01)')
+@click.option('--max-batch', type=int, help='Most notes mapped by one MetaMap run (1 disables batching)')
+@click.option('--max-queue', type=int, help='Notes allowed to wait for a worker before answering 503')
+@click.option('--cache-size', type=int, help='Content cache entries (0 disables the cache)')
+@click.option('--start-servers/--no-start-servers', default=True,
+              help='Automatically start MetaMap servers')
+@click.option('--server-pool', is_flag=True,
+              help='Start a tagger/WSD server pair per worker instead of sharing one')
+@click.option('--warm-up/--no-warm-up', default=True,
+              help='Map a short text before accepting requests')
+def serve(host, port, workers, timeout, request_timeout, batch_window, max_batch, max_queue, cache_size,
+          start_servers, server_pool, warm_up):
+    """Serve MetaMap annotation over HTTP with warm instances
+
+    Keeps MetaMap instances, the tagger/WSD servers and a content cache
+    warm, and answers JSON requests:
+
+    \b
+        POST /annotate        {"text": "...", "id": "n1", "timeout": 30}
+        POST /annotate/batch  {"notes": [{"id": "n1", "text": "..."}]}
+        GET  /health
+        GET  /metrics
+
+    Examples:
+
+        pymm serve --port 8765 --workers 4
+
+        curl -s localhost:8765/annotate -d '{"text": "chest pain and dyspnea"}'
+    """
+    from ..server.annotation_service import AnnotationService, AnnotationServer, DEFAULT_PORT
+
+    config = PyMMConfig()
+    if not config.get("metamap_binary_path") and not config.get("use_java_api", False):
+        console.print("[red]MetaMap binary not configured![/red]")
+        console.print("Run [bold]pymm config setup[/bold] first")
+        sys.exit(1)
+
+    service = AnnotationService(config, workers=workers, timeout=timeout, request_timeout=request_timeout,
+                                batch_window=batch_window, max_batch=max_batch, max_queue=max_queue,
+                                cache_size=cache_size, start_servers=start_servers,
+                                server_pool=server_pool).start()
+    try:
+        server = AnnotationServer(service, port or config.get("service_port", DEFAULT_PORT), host)
+    except OSError as e:
+        service.stop()
+        console.print(f"[red]Cannot listen on {host}:{port or config.get('service_port', DEFAULT_PORT)}: {e}[/red]")
+        sys.exit(1)
+
+    if warm_up:
+        with console.status("[bold cyan]Warming up MetaMap...[/bold cyan]"):
+            ready = service.warm_up()
+        if not ready:
+            console.print("[yellow]Warm-up annotation failed; serving anyway (see log)[/yellow]")
+
+    console.print(f"[green]✓ Serving MetaMap annotation on {server.url} "
+                  f"with {service.workers} workers[/green] (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Stopping...[/yellow]")
+    finally:
+        server.stop()
+
 # Add sub-command groups
 cli.add_command(server_group, name='server')
 cli.add_command(config_group, name='config')
 cli.add_command(stats_group, name='stats')
+cli.add_command(trace_group, name='trace')
 if analysis_group:
     cli.add_command(analysis_group, name='analysis')
 if enhanced_analysis_group:
@@ -340,6 +466,17 @@ cli.add_command(retry)
 cli.add_command(retry_failed)
 cli.add_command(chunked_process_cmd, name='chunked-process')
 
+def _prepare_java_api():
+    """Download Gson and build the Java API classes after an install"""
+    try:
+        from ..core.config import Config
+        from ..processing.java_bridge import prepare_java_api
+        with console.status("[bold cyan]Building Java API classes...[/bold cyan]"):
+            classes_dir = prepare_java_api(Config.from_pymm_config(PyMMConfig()))
+        console.print(f"[green]✓ Java API classes built in {classes_dir}[/green]")
+    except Exception as e:
+        console.print(f"[yellow]Java API not prepared ({e}); run 'pymm setup --fix' later[/yellow]")
+
 @cli.command()
 def install():
     """Install MetaMap binaries
@@ -357,6 +494,7 @@ def install():
         
         if result:
             console.print(f"\n[green]✓ MetaMap installed at: {result}[/green]")
+            _prepare_java_api()
             console.print("\nRun [bold]pymm config setup[/bold] to configure")
         else:
             console.print("\n[red]✗ Installation failed[/red]")
@@ -378,6 +516,7 @@ def install_metamap():
         
         if result:
             console.print(f"\n[green]✓ MetaMap installed successfully at: {result}[/green]")
+            _prepare_java_api()
             console.print("\n[bold]Next steps:[/bold]")
             console.print("1. Run [cyan]pymm setup[/cyan] to verify installation")
             console.print("2. Run [cyan]pymm config setup[/cyan] to configure settings")
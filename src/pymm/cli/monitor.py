@@ -18,6 +18,7 @@ from rich.columns import Columns
 from rich.chart import Chart
 
 from ..core.job_manager import get_job_manager, JobStatus, JobType
+from ..core.resources import get_resource_sampler
 
 console = Console()
 
@@ -30,6 +31,7 @@ class JobMonitor:
         self.running = False
         self.selected_job = None
         self.view_mode = "overview"  # overview, details, resources
+        self.sampler = get_resource_sampler()
         
     def create_header(self) -> Panel:
         """Create header panel"""
@@ -148,24 +150,28 @@ Active: [green]{active}[/green]  Completed: [blue]{completed}[/blue]  Failed: [r
     
     def create_system_stats(self) -> Panel:
         """Create system statistics panel"""
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        sample = self.sampler.latest()
+        cpu_percent = sample.cpu_percent
+        memory_percent = sample.memory_percent
+        disk = sample.disk('/')
+        disk_percent = disk.percent if disk else 0.0
+        disk_used = disk.used if disk else 0
+        disk_total = disk.total if disk else 0
         
         # CPU bar
         cpu_bar = self._create_bar(cpu_percent, 100, 30, "green" if cpu_percent < 80 else "red")
         
         # Memory bar
-        mem_bar = self._create_bar(memory.percent, 100, 30, "green" if memory.percent < 80 else "red")
+        mem_bar = self._create_bar(memory_percent, 100, 30, "green" if memory_percent < 80 else "red")
         
         # Disk bar
-        disk_bar = self._create_bar(disk.percent, 100, 30, "green" if disk.percent < 90 else "red")
+        disk_bar = self._create_bar(disk_percent, 100, 30, "green" if disk_percent < 90 else "red")
         
         stats_text = f"""[bold]System Resources[/bold]
 
 CPU Usage:    {cpu_bar} {cpu_percent:.1f}%
-Memory:       {mem_bar} {memory.percent:.1f}% ({memory.used/1024**3:.1f}GB / {memory.total/1024**3:.1f}GB)
-Disk Space:   {disk_bar} {disk.percent:.1f}% ({disk.used/1024**3:.1f}GB / {disk.total/1024**3:.1f}GB)
+Memory:       {mem_bar} {memory_percent:.1f}% ({sample.memory_used/1024**3:.1f}GB / {sample.memory_total/1024**3:.1f}GB)
+Disk Space:   {disk_bar} {disk_percent:.1f}% ({disk_used/1024**3:.1f}GB / {disk_total/1024**3:.1f}GB)
 
 Cores: {psutil.cpu_count()}  Load Avg: {', '.join(f'{x:.2f}' for x in psutil.getloadavg())}
 """
@@ -347,7 +353,14 @@ Threads: {usage.get('num_threads', 0)}
     def run(self):
         """Run the live monitor"""
         self.running = True
+        self.sampler.acquire()
         
+        try:
+            self._run_live()
+        finally:
+            self.sampler.release()
+    
+    def _run_live(self):
         with Live(
             self.create_layout(),
             refresh_per_second=2,
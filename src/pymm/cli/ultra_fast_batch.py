@@ -4,9 +4,9 @@ import sys
 import time
 import multiprocessing as mp
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+from functools import partial
 import logging
 
 from rich.console import Console
@@ -19,14 +19,37 @@ from rich.layout import Layout
 from ..pymm import Metamap
 from ..core.config import PyMMConfig
 from ..processing.worker import FileProcessor
+from ..processing.retry_manager import RetryManager
+from ..processing.work_queue import WorkItem, build_work_queue, process_work_queue_in_processes
+from ..core.state import StateManager
+from ..core.exceptions import ParseError
+from ..core.inputs import InputRecord, as_input_record, collect_input_records
 
 console = Console()
 logger = logging.getLogger(__name__)
 
 
-def process_file_simple(args: Tuple[str, str, str, int]) -> Tuple[str, bool, float, int]:
-    """Simple file processor for parallel execution"""
+def process_file_simple(args: Tuple[Any, str, str, int]) -> Tuple[str, bool, float, int]:
+    """Simple note processor for parallel execution
+
+    The first argument is a file path or an InputRecord; records are
+    picklable, so each worker reads its own note from the corpus.
+    """
     input_path, output_path, mm_path, worker_id = args
+    record = as_input_record(input_path)
+    success, elapsed, _, concepts = _process_note(record, output_path, mm_path)
+    return record.note_id, success, elapsed, concepts
+
+
+def process_note_task(item: WorkItem, output_dir: str, mm_path: str) -> Tuple[bool, float, Optional[str], int]:
+    """Work queue task for process runners (see run_note_queue)"""
+    output_path = str(Path(output_dir) / f"{item.record.output_stem}.csv")
+    return _process_note(item.record, output_path, mm_path)
+
+
+def _process_note(record: InputRecord, output_path: str,
+                  mm_path: str) -> Tuple[bool, float, Optional[str], int]:
+    """Map one note and write its CSV; returns (success, elapsed, error, concepts)"""
     start_time = time.time()
     
     try:
@@ -34,14 +57,16 @@ def process_file_simple(args: Tuple[str, str, str, int]) -> Tuple[str, bool, flo
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
         
         # Read input
-        with open(input_path, 'r', encoding='utf-8') as f:
-            text = f.read()
+        text = record.read_text()
         
         # Create MetaMap instance (each worker gets its own)
         mm = Metamap(mm_path)
         
         # Process with timeout
         mmos = mm.parse([text], timeout=60)  # 60 second timeout per file
+        if not mmos and text.strip():
+            # MetaMap answers every citation; no output means it crashed
+            raise ParseError(record.note_id, "MetaMap returned no results")
         
         # Extract concepts quickly
         concepts = []
@@ -71,15 +96,40 @@ def process_file_simple(args: Tuple[str, str, str, int]) -> Tuple[str, bool, flo
                 writer = csv.writer(f)
                 writer.writerow(['CUI', 'Score', 'ConceptName', 'PrefName', 'Phrase', 'SemTypes', 'Sources', 'Position'])
         
+        # A retry that succeeds clears the error of the failed attempt
+        if os.path.exists(output_path + '.error'):
+            os.remove(output_path + '.error')
+        
         elapsed = time.time() - start_time
-        return input_path, True, elapsed, len(concepts)
+        return True, elapsed, None, len(concepts)
         
     except Exception as e:
         elapsed = time.time() - start_time
         # Write error file
         with open(output_path + '.error', 'w') as f:
             f.write(str(e))
-        return input_path, False, elapsed, 0
+        return False, elapsed, str(e), 0
+
+
+def run_note_queue(files: List[InputRecord], output_dir: Path, mm_path: str, workers: int,
+                   config, on_note: Callable[[WorkItem, bool, float, Optional[str]], None]) -> Dict[str, Any]:
+    """Process notes in worker processes through the shared priority work queue
+
+    User-priority files (``priority_files``) go first and failed notes are
+    retried with backoff as soon as it expires, within the same run; the
+    queue and retry bookkeeping stay in this process.
+
+    Args:
+        on_note: Called once per note with its final outcome; ``item.output``
+            holds the number of concepts written
+
+    Returns:
+        Retry statistics (see process_work_queue)
+    """
+    work_queue = build_work_queue(files, config)
+    retry_manager = RetryManager(config, StateManager(str(output_dir)))
+    task = partial(process_note_task, output_dir=str(output_dir), mm_path=mm_path)
+    return process_work_queue_in_processes(work_queue, task, workers, on_note, retry_manager)
 
 
 class UltraFastBatchProcessor:
@@ -96,14 +146,12 @@ class UltraFastBatchProcessor:
         
         # Get MetaMap path
         config = PyMMConfig()
+        self.config = config
         self.mm_path = config.get("metamap_binary_path")
     
-    def collect_files(self) -> List[Path]:
-        """Collect all input files"""
-        files = []
-        for pattern in ['*.txt', '*.text']:
-            files.extend(self.input_dir.glob(pattern))
-        return sorted(files)
+    def collect_files(self) -> List[InputRecord]:
+        """Collect all input notes (note files or corpus records)"""
+        return collect_input_records(self.input_dir, self.config)
     
     def process_parallel(self, show_progress: bool = True) -> Dict[str, Any]:
         """Process files in parallel with all workers"""
@@ -111,12 +159,6 @@ class UltraFastBatchProcessor:
         if not files:
             return {"success": True, "processed": 0, "failed": 0, "time": 0}
         
-        # Prepare arguments for parallel processing
-        args_list = []
-        for f in files:
-            output_path = self.output_dir / f"{f.stem}.csv"
-            args_list.append((str(f), str(output_path), self.mm_path, 0))
-        
         results = {
             "processed": 0,
             "failed": 0,
@@ -124,71 +166,42 @@ class UltraFastBatchProcessor:
             "start_time": datetime.now()
         }
         
-        if show_progress:
-            # Process with progress bar
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(),
-                MofNCompleteColumn(),
-                TextColumn("• {task.fields[rate]:.1f} files/min"),
-                TimeRemainingColumn(),
-                console=console
-            ) as progress:
-                
-                task = progress.add_task(
-                    "[cyan]Processing files", 
-                    total=len(files),
-                    rate=0.0
-                )
-                
-                # Use ProcessPoolExecutor for true parallelization
-                with ProcessPoolExecutor(max_workers=self.workers) as executor:
-                    # Submit all tasks
-                    future_to_file = {
-                        executor.submit(process_file_simple, args): args[0] 
-                        for args in args_list
-                    }
-                    
-                    # Process completed tasks
-                    for future in as_completed(future_to_file):
-                        try:
-                            input_path, success, elapsed, concepts = future.result()
-                            
-                            if success:
-                                results["processed"] += 1
-                                results["total_concepts"] += concepts
-                            else:
-                                results["failed"] += 1
-                            
-                            # Update progress
-                            completed = results["processed"] + results["failed"]
-                            progress.update(task, advance=1)
-                            
-                            # Calculate rate
-                            elapsed_total = (datetime.now() - results["start_time"]).total_seconds()
-                            rate = (completed / elapsed_total) * 60 if elapsed_total > 0 else 0
-                            progress.update(task, rate=rate)
-                            
-                        except Exception as e:
-                            results["failed"] += 1
-                            progress.update(task, advance=1)
+        progress = Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("• {task.fields[rate]:.1f} files/min"),
+            TimeRemainingColumn(),
+            console=console
+        ) if show_progress else None
+        task = None
         
-        else:
+        def on_note(item, success, elapsed, error):
+            if success:
+                results["processed"] += 1
+                results["total_concepts"] += item.output or 0
+            else:
+                results["failed"] += 1
+            
+            if progress is not None:
+                # Calculate rate
+                completed = results["processed"] + results["failed"]
+                elapsed_total = (datetime.now() - results["start_time"]).total_seconds()
+                rate = (completed / elapsed_total) * 60 if elapsed_total > 0 else 0
+                progress.update(task, advance=1, rate=rate)
+        
+        # Worker processes fed from the priority work queue; failed notes are
+        # retried within the run
+        if progress is None:
             # Process without progress (for background)
-            with ProcessPoolExecutor(max_workers=self.workers) as executor:
-                futures = [executor.submit(process_file_simple, args) for args in args_list]
-                
-                for future in as_completed(futures):
-                    try:
-                        _, success, _, concepts = future.result()
-                        if success:
-                            results["processed"] += 1
-                            results["total_concepts"] += concepts
-                        else:
-                            results["failed"] += 1
-                    except:
-                        results["failed"] += 1
+            results["retries"] = run_note_queue(
+                files, self.output_dir, self.mm_path, self.workers, self.config, on_note)
+        else:
+            with progress:
+                task = progress.add_task("[cyan]Processing files", total=len(files), rate=0.0)
+                results["retries"] = run_note_queue(
+                    files, self.output_dir, self.mm_path, self.workers, self.config, on_note)
         
         # Calculate final stats
         elapsed = (datetime.now() - results["start_time"]).total_seconds()
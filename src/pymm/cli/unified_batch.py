@@ -11,6 +11,7 @@ from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeRe
 
 from ..core.config import PyMMConfig
 from ..core.file_tracker import UnifiedFileTracker
+from ..core.inputs import InputRecord
 from ..processing.java_bridge_v2 import EnhancedJavaAPIBridge
 from ..processing.unified_processor import UnifiedProcessor, ProcessingMode
 from ..core.config import Config
@@ -225,7 +226,7 @@ class UnifiedBatchProcessor:
             "log_file": str(log_file)
         }
     
-    def _process_with_java_api(self, files: List[Path]) -> Dict[str, Any]:
+    def _process_with_java_api(self, files: List[InputRecord]) -> Dict[str, Any]:
         """Process using Java API"""
         results = {
             "success": True,
@@ -234,8 +235,13 @@ class UnifiedBatchProcessor:
             "failed_files": []
         }
         
+        # The batch Java API reads note files; corpus notes have none
+        if any(f.path is None for f in files):
+            console.print("[yellow]ℹ Corpus input: using the Python wrapper[/yellow]")
+            return self._process_with_python(files)
+        
         # Convert paths to strings
-        input_files = [str(f) for f in files]
+        input_files = [str(f.path) for f in files]
         
         with Progress(
             SpinnerColumn(),
@@ -6,10 +6,26 @@ import subprocess
 import os
 import shlex
 
+from .core.accounting import AccountedPopen, ChildUsage, record_child_usage
+
 __author__ = "Srikanth Mujjiga"
 __copyright__ = "Srikanth Mujjiga"
 __license__ = "mit"
 
+# Default command options – mirrors Java BatchRunner01 settings
+DEFAULT_METAMAP_OPTIONS = [
+    "-c",                       # restrict concept candidates (no over-matching)
+    "-Q", "4",                # term processing: conserve memory and run faster
+    "-K",                      # ignore stop words
+    "--sldi",                  # strict limit derivational variants
+    "-I",                      # show candidate identifiers
+    "--XMLf1",                 # compact XML format (faster to parse)
+    "--negex",                 # attach negation features
+    "--word_sense_disambiguation",  # Enable WSD for better accuracy
+    "--prune", "30",          # Prune candidates for performance
+]
+
+
 class MetamapCommand:
     """Thin wrapper around the MetaMap binary invocation.
 
@@ -32,16 +48,24 @@ class MetamapCommand:
         Port number for the tagger server (default: 1795)
     wsd_port : int, optional
         Port number for the WSD server (default: 5554)
+    options : str or list, optional
+        Explicit MetaMap options. Overrides *METAMAP_PROCESSING_OPTIONS* so
+        that a single instance can run with different settings (e.g. reduced
+        options for pathological notes) without touching the environment.
     """
 
     def __init__(self, metamap_path, input_file, output_file, debug=False, 
-                 tagger_port=1795, wsd_port=5554):
+                 tagger_port=1795, wsd_port=5554, options=None):
         self.metamap_path = abspath(metamap_path)
         self.input_file = input_file
         self.output_file = output_file
         self.debug = bool(debug)
         self.tagger_port = tagger_port
         self.wsd_port = wsd_port
+        self.options = options
+        # Child-process usage of every run, and of the most recent one
+        self.usage = ChildUsage()
+        self.last_usage = None
         # Build CLI once and reuse between calls – avoids repeated shlex work
         self.command = self._get_command()
         if self.debug:
@@ -57,20 +81,14 @@ class MetamapCommand:
         """
 
         # Default command options – mirrors Java BatchRunner01 settings
-        default_options = [
-            "-c",                       # restrict concept candidates (no over-matching)
-            "-Q", "4",                # term processing: conserve memory and run faster
-            "-K",                      # ignore stop words
-            "--sldi",                  # strict limit derivational variants
-            "-I",                      # show candidate identifiers
-            "--XMLf1",                 # compact XML format (faster to parse)
-            "--negex",                 # attach negation features
-            "--word_sense_disambiguation",  # Enable WSD for better accuracy
-            "--prune", "30",          # Prune candidates for performance
-        ]
+        default_options = list(DEFAULT_METAMAP_OPTIONS)
         
-        # Check for environment variable
-        env_options_str = os.getenv("METAMAP_PROCESSING_OPTIONS")
+        # Explicit options take precedence over the environment variable
+        if self.options is not None:
+            env_options_str = self.options if isinstance(self.options, str) \
+                else " ".join(self.options)
+        else:
+            env_options_str = os.getenv("METAMAP_PROCESSING_OPTIONS")
         
         current_options = []
         if env_options_str:
@@ -133,9 +151,13 @@ class MetamapCommand:
             When the process exceeds *timeout* seconds.
         RuntimeError
             When MetaMap returns a non-zero exit status indicating an error.
+
+        The CPU time, peak RSS and block I/O of the run are kept in
+        *last_usage*, added to *usage* and reported to the calling thread's
+        ``track_child_usage`` block.
         """
 
-        proc = subprocess.Popen(
+        proc = AccountedPopen(
             self.command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -149,6 +171,12 @@ class MetamapCommand:
             # communicate() waits for process completion – kill only if still alive
             if proc.poll() is None:
                 proc.kill()
+                # Reap the killed child so its usage is accounted too
+                proc.wait()
+            self.last_usage = proc.usage
+            if proc.usage is not None:
+                self.usage.add(proc.usage)
+                record_child_usage(proc.usage)
 
         if proc.returncode != 0:
             raise RuntimeError(
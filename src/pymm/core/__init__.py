@@ -3,6 +3,7 @@ from .config import PyMMConfig, Config
 from .state import StateManager
 from .enhanced_state import AtomicStateManager, FileTracker
 from .exceptions import MetamapStuck, ServerConnectionError, ParseError
+from .inputs import InputRecord, InputSourceError, collect_input_records, register_input_format
 
 __all__ = [
     'PyMMConfig',
@@ -12,5 +13,9 @@ __all__ = [
     'FileTracker',
     'MetamapStuck',
     'ServerConnectionError',
-    'ParseError'
+    'ParseError',
+    'InputRecord',
+    'InputSourceError',
+    'collect_input_records',
+    'register_input_format'
 ]
\ No newline at end of file
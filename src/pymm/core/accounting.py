@@ -0,0 +1,376 @@
+"""Resource accounting for MetaMap child processes
+
+Each MetaMap invocation is reaped with ``os.wait4`` so the kernel reports
+the CPU time and block I/O of that process tree (the ``metamap`` script and
+the Prolog binary it waits for). Peak RSS is sampled from the tree while it
+runs instead: the rusage high-water mark of a child started from Python
+includes the RSS it inherited from pymm. Usage flows to three places:
+
+- the document being processed on the calling thread (``track_child_usage``)
+- the MetaMap instance that ran it (``MetamapCommand.usage``)
+- the worker event log, from which ``RunUsage`` rolls up a whole run
+
+The tagger and WSD servers are long-lived and shared by all documents, so
+they are accounted per run from psutil deltas on their PIDs instead.
+
+Read and write bytes count block-device I/O (``ru_inblock``/``ru_oublock``);
+reads served from the page cache are not included.
+"""
+import os
+import time
+import logging
+import subprocess
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import psutil
+
+from .events import EventTail
+
+logger = logging.getLogger(__name__)
+
+# ru_inblock/ru_oublock count 512-byte blocks
+_BLOCK_SIZE = 512
+# Seconds between peak RSS samples of a running MetaMap process tree
+_RSS_SAMPLE_INTERVAL = 0.2
+
+
+@dataclass
+class ChildUsage:
+    """CPU, memory and I/O used by one or more child processes"""
+    cpu_user: float = 0.0
+    cpu_system: float = 0.0
+    peak_rss: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    processes: int = 0
+
+    @property
+    def cpu_seconds(self) -> float:
+        return self.cpu_user + self.cpu_system
+
+    @classmethod
+    def from_rusage(cls, rusage, peak_rss: int = 0) -> 'ChildUsage':
+        """Usage from ``wait4``; peak RSS is passed in (ru_maxrss is not
+        trusted, see the module docstring)"""
+        return cls(
+            cpu_user=rusage.ru_utime,
+            cpu_system=rusage.ru_stime,
+            peak_rss=peak_rss,
+            read_bytes=rusage.ru_inblock * _BLOCK_SIZE,
+            write_bytes=rusage.ru_oublock * _BLOCK_SIZE,
+            processes=1
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ChildUsage':
+        return cls(
+            cpu_user=float(data.get("user", 0.0)),
+            cpu_system=float(data.get("sys", 0.0)),
+            peak_rss=int(data.get("rss", 0)),
+            read_bytes=int(data.get("read", 0)),
+            write_bytes=int(data.get("write", 0)),
+            processes=int(data.get("procs", 0))
+        )
+
+    def to_dict(self) -> Dict[str, Union[int, float]]:
+        """Compact form used in event log lines"""
+        return {
+            "user": round(self.cpu_user, 3),
+            "sys": round(self.cpu_system, 3),
+            "rss": self.peak_rss,
+            "read": self.read_bytes,
+            "write": self.write_bytes,
+            "procs": self.processes
+        }
+
+    def add(self, other: 'ChildUsage'):
+        """Accumulate another usage; peak RSS keeps the maximum"""
+        self.cpu_user += other.cpu_user
+        self.cpu_system += other.cpu_system
+        self.peak_rss = max(self.peak_rss, other.peak_rss)
+        self.read_bytes += other.read_bytes
+        self.write_bytes += other.write_bytes
+        self.processes += other.processes
+
+
+def _peak_rss(process: psutil.Process) -> int:
+    """Peak RSS of a process so far (VmHWM), or its current RSS without /proc"""
+    try:
+        with open(f"/proc/{process.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return process.memory_info().rss
+
+
+class _TreeRssSampler(threading.Thread):
+    """Track the largest peak RSS of any process in a child's tree"""
+
+    def __init__(self, pid: int):
+        super().__init__(name=f"rss-sampler-{pid}", daemon=True)
+        self.pid = pid
+        self.peak_rss = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            root = psutil.Process(self.pid)
+        except psutil.Error:
+            return
+        while True:
+            try:
+                processes = [root] + root.children(recursive=True)
+            except psutil.Error:
+                return
+            for process in processes:
+                try:
+                    self.peak_rss = max(self.peak_rss, _peak_rss(process))
+                except (psutil.Error, ValueError):
+                    continue
+            if self._stopped.wait(_RSS_SAMPLE_INTERVAL):
+                return
+
+    def stop(self) -> int:
+        self._stopped.set()
+        return self.peak_rss
+
+
+def _exit_code(status: int) -> int:
+    """Popen-style return code of a wait status (negative signal number if killed)"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    return status
+
+
+class AccountedPopen(subprocess.Popen):
+    """``Popen`` that reaps its child with ``wait4`` and keeps the rusage
+
+    ``wait`` and ``poll`` (and so ``communicate``, ``kill`` and the context
+    manager) reap the child through ``_reap``; ``usage`` is set once it has
+    been reaped there. It stays ``None`` on platforms without ``wait4``.
+    Peak RSS is sampled while the child runs, so very short runs may report
+    less than they used.
+    """
+
+    usage: Optional[ChildUsage] = None
+    _rss_sampler: Optional[_TreeRssSampler] = None
+
+    def __init__(self, *args, **kwargs):
+        self._reap_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+        if hasattr(os, 'wait4'):
+            self._rss_sampler = _TreeRssSampler(self.pid)
+            self._rss_sampler.start()
+
+    def _reap(self, block: bool):
+        """wait4 for the child, setting returncode and usage once it exited"""
+        if not self._reap_lock.acquire(blocking=block):
+            # Another thread is waiting for the child
+            return
+        try:
+            if self.returncode is not None:
+                return
+            try:
+                pid, status, rusage = os.wait4(self.pid, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                # Reaped elsewhere (e.g. SIGCHLD ignored); same fallback as Popen
+                pid, status, rusage = self.pid, 0, None
+            if pid != self.pid:
+                return
+            peak_rss = self._rss_sampler.stop() if self._rss_sampler else 0
+            if rusage is not None:
+                self.usage = ChildUsage.from_rusage(rusage, peak_rss)
+            self.returncode = _exit_code(status)
+        finally:
+            self._reap_lock.release()
+
+    def poll(self) -> Optional[int]:
+        if not hasattr(os, 'wait4'):
+            return super().poll()
+        self._reap(block=False)
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if not hasattr(os, 'wait4'):
+            return super().wait(timeout)
+        if timeout is None:
+            while self.returncode is None:
+                self._reap(block=True)
+            return self.returncode
+
+        # wait4 has no timeout; poll with a growing delay like Popen does
+        deadline = time.monotonic() + timeout
+        delay = 0.0005
+        while self.poll() is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            delay = min(delay * 2, remaining, 0.05)
+            time.sleep(delay)
+        return self.returncode
+
+
+_local = threading.local()
+
+
+@contextmanager
+def track_child_usage() -> Iterator[ChildUsage]:
+    """Collect usage of child processes reaped on this thread"""
+    usage = ChildUsage()
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(usage)
+    try:
+        yield usage
+    finally:
+        stack.remove(usage)
+
+
+def record_child_usage(usage: ChildUsage):
+    """Add usage to every ``track_child_usage`` block open on this thread"""
+    for tracked in getattr(_local, 'stack', ()):
+        tracked.add(usage)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class UsageRollup:
+    """Aggregate per-document usage for a run, overall and per instance"""
+
+    def __init__(self):
+        self.total = ChildUsage()
+        self.attempts = 0
+        self.by_instance: Dict[str, ChildUsage] = {}
+        self._cpu: List[float] = []
+        self._rss: List[int] = []
+
+    def add(self, usage: ChildUsage, instance: Optional[int] = None):
+        self.total.add(usage)
+        self.attempts += 1
+        self._cpu.append(usage.cpu_seconds)
+        self._rss.append(usage.peak_rss)
+        key = str(instance) if instance is not None else "unpooled"
+        self.by_instance.setdefault(key, ChildUsage()).add(usage)
+
+    def to_dict(self) -> Dict:
+        return {
+            "attempts": self.attempts,
+            "cpu_seconds": round(self.total.cpu_seconds, 3),
+            "cpu_seconds_mean": round(self.total.cpu_seconds / self.attempts, 3) if self.attempts else 0.0,
+            "cpu_seconds_p95": round(_percentile(self._cpu, 0.95), 3),
+            "peak_rss_max": self.total.peak_rss,
+            "peak_rss_p95": int(_percentile(self._rss, 0.95)),
+            "read_bytes": self.total.read_bytes,
+            "write_bytes": self.total.write_bytes,
+            "processes": self.total.processes,
+            "by_instance": {
+                key: {"cpu_seconds": round(usage.cpu_seconds, 3),
+                      "peak_rss": usage.peak_rss,
+                      "processes": usage.processes}
+                for key, usage in sorted(self.by_instance.items())
+            }
+        }
+
+
+class _ProcessSnapshot:
+    """CPU and I/O counters of a long-lived process"""
+
+    def __init__(self, pid: int):
+        self.process = psutil.Process(pid)
+        self.cpu, self.read_bytes, self.write_bytes, self.rss = self._read()
+
+    def _read(self):
+        with self.process.oneshot():
+            times = self.process.cpu_times()
+            rss = self.process.memory_info().rss
+            try:
+                io = self.process.io_counters()
+                read_bytes, write_bytes = io.read_bytes, io.write_bytes
+            except (AttributeError, psutil.AccessDenied):
+                read_bytes = write_bytes = 0
+        return (times.user, times.system), read_bytes, write_bytes, rss
+
+    def delta(self) -> ChildUsage:
+        (user, system), read_bytes, write_bytes, rss = self._read()
+        return ChildUsage(
+            cpu_user=max(0.0, user - self.cpu[0]),
+            cpu_system=max(0.0, system - self.cpu[1]),
+            peak_rss=max(rss, self.rss),
+            read_bytes=max(0, read_bytes - self.read_bytes),
+            write_bytes=max(0, write_bytes - self.write_bytes),
+            processes=1
+        )
+
+
+class RunUsage:
+    """Child-process resource use over one run
+
+    Started before processing and finished afterwards. Document usage is
+    read back from the event log (only events of this process, so other
+    nodes sharing the output directory are not counted); server usage is
+    the change in the servers' own counters over the run.
+    """
+
+    def __init__(self, output_dir: Union[str, Path], service_pids: Optional[Dict[str, Optional[int]]] = None):
+        self._tail = EventTail(output_dir, from_end=True)
+        self._services: Dict[str, _ProcessSnapshot] = {}
+        for name, pid in (service_pids or {}).items():
+            if not pid:
+                continue
+            try:
+                self._services[name] = _ProcessSnapshot(pid)
+            except (psutil.Error, OSError) as e:
+                logger.debug(f"Cannot account {name} server (pid {pid}): {e}")
+
+    def finish(self) -> Dict:
+        """Roll up usage since the run started"""
+        rollup = UsageRollup()
+        pid = os.getpid()
+        for event in self._tail.poll():
+            if event.pid == pid and event.usage:
+                rollup.add(ChildUsage.from_dict(event.usage), event.instance)
+        summary = rollup.to_dict()
+
+        services = {}
+        for name, snapshot in self._services.items():
+            try:
+                usage = snapshot.delta()
+            except (psutil.Error, OSError):
+                continue
+            services[name] = {
+                "cpu_seconds": round(usage.cpu_seconds, 3),
+                "rss": usage.peak_rss,
+                "read_bytes": usage.read_bytes,
+                "write_bytes": usage.write_bytes
+            }
+        if services:
+            summary["services"] = services
+
+        if rollup.attempts:
+            logger.info(f"MetaMap used {summary['cpu_seconds']:.1f} CPU seconds over "
+                        f"{rollup.attempts} attempts (p95 {summary['cpu_seconds_p95']:.1f}s), "
+                        f"peak RSS {summary['peak_rss_max'] / (1024 * 1024):.0f} MB "
+                        f"(p95 {summary['peak_rss_p95'] / (1024 * 1024):.0f} MB)")
+        return summary
+
+
+def service_pids(server_manager) -> Dict[str, Optional[int]]:
+    """PIDs of the tagger and WSD servers known to a ServerManager"""
+    try:
+        status = server_manager.get_status()
+    except Exception as e:
+        logger.debug(f"Could not look up server PIDs: {e}")
+        return {}
+    return {name: status.get(name, {}).get("pid") for name in ("tagger", "wsd")}
@@ -19,6 +19,8 @@ class Config:
     java_home: str = ""
     java_heap_size: str = "4G"
     java_api_path: str = ""
+    # Replaces the MetaMapWorker JVM command, e.g. with java_worker_stub
+    java_worker_command: str = ""
     
     # Processing options
     data_version: str = "2020AA"
@@ -45,6 +47,7 @@ class Config:
     tagger_port_base: int = 1795
     wsd_port_base: int = 5554
     mmserver_port_base: int = 8066
+    mmserver_instances: int = 1  # Servers on consecutive ports from mmserver_port_base
     server_startup_timeout: int = 60
     server_persistence_hours: int = 24
     
@@ -73,6 +76,7 @@ class Config:
         # Java configuration
         config.java_home = pymm_config.get("java_home", os.environ.get("JAVA_HOME", ""))
         config.java_heap_size = pymm_config.get("java_heap_size", "4G")
+        config.java_worker_command = pymm_config.get("java_worker_command", "")
         
         # Processing options from string
         if pymm_config.get("metamap_processing_options"):
@@ -93,6 +97,10 @@ class Config:
         config.timeout = pymm_config.get("pymm_timeout", 300)
         config.max_retries = pymm_config.get("retry_max_attempts", 3)
         
+        # MetaMap servers used by the JVM workers
+        config.mmserver_port_base = pymm_config.get("mmserver_port_base", 8066)
+        config.mmserver_instances = pymm_config.get("mmserver_instances", 1)
+        
         return config
     
     def to_dict(self) -> Dict[str, Any]:
@@ -121,6 +129,7 @@ class Config:
             "java_heap_size": self.java_heap_size,
             "java_home": self.java_home,
             "java_api_path": self.java_api_path,
+            "java_worker_command": self.java_worker_command,
             "custom_options": self.custom_options
         }
 
@@ -243,7 +252,8 @@ class PyMMConfig:
             'retry_backoff_base', 'health_check_interval', 'port_wait_timeout',
             'metamap_instance_count', 'max_instances', 'server_startup_timeout',
             'server_persistence_hours', 'tagger_port_base', 'wsd_port_base',
-            'mmserver_port_base'
+            'mmserver_port_base', 'mmserver_instances', 'worker_log_max_bytes', 'worker_log_backup_count',
+            'lease_ttl', 'lease_poll_interval'
         }
         
         if key in numeric_fields and isinstance(value, str):
@@ -0,0 +1,298 @@
+"""Append-only log of per-file processing events
+
+Workers publish one JSON line per finished file to
+``<output_dir>/.pymm_events.jsonl``::
+
+    {"t": 1718000000.1, "file": "note.txt", "status": "completed",
+     "concepts": 42, "bytes": 5120, "elapsed": 1.83, "worker": 3, "pid": 4711}
+
+Failed attempts carry the (truncated) error message, and attempts that ran
+MetaMap carry the pool instance and the child-process usage (see
+``core.accounting``). Every attempt is published, so a retried file appears
+once per attempt.
+
+Each line is written with a single ``write`` on a descriptor opened with
+``O_APPEND`` and kept below ``PIPE_BUF``, so lines from concurrent worker
+processes never interleave and no lock is needed. Monitors follow the log
+with ``EventTail``, which only reads bytes appended since its last poll and
+keeps exact running totals, instead of re-reading output CSVs.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOG_FILENAME = ".pymm_events.jsonl"
+
+# Appends up to PIPE_BUF bytes are not interleaved with other writers
+MAX_EVENT_BYTES = 4096
+MAX_ERROR_CHARS = 200
+
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class ProcessingEvent:
+    """A finished file as reported by a worker"""
+    timestamp: float
+    file: str
+    status: str
+    concepts: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+    worker: Optional[int] = None
+    pid: Optional[int] = None
+    error: Optional[str] = None
+    instance: Optional[int] = None
+    usage: Optional[Dict[str, float]] = None
+
+    def to_json(self) -> str:
+        data = {
+            "t": round(self.timestamp, 3),
+            "file": self.file,
+            "status": self.status,
+            "concepts": self.concepts,
+            "bytes": self.bytes,
+            "elapsed": round(self.elapsed, 4),
+            "worker": self.worker,
+            "pid": self.pid
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.instance is not None:
+            data["instance"] = self.instance
+        if self.usage:
+            data["usage"] = self.usage
+        return json.dumps(data, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, line: str) -> 'ProcessingEvent':
+        data = json.loads(line)
+        return cls(
+            timestamp=float(data["t"]),
+            file=data["file"],
+            status=data.get("status", STATUS_COMPLETED),
+            concepts=int(data.get("concepts", 0)),
+            bytes=int(data.get("bytes", 0)),
+            elapsed=float(data.get("elapsed", 0.0)),
+            worker=data.get("worker"),
+            pid=data.get("pid"),
+            error=data.get("error"),
+            instance=data.get("instance"),
+            usage=data.get("usage")
+        )
+
+
+def event_log_path(output_dir: Union[str, Path]) -> Path:
+    return Path(output_dir) / EVENT_LOG_FILENAME
+
+
+class EventLog:
+    """Writer side of the event log, safe to share between threads and processes"""
+
+    def __init__(self, output_dir: Union[str, Path]):
+        self.path = event_log_path(output_dir)
+        self._fd = -1
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _descriptor(self) -> int:
+        # Descriptors inherited through fork are reopened in the child
+        if self._fd < 0 or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def publish(self, file: str, status: str = STATUS_COMPLETED, concepts: int = 0,
+                bytes: int = 0, elapsed: float = 0.0, worker: Optional[int] = None,
+                error: Optional[str] = None, instance: Optional[int] = None,
+                usage: Optional[Dict[str, float]] = None):
+        """Append an event for a finished file
+
+        Failures are logged and swallowed - monitoring must never fail a file.
+        """
+        event = ProcessingEvent(time.time(), file, status, concepts, bytes, elapsed,
+                                worker, os.getpid(), error[:MAX_ERROR_CHARS] if error else None,
+                                instance, usage)
+        line = (event.to_json() + "\n").encode('utf-8')
+        if len(line) > MAX_EVENT_BYTES:
+            event.file = event.file[:256]
+            line = (event.to_json() + "\n").encode('utf-8')
+
+        try:
+            with self._lock:
+                os.write(self._descriptor(), line)
+        except OSError as e:
+            logger.debug(f"Could not append to event log {self.path}: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._fd >= 0 and self._pid == os.getpid():
+                os.close(self._fd)
+            self._fd = -1
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_event_logs: Dict[Path, EventLog] = {}
+_event_logs_lock = threading.Lock()
+
+
+def get_event_log(output_dir: Union[str, Path]) -> EventLog:
+    """Get the shared event log writer for an output directory"""
+    path = event_log_path(output_dir).resolve()
+    with _event_logs_lock:
+        event_log = _event_logs.get(path)
+        if event_log is None:
+            event_log = _event_logs[path] = EventLog(path.parent)
+        return event_log
+
+
+class EventTail:
+    """Follows an event log and keeps exact totals and recent rates
+
+    Totals count each file once using its latest event, so files that are
+    retried or reprocessed in a later run are not counted twice.
+    """
+
+    def __init__(self, output_dir: Union[str, Path], window: float = 60.0,
+                 from_end: bool = False):
+        """
+        Args:
+            output_dir: Output directory holding the event log
+            window: Seconds of recent events used for rates
+            from_end: Ignore events already in the log (count this run only)
+        """
+        self.path = event_log_path(output_dir)
+        self.window = window
+
+        self._offset = 0
+        self._inode = None
+        self._partial = b''
+        self._files: Dict[str, Tuple[str, int, int]] = {}
+        self._recent: Deque[ProcessingEvent] = deque()
+
+        self.files_completed = 0
+        self.files_failed = 0
+        self.concepts = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.events_read = 0
+
+        if from_end:
+            try:
+                stat = os.stat(self.path)
+                self._inode, self._offset = stat.st_ino, stat.st_size
+            except OSError:
+                pass
+
+    def _reset(self):
+        self._offset = 0
+        self._partial = b''
+        self._files.clear()
+        self._recent.clear()
+        self.files_completed = self.files_failed = 0
+        self.concepts = self.bytes = 0
+        self.elapsed = 0.0
+        self.events_read = 0
+
+    def _apply(self, event: ProcessingEvent):
+        previous = self._files.get(event.file)
+        if previous is not None:
+            status, concepts, size = previous
+            if status == STATUS_FAILED:
+                self.files_failed -= 1
+            else:
+                self.files_completed -= 1
+            self.concepts -= concepts
+            self.bytes -= size
+
+        self._files[event.file] = (event.status, event.concepts, event.bytes)
+        if event.status == STATUS_FAILED:
+            self.files_failed += 1
+        else:
+            self.files_completed += 1
+        self.concepts += event.concepts
+        self.bytes += event.bytes
+        self.elapsed += event.elapsed
+        self.events_read += 1
+        self._recent.append(event)
+
+    def poll(self) -> List[ProcessingEvent]:
+        """Read events appended since the last poll
+
+        Returns:
+            The new events, oldest first
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._inode is not None:
+                self._inode = None
+                self._reset()
+            return []
+        except OSError:
+            return []
+
+        # Log was replaced or truncated: start over
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._inode = stat.st_ino
+            self._reset()
+        if stat.st_size == self._offset:
+            return []
+
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+        except OSError as e:
+            logger.debug(f"Could not read event log {self.path}: {e}")
+            return []
+        self._offset += len(data)
+
+        data = self._partial + data
+        end = data.rfind(b'\n')
+        # A line still being written stays buffered until it is complete
+        self._partial = data[end + 1:]
+
+        events = []
+        for line in data[:end + 1].splitlines():
+            if not line.strip():
+                continue
+            try:
+                event = ProcessingEvent.from_json(line.decode('utf-8'))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.debug(f"Skipping malformed event: {e}")
+                continue
+            self._apply(event)
+            events.append(event)
+        return events
+
+    def rates(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Files, concepts and bytes per second over the recent window"""
+        now = time.time() if now is None else now
+        while self._recent and self._recent[0].timestamp < now - self.window:
+            self._recent.popleft()
+        if not self._recent:
+            return {"files_per_sec": 0.0, "concepts_per_sec": 0.0, "bytes_per_sec": 0.0}
+
+        # Measure from the first event in the window when the run is younger
+        span = max(min(self.window, now - self._recent[0].timestamp), 1.0)
+        return {
+            "files_per_sec": len(self._recent) / span,
+            "concepts_per_sec": sum(e.concepts for e in self._recent) / span,
+            "bytes_per_sec": sum(e.bytes for e in self._recent) / span
+        }
@@ -9,6 +9,7 @@ from dataclasses import dataclass, field, asdict
 from collections import defaultdict
 
 from .config import PyMMConfig
+from .inputs import InputRecord, as_input_record, stream_input_records
 
 
 @dataclass
@@ -94,25 +95,33 @@ class UnifiedFileTracker:
                 hash_md5.update(chunk)
         return hash_md5.hexdigest()
         
-    def get_unprocessed_files(self, rescan: bool = False) -> List[Path]:
-        """Get list of files that haven't been processed yet"""
+    def _input_hash(self, note: InputRecord) -> str:
+        """Content hash of a note file, or of a corpus note's location"""
+        if note.path is not None:
+            return self.get_file_hash(note.path)
+        return hashlib.md5(repr(note.location).encode('utf-8')).hexdigest()
+
+    def get_unprocessed_files(self, rescan: bool = False) -> List[InputRecord]:
+        """Get the notes of the input directory that haven't been processed yet
+
+        Notes are listed like ``pymm process`` lists them (note files and,
+        with ``input_format`` set, corpus files), but subdirectories are
+        included, and keyed like the manifest (``sub/x.txt``).
+        """
         unprocessed = []
         
-        # Scan input directory
-        for file_path in self.input_dir.glob("**/*.txt"):
-            relative_path = str(file_path.relative_to(self.input_dir))
+        for note in stream_input_records(self.input_dir, self.config, recursive=True):
+            key = self._manifest_key(note)
             
-            # Check if file is in manifest
-            if relative_path not in self.manifest.files:
-                unprocessed.append(file_path)
+            # Check if note is in manifest
+            if key not in self.manifest.files:
+                unprocessed.append(note)
             elif rescan:
-                # Check if file has changed
-                current_hash = self.get_file_hash(file_path)
-                record = self.manifest.files[relative_path]
-                if current_hash != record.input_hash:
-                    unprocessed.append(file_path)
+                # Check if note has changed
+                if self._input_hash(note) != self.manifest.files[key].input_hash:
+                    unprocessed.append(note)
                     
-        return sorted(unprocessed)
+        return unprocessed
         
     def get_processed_files(self) -> List[Tuple[Path, FileRecord]]:
         """Get list of successfully processed files"""
@@ -138,9 +147,24 @@ class UnifiedFileTracker:
                     
         return failed
         
-    def mark_file_started(self, input_path: Path) -> str:
-        """Mark a file as started processing"""
-        relative_path = str(input_path.relative_to(self.input_dir))
+    def _manifest_key(self, input_path) -> str:
+        """Manifest key of a file or input record
+
+        Files under the managed input directory keep their relative path;
+        other notes (e.g. records of a JSONL corpus) are keyed by note id.
+        """
+        note = as_input_record(input_path)
+        if note.path is not None:
+            try:
+                return str(note.path.relative_to(self.input_dir))
+            except ValueError:
+                pass
+        return note.note_id
+        
+    def mark_file_started(self, input_path) -> str:
+        """Mark a file (or input record) as started processing"""
+        note = as_input_record(input_path)
+        relative_path = self._manifest_key(note)
         
         # Calculate expected output path
         output_path = self.output_dir / relative_path.replace('.txt', '_processed.csv')
@@ -148,11 +172,11 @@ class UnifiedFileTracker:
         
         # Create record
         record = FileRecord(
-            input_path=str(input_path),
+            input_path=note.source,
             output_path=str(output_path),
-            input_hash=self.get_file_hash(input_path),
+            input_hash=self._input_hash(note),
             process_date=datetime.now().isoformat(),
-            file_size=input_path.stat().st_size,
+            file_size=note.size or 0,
             status='in_progress'
         )
         
@@ -162,9 +186,9 @@ class UnifiedFileTracker:
         
         return str(output_path)
         
-    def mark_file_completed(self, input_path: Path, concepts_found: int, processing_time: float):
-        """Mark a file as successfully processed"""
-        relative_path = str(input_path.relative_to(self.input_dir))
+    def mark_file_completed(self, input_path, concepts_found: int, processing_time: float):
+        """Mark a file (or input record) as successfully processed"""
+        relative_path = self._manifest_key(input_path)
         
         if relative_path in self.manifest.files:
             record = self.manifest.files[relative_path]
@@ -177,9 +201,9 @@ class UnifiedFileTracker:
             self.manifest.last_updated = datetime.now().isoformat()
             self.save_manifest()
             
-    def mark_file_failed(self, input_path: Path, error_message: str):
-        """Mark a file as failed"""
-        relative_path = str(input_path.relative_to(self.input_dir))
+    def mark_file_failed(self, input_path, error_message: str):
+        """Mark a file (or input record) as failed"""
+        relative_path = self._manifest_key(input_path)
         
         if relative_path in self.manifest.files:
             record = self.manifest.files[relative_path]
@@ -192,7 +216,7 @@ class UnifiedFileTracker:
             
     def get_processing_summary(self) -> Dict[str, any]:
         """Get summary of processing status"""
-        total_files = len(list(self.input_dir.glob("**/*.txt")))
+        total_files = sum(1 for _ in stream_input_records(self.input_dir, self.config, recursive=True))
         processed = len([r for r in self.manifest.files.values() if r.status == 'completed'])
         failed = len([r for r in self.manifest.files.values() if r.status == 'failed'])
         in_progress = len([r for r in self.manifest.files.values() if r.status == 'in_progress'])
@@ -208,7 +232,7 @@ class UnifiedFileTracker:
             'last_updated': self.manifest.last_updated
         }
         
-    def suggest_batch_size(self, target_files: Optional[int] = None) -> Tuple[List[Path], str]:
+    def suggest_batch_size(self, target_files: Optional[int] = None) -> Tuple[List, str]:
         """Suggest files to process based on various strategies"""
         unprocessed = self.get_unprocessed_files()
         failed = [path for path, _ in self.get_failed_files()]
@@ -0,0 +1,753 @@
+"""Input corpora as streams of (note_id, text) records
+
+Runners used to assume one note per ``.txt`` file in a flat directory.
+``iter_input_records`` turns any supported input path into
+``InputRecord`` objects instead:
+
+- a directory of note files (``*.txt``, ``*.text``, ``*.input`` and files
+  without an extension), one note per file; corpus files found in the
+  directory are read too
+- JSON Lines (``.jsonl``/``.ndjson``), one note per line
+- CSV/TSV with an id and a text column
+- Parquet with an id and a text column (needs pyarrow)
+- tar (plain or compressed) and zip archives of note files, read in place
+- one large text file of notes separated by a delimiter, memory-mapped
+  and sliced through an offset index saved next to the file
+
+A record carries a small picklable locator instead of its text, and
+``read_text`` fetches the text on demand: a seek into the JSONL/CSV file,
+one cached row group of the Parquet file, one archive member. Listing a
+multi-GB export is a single pass with little memory, nothing is extracted
+to disk, and records can be handed to worker processes.
+
+Note ids key everything downstream: output file names, run state, retries
+and distributed leases. Plain files keep their file name as note id, so
+existing output directories resume unchanged.
+"""
+import io
+import os
+import csv
+import sys
+import json
+import mmap
+import time
+import hashlib
+import tarfile
+import zipfile
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .exceptions import PyMMError
+
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+NOTE_SUFFIXES = ('.txt', '.text', '.input')
+
+FORMAT_FILE = "file"
+FORMAT_JSONL = "jsonl"
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+FORMAT_TAR = "tar"
+FORMAT_ZIP = "zip"
+FORMAT_DELIMITED = "delimited"
+FORMAT_TEXT = "text"  # text held in memory, e.g. from process_stream
+
+DEFAULT_ID_FIELD = "id"
+DEFAULT_TEXT_FIELD = "text"
+DEFAULT_NOTE_DELIMITER = "\f"  # form feed between notes
+
+# Config keys describing how to read an input; stored with a session's
+# input source so resuming reads the corpus the same way
+INPUT_LAYOUT_KEYS = ("input_format", "input_delimiter", "input_id_field", "input_text_field")
+
+# Skipped members of a compressed tarball kept for out-of-order reads
+TAR_STREAM_BUFFER = 256
+
+
+class InputSourceError(PyMMError):
+    """An input corpus cannot be listed (unknown format, missing column, ...)"""
+    pass
+
+
+def is_note_file(name: str) -> bool:
+    """Whether a file or archive member name looks like a single note"""
+    base = name.replace('\\', '/').rsplit('/', 1)[-1]
+    if not base or base.startswith('.'):
+        return False
+    suffix = os.path.splitext(base)[1].lower()
+    return suffix in NOTE_SUFFIXES or suffix == ''
+
+
+def output_stem(note_id: str) -> str:
+    """Stem of the output CSV for a note id
+
+    Matches how ``FileProcessor`` names outputs: a ``.txt`` suffix is
+    dropped, and path separators of archive members become ``__``.
+    """
+    stem = note_id[:-4] if note_id.lower().endswith('.txt') else note_id
+    return stem.replace('/', '__').replace('\\', '__')
+
+
+@dataclass(frozen=True)
+class InputRecord:
+    """One note to process, wherever its text is stored
+
+    ``location`` is a format-specific locator (a path, a byte offset, a
+    row group and row, an archive member) used by ``read_text``.
+    """
+    note_id: str
+    format: str = FORMAT_FILE
+    location: Tuple[Any, ...] = ()
+    size: Optional[int] = None
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], note_id: Optional[str] = None) -> 'InputRecord':
+        """Record for a note stored in a file of its own (id: its file name)"""
+        path = Path(path)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            size = None
+        return cls(note_id or path.name, FORMAT_FILE, (str(path),), size)
+
+    @classmethod
+    def from_text(cls, note_id: str, text: str) -> 'InputRecord':
+        """Record for a note whose text is already in memory"""
+        return cls(note_id, FORMAT_TEXT, (text,), len(text))
+
+    @property
+    def name(self) -> str:
+        return self.note_id
+
+    @property
+    def output_stem(self) -> str:
+        return output_stem(self.note_id)
+
+    @property
+    def path(self) -> Optional[Path]:
+        """File holding only this note, if it has one"""
+        return Path(self.location[0]) if self.format == FORMAT_FILE else None
+
+    @property
+    def source(self) -> str:
+        """Human-readable location, for messages"""
+        if self.format == FORMAT_FILE:
+            return str(self.location[0])
+        if self.format == FORMAT_TEXT:
+            return f"<text {self.note_id}>"
+        return f"{self.location[0]}[{self.location[1]}]"
+
+    def read_text(self) -> str:
+        """Read the note's text"""
+        try:
+            reader = _FORMATS[self.format].read_text
+        except KeyError:
+            raise InputSourceError(f"Unknown input format: {self.format}")
+        return reader(self.location)
+
+
+def as_input_record(item: Union[InputRecord, str, Path]) -> InputRecord:
+    """Wrap a plain file path as a record; records pass through"""
+    if isinstance(item, InputRecord):
+        return item
+    return InputRecord.from_file(item)
+
+
+class InputOptions(NamedTuple):
+    """How to find notes inside a corpus file"""
+    id_field: str = DEFAULT_ID_FIELD
+    text_field: str = DEFAULT_TEXT_FIELD
+    delimiter: str = DEFAULT_NOTE_DELIMITER
+
+
+class InputFormat(NamedTuple):
+    """A registered input format
+
+    ``list_records(path, options)`` yields the records of a corpus file;
+    ``read_text(location)`` reads one record's text back.
+    """
+    suffixes: Tuple[str, ...]
+    list_records: Callable[[Path, InputOptions], Iterator[InputRecord]]
+    read_text: Callable[[Tuple[Any, ...]], str]
+
+
+_FORMATS: Dict[str, InputFormat] = {}
+
+
+def register_input_format(name: str, suffixes: Iterable[str],
+                          list_records: Callable[[Path, InputOptions], Iterator[InputRecord]],
+                          read_text: Callable[[Tuple[Any, ...]], str]):
+    """Add (or replace) a corpus format recognised by file suffix"""
+    _FORMATS[name] = InputFormat(tuple(s.lower() for s in suffixes), list_records, read_text)
+
+
+def detect_format(path: Union[str, Path]) -> Optional[str]:
+    """Corpus format of a file from its suffix, or None for a plain note"""
+    name = Path(path).name.lower()
+    best, best_length = None, 0
+    for format_name, input_format in _FORMATS.items():
+        for suffix in input_format.suffixes:
+            # Longest match wins, so ".tar.gz" beats a plain ".gz"
+            if name.endswith(suffix) and len(suffix) > best_length:
+                best, best_length = format_name, len(suffix)
+    return best
+
+
+def _fallback_id(path: Path, index: Any) -> str:
+    return f"{path.stem}_{index}"
+
+
+def _text_field_value(data: Any, text_field: str) -> Optional[str]:
+    if not isinstance(data, dict):
+        return None
+    value = data.get(text_field)
+    return value if isinstance(value, str) else None
+
+
+# Plain note files
+
+def _read_file(location: Tuple[Any, ...]) -> str:
+    with open(location[0], 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+# JSON Lines
+
+def _list_jsonl(path: Path, options: 'InputOptions') -> Iterator[InputRecord]:
+    id_field, text_field = options.id_field, options.text_field
+    skipped = 0
+    with open(path, 'rb') as f:
+        offset = 0
+        for line_number, line in enumerate(f, 1):
+            start, offset = offset, offset + len(line)
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if _text_field_value(data, text_field) is None:
+                skipped += 1
+                continue
+            note_id = data.get(id_field)
+            if note_id is None or note_id == "":
+                note_id = _fallback_id(path, line_number)
+            yield InputRecord(str(note_id), FORMAT_JSONL, (str(path), start, text_field), len(line))
+    if skipped:
+        logger.warning(f"Skipped {skipped} lines of {path.name} without a '{text_field}' string")
+
+
+def _read_jsonl(location: Tuple[Any, ...]) -> str:
+    path, offset, text_field = location
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        line = f.readline()
+    text = _text_field_value(json.loads(line), text_field)
+    if text is None:
+        raise InputSourceError(f"{path} at byte {offset} has no '{text_field}' string")
+    return text
+
+
+# CSV / TSV
+
+class _OffsetLines:
+    """Decoded lines of a binary file, tracking the byte offset read so far"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self.f:
+            self.offset += len(line)
+            yield line.decode('utf-8')
+
+
+def _csv_delimiter(path: Union[str, Path]) -> str:
+    return '\t' if str(path).lower().endswith('.tsv') else ','
+
+
+@lru_cache(maxsize=None)
+def _allow_large_csv_fields():
+    # Notes easily exceed the csv module's 128 KiB field limit; the largest
+    # value a C long takes depends on the platform
+    limit = sys.maxsize
+    while True:
+        try:
+            csv.field_size_limit(limit)
+            return
+        except OverflowError:
+            limit //= 10
+
+
+def _list_csv(path: Path, options: 'InputOptions') -> Iterator[InputRecord]:
+    id_field, text_field = options.id_field, options.text_field
+    delimiter = _csv_delimiter(path)
+    _allow_large_csv_fields()
+    with open(path, 'rb') as f:
+        lines = _OffsetLines(f)
+        reader = csv.reader(lines, delimiter=delimiter)
+        try:
+            header = [column.lstrip('﻿').strip() for column in next(reader)]
+        except StopIteration:
+            return
+        if text_field not in header:
+            raise InputSourceError(f"{path.name} has no '{text_field}' column (columns: {', '.join(header)})")
+        text_index = header.index(text_field)
+        id_index = header.index(id_field) if id_field in header else None
+
+        row_number = 0
+        while True:
+            start = lines.offset
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            row_number += 1
+            if not row or len(row) <= text_index:
+                continue
+            note_id = row[id_index] if id_index is not None and id_index < len(row) else ""
+            if not note_id:
+                note_id = _fallback_id(path, row_number)
+            yield InputRecord(note_id, FORMAT_CSV, (str(path), start, text_index, delimiter),
+                              lines.offset - start)
+
+
+def _read_csv(location: Tuple[Any, ...]) -> str:
+    path, offset, text_index, delimiter = location
+    _allow_large_csv_fields()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        row = next(csv.reader(_OffsetLines(f), delimiter=delimiter))
+    return row[text_index]
+
+
+# Parquet
+
+def _require_pyarrow():
+    if not HAS_PYARROW:
+        raise InputSourceError("pyarrow is required to read Parquet inputs (pip install pyarrow)")
+
+
+def _list_parquet(path: Path, options: 'InputOptions') -> Iterator[InputRecord]:
+    id_field, text_field = options.id_field, options.text_field
+    _require_pyarrow()
+    parquet = pq.ParquetFile(str(path))
+    columns = parquet.schema_arrow.names
+    if text_field not in columns:
+        raise InputSourceError(f"{path.name} has no '{text_field}' column (columns: {', '.join(columns)})")
+
+    for row_group in range(parquet.num_row_groups):
+        if id_field in columns:
+            ids = parquet.read_row_group(row_group, columns=[id_field]).column(0).to_pylist()
+        else:
+            ids = [None] * parquet.metadata.row_group(row_group).num_rows
+        for row, note_id in enumerate(ids):
+            if note_id is None or note_id == "":
+                note_id = _fallback_id(path, f"{row_group}_{row}")
+            yield InputRecord(str(note_id), FORMAT_PARQUET, (str(path), row_group, row, text_field))
+
+
+@lru_cache(maxsize=4)
+def _parquet_row_group_text(path: str, row_group: int, column: str) -> List[Optional[str]]:
+    # Workers take records in order, so one decoded row group serves many notes
+    return pq.ParquetFile(path).read_row_group(row_group, columns=[column]).column(0).to_pylist()
+
+
+def _read_parquet(location: Tuple[Any, ...]) -> str:
+    _require_pyarrow()
+    path, row_group, row, text_field = location
+    text = _parquet_row_group_text(path, row_group, text_field)[row]
+    return text if text is not None else ""
+
+
+# tar archives
+
+def _is_compressed(path: Union[str, Path]) -> bool:
+    with open(path, 'rb') as f:
+        magic = f.read(6)
+    return magic.startswith((b'\x1f\x8b', b'BZh', b'\xfd7zXZ\x00'))
+
+
+def _list_tar(path: Path, options: 'InputOptions') -> Iterator[InputRecord]:
+    compressed = _is_compressed(path)
+    with tarfile.open(str(path), 'r:*') as archive:
+        for member in archive:
+            if not member.isfile() or not is_note_file(member.name):
+                continue
+            # Plain tarballs are read by seeking straight to the member data
+            offset = -1 if compressed else member.offset_data
+            yield InputRecord(member.name, FORMAT_TAR, (str(path), member.name, offset, member.size),
+                              member.size)
+
+
+class _TarStream:
+    """Sequential reader of one compressed tarball
+
+    Compressed archives cannot seek, so reads advance one shared stream to
+    the requested member. Members skipped on the way are kept (up to
+    ``TAR_STREAM_BUFFER``) because workers ask for them shortly after; a
+    member already passed, e.g. on a retry, is found by re-opening.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._archive = None
+        self._members = None
+        self._buffer: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._archive is not None:
+            self._archive.close()
+        self._archive = tarfile.open(self.path, 'r|*')
+        self._members = iter(self._archive)
+
+    def read(self, name: str) -> bytes:
+        with self._lock:
+            if name in self._buffer:
+                return self._buffer.pop(name)
+            if self._members is None:
+                self._open()
+            data = self._advance_to(name, keep_skipped=True)
+            if data is None:
+                # Passed already; scan again from the start
+                self._open()
+                data = self._advance_to(name, keep_skipped=False)
+            if data is None:
+                raise InputSourceError(f"{name} not found in {self.path}")
+            return data
+
+    def _advance_to(self, name: str, keep_skipped: bool) -> Optional[bytes]:
+        for member in self._members:
+            if not member.isfile():
+                continue
+            if member.name == name:
+                return self._archive.extractfile(member).read()
+            if keep_skipped and is_note_file(member.name):
+                self._buffer[member.name] = self._archive.extractfile(member).read()
+                if len(self._buffer) > TAR_STREAM_BUFFER:
+                    self._buffer.popitem(last=False)
+        return None
+
+
+_tar_streams: Dict[str, _TarStream] = {}
+_tar_streams_lock = threading.Lock()
+
+
+def _read_tar(location: Tuple[Any, ...]) -> str:
+    path, name, offset, size = location
+    if offset >= 0:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size).decode('utf-8')
+    with _tar_streams_lock:
+        stream = _tar_streams.get(path)
+        if stream is None:
+            stream = _tar_streams[path] = _TarStream(path)
+    return stream.read(name).decode('utf-8')
+
+
+# zip archives
+
+def _list_zip(path: Path, options: 'InputOptions') -> Iterator[InputRecord]:
+    with zipfile.ZipFile(str(path)) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not is_note_file(info.filename):
+                continue
+            yield InputRecord(info.filename, FORMAT_ZIP, (str(path), info.filename), info.file_size)
+
+
+_zip_local = threading.local()
+
+
+def _read_zip(location: Tuple[Any, ...]) -> str:
+    path, name = location
+    # One open archive per thread; ZipFile reads are not safe to interleave
+    archives = _zip_local.__dict__.setdefault('archives', {})
+    archive = archives.get(path)
+    if archive is None:
+        archive = archives[path] = zipfile.ZipFile(path)
+    with archive.open(name) as member:
+        return io.TextIOWrapper(member, encoding='utf-8').read()
+
+
+# Delimited text: one large file of notes separated by a delimiter
+
+INDEX_SUFFIX = ".pymm-index"
+INDEX_VERSION = 1
+_WHITESPACE = frozenset(b" \t\r\n\f\v")
+
+
+def _index_paths(path: Path) -> List[Path]:
+    """Where a corpus' offset index may live: next to it, else under ~/.pymm"""
+    digest = hashlib.sha1(str(path.resolve()).encode('utf-8')).hexdigest()[:16]
+    return [path.with_name(path.name + INDEX_SUFFIX),
+            Path.home() / ".pymm" / "index" / f"{digest}-{path.name}{INDEX_SUFFIX}"]
+
+
+def _index_header(path: Path, delimiter: bytes) -> Dict[str, Any]:
+    stat = path.stat()
+    return {"version": INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "delimiter": delimiter.hex()}
+
+
+def _load_offset_index(index_path: Path, header: Dict[str, Any]) -> Optional[array]:
+    try:
+        with open(index_path, 'rb') as f:
+            if json.loads(f.readline()) != header:
+                return None
+            offsets = array('Q')
+            offsets.frombytes(f.read())
+    except (OSError, ValueError):
+        return None
+    if offsets.itemsize != 8 or len(offsets) % 2:
+        return None
+    return offsets
+
+
+def _save_offset_index(index_paths: List[Path], header: Dict[str, Any], offsets: array):
+    for index_path in index_paths:
+        temp_path = index_path.with_name(f".{index_path.name}.{os.getpid()}.tmp")
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b"\n")
+                f.write(offsets.tobytes())
+            os.replace(temp_path, index_path)
+            return
+        except OSError as e:
+            logger.debug(f"Cannot write offset index {index_path}: {e}")
+            try:
+                temp_path.unlink()
+            except OSError:
+                pass
+    logger.warning("Offset index could not be saved; it will be rebuilt next run")
+
+
+def _trim(data, start: int, end: int) -> Tuple[int, int]:
+    while start < end and data[start] in _WHITESPACE:
+        start += 1
+    while end > start and data[end - 1] in _WHITESPACE:
+        end -= 1
+    return start, end
+
+
+def build_offset_index(path: Union[str, Path], delimiter: str = DEFAULT_NOTE_DELIMITER) -> array:
+    """Scan a delimited corpus once and return its (start, end) note offsets
+
+    The file is memory-mapped, so scanning costs no more memory than the
+    page cache; surrounding whitespace and empty notes are dropped.
+    """
+    separator = delimiter.encode('utf-8')
+    if not separator:
+        raise InputSourceError("The note delimiter must not be empty")
+    offsets = array('Q')
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return offsets
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = 0
+            while position <= size:
+                end = data.find(separator, position)
+                if end < 0:
+                    end = size
+                start, stop = _trim(data, position, end)
+                if stop > start:
+                    offsets.extend((start, stop))
+                position = end + len(separator)
+    return offsets
+
+
+def load_offset_index(path: Union[str, Path], delimiter: str = DEFAULT_NOTE_DELIMITER) -> array:
+    """Offset index of a delimited corpus, built once and persisted
+
+    The index is stored next to the corpus as ``<name>.pymm-index`` (or
+    under ``~/.pymm/index`` when that directory is read-only) and rebuilt
+    when the corpus' size or mtime or the delimiter change.
+    """
+    path = Path(path)
+    header = _index_header(path, delimiter.encode('utf-8'))
+    index_paths = _index_paths(path)
+    for index_path in index_paths:
+        offsets = _load_offset_index(index_path, header)
+        if offsets is not None:
+            return offsets
+
+    start = time.time()
+    offsets = build_offset_index(path, delimiter)
+    logger.info(f"Indexed {len(offsets) // 2} notes in {path.name} in {time.time() - start:.1f}s")
+    _save_offset_index(index_paths, header, offsets)
+    return offsets
+
+
+def _list_delimited(path: Path, options: 'InputOptions') -> Iterator[InputRecord]:
+    offsets = load_offset_index(path, options.delimiter)
+    source = str(path)
+    for number in range(len(offsets) // 2):
+        start, end = offsets[2 * number], offsets[2 * number + 1]
+        yield InputRecord(f"{path.stem}_{number + 1}", FORMAT_DELIMITED, (source, start, end), end - start)
+
+
+_corpus_maps: Dict[str, mmap.mmap] = {}
+_corpus_maps_lock = threading.Lock()
+
+
+def _corpus_map(path: str) -> mmap.mmap:
+    # One read-only map per corpus and process; workers slice notes out of
+    # the shared page cache instead of holding copies of the file
+    with _corpus_maps_lock:
+        data = _corpus_maps.get(path)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = _corpus_maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return data
+
+
+def _read_delimited(location: Tuple[Any, ...]) -> str:
+    path, start, end = location
+    return _corpus_map(path)[start:end].decode('utf-8')
+
+
+register_input_format(FORMAT_JSONL, ('.jsonl', '.ndjson'), _list_jsonl, _read_jsonl)
+register_input_format(FORMAT_CSV, ('.csv', '.tsv'), _list_csv, _read_csv)
+register_input_format(FORMAT_PARQUET, ('.parquet', '.pq'), _list_parquet, _read_parquet)
+register_input_format(FORMAT_TAR, ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz'),
+                      _list_tar, _read_tar)
+register_input_format(FORMAT_ZIP, ('.zip',), _list_zip, _read_zip)
+register_input_format(FORMAT_DELIMITED, (), _list_delimited, _read_delimited)
+_FORMATS[FORMAT_FILE] = InputFormat((), lambda path, options: iter(()), _read_file)
+_FORMATS[FORMAT_TEXT] = InputFormat((), lambda path, options: iter(()), lambda location: location[0])
+
+
+def iter_input_records(path: Union[str, Path], input_format: Optional[str] = None,
+                       id_field: str = DEFAULT_ID_FIELD,
+                       text_field: str = DEFAULT_TEXT_FIELD,
+                       delimiter: str = DEFAULT_NOTE_DELIMITER,
+                       recursive: bool = False) -> Iterator[InputRecord]:
+    """Stream the notes of a directory, corpus file or single note file
+
+    A directory yields its note files. Corpus files inside it (e.g. a
+    ``manifest.csv`` next to the notes) are only read when ``input_format``
+    names their format, so a directory of JSONL shards needs
+    ``input_format="jsonl"``. With ``recursive`` set, subdirectories are
+    read too and their note files are identified by relative path
+    (``sub/x.txt``); hidden directories are skipped.
+
+    Args:
+        path: Directory, corpus file (JSONL, CSV, Parquet, tar, zip,
+            delimited text) or note file
+        input_format: Force a corpus format instead of detecting it by suffix
+        id_field: Field or column holding the note id
+        text_field: Field or column holding the note text
+        delimiter: Separator between the notes of a delimited text corpus
+        recursive: Also read the subdirectories of a directory
+    """
+    options = InputOptions(id_field, text_field, delimiter)
+    path = Path(path)
+    if path.is_dir():
+        entries = path.rglob('*') if recursive else path.iterdir()
+        files = sorted(entry for entry in entries if entry.is_file()
+                       and not any(part.startswith('.') for part in entry.relative_to(path).parts[:-1]))
+        skipped = 0
+        for file in files:
+            file_format = detect_format(file)
+            if file_format and file_format == input_format:
+                yield from _FORMATS[file_format].list_records(file, options)
+            elif file_format:
+                skipped += 1
+            elif is_note_file(file.name):
+                yield InputRecord.from_file(file, file.relative_to(path).as_posix())
+        if skipped:
+            logger.info(f"Ignored {skipped} corpus files in {path}; "
+                        f"set input_format to read them as notes")
+        return
+
+    if not path.exists():
+        raise InputSourceError(f"Input not found: {path}")
+    format_name = input_format or detect_format(path)
+    if not format_name or format_name == FORMAT_FILE:
+        yield InputRecord.from_file(path)
+        return
+    if format_name not in _FORMATS:
+        raise InputSourceError(f"Unknown input format: {format_name}")
+    yield from _FORMATS[format_name].list_records(path, options)
+
+
+def stream_input_records(path: Union[str, Path], config=None,
+                         recursive: bool = False) -> Iterator[InputRecord]:
+    """Stream all notes of an input, with unique note ids (see ``iter_input_records``)
+
+    Config keys:
+        input_format: corpus format to use instead of detecting it by suffix
+        input_id_field / input_text_field: id and text field or column names
+        input_delimiter: separator between notes of one large text file
+            (backslash escapes such as ``\\f`` allowed); setting it makes a
+            single text file input a delimited corpus
+
+    A repeated note id gets a ``#n`` suffix (with a warning) so its output
+    does not overwrite the first one.
+    """
+    get = config.get if config else (lambda key, default=None: default)
+    input_format = get("input_format") or None
+    delimiter = get("input_delimiter") or None
+    if delimiter:
+        if '\\' in delimiter:
+            # Expand escapes only; unicode_escape alone would garble non-ASCII text
+            delimiter = delimiter.encode('latin-1', 'backslashreplace').decode('unicode_escape')
+        if not input_format and Path(path).is_file() and not detect_format(path):
+            input_format = FORMAT_DELIMITED
+
+    seen: Dict[str, int] = {}
+    duplicates = 0
+    for record in iter_input_records(path, input_format,
+                                     get("input_id_field", DEFAULT_ID_FIELD) or DEFAULT_ID_FIELD,
+                                     get("input_text_field", DEFAULT_TEXT_FIELD) or DEFAULT_TEXT_FIELD,
+                                     delimiter or DEFAULT_NOTE_DELIMITER, recursive):
+        count = seen.get(record.note_id, 0)
+        seen[record.note_id] = count + 1
+        if count:
+            duplicates += 1
+            record = InputRecord(f"{record.note_id}#{count + 1}", record.format, record.location, record.size)
+        yield record
+    if duplicates:
+        logger.warning(f"Renamed {duplicates} notes with repeated ids in {path}")
+
+
+def input_layout(config) -> Dict[str, str]:
+    """The corpus layout settings of config (see ``INPUT_LAYOUT_KEYS``)"""
+    if not config:
+        return {}
+    return {key: str(config.get(key)) for key in INPUT_LAYOUT_KEYS if config.get(key)}
+
+
+def restore_input_layout(layout: Dict[str, str]):
+    """Use a stored corpus layout for this run
+
+    Set through the environment, which ``PyMMConfig.get`` falls back to,
+    so the saved config is left alone.
+    """
+    for key in INPUT_LAYOUT_KEYS:
+        if layout.get(key):
+            os.environ[key.upper()] = layout[key]
+
+
+def collect_input_records(path: Union[str, Path], config=None) -> List[InputRecord]:
+    """List all notes of an input; see ``stream_input_records``"""
+    records = list(stream_input_records(path, config))
+    logger.info(f"Found {len(records)} input notes in {path}")
+    return records
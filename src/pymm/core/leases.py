@@ -0,0 +1,360 @@
+"""Shared-filesystem work leases for multi-node processing
+
+Several machines (or local processes) can process the same input directory
+into the same output directory without a coordinator. Before processing a
+file a node claims a lease record in ``<output_dir>/.leases``:
+
+- Claims are atomic: the lease is written to a private temp file and
+  hard-linked into place (``link`` is atomic on NFS), falling back to an
+  ``O_CREAT | O_EXCL`` create where hard links are unsupported.
+- A heartbeat thread refreshes the mtime of every lease the node holds.
+  Leases whose mtime is older than the TTL belong to a dead node and can be
+  reclaimed; the stale lease is first renamed to a unique name so only one
+  node wins the reclaim.
+- Expiry is judged against the file server's clock (the mtime of this
+  node's own freshly touched heartbeat file), so clock skew between nodes
+  does not cause premature reclaims.
+- Finished files get a ``.done`` or ``.failed`` marker that every node
+  honours.
+
+Like ``AtomicStateManager`` this relies only on atomic filesystem
+operations, so it works across processes on one machine as well.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Any
+
+from .inputs import InputRecord
+
+logger = logging.getLogger(__name__)
+
+LEASE_DIR = ".leases"
+DEFAULT_LEASE_TTL = 120  # seconds without heartbeat before a lease is reclaimable
+
+
+def default_node_id() -> str:
+    """Node id unique per host and process"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseManager:
+    """Claims, heartbeats and completes per-file leases on a shared filesystem"""
+
+    def __init__(self, output_dir: str, input_dir: Optional[str] = None,
+                 node_id: Optional[str] = None, lease_ttl: int = DEFAULT_LEASE_TTL,
+                 heartbeat_interval: Optional[float] = None):
+        """
+        Args:
+            output_dir: Shared output directory holding the lease records
+            input_dir: Shared input directory; lease keys are paths relative
+                to it so nodes with different mount points agree
+            node_id: Unique id of this node (defaults to host-pid)
+            lease_ttl: Seconds without heartbeat after which a lease expires
+            heartbeat_interval: Seconds between heartbeats (default ttl / 4)
+        """
+        self.lease_dir = Path(output_dir) / LEASE_DIR
+        self.nodes_dir = self.lease_dir / "nodes"
+        self.nodes_dir.mkdir(parents=True, exist_ok=True)
+
+        self.input_dir = Path(input_dir).resolve() if input_dir else None
+        self.node_id = node_id or default_node_id()
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval or max(1.0, lease_ttl / 4)
+
+        self.node_file = self.nodes_dir / f"{self.node_id}.alive"
+        self._held: Dict[str, Path] = {}  # key -> lease path
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._heartbeat_thread = None
+
+        self.stats = {"claimed": 0, "reclaimed": 0, "lost": 0,
+                      "completed": 0, "failed": 0}
+
+    # Keys and paths
+
+    def key_for(self, file_path) -> str:
+        """Stable lease key for a file or input record, shared by all nodes"""
+        if isinstance(file_path, InputRecord):
+            if file_path.path is None:
+                # Notes inside a corpus file are keyed by note id
+                return hashlib.sha1(f"note:{file_path.note_id}".encode('utf-8')).hexdigest()
+            file_path = file_path.path
+        path = Path(file_path).resolve()
+        if self.input_dir:
+            try:
+                path = path.relative_to(self.input_dir)
+            except ValueError:
+                pass
+        return hashlib.sha1(path.as_posix().encode('utf-8')).hexdigest()
+
+    def _lease_path(self, key: str) -> Path:
+        return self.lease_dir / f"{key}.lease"
+
+    def _marker_path(self, key: str, status: str) -> Path:
+        return self.lease_dir / f"{key}.{status}"
+
+    # Filesystem primitives
+
+    def _create_exclusive(self, path: Path, record: Dict[str, Any]) -> bool:
+        """Atomically create path with record; False if it already exists"""
+        data = json.dumps(record).encode('utf-8')
+        temp = self.lease_dir / f".{path.name}.{self.node_id}.{uuid.uuid4().hex}"
+
+        try:
+            with open(temp, 'wb') as f:
+                f.write(data)
+            try:
+                os.link(str(temp), str(path))
+                return True
+            except FileExistsError:
+                return False
+            except (AttributeError, NotImplementedError, OSError):
+                # Filesystem without hard links
+                try:
+                    fd = os.open(str(path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    return False
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                return True
+        finally:
+            try:
+                temp.unlink()
+            except OSError:
+                pass
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _server_now(self) -> float:
+        """Current time on the file server, via this node's heartbeat file"""
+        try:
+            self.node_file.touch()
+            return self.node_file.stat().st_mtime
+        except OSError:
+            return time.time()
+
+    def _is_expired(self, path: Path, now: float) -> bool:
+        try:
+            return now - path.stat().st_mtime > self.lease_ttl
+        except FileNotFoundError:
+            return True
+
+    # Public API
+
+    def is_finished(self, file_path) -> bool:
+        """Whether any node has completed (or given up on) the file"""
+        key = self.key_for(file_path)
+        return (self._marker_path(key, "done").exists() or
+                self._marker_path(key, "failed").exists())
+
+    def claim(self, file_path) -> bool:
+        """Try to claim a file for this node
+
+        Returns:
+            True if this node now holds the lease
+        """
+        key = self.key_for(file_path)
+        with self._lock:
+            if key in self._held:
+                return True
+
+        if self.is_finished(file_path):
+            return False
+
+        lease_path = self._lease_path(key)
+        record = {
+            "node": self.node_id,
+            "file": str(file_path),
+            "claimed": time.time()
+        }
+
+        if not self._create_exclusive(lease_path, record):
+            if not self._is_expired(lease_path, self._server_now()):
+                return False
+            if not self._break_lease(lease_path):
+                return False
+            if not self._create_exclusive(lease_path, record):
+                return False
+            self.stats["reclaimed"] += 1
+            logger.info(f"Reclaimed expired lease for {file_path}")
+
+        # A finishing node may have written its marker between our checks
+        if self.is_finished(file_path):
+            self._unlink(lease_path)
+            return False
+
+        with self._lock:
+            self._held[key] = lease_path
+            self.stats["claimed"] += 1
+        return True
+
+    def _break_lease(self, lease_path: Path) -> bool:
+        """Remove an expired lease; only one of several racing nodes succeeds"""
+        tombstone = lease_path.with_name(
+            f"{lease_path.name}.stale.{self.node_id}.{uuid.uuid4().hex}")
+        try:
+            os.rename(str(lease_path), str(tombstone))
+        except FileNotFoundError:
+            # Another node broke it first; compete on the re-create instead
+            return True
+        except OSError as e:
+            logger.debug(f"Could not break lease {lease_path}: {e}")
+            return False
+
+        # The owner may have heartbeated just before the rename
+        if not self._is_expired(tombstone, self._server_now()):
+            try:
+                os.link(str(tombstone), str(lease_path))
+            except OSError:
+                pass
+            self._unlink(tombstone)
+            return False
+
+        previous = self._read(tombstone) or {}
+        logger.warning(f"Lease of node {previous.get('node', 'unknown')} on "
+                       f"{previous.get('file', lease_path.name)} expired")
+        self._unlink(tombstone)
+        return True
+
+    def holds(self, file_path) -> bool:
+        """Whether this node still holds the lease for a file"""
+        with self._lock:
+            return self.key_for(file_path) in self._held
+
+    def complete(self, file_path):
+        """Record a file as done and release its lease"""
+        self._finish(file_path, "done", {"node": self.node_id, "finished": time.time()})
+        self.stats["completed"] += 1
+
+    def fail(self, file_path, error: Optional[str] = None):
+        """Record a file as permanently failed and release its lease"""
+        self._finish(file_path, "failed", {
+            "node": self.node_id,
+            "finished": time.time(),
+            "error": (error or "")[:500]
+        })
+        self.stats["failed"] += 1
+
+    def release(self, file_path):
+        """Give a lease back without finishing the file"""
+        key = self.key_for(file_path)
+        with self._lock:
+            lease_path = self._held.pop(key, None)
+        if lease_path and self._owns(lease_path):
+            self._unlink(lease_path)
+
+    def _finish(self, file_path, status: str, record: Dict[str, Any]):
+        key = self.key_for(file_path)
+        record["file"] = str(file_path)
+        self._create_exclusive(self._marker_path(key, status), record)
+
+        with self._lock:
+            lease_path = self._held.pop(key, None)
+        if lease_path and self._owns(lease_path):
+            self._unlink(lease_path)
+
+    def _owns(self, lease_path: Path) -> bool:
+        record = self._read(lease_path)
+        return bool(record) and record.get("node") == self.node_id
+
+    def _unlink(self, path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def unfinished(self, files: Iterable[Path]) -> List[Path]:
+        """Files that no node has finished yet"""
+        return [f for f in files if not self.is_finished(f)]
+
+    def claimable(self, files: Iterable[Path]) -> List[Path]:
+        """Unfinished files that are unleased or whose lease has expired"""
+        now = self._server_now()
+        result = []
+        for file in files:
+            if self.is_finished(file):
+                continue
+            lease_path = self._lease_path(self.key_for(file))
+            if not lease_path.exists() or self._is_expired(lease_path, now):
+                result.append(file)
+        return result
+
+    def live_nodes(self) -> List[str]:
+        """Nodes whose heartbeat is within the lease TTL"""
+        now = self._server_now()
+        return sorted(
+            path.stem for path in self.nodes_dir.glob("*.alive")
+            if not self._is_expired(path, now)
+        )
+
+    # Heartbeats
+
+    def heartbeat(self):
+        """Refresh this node's heartbeat and all held leases"""
+        self._server_now()
+
+        with self._lock:
+            held = list(self._held.items())
+
+        for key, lease_path in held:
+            try:
+                if not self._owns(lease_path):
+                    raise FileNotFoundError(str(lease_path))
+                os.utime(str(lease_path))
+            except OSError:
+                with self._lock:
+                    self._held.pop(key, None)
+                self.stats["lost"] += 1
+                logger.warning(f"Lost lease {lease_path.name}; another node reclaimed it")
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Lease heartbeat failed: {e}")
+
+    def start(self):
+        """Register this node and start the heartbeat thread"""
+        self._server_now()
+        if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+            self._stop_event.clear()
+            self._heartbeat_thread = threading.Thread(
+                target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+        logger.info(f"Node {self.node_id} joined {self.lease_dir} "
+                    f"(lease TTL {self.lease_ttl}s)")
+
+    def stop(self):
+        """Stop heartbeats, release held leases and deregister the node"""
+        self._stop_event.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join(timeout=5)
+            self._heartbeat_thread = None
+
+        with self._lock:
+            held = list(self._held.values())
+            self._held.clear()
+        for lease_path in held:
+            if self._owns(lease_path):
+                self._unlink(lease_path)
+        self._unlink(self.node_file)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,327 @@
+"""Process-wide background sampling of system resources
+
+A single ``ResourceSampler`` thread reads CPU, memory, swap, disk and
+network counters once per interval and publishes an immutable
+``ResourceSample``. Readers never call psutil themselves::
+
+    sampler = get_resource_sampler()
+    sampler.acquire()                  # start sampling while in use
+    sample = sampler.latest()          # plain attribute read, no lock
+    if sample.memory_percent > 90:
+        ...
+    sampler.release()
+
+CPU usage is computed from ``cpu_times`` deltas between ticks, so no
+sample blocks the way ``psutil.cpu_percent(interval=...)`` does and the
+result does not depend on other ``cpu_percent`` callers in the process.
+Recent samples are kept in a ring buffer (``history``) and monitors that
+keep their own series can ``subscribe`` to every new sample.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_HISTORY = 300
+
+_GB = 1024 ** 3
+
+
+@dataclass(frozen=True)
+class DiskUsage:
+    """Space on the file system holding a watched path"""
+    percent: float
+    free: int
+    total: int
+    used: int = 0
+
+
+@dataclass(frozen=True)
+class ResourceSample:
+    """System resources at one point in time
+
+    Rates are bytes per second since the previous sample.
+    """
+    timestamp: float
+    cpu_percent: float
+    cpu_per_core: Tuple[float, ...]
+    memory_percent: float
+    memory_total: int
+    memory_used: int
+    memory_available: int
+    swap_percent: float
+    swap_used: int
+    swap_total: int
+    disk_read_rate: float = 0.0
+    disk_write_rate: float = 0.0
+    net_recv_rate: float = 0.0
+    net_sent_rate: float = 0.0
+    net_recv_bytes: int = 0
+    net_sent_bytes: int = 0
+    disks: Dict[str, DiskUsage] = field(default_factory=dict)
+
+    @property
+    def memory_available_gb(self) -> float:
+        return self.memory_available / _GB
+
+    @property
+    def memory_total_gb(self) -> float:
+        return self.memory_total / _GB
+
+    def disk(self, path: str = '/') -> Optional[DiskUsage]:
+        """Usage of a path registered with ``ResourceSampler.watch_disk``"""
+        return self.disks.get(str(path))
+
+
+def _busy_fraction(previous, current) -> float:
+    """Share of CPU time spent busy between two ``cpu_times`` readings"""
+    def split(times):
+        total = sum(times)
+        # Guest time is already included in user/nice on Linux
+        total -= getattr(times, 'guest', 0.0) + getattr(times, 'guest_nice', 0.0)
+        idle = times.idle + getattr(times, 'iowait', 0.0)
+        return total, total - idle
+
+    total_before, busy_before = split(previous)
+    total_after, busy_after = split(current)
+    total = total_after - total_before
+    if total <= 0:
+        return 0.0
+    return min(max((busy_after - busy_before) / total, 0.0), 1.0)
+
+
+class ResourceSampler:
+    """Samples system resources on a background thread
+
+    ``latest`` and ``history`` are safe to call from any thread without
+    locking: each tick builds a new sample and publishes it with a single
+    reference assignment. Sampling runs while at least one consumer holds
+    an ``acquire``; without one, ``latest`` samples inline when the last
+    sample is older than the interval.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, history_size: int = DEFAULT_HISTORY):
+        self.interval = interval
+        self._history: Deque[ResourceSample] = deque(maxlen=history_size)
+        self._latest: Optional[ResourceSample] = None
+        self._subscribers: Tuple[Callable[[ResourceSample], None], ...] = ()
+        self._disk_paths: Tuple[str, ...] = ('/',)
+
+        # Counters from the previous tick, used for rates
+        self._cpu_times = None
+        self._cpu_times_per_core = None
+        self._disk_io = None
+        self._net_io = None
+        self._last_time = None
+
+        self._users = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._sample_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._published = threading.Condition()
+
+    @property
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def acquire(self):
+        """Register a consumer, starting the sampling thread if needed"""
+        with self._lock:
+            self._users += 1
+            if not self.running:
+                self._stop.clear()
+                self.sample()
+                self._thread = threading.Thread(target=self._run, name="pymm-resource-sampler",
+                                                daemon=True)
+                self._thread.start()
+
+    def release(self):
+        """Drop a consumer, stopping the thread when none are left"""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users or self._thread is None:
+                return
+            self._stop.set()
+            thread, self._thread = self._thread, None
+        if thread is not threading.current_thread():
+            thread.join(timeout=self.interval + 1)
+
+    def watch_disk(self, path):
+        """Include space usage of the file system holding path in samples"""
+        path = str(path)
+        with self._lock:
+            if path not in self._disk_paths:
+                self._disk_paths = self._disk_paths + (path,)
+
+    def subscribe(self, callback: Callable[[ResourceSample], None]):
+        """Call back with every new sample, on the sampler thread
+
+        Callbacks must be quick; a slow subscriber delays everyone's samples.
+        """
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers = self._subscribers + (callback,)
+
+    def unsubscribe(self, callback: Callable[[ResourceSample], None]):
+        with self._lock:
+            self._subscribers = tuple(c for c in self._subscribers if c != callback)
+
+    def latest(self) -> ResourceSample:
+        """Most recent sample"""
+        sample = self._latest
+        if sample is None or (not self.running
+                              and time.time() - sample.timestamp >= self.interval):
+            sample = self.sample()
+        return sample
+
+    def history(self, seconds: Optional[float] = None) -> List[ResourceSample]:
+        """Buffered samples, oldest first, optionally only the last seconds"""
+        while True:
+            try:
+                samples = list(self._history)
+                break
+            except RuntimeError:
+                # Appended to while copying
+                continue
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            samples = [s for s in samples if s.timestamp >= cutoff]
+        return samples
+
+    def wait(self, timeout: Optional[float] = None) -> ResourceSample:
+        """Block until the next sample is published (or timeout) and return the latest"""
+        if self.running:
+            with self._published:
+                self._published.wait(timeout)
+        elif timeout:
+            time.sleep(min(timeout, self.interval))
+        return self.latest()
+
+    def sample(self) -> ResourceSample:
+        """Take a sample now and publish it"""
+        with self._sample_lock:
+            sample = self._read()
+            self._history.append(sample)
+            self._latest = sample
+
+        with self._published:
+            self._published.notify_all()
+        for callback in self._subscribers:
+            try:
+                callback(sample)
+            except Exception as e:
+                logger.debug(f"Resource subscriber {callback!r} failed: {e}")
+        return sample
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug(f"Resource sampling failed: {e}")
+
+    def _read(self) -> ResourceSample:
+        now = time.time()
+        elapsed = now - self._last_time if self._last_time else 0.0
+        self._last_time = now
+
+        cpu_times = psutil.cpu_times()
+        per_core = psutil.cpu_times(percpu=True)
+        if self._cpu_times is not None:
+            cpu_percent = _busy_fraction(self._cpu_times, cpu_times) * 100
+            cpu_per_core = tuple(_busy_fraction(before, after) * 100
+                                 for before, after in zip(self._cpu_times_per_core, per_core))
+        else:
+            cpu_percent, cpu_per_core = 0.0, tuple(0.0 for _ in per_core)
+        self._cpu_times, self._cpu_times_per_core = cpu_times, per_core
+
+        memory = psutil.virtual_memory()
+        try:
+            swap = psutil.swap_memory()
+            swap_percent, swap_used, swap_total = swap.percent, swap.used, swap.total
+        except (OSError, RuntimeError):
+            swap_percent, swap_used, swap_total = 0.0, 0, 0
+
+        disk_read_rate = disk_write_rate = 0.0
+        try:
+            disk_io = psutil.disk_io_counters()
+        except (OSError, RuntimeError):
+            disk_io = None
+        if disk_io and self._disk_io and elapsed > 0:
+            disk_read_rate = max(0, disk_io.read_bytes - self._disk_io.read_bytes) / elapsed
+            disk_write_rate = max(0, disk_io.write_bytes - self._disk_io.write_bytes) / elapsed
+        self._disk_io = disk_io
+
+        net_recv_rate = net_sent_rate = 0.0
+        try:
+            net_io = psutil.net_io_counters()
+        except (OSError, RuntimeError):
+            net_io = None
+        if net_io and self._net_io and elapsed > 0:
+            net_recv_rate = max(0, net_io.bytes_recv - self._net_io.bytes_recv) / elapsed
+            net_sent_rate = max(0, net_io.bytes_sent - self._net_io.bytes_sent) / elapsed
+        self._net_io = net_io
+
+        disks = {}
+        for path in self._disk_paths:
+            try:
+                usage = psutil.disk_usage(path)
+            except OSError:
+                continue
+            disks[path] = DiskUsage(usage.percent, usage.free, usage.total, usage.used)
+
+        return ResourceSample(
+            timestamp=now,
+            cpu_percent=cpu_percent,
+            cpu_per_core=cpu_per_core,
+            memory_percent=memory.percent,
+            memory_total=memory.total,
+            memory_used=memory.used,
+            memory_available=memory.available,
+            swap_percent=swap_percent,
+            swap_used=swap_used,
+            swap_total=swap_total,
+            disk_read_rate=disk_read_rate,
+            disk_write_rate=disk_write_rate,
+            net_recv_rate=net_recv_rate,
+            net_sent_rate=net_sent_rate,
+            net_recv_bytes=net_io.bytes_recv if net_io else 0,
+            net_sent_bytes=net_io.bytes_sent if net_io else 0,
+            disks=disks
+        )
+
+
+_sampler: Optional[ResourceSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_resource_sampler() -> ResourceSampler:
+    """Get the process-wide resource sampler"""
+    global _sampler
+    sampler = _sampler
+    if sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = ResourceSampler()
+            sampler = _sampler
+    return sampler
+
+
+def _reset_after_fork():
+    # The sampling thread does not survive fork; children start their own
+    global _sampler
+    _sampler = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
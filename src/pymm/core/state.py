@@ -1,6 +1,9 @@
 """State management for processing sessions"""
 import json
 import os
+import time
+import atexit
+import weakref
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional, List
@@ -9,16 +12,32 @@ import logging
 import threading
 import copy
 
+# Managers with per-note updates not yet written, flushed at exit
+_unsaved = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_unsaved():
+    for manager in list(_unsaved):
+        manager.flush()
+
+
 class StateManager:
     """Manages persistent state for processing sessions"""
     
     STATE_FILE = ".pymm_state.json"
+    # Per-note updates are written at most this often (seconds); the state
+    # lists every completed note, so rewriting it per note is quadratic
+    SAVE_INTERVAL = 2.0
     
-    def __init__(self, output_dir: str):
+    def __init__(self, output_dir: str, state_file: Optional[str] = None):
         self.output_dir = Path(output_dir)
-        self.state_path = self.output_dir / self.STATE_FILE
+        self.state_path = self.output_dir / (state_file or self.STATE_FILE)
         self._lock = threading.RLock()  # Use reentrant lock for nested calls
         self._state = self._load_state()
+        # Set view of completed_files; corpora can hold millions of notes
+        self._completed = set(self._state["completed_files"])
+        self._last_save = 0.0
         self.logger = logging.getLogger(__name__)
     
     def _load_state(self) -> Dict[str, Any]:
@@ -61,27 +80,47 @@ class StateManager:
         with self._lock:
             self._state["last_updated"] = datetime.now().isoformat()
             self.output_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Create a deep copy to avoid modification during serialization
-            state_copy = copy.deepcopy(self._state)
+            _unsaved.discard(self)
+            self._last_save = time.monotonic()
             
             try:
+                # Serialized under the lock, so no copy of the state is needed
+                data = json.dumps(self._state, indent=2)
                 with open(self.state_path, 'w') as f:
-                    json.dump(state_copy, f, indent=2)
+                    f.write(data)
             except Exception as e:
                 self.logger.error(f"Failed to save state: {e}")
+
+    def _save_soon(self):
+        """Save a per-note update, batching writes within SAVE_INTERVAL
+
+        Unsaved updates are written by the next save, ``flush`` or at exit;
+        notes whose completion is lost in a crash are processed again.
+        """
+        with self._lock:
+            if time.monotonic() - self._last_save >= self.SAVE_INTERVAL:
+                self.save()
+            else:
+                _unsaved.add(self)
+
+    def flush(self):
+        """Write updates held back by the save interval"""
+        with self._lock:
+            if self in _unsaved:
+                self.save()
     
     def mark_completed(self, file_path: str):
         """Mark a file as completed"""
         with self._lock:
-            if file_path not in self._state["completed_files"]:
+            if file_path not in self._completed:
+                self._completed.add(file_path)
                 self._state["completed_files"].append(file_path)
                 self._state["statistics"]["completed"] += 1
             
             # Remove from failed/retry if present
             self._state["failed_files"].pop(file_path, None)
             self._state["retry_queue"].pop(file_path, None)
-            self.save()
+            self._save_soon()
     
     def mark_failed(self, file_path: str, error: str):
         """Mark a file as failed"""
@@ -94,7 +133,7 @@ class StateManager:
                 "error": error,
                 "timestamp": datetime.now().isoformat()
             }
-            self.save()
+            self._save_soon()
     
     def add_to_retry_queue(self, file_path: str, attempt: int, error: str):
         """Add file to retry queue"""
@@ -104,16 +143,46 @@ class StateManager:
                 "last_error": error,
                 "last_attempt": datetime.now().isoformat()
             }
-            self.save()
+            self._save_soon()
     
     def get_retry_info(self, file_path: str) -> Optional[Dict[str, Any]]:
         """Get retry information for a file"""
         with self._lock:
             return self._state["retry_queue"].get(file_path)
     
+    def set_input_source(self, input_source: str, layout: Optional[Dict[str, str]] = None):
+        """Remember the input directory or corpus file of this session
+
+        Args:
+            input_source: Input directory or corpus file
+            layout: How the input is read (format, delimiter, id and text
+                fields; see ``inputs.input_layout``), restored on resume
+        """
+        with self._lock:
+            self._state["input_source"] = str(input_source)
+            self._state["input_layout"] = dict(layout or {})
+            self.save()
+
+    def get_input_layout(self) -> Dict[str, str]:
+        """Corpus layout stored with the input source (empty for older states)"""
+        with self._lock:
+            return dict(self._state.get("input_layout") or {})
+
+    def get_input_source(self) -> Optional[str]:
+        """Input of this session; older states only list completed file paths"""
+        with self._lock:
+            if self._state.get("input_source"):
+                return self._state["input_source"]
+            completed = self._state["completed_files"]
+            return str(Path(completed[0]).parent) if completed else None
+
     def is_completed(self, file_path: str) -> bool:
-        """Check if file is already completed"""
+        """Check if a note id (or file path, for older states) is completed"""
         with self._lock:
+            if file_path in self._completed:
+                return True
+            if os.sep not in str(file_path) and not Path(file_path).is_absolute():
+                return False
             # Normalize path for comparison
             normalized_path = str(Path(file_path).resolve())
             for completed in self._state["completed_files"]:
@@ -183,7 +252,7 @@ class StateManager:
                 )
                 concept_data["top_semantic_types"] = sorted_types[:10]
                 
-                self.save()
+                self._save_soon()
                 
             except Exception as e:
                 self.logger.error(f"Error tracking concepts: {e}")
@@ -213,13 +282,15 @@ class StateManager:
         """Clear all state"""
         with self._lock:
             self._state = self._load_state()
+            self._completed = set(self._state["completed_files"])
             self.save()
     
     def reset_file_state(self, file_path: str):
         """Reset state for a specific file"""
         with self._lock:
             # Remove from completed files
-            if file_path in self._state["completed_files"]:
+            if file_path in self._completed:
+                self._completed.discard(file_path)
                 self._state["completed_files"].remove(file_path)
                 self._state["statistics"]["completed"] = max(0, self._state["statistics"]["completed"] - 1)
             
@@ -0,0 +1,503 @@
+"""Per-stage latency tracing
+
+Processing stages are wrapped in spans::
+
+    with span("metamap", document=name, instance_id=3):
+        ...
+
+Tracing is off by default. ``span`` then returns a shared no-op context
+manager, so instrumented code pays one global lookup per stage. When
+enabled with a trace file (``enable_tracing``, the ``trace_file`` config
+key or the ``PYMM_TRACE_FILE`` environment variable) each finished span is
+appended to a JSONL file, one OpenTelemetry-style span per line::
+
+    {"traceId": "...", "spanId": "...", "parentSpanId": "...", "name": "metamap",
+     "startTimeUnixNano": ..., "endTimeUnixNano": ...,
+     "attributes": [{"key": "document", "value": {"stringValue": "note.txt"}}],
+     "status": {"code": "STATUS_CODE_OK"}, "resource": {...}}
+
+Spans of a document are buffered and appended in one ``O_APPEND`` write
+when its outermost span ends, so several worker processes can share one
+trace file. Without a file, spans are only handed to listeners (e.g. the
+metrics endpoint). ``export_trace`` converts a trace file to Chrome trace-event
+JSON (chrome://tracing, Perfetto, speedscope) or an OTLP/JSON export request
+(an OpenTelemetry collector's ``/v1/traces``), and ``summarize_spans``
+reports per-stage latency percentiles.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENV_VAR = "PYMM_TRACE_FILE"
+SERVICE_NAME = "pymm"
+
+# Buffered spans are flushed at least this often even inside long documents
+_FLUSH_SPANS = 256
+
+# Attributes that nested stages copy from the span they run in
+_INHERITED_ATTRIBUTES = ('document', 'size', 'instance_id')
+
+
+class _NullSpan:
+    """Span returned while tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed stage; use as a context manager"""
+    __slots__ = ('tracer', 'name', 'attributes', 'trace_id', 'span_id', 'parent_id',
+                 'start_ns', 'end_ns', 'error', 'thread_id', '_start_perf')
+
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = None
+        self.span_id = None
+        self.parent_id = None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error = None
+        self.thread_id = 0
+        self._start_perf = 0
+
+    def set(self, **attributes):
+        """Add attributes known only once the stage is running (e.g. concept counts)"""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.tracer._start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._end(self)
+        return False
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_dict(self, resource: Dict[str, Any]) -> Dict[str, Any]:
+        record = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": [{"key": key, "value": _otlp_value(value)}
+                           for key, value in self.attributes.items() if value is not None],
+            "status": {"code": "STATUS_CODE_ERROR", "message": self.error} if self.error
+            else {"code": "STATUS_CODE_OK"},
+            "resource": dict(resource, **{"thread.id": self.thread_id})
+        }
+        return record
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Encode an attribute value as an OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": value}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _plain_value(value: Dict[str, Any]) -> Any:
+    return next(iter(value.values())) if value else None
+
+
+class Tracer:
+    """Records spans of this process and appends them to a trace file
+
+    With path None spans are not recorded, only passed to listeners.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.path = Path(path) if path is not None else None
+        self._fd = -1
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._start_listeners: List[Callable[[Span], None]] = []
+        self._end_listeners: List[Callable[[Span], None]] = []
+        self.resource = {
+            "service.name": SERVICE_NAME,
+            "host.name": socket.gethostname(),
+            "process.pid": self._pid
+        }
+
+    def span(self, name: str, attributes: Dict[str, Any]) -> Span:
+        return Span(self, name, attributes)
+
+    def add_listener(self, listener: Callable[[Span], None], when: str = "start"):
+        """Call listener with every span as it starts or ends
+
+        Args:
+            listener: Called with the Span (e.g. to show live stages)
+            when: 'start' or 'end' (duration and final attributes are known)
+        """
+        if when == "start":
+            self._start_listeners.append(listener)
+        elif when == "end":
+            self._end_listeners.append(listener)
+        else:
+            raise ValueError(f"Unknown listener event: {when}")
+
+    def remove_listener(self, listener: Callable[[Span], None]):
+        for listeners in (self._start_listeners, self._end_listeners):
+            if listener in listeners:
+                listeners.remove(listener)
+
+    def _notify(self, listeners: List[Callable[[Span], None]], span: Span):
+        for listener in listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                logger.debug(f"Span listener failed: {e}")
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _start(self, span: Span):
+        stack = self._stack()
+        if stack:
+            parent = stack[-1]
+            span.trace_id = parent.trace_id
+            span.parent_id = parent.span_id
+            # Stages inherit the document they belong to
+            for key in _INHERITED_ATTRIBUTES:
+                if key in parent.attributes:
+                    span.attributes.setdefault(key, parent.attributes[key])
+        else:
+            span.trace_id = os.urandom(16).hex()
+        span.span_id = os.urandom(8).hex()
+        span.thread_id = threading.get_ident()
+        stack.append(span)
+
+        if self._start_listeners:
+            self._notify(self._start_listeners, span)
+
+        span.start_ns = time.time_ns()
+        span._start_perf = time.perf_counter_ns()
+
+    def _end(self, span: Span):
+        span.end_ns = span.start_ns + (time.perf_counter_ns() - span._start_perf)
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        elif span in stack:
+            stack.remove(span)
+
+        if self._end_listeners:
+            self._notify(self._end_listeners, span)
+        if self.path is None:
+            return
+
+        line = json.dumps(span.to_dict(self.resource), separators=(',', ':'), default=str)
+        with self._lock:
+            self._buffer.append(line)
+            flush = not stack or len(self._buffer) >= _FLUSH_SPANS
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Append buffered spans to the trace file"""
+        with self._lock:
+            if not self._buffer:
+                return
+            data = ("\n".join(self._buffer) + "\n").encode('utf-8')
+            self._buffer = []
+            try:
+                if self._pid != os.getpid():
+                    # Forked child: do not share the parent's descriptor
+                    self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    self._pid = self.resource["process.pid"] = os.getpid()
+                os.write(self._fd, data)
+            except OSError as e:
+                logger.warning(f"Could not write trace spans to {self.path}: {e}")
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._fd >= 0 and self._pid == os.getpid():
+                os.close(self._fd)
+            self._fd = -1
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def span(name: str, **attributes):
+    """Time a stage if tracing is enabled
+
+    Args:
+        name: Stage name
+        **attributes: Span attributes such as document, size, instance_id
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, attributes)
+
+
+def get_tracer() -> Optional[Tracer]:
+    """The active tracer, or None while tracing is disabled"""
+    return _tracer
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def enable_tracing(path: Optional[Union[str, Path]] = None) -> Tracer:
+    """Start appending spans of this process to path
+
+    The path is also exported through ``PYMM_TRACE_FILE`` so worker
+    processes started from here trace into the same file. Without a path
+    spans only reach listeners, and an already active tracer is kept.
+    """
+    global _tracer
+    if path is not None:
+        path = Path(path).resolve()
+    with _tracer_lock:
+        previous = _tracer
+        if previous is not None:
+            if path is None or previous.path == path:
+                return previous
+            previous.close()
+        _tracer = Tracer(path)
+        if previous is not None:
+            # Listeners (live stages, metrics) carry over to the new tracer
+            _tracer._start_listeners.extend(previous._start_listeners)
+            _tracer._end_listeners.extend(previous._end_listeners)
+        if path is not None:
+            os.environ[TRACE_ENV_VAR] = str(path)
+            logger.info(f"Tracing processing stages to {path}")
+        return _tracer
+
+
+def disable_tracing():
+    """Stop tracing and flush pending spans"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.close()
+            _tracer = None
+        os.environ.pop(TRACE_ENV_VAR, None)
+
+
+def release_tracing():
+    """Disable a tracer that writes no file and has no listeners left
+
+    For components that called ``enable_tracing()`` without a path only to
+    receive spans; tracing to a file is left on.
+    """
+    global _tracer
+    with _tracer_lock:
+        if (_tracer is not None and _tracer.path is None
+                and not _tracer._start_listeners and not _tracer._end_listeners):
+            _tracer.close()
+            _tracer = None
+
+
+def configure_tracing(config=None) -> Optional[Tracer]:
+    """Enable tracing from the ``trace_file`` config key or PYMM_TRACE_FILE"""
+    path = None
+    if config is not None:
+        path = config.get("trace_file")
+    path = path or os.environ.get(TRACE_ENV_VAR)
+    if not path:
+        return _tracer
+    try:
+        return enable_tracing(path)
+    except OSError as e:
+        logger.warning(f"Could not open trace file {path}: {e}")
+        return None
+
+
+def read_spans(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Yield the spans recorded in a trace file, skipping damaged lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.debug(f"Skipping malformed span line in {path}")
+
+
+def span_attributes(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Attributes of a span record as a plain dict"""
+    return {a["key"]: _plain_value(a.get("value")) for a in record.get("attributes", [])}
+
+
+def to_chrome_trace(spans) -> Dict[str, Any]:
+    """Convert span records to Chrome trace-event JSON ("X" complete events)"""
+    events = []
+    for record in spans:
+        start = int(record["startTimeUnixNano"])
+        end = int(record["endTimeUnixNano"])
+        resource = record.get("resource", {})
+        args = span_attributes(record)
+        status = record.get("status", {})
+        if status.get("code") == "STATUS_CODE_ERROR":
+            args["error"] = status.get("message", "")
+        events.append({
+            "name": record["name"],
+            "cat": SERVICE_NAME,
+            "ph": "X",
+            "ts": start / 1000.0,
+            "dur": (end - start) / 1000.0,
+            "pid": resource.get("process.pid", 0),
+            "tid": resource.get("thread.id", 0),
+            "args": args
+        })
+    events.sort(key=lambda e: e["ts"])
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# OTLP/JSON encodes enums as integers
+_OTLP_SPAN_KIND_INTERNAL = 1
+_OTLP_STATUS_CODES = {"STATUS_CODE_UNSET": 0, "STATUS_CODE_OK": 1, "STATUS_CODE_ERROR": 2}
+
+
+def _otlp_json_attributes(items) -> List[Dict[str, Any]]:
+    """Encode (key, value) pairs as OTLP/JSON attributes (64-bit ints as strings)"""
+    attributes = []
+    for key, value in items:
+        if value is None:
+            continue
+        encoded = _otlp_value(value)
+        if "intValue" in encoded:
+            encoded["intValue"] = str(encoded["intValue"])
+        attributes.append({"key": key, "value": encoded})
+    return attributes
+
+
+def to_otlp_request(spans) -> Dict[str, Any]:
+    """Convert span records to an OTLP/JSON ExportTraceServiceRequest
+
+    Spans are grouped into one resourceSpans entry per process; the thread
+    id, kept with the resource in trace files, becomes a span attribute.
+    """
+    by_resource: Dict[tuple, List[Dict[str, Any]]] = {}
+    for record in spans:
+        resource = dict(record.get("resource", {}))
+        attributes = span_attributes(record)
+        thread_id = resource.pop("thread.id", None)
+        if thread_id is not None:
+            attributes["thread.id"] = thread_id
+        status = record.get("status", {})
+        otlp_status = {"code": _OTLP_STATUS_CODES.get(status.get("code"), 0)}
+        if status.get("message"):
+            otlp_status["message"] = status["message"]
+        otlp_span = {
+            "traceId": record["traceId"],
+            "spanId": record["spanId"],
+            "name": record["name"],
+            "kind": _OTLP_SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(int(record["startTimeUnixNano"])),
+            "endTimeUnixNano": str(int(record["endTimeUnixNano"])),
+            "attributes": _otlp_json_attributes(attributes.items()),
+            "status": otlp_status
+        }
+        if record.get("parentSpanId"):
+            otlp_span["parentSpanId"] = record["parentSpanId"]
+        by_resource.setdefault(tuple(sorted(resource.items())), []).append(otlp_span)
+
+    return {"resourceSpans": [
+        {"resource": {"attributes": _otlp_json_attributes(resource)},
+         "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": otlp_spans}]}
+        for resource, otlp_spans in by_resource.items()
+    ]}
+
+
+def export_trace(path: Union[str, Path], output: Union[str, Path], format: str = "chrome") -> int:
+    """Export a trace file
+
+    Args:
+        path: Trace file written while tracing
+        output: Destination file
+        format: 'chrome' (trace-event JSON) or 'otlp' (OTLP/JSON export request)
+
+    Returns:
+        Number of spans exported
+    """
+    spans = list(read_spans(path))
+    if format == "chrome":
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(to_chrome_trace(spans), f)
+    elif format == "otlp":
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(to_otlp_request(spans), f, separators=(',', ':'))
+    else:
+        raise ValueError(f"Unknown trace format: {format}")
+    return len(spans)
+
+
+def summarize_spans(spans) -> Dict[str, Dict[str, float]]:
+    """Latency statistics per stage name
+
+    Returns:
+        {name: {count, errors, total, mean, p50, p95, max}} with times in seconds
+    """
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for record in spans:
+        name = record["name"]
+        duration = (int(record["endTimeUnixNano"]) - int(record["startTimeUnixNano"])) / 1e9
+        durations.setdefault(name, []).append(duration)
+        if record.get("status", {}).get("code") == "STATUS_CODE_ERROR":
+            errors[name] = errors.get(name, 0) + 1
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        count = len(values)
+        total = sum(values)
+        summary[name] = {
+            "count": count,
+            "errors": errors.get(name, 0),
+            "total": total,
+            "mean": total / count,
+            "p50": values[(count - 1) // 2],
+            "p95": values[min(count - 1, int(count * 0.95))],
+            "max": values[-1]
+        }
+    return summary
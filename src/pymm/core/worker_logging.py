@@ -0,0 +1,194 @@
+"""Shared queue-based logging pipeline for processing workers
+
+Workers log through a ``QueueHandler`` and a single ``QueueListener`` thread
+per log directory performs all file I/O. The number of open log files and
+handlers therefore stays constant no matter how many ``FileProcessor``
+objects a run creates.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+LOG_FORMAT = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
+SHARED_LOG_NAME = "workers.log"
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024  # 50MB per log file before rotation
+DEFAULT_BACKUP_COUNT = 5
+
+
+class _PipelineQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler owned by a WorkerLogPipeline"""
+
+    def __init__(self, log_queue, pipeline: 'WorkerLogPipeline'):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+
+
+class _WorkerRoutingHandler(logging.Handler):
+    """Writes records to per-worker (or one shared) rotating log file
+
+    Only the listener thread calls this handler, so the file handlers it
+    owns are never written concurrently.
+    """
+
+    def __init__(self, log_dir: Path, per_worker: bool,
+                 max_bytes: int, backup_count: int):
+        super().__init__(logging.DEBUG)
+        self.log_dir = log_dir
+        self.per_worker = per_worker
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.routes: Dict[str, str] = {}  # logger name -> log file name
+        self._files: Dict[str, logging.Handler] = {}
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def _get_file_handler(self, record: logging.LogRecord) -> logging.Handler:
+        """Get (or lazily open) the file handler for a record"""
+        if self.per_worker:
+            name = self.routes.get(record.name, SHARED_LOG_NAME)
+        else:
+            name = SHARED_LOG_NAME
+
+        handler = self._files.get(name)
+        if handler is None:
+            handler = logging.handlers.RotatingFileHandler(
+                self.log_dir / name,
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count,
+                encoding='utf-8',
+                delay=True
+            )
+            handler.setFormatter(self.formatter)
+            self._files[name] = handler
+        return handler
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._get_file_handler(record).handle(record)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for handler in self._files.values():
+            try:
+                handler.close()
+            except Exception:
+                pass
+        self._files.clear()
+        super().close()
+
+
+class WorkerLogPipeline:
+    """Queue plus single writer thread shared by all workers of a log directory"""
+
+    def __init__(self, log_dir: str, per_worker: bool = True,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.per_worker = per_worker
+
+        self.queue = queue.SimpleQueue()
+        self._router = _WorkerRoutingHandler(
+            self.log_dir, per_worker, max_bytes, backup_count)
+        self._queue_handler = _PipelineQueueHandler(self.queue, self)
+        self._listener = logging.handlers.QueueListener(
+            self.queue, self._router, respect_handler_level=True)
+        self._lock = threading.Lock()
+        self._running = False
+        self.start()
+
+    def start(self):
+        """Start the writer thread"""
+        with self._lock:
+            if not self._running:
+                self._listener.start()
+                self._running = True
+
+    def stop(self):
+        """Flush pending records and close all log files"""
+        with self._lock:
+            if self._running:
+                self._listener.stop()
+                self._running = False
+            self._router.close()
+
+    def attach(self, worker_logger: logging.Logger, worker_id: int = 0) -> logging.Logger:
+        """Route a worker logger through this pipeline
+
+        Idempotent: attaching the same logger again (e.g. from a new
+        ``FileProcessor`` with the same worker id) adds no new handler.
+        """
+        with self._lock:
+            self._router.routes[worker_logger.name] = f"worker_{worker_id}.log"
+
+            for handler in list(worker_logger.handlers):
+                if handler is self._queue_handler:
+                    return worker_logger
+                if isinstance(handler, _PipelineQueueHandler):
+                    # Logger was attached to a pipeline for another directory
+                    worker_logger.removeHandler(handler)
+
+            worker_logger.addHandler(self._queue_handler)
+            worker_logger.setLevel(logging.DEBUG)
+        return worker_logger
+
+
+_pipelines: Dict[str, WorkerLogPipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def _config_int(config, key: str, default: int) -> int:
+    value = config.get(key, default) if config else default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def get_log_pipeline(log_dir: str, config=None) -> WorkerLogPipeline:
+    """Get the process-wide logging pipeline for a log directory
+
+    Options are read from config on first use:
+        worker_log_per_worker: one file per worker id instead of workers.log
+        worker_log_max_bytes: rotation size per log file
+        worker_log_backup_count: rotated files to keep
+    """
+    key = str(Path(log_dir).resolve())
+
+    with _pipelines_lock:
+        pipeline = _pipelines.get(key)
+        if pipeline is None:
+            per_worker = config.get("worker_log_per_worker", True) if config else True
+            if isinstance(per_worker, str):
+                per_worker = per_worker.lower() in ('yes', 'true', '1')
+
+            pipeline = WorkerLogPipeline(
+                log_dir,
+                per_worker=bool(per_worker),
+                max_bytes=_config_int(config, "worker_log_max_bytes", DEFAULT_MAX_BYTES),
+                backup_count=_config_int(config, "worker_log_backup_count", DEFAULT_BACKUP_COUNT)
+            )
+            _pipelines[key] = pipeline
+        return pipeline
+
+
+def shutdown_log_pipelines(log_dir: Optional[str] = None):
+    """Stop one pipeline (or all of them) and close their files"""
+    with _pipelines_lock:
+        if log_dir is not None:
+            pipeline = _pipelines.pop(str(Path(log_dir).resolve()), None)
+            pipelines = [pipeline] if pipeline else []
+        else:
+            pipelines = list(_pipelines.values())
+            _pipelines.clear()
+
+    for pipeline in pipelines:
+        pipeline.stop()
+
+
+atexit.register(shutdown_log_pipelines)
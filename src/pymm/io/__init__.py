@@ -0,0 +1,9 @@
+"""Readers for PythonMetaMap output files"""
+from .outputs import load_outputs, open_arrow, OUTPUT_DTYPES, SOURCE_COLUMN
+
+__all__ = [
+    'load_outputs',
+    'open_arrow',
+    'OUTPUT_DTYPES',
+    'SOURCE_COLUMN'
+]
@@ -0,0 +1,317 @@
+"""Bulk loading of MetaMap output CSVs into pandas
+
+Output files are small marker-delimited CSVs::
+
+    META_BATCH_START_NOTE_ID:note.txt
+    "CUI","Score","ConceptName",...
+    ...
+    META_BATCH_END_NOTE_ID:note.txt
+
+``load_outputs`` strips the markers and headers from the raw bytes, joins
+the bodies of a shard of files into one buffer and parses it with a single
+call to the pandas C parser using explicit dtypes (categorical text
+columns, int32 scores). Shards run in parallel through ``ingest_files``
+and the categoricals are unioned at the end, so the whole corpus becomes
+one compact frame without thousands of per-file frames or marker rows.
+
+The result can be cached as an uncompressed Arrow IPC (Feather v2) file,
+which is memory-mapped on later loads while the CSVs are unchanged.
+"""
+import io
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from ..analysis.ingest import ingest_files, list_output_csvs
+from ..processing.worker import CSV_HEADER
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+# Explicit dtypes for the output columns; anything not listed is categorical
+OUTPUT_DTYPES: Dict[str, str] = {column: 'category' for column in CSV_HEADER}
+OUTPUT_DTYPES['Score'] = 'int32'
+
+SOURCE_COLUMN = 'source_file'
+
+# Bumped when the cached frame layout changes
+ARROW_CACHE_VERSION = 1
+
+_MARKER = b'META_BATCH'
+_ERROR_PREFIX = b'# Error:'
+
+
+def _drop_lines(data: bytes, prefix: bytes) -> bytes:
+    """Remove every line of data that starts with prefix"""
+    if data.startswith(prefix):
+        newline = data.find(b'\n')
+        data = data[newline + 1:] if newline >= 0 else b''
+    start = data.find(b'\n' + prefix)
+    while start >= 0:
+        end = data.find(b'\n', start + 1)
+        data = data[:start + 1] + (data[end + 1:] if end >= 0 else b'')
+        start = data.find(b'\n' + prefix, start)
+    return data
+
+
+def _split_output(data: bytes) -> Tuple[Optional[List[str]], bytes]:
+    """Split raw output bytes into (header columns, body rows)
+
+    Start/end marker lines and the "# Error:" note of failed files are
+    dropped; all other rows are kept, as the CSV readers do.
+    """
+    data = _drop_lines(data, _MARKER)
+    data = _drop_lines(data, _ERROR_PREFIX)
+
+    newline = data.find(b'\n')
+    if newline < 0:
+        header, body = data, b''
+    else:
+        header, body = data[:newline], data[newline + 1:]
+    header = header.decode('utf-8', errors='replace').strip()
+    if not header:
+        return None, b''
+    if body and not body.endswith(b'\n'):
+        body += b'\n'
+    return [c.strip().strip('"') for c in header.split(',')], body
+
+
+def _parse(buffer: bytes, names: List[str], usecols: List[str]) -> pd.DataFrame:
+    """Parse header-less output rows with the C parser and explicit dtypes"""
+    dtypes = {c: OUTPUT_DTYPES[c] for c in usecols}
+    try:
+        return pd.read_csv(io.BytesIO(buffer), header=None, names=names, usecols=usecols,
+                           dtype=dtypes, engine='c')
+    except ValueError:
+        # Non-numeric scores (e.g. "-"): parse as text, keep them as missing
+        if 'Score' not in dtypes:
+            raise
+        dtypes['Score'] = 'object'
+        df = pd.read_csv(io.BytesIO(buffer), header=None, names=names, usecols=usecols,
+                         dtype=dtypes, engine='c')
+        df['Score'] = pd.to_numeric(df['Score'], errors='coerce').astype('Int32')
+        return df
+
+
+def _empty_frame(columns: List[str]) -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=OUTPUT_DTYPES[c]) for c in columns})
+
+
+def _load_shard(files: List[Path], columns: List[str]) -> Tuple[List[pd.DataFrame], List[str]]:
+    """Load a shard of output files
+
+    Returns:
+        (frames, errors) - lists, so shard results merge by extending
+    """
+    bodies: List[bytes] = []
+    stems: List[str] = []
+    counts: List[int] = []
+    extra: List[pd.DataFrame] = []
+    errors: List[str] = []
+
+    for path in files:
+        path = Path(path)
+        try:
+            header, body = _split_output(path.read_bytes())
+        except OSError as e:
+            errors.append(f"{path.name}: {e}")
+            continue
+        if header is None or not body:
+            continue
+        if header != CSV_HEADER:
+            # Legacy or hand-made files: parse on their own and align columns
+            try:
+                df = pd.read_csv(io.BytesIO(body), header=None, names=header, dtype=str)
+            except (ValueError, pd.errors.ParserError) as e:
+                errors.append(f"{path.name}: {e}")
+                continue
+            df = df.reindex(columns=columns)
+            df[SOURCE_COLUMN] = path.stem
+            extra.append(df)
+            continue
+        bodies.append(body)
+        stems.append(path.stem)
+        counts.append(body.count(b'\n'))
+
+    frames: List[pd.DataFrame] = []
+    if bodies:
+        try:
+            df = _parse(b''.join(bodies), CSV_HEADER, columns)
+        except (ValueError, pd.errors.ParserError) as e:
+            df = None
+            logger.debug(f"Shard parse failed ({e}), parsing files separately")
+        if df is not None and len(df) == sum(counts):
+            if len(set(stems)) == len(stems):
+                codes = np.repeat(np.arange(len(stems), dtype=np.int32), counts)
+                df[SOURCE_COLUMN] = pd.Categorical.from_codes(codes, categories=stems)
+            else:
+                df[SOURCE_COLUMN] = pd.Categorical(np.repeat(np.array(stems, dtype=object), counts))
+            frames.append(df)
+        else:
+            # Quoted newlines or blank lines broke the row-per-line assumption
+            for stem, body in zip(stems, bodies):
+                try:
+                    df = _parse(body, CSV_HEADER, columns)
+                except (ValueError, pd.errors.ParserError) as e:
+                    errors.append(f"{stem}: {e}")
+                    continue
+                df[SOURCE_COLUMN] = stem
+                frames.append(df)
+
+    frames.extend(extra)
+    return frames, errors
+
+
+def _merge_shards(a: Tuple[List, List], b: Tuple[List, List]) -> Tuple[List, List]:
+    a[0].extend(b[0])
+    a[1].extend(b[1])
+    return a
+
+
+def _combine(frames: List[pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+    """Concatenate shard frames, unioning categoricals instead of decaying to object"""
+    columns = columns + [SOURCE_COLUMN]
+    if not frames:
+        frame = _empty_frame(columns[:-1])
+        frame[SOURCE_COLUMN] = pd.Categorical([])
+        return frame
+
+    data = {}
+    for column in columns:
+        parts = [f[column] for f in frames]
+        if OUTPUT_DTYPES.get(column, 'category') == 'category':
+            parts = [p if isinstance(p.dtype, pd.CategoricalDtype) else p.astype('category')
+                     for p in parts]
+            data[column] = union_categoricals(parts, ignore_order=True)
+        else:
+            data[column] = pd.concat(parts, ignore_index=True)
+            if data[column].dtype == object:
+                data[column] = pd.to_numeric(data[column], errors='coerce').astype('Int32')
+    return pd.DataFrame(data)
+
+
+def _fingerprint(files: Sequence[Path], columns: List[str]) -> Dict:
+    """Cheap summary of the inputs used to decide whether a cache is fresh"""
+    size = 0
+    mtime = 0.0
+    for path in files:
+        stat = os.stat(path)
+        size += stat.st_size
+        mtime = max(mtime, stat.st_mtime)
+    return {
+        'version': ARROW_CACHE_VERSION,
+        'files': len(files),
+        'size': size,
+        'mtime': mtime,
+        'columns': list(columns)
+    }
+
+
+def open_arrow(path: Union[str, Path]):
+    """Memory-map an Arrow file written by ``load_outputs``
+
+    Returns:
+        A ``pyarrow.Table`` backed by the mapped file
+    """
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow is required for Arrow output caches (pip install pyarrow)")
+    with pa.memory_map(str(path), 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _read_arrow_cache(path: Path, fingerprint: Dict) -> Optional[pd.DataFrame]:
+    try:
+        table = open_arrow(path)
+    except (OSError, pa.ArrowInvalid) as e:
+        logger.debug(f"Ignoring unreadable Arrow cache {path}: {e}")
+        return None
+    metadata = (table.schema.metadata or {}).get(b'pymm_outputs')
+    if not metadata or json.loads(metadata) != fingerprint:
+        return None
+    return table.to_pandas()
+
+
+def _write_arrow_cache(df: pd.DataFrame, path: Path, fingerprint: Dict):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'pymm_outputs'] = json.dumps(fingerprint).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    temp_path = path.with_name(path.name + '.tmp')
+    feather.write_feather(table, str(temp_path), compression='uncompressed')
+    os.replace(temp_path, path)
+
+
+def load_outputs(source: Union[str, Path, Sequence[Path]],
+                 columns: Optional[Sequence[str]] = None,
+                 workers: Optional[int] = None,
+                 arrow_path: Optional[Union[str, Path]] = None,
+                 on_progress: Optional[Callable[[int], None]] = None) -> pd.DataFrame:
+    """Load MetaMap output CSVs into one typed DataFrame
+
+    Args:
+        source: Output directory or list of output CSV files
+        columns: Output columns to load (default: all of CSV_HEADER)
+        workers: Worker processes (default: CPU count)
+        arrow_path: Arrow cache file; reused while the CSVs are unchanged,
+            rewritten otherwise (requires pyarrow)
+        on_progress: Called with the number of files finished by each shard
+
+    Returns:
+        DataFrame of the requested columns plus ``source_file`` (the output
+        file stem). Text columns are categorical and Score is int32 (or
+        nullable Int32 when some scores are not numeric). Unreadable files
+        are skipped and logged.
+    """
+    if isinstance(source, (str, Path)):
+        files = sorted(list_output_csvs(Path(source)))
+    else:
+        files = [Path(f) for f in source]
+
+    columns = list(columns) if columns else list(CSV_HEADER)
+    unknown = [c for c in columns if c not in CSV_HEADER]
+    if unknown:
+        raise ValueError(f"Unknown output columns: {', '.join(unknown)}")
+
+    fingerprint = None
+    if arrow_path is not None:
+        if HAS_PYARROW:
+            arrow_path = Path(arrow_path)
+            fingerprint = _fingerprint(files, columns)
+            if arrow_path.exists():
+                df = _read_arrow_cache(arrow_path, fingerprint)
+                if df is not None:
+                    logger.info(f"Loaded {len(df):,} output rows from {arrow_path}")
+                    if on_progress:
+                        on_progress(len(files))
+                    return df
+        else:
+            logger.warning("pyarrow is not installed, Arrow cache disabled")
+
+    result = ingest_files(files, _load_shard, _merge_shards, args=(columns,),
+                          workers=workers, on_progress=on_progress)
+    frames, errors = result if result else ([], [])
+    if errors:
+        logger.warning(f"Skipped {len(errors)} unreadable output files")
+        for error in errors[:10]:
+            logger.debug(error)
+
+    df = _combine(frames, columns)
+    if fingerprint is not None:
+        try:
+            _write_arrow_cache(df, arrow_path, fingerprint)
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Could not write Arrow cache {arrow_path}: {e}")
+    return df
@@ -0,0 +1,267 @@
+"""Directory change notification for output monitors
+
+``InotifyWatcher`` receives kernel events through Linux inotify (via
+ctypes, no extra dependency) so only files that were created, finished
+writing, moved or deleted are reported. ``PollingWatcher`` provides the
+same interface on other platforms by comparing (mtime, size) snapshots.
+``create_watcher`` picks inotify when available.
+
+Watchers report ``FileEvent`` batches from ``poll``:
+
+- ``changed`` - a matching file was created, written and closed, or moved in
+- ``deleted`` - a matching file was deleted or moved out
+- ``rescan`` - the path is a directory whose state must be re-read, sent
+  once per directory when it is first watched and after an event overflow
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+class FileEvent(NamedTuple):
+    """A change reported by a watcher"""
+    path: Path
+    kind: str  # changed, deleted, rescan
+
+
+def _matches(name: str, pattern: str) -> bool:
+    """Match a file name like ``Path.glob`` (hidden files need a dotted pattern)"""
+    if name.startswith('.') and not pattern.startswith('.'):
+        return False
+    return fnmatchcase(name, pattern)
+
+
+def _dedupe(events: List[FileEvent]) -> List[FileEvent]:
+    """Keep the last event per path, in order of last occurrence"""
+    latest: Dict[Path, FileEvent] = {}
+    for event in events:
+        latest.pop(event.path, None)
+        latest[event.path] = event
+    return list(latest.values())
+
+
+class PollingWatcher:
+    """Reports changes by rescanning directories every ``interval`` seconds"""
+
+    backend = 'polling'
+
+    def __init__(self, directories: Sequence[Path], pattern: str = "*.csv",
+                 interval: float = 2.0):
+        self.directories = [Path(d) for d in directories]
+        self.pattern = pattern
+        self.interval = interval
+        self._snapshot: Dict[Path, Tuple[float, int]] = {}
+        self._next_scan = 0.0
+
+    def _scan(self) -> Dict[Path, Tuple[float, int]]:
+        snapshot = {}
+        for directory in self.directories:
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if not _matches(entry.name, self.pattern):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    snapshot[Path(entry.path)] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout: Optional[float] = None) -> List[FileEvent]:
+        """Wait until the next scan is due (at most timeout) and report changes"""
+        wait = self._next_scan - time.monotonic()
+        if wait > 0:
+            if timeout is not None and timeout < wait:
+                time.sleep(max(0.0, timeout))
+                return []
+            time.sleep(wait)
+        self._next_scan = time.monotonic() + self.interval
+
+        snapshot = self._scan()
+        events = [FileEvent(path, 'changed') for path, state in snapshot.items()
+                  if self._snapshot.get(path) != state]
+        events.extend(FileEvent(path, 'deleted') for path in self._snapshot
+                      if path not in snapshot)
+        self._snapshot = snapshot
+        return events
+
+    def close(self):
+        self._snapshot = {}
+
+
+class InotifyWatcher:
+    """Reports changes from Linux inotify events"""
+
+    backend = 'inotify'
+
+    def __init__(self, directories: Sequence[Path], pattern: str = "*.csv"):
+        self.directories = [Path(d) for d in directories]
+        self.pattern = pattern
+
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+
+        self._watches: Dict[int, Path] = {}
+        self._pending: List[FileEvent] = []
+
+    def _add_missing_watches(self):
+        """Watch directories not yet watched (e.g. created after start)"""
+        watched = set(self._watches.values())
+        for directory in self.directories:
+            if directory in watched or not directory.is_dir():
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    logger.warning(f"inotify watch limit reached, cannot watch {directory} "
+                                   "(raise fs.inotify.max_user_watches)")
+                continue
+            self._watches[wd] = directory
+            # Files written before the watch existed are picked up by a rescan
+            self._pending.append(FileEvent(directory, 'rescan'))
+
+    def _read_events(self, data: bytes) -> List[FileEvent]:
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                logger.debug("inotify queue overflow, rescanning watched directories")
+                events.extend(FileEvent(d, 'rescan') for d in self._watches.values())
+                continue
+
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                # Directory is gone; it is re-watched if it comes back
+                if mask & IN_MOVE_SELF:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                if mask & (IN_IGNORED | IN_MOVE_SELF):
+                    del self._watches[wd]
+                events.append(FileEvent(directory, 'rescan'))
+                continue
+            if mask & IN_ISDIR or not name:
+                continue
+
+            name = os.fsdecode(name)
+            if not _matches(name, self.pattern):
+                continue
+            kind = 'deleted' if mask & (IN_DELETE | IN_MOVED_FROM) else 'changed'
+            events.append(FileEvent(directory / name, kind))
+        return events
+
+    def poll(self, timeout: Optional[float] = None) -> List[FileEvent]:
+        """Wait up to timeout for events and return everything queued"""
+        self._add_missing_watches()
+        events, self._pending = self._pending, []
+
+        if not events:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if not ready:
+                return []
+
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            events.extend(self._read_events(data))
+        return _dedupe(events)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches = {}
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _load_libc():
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+def inotify_available() -> bool:
+    """Whether the inotify backend can be used on this system"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_load_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+def create_watcher(directories: Sequence[Path], pattern: str = "*.csv",
+                   interval: float = 2.0, backend: str = 'auto'):
+    """Create a watcher for the directories
+
+    Args:
+        directories: Directories to watch (need not exist yet)
+        pattern: File name pattern to report
+        interval: Rescan interval of the polling backend
+        backend: 'inotify', 'polling' or 'auto' (inotify when available)
+    """
+    if backend not in ('auto', 'inotify', 'polling'):
+        raise ValueError(f"Unknown watcher backend: {backend}")
+
+    if backend != 'polling' and (backend == 'inotify' or inotify_available()):
+        try:
+            return InotifyWatcher(directories, pattern)
+        except (OSError, AttributeError) as e:
+            if backend == 'inotify':
+                raise
+            logger.info(f"inotify unavailable ({e}), polling output directories")
+    return PollingWatcher(directories, pattern, interval)
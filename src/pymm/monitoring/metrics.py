@@ -0,0 +1,439 @@
+"""Prometheus metrics endpoint for batch runs
+
+Long runs started with nohup can be watched by an existing Prometheus
+scraper instead of a terminal. When ``metrics_port`` is configured (or
+``PYMM_METRICS_PORT`` is set) the runners start a small HTTP server that
+serves ``/metrics`` in the Prometheus text exposition format.
+
+Nothing is sampled on the processing path. At scrape time the endpoint:
+
+- tails the worker event log (``core.events``) for files, concepts, output
+  bytes, per-file latency, retries, timeouts and MetaMap child-process
+  CPU and peak RSS
+- reads per-stage latency histograms fed by tracing span listeners
+  (``core.tracing``; spans are kept in memory unless a trace file is set)
+- asks the instance pool and HealthMonitor for their current state
+"""
+import os
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from ..core.events import EventTail, STATUS_FAILED
+from ..core.tracing import enable_tracing, get_tracer, release_tracing
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENV_VAR = "PYMM_METRICS_PORT"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# MetaMap documents take from under a second to several minutes
+FILE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+RSS_BUCKETS = tuple(mb * 1024 * 1024 for mb in (128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192))
+
+# Port checks are cached so frequent scrapes do not hammer the servers
+SERVER_CHECK_INTERVAL = 15.0
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._labels(key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._labels(key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = FILE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts with a trailing +Inf slot, sum)
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket"
+                                 f"{self._labels(key, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total[0])}")
+                lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that refresh them before each scrape"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = FILE_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Run collectors and return the text exposition of every metric"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug(f"Metrics collector failed: {e}")
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class BatchMetrics:
+    """Metrics of one batch run over an output directory"""
+
+    def __init__(self, output_dir: Union[str, Path], workers: Optional[int] = None,
+                 instance_pool=None, health_monitor=None):
+        self.output_dir = Path(output_dir)
+        self.instance_pool = instance_pool
+        self.health_monitor = health_monitor
+        self.registry = MetricsRegistry()
+        registry = self.registry
+
+        self.files = registry.counter(
+            "pymm_files_processed_total", "File processing attempts by outcome", ["status"])
+        self.concepts = registry.counter(
+            "pymm_concepts_total", "Concepts written to output files")
+        self.output_bytes = registry.counter(
+            "pymm_output_bytes_total", "Bytes of output CSV written")
+        self.retries = registry.counter(
+            "pymm_retries_total", "Repeated attempts on a file already attempted in this run")
+        self.timeouts = registry.counter(
+            "pymm_timeouts_total", "Attempts that failed with a MetaMap timeout")
+        self.file_seconds = registry.histogram(
+            "pymm_file_duration_seconds", "Wall time per file attempt", buckets=FILE_BUCKETS)
+        self.metamap_cpu = registry.counter(
+            "pymm_metamap_cpu_seconds_total", "CPU time of MetaMap child processes", ["mode"])
+        self.metamap_rss = registry.histogram(
+            "pymm_metamap_peak_rss_bytes", "Peak RSS of MetaMap child processes per file attempt",
+            buckets=RSS_BUCKETS)
+        self.metamap_io = registry.counter(
+            "pymm_metamap_io_bytes_total", "Block I/O of MetaMap child processes", ["direction"])
+        self.stage_seconds = registry.histogram(
+            "pymm_stage_duration_seconds", "Wall time per processing stage", ["stage"],
+            buckets=STAGE_BUCKETS)
+        self.in_flight = registry.gauge(
+            "pymm_documents_in_flight", "Documents currently being processed")
+        self.workers = registry.gauge("pymm_workers", "Configured worker threads")
+        self.total_files = registry.gauge("pymm_input_files", "Input files in this run")
+        self.start_time = registry.gauge(
+            "pymm_run_start_time_seconds", "Unix time the run started")
+        self.pool_instances = registry.gauge(
+            "pymm_pool_instances", "MetaMap instances in the pool by state", ["state"])
+        self.pool_utilization = registry.gauge(
+            "pymm_pool_utilization", "Fraction of pooled MetaMap instances in use")
+        self.server_up = registry.gauge(
+            "pymm_server_up", "Whether the MetaMap server port accepts connections", ["service"])
+        self.server_failures = registry.gauge(
+            "pymm_server_consecutive_failures", "Consecutive failed health checks", ["service"])
+
+        self.start_time.set(time.time())
+        self.in_flight.set(0)
+        if workers:
+            self.workers.set(workers)
+
+        self._tail = EventTail(self.output_dir, from_end=True)
+        self._tail_lock = threading.Lock()
+        self._attempted = set()
+        self._servers_checked = 0.0
+
+        registry.add_collector(self._collect_events)
+        registry.add_collector(self._collect_pool)
+        registry.add_collector(self._collect_servers)
+
+        # Stage timings come from tracing spans; an in-memory tracer is enough
+        self._enabled_tracing = get_tracer() is None
+        self._tracer = enable_tracing()
+        self._tracer.add_listener(self._on_span_start, when="start")
+        self._tracer.add_listener(self._on_span_end, when="end")
+
+    def _on_span_start(self, span):
+        if span.name == "process_file":
+            self.in_flight.inc()
+
+    def _on_span_end(self, span):
+        if span.name == "process_file":
+            self.in_flight.dec()
+        else:
+            self.stage_seconds.observe(span.duration, stage=span.name)
+
+    def _collect_events(self):
+        from ..processing.bisect_retry import is_timeout_error
+
+        with self._tail_lock:
+            events = self._tail.poll()
+        for event in events:
+            self.files.inc(status=event.status)
+            self.concepts.inc(event.concepts)
+            self.output_bytes.inc(event.bytes)
+            self.file_seconds.observe(event.elapsed)
+            if event.file in self._attempted:
+                self.retries.inc()
+            self._attempted.add(event.file)
+            if event.status == STATUS_FAILED and is_timeout_error(event.error):
+                self.timeouts.inc()
+            if event.usage:
+                self.metamap_cpu.inc(event.usage.get("user", 0.0), mode="user")
+                self.metamap_cpu.inc(event.usage.get("sys", 0.0), mode="system")
+                self.metamap_rss.observe(event.usage.get("rss", 0))
+                self.metamap_io.inc(event.usage.get("read", 0), direction="read")
+                self.metamap_io.inc(event.usage.get("write", 0), direction="write")
+
+    def _collect_pool(self):
+        if self.instance_pool is None:
+            return
+        stats = self.instance_pool.get_stats()
+        active = stats.get("active", 0)
+        available = stats.get("available", 0)
+        maximum = stats.get("max_instances") or 0
+        self.pool_instances.set(active, state="active")
+        self.pool_instances.set(available, state="available")
+        self.pool_instances.set(maximum, state="max")
+        self.pool_utilization.set(active / maximum if maximum else 0)
+
+    def _collect_servers(self):
+        if time.monotonic() - self._servers_checked >= SERVER_CHECK_INTERVAL:
+            from ..processing.worker import check_server_status
+
+            for service, up in check_server_status().items():
+                self.server_up.set(1 if up else 0, service=service)
+            self._servers_checked = time.monotonic()
+
+        if self.health_monitor is not None:
+            for service, failures in self.health_monitor.consecutive_failures.items():
+                self.server_failures.set(failures, service=service)
+
+    def set_total_files(self, count: int):
+        self.total_files.set(count)
+
+    def close(self):
+        # Listeners move along if a trace file was enabled after we started
+        for tracer in (self._tracer, get_tracer()):
+            if tracer is not None:
+                tracer.remove_listener(self._on_span_start)
+                tracer.remove_listener(self._on_span_end)
+        # Leave tracing off again if it was only on for these metrics
+        if self._enabled_tracing:
+            release_tracing()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"metrics {self.address_string()} {format % args}")
+
+
+class MetricsServer:
+    """Serves a registry on /metrics from a daemon thread"""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = "127.0.0.1"):
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        name="pymm-metrics", daemon=True)
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        logger.info(f"Serving Prometheus metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def metrics_port(config=None) -> Optional[int]:
+    """Port from the ``metrics_port`` config key or PYMM_METRICS_PORT (None if unset)"""
+    value = os.environ.get(METRICS_ENV_VAR)
+    if not value and config is not None:
+        value = config.get("metrics_port")
+    try:
+        return int(value) if value not in (None, "", 0, "0") else None
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid metrics port: {value}")
+        return None
+
+
+class BatchMetricsEndpoint:
+    """A BatchMetrics collection and the server exposing it"""
+
+    def __init__(self, metrics: BatchMetrics, server: MetricsServer):
+        self.metrics = metrics
+        self.server = server
+
+    def stop(self):
+        self.server.stop()
+        self.metrics.close()
+
+
+def start_metrics_server(config, output_dir: Union[str, Path], workers: Optional[int] = None,
+                         instance_pool=None, health_monitor=None) -> Optional[BatchMetricsEndpoint]:
+    """Start the metrics endpoint for a batch run if a port is configured
+
+    The host comes from ``metrics_host`` (default 127.0.0.1; use 0.0.0.0
+    for remote scrapers). Failing to bind is logged and never stops the run.
+
+    Returns:
+        The running endpoint (call ``stop`` when the run ends) or None
+    """
+    port = metrics_port(config)
+    if port is None:
+        return None
+    host = config.get("metrics_host", "127.0.0.1") if config is not None else "127.0.0.1"
+
+    metrics = BatchMetrics(output_dir, workers=workers, instance_pool=instance_pool,
+                           health_monitor=health_monitor)
+    try:
+        server = MetricsServer(metrics.registry, port, host).start()
+    except OSError as e:
+        logger.warning(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        metrics.close()
+        return None
+    return BatchMetricsEndpoint(metrics, server)
@@ -1,4 +1,10 @@
-"""Real-time output file explorer with live updates and counts"""
+"""Real-time output file explorer with live updates and counts
+
+Changes are picked up through ``fs_watch`` (inotify on Linux, polling
+elsewhere): only created, rewritten or deleted files are re-read, and the
+per-directory and global statistics are adjusted by each file's
+contribution instead of being rebuilt from every file.
+"""
 import os
 import threading
 import time
@@ -10,7 +16,7 @@ from collections import defaultdict
 import csv
 import json
 
-from rich.console import Console
+from rich.console import Console, Group
 from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
@@ -20,8 +26,13 @@ from rich import box
 from rich.syntax import Syntax
 from rich.columns import Columns
 
+from .fs_watch import FileEvent, create_watcher
+
 console = Console()
 
+# Files modified within this many seconds are shown as active
+ACTIVE_SECONDS = 60
+
 
 @dataclass
 class OutputFile:
@@ -33,6 +44,7 @@ class OutputFile:
     row_count: int = 0
     concept_count: int = 0
     unique_concepts: Set[str] = field(default_factory=set)
+    concept_frequency: Dict[str, int] = field(default_factory=dict)
     semantic_types: Dict[str, int] = field(default_factory=dict)
     status: str = "active"  # active, complete, error
     associated_input: Optional[str] = None
@@ -54,9 +66,19 @@ class DirectoryStats:
 class OutputExplorer:
     """Real-time explorer for output files with live updates"""
     
-    def __init__(self, output_dirs: List[Path], update_interval: float = 2.0):
+    def __init__(self, output_dirs: List[Path], update_interval: float = 2.0,
+                 backend: str = "auto"):
+        """
+        Args:
+            output_dirs: Output directories to watch
+            update_interval: Seconds between display updates (and rescans
+                when polling)
+            backend: Change notification backend: 'inotify', 'polling' or
+                'auto' (inotify when available)
+        """
         self.output_dirs = [Path(d) for d in output_dirs]
         self.update_interval = update_interval
+        self.backend = backend
         
         # File tracking
         self.files: Dict[Path, OutputFile] = {}
@@ -74,6 +96,7 @@ class OutputExplorer:
         self.update_callback: Optional[Callable] = None
         self._lock = threading.Lock()
         self._watch_thread: Optional[threading.Thread] = None
+        self._active_files: Set[Path] = set()
         
         # Display settings
         self.show_preview = True
@@ -94,73 +117,60 @@ class OutputExplorer:
             self._watch_thread.join(timeout=5)
     
     def _watch_loop(self):
-        """Main watching loop"""
-        while self.watch_active:
-            try:
-                self._scan_directories()
-                time.sleep(self.update_interval)
-            except Exception as e:
-                console.print(f"[error]Watch error: {e}[/error]")
+        """Main watching loop: apply change events as they arrive"""
+        try:
+            watcher = create_watcher(self.output_dirs, self.filter_pattern,
+                                     self.update_interval, self.backend)
+        except (OSError, ValueError) as e:
+            console.print(f"[red]Watch error: {e}[/red]")
+            self.watch_active = False
+            return
+        
+        try:
+            while self.watch_active:
+                try:
+                    events = watcher.poll(timeout=self.update_interval)
+                    self._apply_events(events)
+                except Exception as e:
+                    console.print(f"[red]Watch error: {e}[/red]")
+                    time.sleep(self.update_interval)
+        finally:
+            watcher.close()
     
-    def _scan_directories(self):
-        """Scan output directories for changes"""
+    def _apply_events(self, events: List[FileEvent]):
+        """Re-read changed files, drop deleted ones and rescan flagged directories"""
+        changed = {}
+        for event in events:
+            if event.kind == 'rescan':
+                listing = self._list_directory(event.path)
+                for path, mtime in listing.items():
+                    known = self.files.get(path)
+                    if not known or mtime > known.modified_time.timestamp():
+                        changed[path] = True
+                with self._lock:
+                    for path in list(self.files):
+                        if path.parent == event.path and path not in listing:
+                            changed[path] = False
+            else:
+                changed[event.path] = event.kind == 'changed'
+        
+        # Read outside the lock so the display stays responsive
+        results = {}
+        for path, exists in changed.items():
+            results[path] = self._read_file(path) if exists else None
+        
         with self._lock:
             self.new_files.clear()
             self.updated_files.clear()
             
-            # Track seen files
-            seen_files = set()
-            
-            for output_dir in self.output_dirs:
-                if not output_dir.exists():
+            for path, file_info in results.items():
+                if file_info is None:
+                    self._remove_file(path)
                     continue
-                
-                # Initialize directory stats
-                if output_dir not in self.directory_stats:
-                    self.directory_stats[output_dir] = DirectoryStats()
-                
-                dir_stats = DirectoryStats()
-                
-                # Scan for CSV files
-                for csv_file in output_dir.glob(self.filter_pattern):
-                    seen_files.add(csv_file)
-                    
-                    # Check if new or updated
-                    if csv_file not in self.files:
-                        # New file
-                        self._analyze_file(csv_file)
-                        self.new_files.append(csv_file)
-                    else:
-                        # Check if updated
-                        stat = csv_file.stat()
-                        if stat.st_mtime > self.files[csv_file].modified_time.timestamp():
-                            self._analyze_file(csv_file)
-                            self.updated_files.append(csv_file)
-                    
-                    # Update directory stats
-                    if csv_file in self.files:
-                        file_info = self.files[csv_file]
-                        dir_stats.total_files += 1
-                        dir_stats.total_rows += file_info.row_count
-                        dir_stats.total_concepts += file_info.concept_count
-                        dir_stats.unique_concepts += len(file_info.unique_concepts)
-                        dir_stats.total_size_mb += file_info.size / (1024 * 1024)
-                        
-                        # Track by hour
-                        hour = file_info.created_time.hour
-                        dir_stats.files_by_hour[hour] = dir_stats.files_by_hour.get(hour, 0) + 1
-                        
-                        if file_info.status == "active":
-                            dir_stats.active_files += 1
-                        else:
-                            dir_stats.completed_files += 1
-                
-                self.directory_stats[output_dir] = dir_stats
+                (self.updated_files if path in self.files else self.new_files).append(path)
+                self._set_file(file_info)
             
-            # Remove files that no longer exist
-            for file_path in list(self.files.keys()):
-                if file_path not in seen_files:
-                    del self.files[file_path]
+            self._expire_active_files()
             
             # Notify updates
             if self.update_callback and (self.new_files or self.updated_files):
@@ -169,67 +179,166 @@ class OutputExplorer:
                     'updated': self.updated_files
                 })
     
+    def _scan_directories(self):
+        """Rescan all output directories (e.g. for a one-off refresh)"""
+        self._apply_events([FileEvent(d, 'rescan') for d in self.output_dirs])
+    
+    def _list_directory(self, output_dir: Path) -> Dict[Path, float]:
+        """Matching files of a directory with their modification times"""
+        files = {}
+        if not output_dir.exists():
+            return files
+        for csv_file in output_dir.glob(self.filter_pattern):
+            try:
+                files[csv_file] = csv_file.stat().st_mtime
+            except OSError:
+                continue
+        return files
+    
+    def _set_file(self, file_info: OutputFile):
+        """Add or replace a file and its contribution to the statistics"""
+        self._remove_file(file_info.path)
+        self.files[file_info.path] = file_info
+        self._update_stats(file_info, 1)
+        if file_info.status == "active":
+            self._active_files.add(file_info.path)
+    
+    def _remove_file(self, path: Path):
+        file_info = self.files.pop(path, None)
+        if file_info is not None:
+            self._update_stats(file_info, -1)
+            self._active_files.discard(path)
+    
+    def _update_stats(self, file_info: OutputFile, sign: int):
+        """Add (sign=1) or subtract (sign=-1) a file's contribution"""
+        output_dir = file_info.path.parent
+        dir_stats = self.directory_stats.get(output_dir)
+        if dir_stats is None:
+            dir_stats = self.directory_stats[output_dir] = DirectoryStats()
+        
+        dir_stats.total_files += sign
+        dir_stats.total_rows += sign * file_info.row_count
+        dir_stats.total_concepts += sign * file_info.concept_count
+        dir_stats.unique_concepts += sign * len(file_info.unique_concepts)
+        dir_stats.total_size_mb += sign * file_info.size / (1024 * 1024)
+        if file_info.status == "active":
+            dir_stats.active_files += sign
+        else:
+            dir_stats.completed_files += sign
+        
+        # Track by hour
+        hour = file_info.created_time.hour
+        count = dir_stats.files_by_hour.get(hour, 0) + sign
+        if count:
+            dir_stats.files_by_hour[hour] = count
+        else:
+            dir_stats.files_by_hour.pop(hour, None)
+        
+        for concept, count in file_info.concept_frequency.items():
+            total = self.concept_frequency[concept] + sign * count
+            if total > 0:
+                self.concept_frequency[concept] = total
+                self.global_concepts.add(concept)
+            else:
+                del self.concept_frequency[concept]
+                self.global_concepts.discard(concept)
+        
+        for sem_type, count in file_info.semantic_types.items():
+            total = self.semantic_type_stats[sem_type] + sign * count
+            if total > 0:
+                self.semantic_type_stats[sem_type] = total
+            else:
+                del self.semantic_type_stats[sem_type]
+    
+    def _expire_active_files(self):
+        """Mark files complete once they have not been modified for a while"""
+        now = datetime.now()
+        for path in list(self._active_files):
+            file_info = self.files[path]
+            if (now - file_info.modified_time).total_seconds() >= ACTIVE_SECONDS:
+                self._update_stats(file_info, -1)
+                file_info.status = "complete"
+                self._update_stats(file_info, 1)
+                self._active_files.discard(path)
+    
     def _analyze_file(self, file_path: Path):
-        """Analyze a CSV output file"""
+        """Analyze a CSV output file and update the statistics"""
+        file_info = self._read_file(file_path)
+        with self._lock:
+            if file_info is None:
+                self._remove_file(file_path)
+            else:
+                self._set_file(file_info)
+    
+    def _read_file(self, file_path: Path) -> Optional[OutputFile]:
+        """Read a CSV output file (None if it no longer exists)"""
         try:
             stat = file_path.stat()
-            
-            # Create file info
-            file_info = OutputFile(
-                path=file_path,
-                created_time=datetime.fromtimestamp(stat.st_ctime),
-                modified_time=datetime.fromtimestamp(stat.st_mtime),
-                size=stat.st_size
-            )
-            
-            # Determine associated input file
-            # Assuming output filename format: input_filename_timestamp.csv
-            base_name = file_path.stem
-            if '_' in base_name:
-                parts = base_name.rsplit('_', 1)
-                if len(parts) == 2:
-                    file_info.associated_input = parts[0]
-            
-            # Quick analysis of CSV content
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            console.print(f"[red]Error processing {file_path}: {e}[/red]")
+            return None
+        
+        # Create file info
+        file_info = OutputFile(
+            path=file_path,
+            created_time=datetime.fromtimestamp(stat.st_ctime),
+            modified_time=datetime.fromtimestamp(stat.st_mtime),
+            size=stat.st_size
+        )
+        
+        # Determine associated input file
+        # Assuming output filename format: input_filename_timestamp.csv
+        base_name = file_path.stem
+        if '_' in base_name:
+            parts = base_name.rsplit('_', 1)
+            if len(parts) == 2:
+                file_info.associated_input = parts[0]
+        
+        # Quick analysis of CSV content
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                # Skip the start marker line if present
+                first_line = f.readline()
+                if not first_line.startswith("META_BATCH_START"):
+                    f.seek(0)
+                
+                reader = csv.DictReader(f)
+                
+                for row in reader:
+                    # Skip empty rows or end marker
+                    if not row or 'META_BATCH' in str(row.get('CUI', '')):
+                        continue
+                    file_info.row_count += 1
                     
-                    for row in reader:
-                        file_info.row_count += 1
-                        
-                        # Extract concept info
-                        if 'preferred_name' in row:
-                            concept = row['preferred_name']
-                            file_info.unique_concepts.add(concept)
-                            self.global_concepts.add(concept)
-                            self.concept_frequency[concept] += 1
-                        
-                        # Extract semantic type
-                        if 'semantic_types' in row:
-                            sem_types = row['semantic_types'].split(',')
-                            for st in sem_types:
-                                st = st.strip()
-                                if st:
-                                    file_info.semantic_types[st] = file_info.semantic_types.get(st, 0) + 1
-                                    self.semantic_type_stats[st] += 1
+                    # Extract concept info
+                    concept = row.get('PrefName', row.get('preferred_name'))
+                    if concept:
+                        file_info.unique_concepts.add(concept)
+                        file_info.concept_frequency[concept] = file_info.concept_frequency.get(concept, 0) + 1
                     
-                    file_info.concept_count = len(file_info.unique_concepts)
+                    # Extract semantic type
+                    sem_types = row.get('SemTypes', row.get('semantic_types'))
+                    if sem_types:
+                        for st in sem_types.strip('[]').split(','):
+                            st = st.strip()
+                            if st:
+                                file_info.semantic_types[st] = file_info.semantic_types.get(st, 0) + 1
+                
+                file_info.concept_count = len(file_info.unique_concepts)
+                
+                # Determine status based on file activity
+                if (datetime.now() - file_info.modified_time).total_seconds() < ACTIVE_SECONDS:
+                    file_info.status = "active"
+                else:
+                    file_info.status = "complete"
                     
-                    # Determine status based on file activity
-                    if (datetime.now() - file_info.modified_time).seconds < 60:
-                        file_info.status = "active"
-                    else:
-                        file_info.status = "complete"
-                        
-            except Exception as e:
-                file_info.status = "error"
-                console.print(f"[error]Error analyzing {file_path.name}: {e}[/error]")
-            
-            self.files[file_path] = file_info
-            
         except Exception as e:
-            console.print(f"[error]Error processing {file_path}: {e}[/error]")
+            file_info.status = "error"
+            console.print(f"[red]Error analyzing {file_path.name}: {e}[/red]")
+        
+        return file_info
     
     def get_display(self) -> Layout:
         """Get rich Layout for output explorer display"""
@@ -129,6 +129,26 @@ class RealtimeProgressTracker:
                     "progress": progress
                 })
     
+    def follow_tracing(self, tracer=None) -> bool:
+        """Update file stages from processing spans as they start
+
+        Returns:
+            False if tracing is disabled (see pymm.core.tracing)
+        """
+        from ..core.tracing import get_tracer
+
+        tracer = tracer or get_tracer()
+        if tracer is None:
+            return False
+
+        def on_span(span):
+            document = span.attributes.get("document")
+            if document and span.name != "process_file":
+                self.update_file_stage(document, span.name)
+
+        tracer.add_listener(on_span)
+        return True
+
     def complete_file(self, filename: str, concepts_found: int = 0, batch_id: Optional[str] = None):
         """Mark a file as completed"""
         batch_id = batch_id or self.current_batch
@@ -16,6 +16,8 @@ from rich.progress import Progress, BarColumn
 from rich.layout import Layout
 from rich.columns import Columns
 from rich import box
+
+from ..core.resources import ResourceSample, get_resource_sampler
 # from rich.chart import LineChart  # Not available in all rich versions
 
 console = Console()
@@ -76,10 +78,9 @@ class ResourceMonitor:
             'swap_percent': 80.0
         }
         
-        # Previous values for rate calculation
-        self._last_disk_io = psutil.disk_io_counters()
-        self._last_net_io = psutil.net_io_counters()
-        self._last_update = time.time()
+        # System metrics come from the shared sampler; this monitor only
+        # adds the per-process view
+        self.sampler = get_resource_sampler()
         
         # Control
         self._running = False
@@ -90,11 +91,16 @@ class ResourceMonitor:
         """Start monitoring"""
         if not self._running:
             self._running = True
+            self.sampler.subscribe(self._record_sample)
+            self.sampler.acquire()
             self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
             self._monitor_thread.start()
     
     def stop(self):
         """Stop monitoring"""
+        if self._running:
+            self.sampler.unsubscribe(self._record_sample)
+            self.sampler.release()
         self._running = False
         if self._monitor_thread and self._monitor_thread.is_alive():
             self._monitor_thread.join(timeout=5)
@@ -103,56 +109,28 @@ class ResourceMonitor:
         """Main monitoring loop"""
         while self._running:
             try:
-                self._collect_metrics()
+                self._update_process_metrics()
                 time.sleep(self.update_interval)
             except Exception as e:
                 console.print(f"[error]Resource monitoring error: {e}[/error]")
     
-    def _collect_metrics(self):
-        """Collect current system metrics"""
+    def _record_sample(self, sample: ResourceSample):
+        """Append a sample from the shared sampler to the history"""
         with self._lock:
-            now = time.time()
-            time_delta = now - self._last_update
-            self._last_update = now
-            
-            # CPU metrics
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            cpu_per_core = psutil.cpu_percent(interval=0.1, percpu=True)
-            
-            self.cpu_history.append(cpu_percent)
-            for i, percent in enumerate(cpu_per_core):
+            self.cpu_history.append(sample.cpu_percent)
+            for i, percent in enumerate(sample.cpu_per_core):
                 if i < len(self.cpu_per_core_history):
                     self.cpu_per_core_history[i].append(percent)
             
-            # Memory metrics
-            memory = psutil.virtual_memory()
-            swap = psutil.swap_memory()
-            
-            self.memory_history.append(memory.percent)
-            
-            # Disk I/O
-            disk_io = psutil.disk_io_counters()
-            if disk_io and self._last_disk_io:
-                read_rate = (disk_io.read_bytes - self._last_disk_io.read_bytes) / time_delta
-                write_rate = (disk_io.write_bytes - self._last_disk_io.write_bytes) / time_delta
-                self.disk_read_history.append(read_rate / (1024 * 1024))  # MB/s
-                self.disk_write_history.append(write_rate / (1024 * 1024))  # MB/s
-                self._last_disk_io = disk_io
-            
-            # Network I/O
-            net_io = psutil.net_io_counters()
-            if net_io and self._last_net_io:
-                recv_rate = (net_io.bytes_recv - self._last_net_io.bytes_recv) / time_delta
-                sent_rate = (net_io.bytes_sent - self._last_net_io.bytes_sent) / time_delta
-                self.network_recv_history.append(recv_rate / (1024 * 1024))  # MB/s
-                self.network_sent_history.append(sent_rate / (1024 * 1024))  # MB/s
-                self._last_net_io = net_io
+            self.memory_history.append(sample.memory_percent)
             
-            # Process metrics
-            self._update_process_metrics()
+            self.disk_read_history.append(sample.disk_read_rate / (1024 * 1024))  # MB/s
+            self.disk_write_history.append(sample.disk_write_rate / (1024 * 1024))  # MB/s
+            self.network_recv_history.append(sample.net_recv_rate / (1024 * 1024))  # MB/s
+            self.network_sent_history.append(sample.net_sent_rate / (1024 * 1024))  # MB/s
             
             # Check thresholds
-            self._check_alerts(cpu_percent, memory.percent, swap.percent)
+            self._check_alerts(sample.cpu_percent, sample.memory_percent, sample.swap_percent)
     
     def _update_process_metrics(self):
         """Update metrics for top processes"""
@@ -167,7 +145,9 @@ class ResourceMonitor:
                     pass
             
             # Sort by CPU usage
-            self.top_processes = sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)[:10]
+            top_processes = sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)[:10]
+            with self._lock:
+                self.top_processes = top_processes
             
         except Exception as e:
             console.print(f"[error]Process metrics error: {e}[/error]")
@@ -266,24 +246,23 @@ class ResourceMonitor:
     def _create_memory_section(self) -> Panel:
         """Create memory usage display"""
         with self._lock:
-            memory = psutil.virtual_memory()
-            swap = psutil.swap_memory()
+            sample = self.sampler.latest()
             
             content = Text()
             
             # RAM usage
             content.append("RAM Usage\n", style="bold")
-            ram_bar = self._create_usage_bar(memory.percent, 100)
+            ram_bar = self._create_usage_bar(sample.memory_percent, 100)
             content.append(ram_bar)
-            content.append(f" {memory.percent:.1f}%\n")
-            content.append(f"Used: {memory.used / (1024**3):.1f}GB / {memory.total / (1024**3):.1f}GB\n\n")
+            content.append(f" {sample.memory_percent:.1f}%\n")
+            content.append(f"Used: {sample.memory_used / (1024**3):.1f}GB / {sample.memory_total / (1024**3):.1f}GB\n\n")
             
             # Swap usage
             content.append("Swap Usage\n", style="bold")
-            swap_bar = self._create_usage_bar(swap.percent, 100)
+            swap_bar = self._create_usage_bar(sample.swap_percent, 100)
             content.append(swap_bar)
-            content.append(f" {swap.percent:.1f}%\n")
-            content.append(f"Used: {swap.used / (1024**3):.1f}GB / {swap.total / (1024**3):.1f}GB\n")
+            content.append(f" {sample.swap_percent:.1f}%\n")
+            content.append(f"Used: {sample.swap_used / (1024**3):.1f}GB / {sample.swap_total / (1024**3):.1f}GB\n")
             
             # Memory graph
             if len(self.memory_history) > 10:
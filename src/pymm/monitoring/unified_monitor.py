@@ -14,7 +14,6 @@ import os
 import time
 import threading
 import json
-import psutil
 from pathlib import Path
 from typing import Dict, Optional, Any
 from datetime import datetime, timedelta
@@ -33,6 +32,8 @@ from rich.padding import Padding
 from ..core.state import StateManager
 from ..core.job_manager import get_job_manager
 from ..core.file_tracker import UnifiedFileTracker
+from ..core.events import EventTail, STATUS_FAILED
+from ..core.resources import ResourceSample, get_resource_sampler
 from ..theme import (
     ICONS, format_progress_bar, get_progress_color, get_panel_style
 )
@@ -87,6 +88,9 @@ class UnifiedMonitor:
         # Progress tracking
         self.progress_tracker = ProgressTracker(output_dir)
 
+        # Per-file events published by the workers
+        self.event_tail = EventTail(output_dir)
+
         # Statistics
         self.stats = {
             "start_time": None,
@@ -94,6 +98,8 @@ class UnifiedMonitor:
             "files_failed": 0,
             "total_files": 0,
             "concepts_found": 0,
+            "concepts_per_sec": 0,
+            "bytes_written": 0,
             "processing_rate": 0,
             "avg_file_time": 0,
             "current_file": None,
@@ -258,38 +264,29 @@ class UnifiedMonitor:
         if in_progress:
             self.stats["current_file"] = Path(in_progress[0]).name
 
-        # Count concepts from CSV files
+        # Exact concept totals from the worker event log
         self._update_concept_count()
 
         # Check for new errors
         self._check_errors()
 
     def _update_concept_count(self):
-        """Count total concepts from CSV files"""
+        """Update concept totals and rates from newly appended worker events"""
         try:
-            csv_files = list(self.output_dir.glob("*.csv"))
-            total_concepts = 0
+            events = self.event_tail.poll()
+        except Exception:
+            return
 
-            for csv_file in csv_files[-10:]:  # Sample last 10 files
-                try:
-                    with open(csv_file, 'r') as f:
-                        # Count non-header, non-empty lines
-                        lines = sum(1 for line in f if line.strip()
-                                    and not line.startswith('#'))
-                        total_concepts += max(0, lines - 1)  # Subtract header
-                except BaseException:
-                    pass
-
-            # Extrapolate if not all files checked
-            if len(csv_files) > 10:
-                avg_per_file = total_concepts / 10
-                self.stats["concepts_found"] = int(
-                    avg_per_file * len(csv_files))
-            else:
-                self.stats["concepts_found"] = total_concepts
+        for event in events[-5:]:
+            if event.status == STATUS_FAILED:
+                continue
+            self.activity_log.append(
+                f"[dim]{datetime.fromtimestamp(event.timestamp).strftime('%H:%M:%S')}[/dim] "
+                f"{event.file}: {event.concepts} concepts in {event.elapsed:.1f}s")
 
-        except BaseException:
-            pass
+        self.stats["concepts_found"] = self.event_tail.concepts
+        self.stats["bytes_written"] = self.event_tail.bytes
+        self.stats["concepts_per_sec"] = self.event_tail.rates()["concepts_per_sec"]
 
     def _check_errors(self):
         """Check for recent errors"""
@@ -711,6 +708,10 @@ class UnifiedMonitor:
             f"{ICONS['arrow']} Total Concepts Identified", 
             f"{self.stats['concepts_found']:,}"
         )
+        table.add_row(
+            f"{ICONS['arrow']} Concept Rate",
+            f"{self.stats['concepts_per_sec']:.1f} concepts/sec"
+        )
 
         if self.stats["current_file"]:
             table.add_row(
@@ -812,6 +813,11 @@ class UnifiedMonitor:
             f"[bold bright_blue]{self.stats['concepts_found']:,}[/bold bright_blue]",
             "Total medical concepts identified"
         )
+        table.add_row(
+            f"{ICONS['arrow']} Concept Rate",
+            f"[bold bright_blue]{self.stats['concepts_per_sec']:.1f}/sec[/bold bright_blue]",
+            "Concepts identified per second (last minute)"
+        )
 
         if self.stats['files_processed'] > 0:
             avg_concepts = self.stats['concepts_found'] / self.stats['files_processed']
@@ -1083,7 +1089,7 @@ class ResourceMonitor:
 
     def __init__(self):
         self.monitoring = False
-        self.monitor_thread = None
+        self.sampler = get_resource_sampler()
         self.cpu_history = deque(maxlen=60)
         self.memory_history = deque(maxlen=60)
         self.disk_history = deque(maxlen=30)
@@ -1092,36 +1098,27 @@ class ResourceMonitor:
 
     def start(self):
         """Start resource monitoring"""
+        if self.monitoring:
+            return
         self.monitoring = True
-        self.monitor_thread = threading.Thread(
-            target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        self.sampler.subscribe(self._record_sample)
+        self.sampler.acquire()
 
     def stop(self):
         """Stop resource monitoring"""
+        if not self.monitoring:
+            return
         self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=2)
-
-    def _monitor_loop(self):
-        """Background monitoring loop"""
-        while self.monitoring:
-            try:
-                # CPU
-                self.cpu_history.append(psutil.cpu_percent(interval=0.1))
+        self.sampler.unsubscribe(self._record_sample)
+        self.sampler.release()
 
-                # Memory
-                mem = psutil.virtual_memory()
-                self.memory_history.append(mem.percent)
-
-                # Disk
-                disk = psutil.disk_usage('/')
-                self.disk_history.append(disk.percent)
-
-                time.sleep(1)
-
-            except Exception:
-                pass
+    def _record_sample(self, sample: ResourceSample):
+        """Append a sample from the shared sampler to the history"""
+        self.cpu_history.append(sample.cpu_percent)
+        self.memory_history.append(sample.memory_percent)
+        disk = sample.disk('/')
+        if disk:
+            self.disk_history.append(disk.percent)
 
     def get_compact_display(self) -> str:
         """Get compact resource display with colorful theme"""
@@ -1184,10 +1181,9 @@ class ResourceMonitor:
         mem_color = 'bright_red' if mem_percent > 80 else 'bright_yellow' if mem_percent > 50 else 'bright_green'
         mem_bar = self._create_bar(mem_percent, 20, mem_color)
 
-        # Get memory info from psutil
-        mem_info = psutil.virtual_memory()
-        mem_used_gb = mem_info.used / (1024**3)
-        mem_total_gb = mem_info.total / (1024**3)
+        sample = self.sampler.latest()
+        mem_used_gb = sample.memory_used / (1024**3)
+        mem_total_gb = sample.memory_total / (1024**3)
         table.add_row(
             f"{ICONS['arrow']} Memory Utilization",
             mem_bar,
@@ -1199,10 +1195,9 @@ class ResourceMonitor:
         disk_color = 'bright_red' if disk_percent > 90 else 'bright_yellow' if disk_percent > 70 else 'bright_green'
         disk_bar = self._create_bar(disk_percent, 20, disk_color)
 
-        # Get disk info from psutil
-        disk_info = psutil.disk_usage('/')
-        disk_free_gb = disk_info.free / (1024**3)
-        disk_total_gb = disk_info.total / (1024**3)
+        disk_info = sample.disk('/')
+        disk_free_gb = disk_info.free / (1024**3) if disk_info else 0.0
+        disk_total_gb = disk_info.total / (1024**3) if disk_info else 0.0
         table.add_row(
             f"{ICONS['arrow']} Disk Space Utilization",
             disk_bar,
@@ -1210,25 +1205,19 @@ class ResourceMonitor:
         )
 
         # Network (if available)
-        try:
-            # Get network stats from psutil
-            net_io = psutil.net_io_counters()
-            if net_io:
-                sent_mb = net_io.bytes_sent / (1024**2)
-                recv_mb = net_io.bytes_recv / (1024**2)
-                table.add_row(
-                    f"{ICONS['up']} Network Upload",
-                    "",
-                    f"[bold bright_cyan]{sent_mb:.1f} MB[/bold bright_cyan]"
-                )
-                table.add_row(
-                    f"{ICONS['down']} Network Download",
-                    "",
-                    f"[bold bright_cyan]{recv_mb:.1f} MB[/bold bright_cyan]"
-                )
-        except BaseException:
-            # Network stats not available
-            pass
+        if sample.net_sent_bytes or sample.net_recv_bytes:
+            sent_mb = sample.net_sent_bytes / (1024**2)
+            recv_mb = sample.net_recv_bytes / (1024**2)
+            table.add_row(
+                f"{ICONS['up']} Network Upload",
+                "",
+                f"[bold bright_cyan]{sent_mb:.1f} MB[/bold bright_cyan]"
+            )
+            table.add_row(
+                f"{ICONS['down']} Network Download",
+                "",
+                f"[bold bright_cyan]{recv_mb:.1f} MB[/bold bright_cyan]"
+            )
 
         return Panel(
             table,
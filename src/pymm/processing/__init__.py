@@ -4,6 +4,7 @@ from .chunked_batch_runner import ChunkedBatchRunner
 from .worker import FileProcessor
 from .pool_manager import MetaMapInstancePool, AdaptivePoolManager
 from .retry_manager import RetryManager
+from .stream import StreamProcessor, process_stream
 
 __all__ = [
     'BatchRunner',
@@ -11,5 +12,7 @@ __all__ = [
     'FileProcessor', 
     'MetaMapInstancePool',
     'AdaptivePoolManager',
-    'RetryManager'
+    'RetryManager',
+    'StreamProcessor',
+    'process_stream'
 ]
\ No newline at end of file
@@ -9,7 +9,7 @@ import shutil
 import sys
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 import threading
 from queue import Queue, Empty
@@ -22,11 +22,17 @@ from ..core.config import PyMMConfig
 from ..core.state import StateManager
 from ..core.job_manager import get_job_manager
 from ..core.file_tracker import UnifiedFileTracker
+from ..core.leases import LeaseManager, DEFAULT_LEASE_TTL
+from ..core.accounting import RunUsage, service_pids
+from ..core.tracing import span, configure_tracing
+from ..core.inputs import InputRecord, collect_input_records, input_layout, output_stem, restore_input_layout
 from ..server.manager import ServerManager
 from ..server.health_check import HealthMonitor
 from .pool_manager import MetaMapInstancePool
-from .worker import FileProcessor
+from .worker import FileProcessor, WorkerProcessorPool
 from .retry_manager import RetryManager
+from .work_queue import WorkItem, build_work_queue, process_work_queue
+from .bisect_retry import is_timeout_error
 
 logger = logging.getLogger(__name__)
 console = Console()
@@ -53,9 +59,28 @@ class BatchRunner:
         self.timeout = config.get("pymm_timeout", 300)
         self.use_instance_pool = config.get("use_instance_pool", True)
         self.show_progress = config.get("progress_bar", True)
+        configure_tracing(config)
         
-        # State management
-        self.state_manager = StateManager(str(self.output_dir))
+        # Distributed mode: nodes share input/output dirs and claim files via leases
+        self.distributed = config.get("distributed", False)
+        if isinstance(self.distributed, str):
+            self.distributed = self.distributed.lower() in ('yes', 'true', '1')
+        self.lease_manager = None
+        
+        # State management (per node in distributed mode, the state file is not shared)
+        if self.distributed:
+            self.lease_manager = LeaseManager(
+                str(self.output_dir),
+                input_dir=str(self.input_dir),
+                node_id=config.get("node_id") or None,
+                lease_ttl=config.get("lease_ttl", DEFAULT_LEASE_TTL)
+            )
+            self.state_manager = StateManager(
+                str(self.output_dir),
+                state_file=f".pymm_state.{self.lease_manager.node_id}.json"
+            )
+        else:
+            self.state_manager = StateManager(str(self.output_dir))
         
         # Unified file tracking
         self.file_tracker = UnifiedFileTracker(config) if config.get('use_unified_tracking', True) else None
@@ -104,6 +129,12 @@ class BatchRunner:
             self.instance_pool = MetaMapInstancePool(config)
             logger.info(f"Created instance pool of type: {type(self.instance_pool)}")
         
+        # Worker-affine FileProcessors, reused for every file a thread handles
+        self.worker_processors = WorkerProcessorPool(
+            self._create_worker_processor,
+            instance_pool=self.instance_pool
+        )
+        
         # Progress tracking
         self.progress_queue = Queue()
         self.stats = {
@@ -131,40 +162,26 @@ class BatchRunner:
         
         logger.info(f"Batch processing log: {log_file}")
     
-    def _collect_input_files(self) -> List[Path]:
-        """Collect all input files to process"""
-        input_files = []
-        
-        if self.input_dir.is_file():
-            input_files.append(self.input_dir)
-        else:
-            # Collect all text files
-            for pattern in ['*.txt', '*.text', '*.input']:
-                input_files.extend(self.input_dir.glob(pattern))
-            
-            # Also check for files without extension
-            for file in self.input_dir.iterdir():
-                if file.is_file() and file.suffix == '' and not file.name.startswith('.'):
-                    input_files.append(file)
-        
-        # Sort for consistent ordering
-        input_files.sort()
-        
-        logger.info(f"Found {len(input_files)} input files")
-        return input_files
+    def _collect_input_files(self) -> List[InputRecord]:
+        """Collect all input notes to process (note files or corpus records)"""
+        return collect_input_records(self.input_dir, self.config)
     
-    def _filter_pending_files(self, input_files: List[Path]) -> List[Path]:
-        """Filter out already processed files"""
+    def _filter_pending_files(self, input_files: List[InputRecord]) -> List[InputRecord]:
+        """Filter out already processed notes"""
         pending = []
         
         for file in input_files:
-            # Normalize file path for consistent comparison
-            file_str = str(file.resolve())
-            output_file = self.output_dir / f"{file.stem}.csv"
+            output_file = self.output_dir / f"{file.output_stem}.csv"
+            
+            # Check if already completed (older states list resolved file paths)
+            if self.state_manager.is_completed(file.note_id) or \
+                    (file.path and self.state_manager.is_completed(str(file.path.resolve()))):
+                logger.debug(f"Skipping completed note: {file.note_id}")
+                continue
             
-            # Check if already completed
-            if self.state_manager.is_completed(file_str):
-                logger.debug(f"Skipping completed file: {file}")
+            # Check if another node finished it
+            if self.lease_manager and self.lease_manager.is_finished(file):
+                logger.debug(f"Skipping note finished by another node: {file.note_id}")
                 continue
             
             # Check if output exists and is valid
@@ -174,8 +191,8 @@ class BatchRunner:
                     with open(output_file, 'r') as f:
                         lines = f.readlines()
                         if lines and "META_BATCH_END" in lines[-1]:
-                            self.state_manager.mark_completed(file_str)
-                            logger.debug(f"Skipping file with valid output: {file}")
+                            self.state_manager.mark_completed(file.note_id)
+                            logger.debug(f"Skipping note with valid output: {file.note_id}")
                             continue
                 except:
                     pass
@@ -185,51 +202,54 @@ class BatchRunner:
         logger.info(f"Filtered to {len(pending)} pending files")
         return pending
     
-    def _process_file_with_pool(self, file: Path) -> Tuple[bool, float, Optional[str]]:
-        """Process file using instance pool"""
-        instance_id = None
-        mm_instance = None
-        
-        try:
-            # Get instance from pool
-            logger.debug(f"Getting instance from pool of type: {type(self.instance_pool)}")
-            logger.debug(f"Pool has get_instance: {hasattr(self.instance_pool, 'get_instance')}")
-            instance_id, mm_instance = self.instance_pool.get_instance()
-            
-            # Process file with pooled instance
-            processor = FileProcessor(
-                self.config.get("metamap_binary_path"),
-                str(self.output_dir),
-                self.config.get("metamap_processing_options", ""),
-                self.timeout,
-                metamap_instance=mm_instance,  # Pass the pooled instance
-                state_manager=self.state_manager,  # Pass state manager for concept tracking
-                file_tracker=self.file_tracker  # Pass file tracker for tracking
-            )
-            
-            # Process the file
-            return processor.process_file(str(file))
-            
-        finally:
-            # Return instance to pool
-            if instance_id is not None:
-                self.instance_pool.release_instance(instance_id, mm_instance if 'mm_instance' in locals() else None)
-    
-    def _process_file_direct(self, file: Path) -> Tuple[bool, float, Optional[str]]:
-        """Process file without instance pool"""
-        processor = FileProcessor(
+    def _create_worker_processor(self, worker_id: int) -> FileProcessor:
+        """Create the FileProcessor owned by one worker thread"""
+        return FileProcessor(
             self.config.get("metamap_binary_path"),
             str(self.output_dir),
             self.config.get("metamap_processing_options", ""),
             self.timeout,
+            worker_id=worker_id,
             state_manager=self.state_manager,  # Pass state manager for concept tracking
             file_tracker=self.file_tracker  # Pass file tracker for tracking
         )
+    
+    def _process_file_with_pool(self, file: InputRecord, bisect: bool = False) -> Tuple[bool, float, Optional[str]]:
+        """Process file with the worker's processor and its pooled instance
+        
+        With bisect=True (used when retrying timeouts) the document is split
+        around the span that makes MetaMap hang instead of being re-run whole.
+        """
+        processor = self.worker_processors.get()
+        
+        try:
+            success, elapsed, error = processor.process_file(file, bisect=bisect)
+        except Exception:
+            self.worker_processors.reset(processor)
+            raise
+        
+        # Timed out or crashed MetaMap instances are not reused
+        if not success:
+            self.worker_processors.reset(processor)
         
-        return processor.process_file(str(file))
+        return success, elapsed, error
+    
+    def _process_file_direct(self, file: InputRecord) -> Tuple[bool, float, Optional[str]]:
+        """Process file without instance pool"""
+        # Without an instance pool the worker processor simply has no bound instance
+        return self._process_file_with_pool(file)
     
-    def _process_with_progress(self, files: List[Path]) -> Dict[str, Any]:
-        """Process files with progress tracking"""
+    def _process_work_item(self, item: WorkItem) -> Tuple[bool, float, Optional[str]]:
+        """Process one queued file; retries of timed-out files are bisected"""
+        bisect = item.attempts > 0 and is_timeout_error(item.last_error)
+        return self._process_file_with_pool(item.record, bisect=bisect)
+    
+    def _process_with_progress(self, files: List[InputRecord]) -> Dict[str, Any]:
+        """Process files through the priority work queue with progress tracking
+        
+        Failed files are retried from the queue's retry lane as soon as their
+        backoff expires, interleaved with new work.
+        """
         results = {
             "success": True,
             "total_files": len(files),
@@ -240,8 +260,58 @@ class BatchRunner:
         }
         
         start_time = time.time()
+        work_queue = build_work_queue(files, self.config)
+        retry_manager = self.retry_manager if self.config.get("retry_max_attempts", 0) > 0 else None
+        claim_func = (lambda item: self.lease_manager.claim(item.record)) if self.lease_manager else None
+        
+        progress = None
+        task = None
+        completed = 0
+        last_update_time = time.time()
+        last_percentage = 0
+        
+        def on_result(item: WorkItem, success: bool, elapsed: float, error: Optional[str]):
+            nonlocal completed, last_update_time, last_percentage
+            file = item.record
+            
+            if success:
+                results["processed"] += 1
+                with span("save_state", document=file.name):
+                    self.state_manager.mark_completed(file.note_id)
+                    if self.lease_manager:
+                        self.lease_manager.complete(file)
+                logger.info(f"Processed {file.name} in {elapsed:.2f}s")
+            else:
+                results["failed"] += 1
+                results["failed_files"].append(file.note_id)
+                with span("save_state", document=file.name):
+                    self.state_manager.mark_failed(file.note_id, error or "Unknown error")
+                    if self.lease_manager:
+                        self.lease_manager.fail(file, error)
+                logger.error(f"Failed to process {file.name}: {error}")
+            
+            completed += 1
+            current_percentage = int((completed / len(files)) * 100)
+            
+            # Update job manager immediately for each file
+            if self.job_manager and self.job_id:
+                self.job_manager.update_progress(self.job_id, {
+                    'total_files': len(files),
+                    'processed': results["processed"],
+                    'failed': results["failed"],
+                    'percentage': current_percentage,
+                    'current_file': file.name,
+                    'last_updated': datetime.now().isoformat()
+                })
+            
+            # Only update progress bar if enough time has passed AND percentage has changed
+            current_time = time.time()
+            if (progress and current_time - last_update_time >= 0.5 and 
+                current_percentage != last_percentage):
+                progress.update(task, completed=completed)
+                last_update_time = current_time
+                last_percentage = current_percentage
         
-        # Create progress bar
         if self.show_progress:
             progress = Progress(
                 SpinnerColumn(),
@@ -258,109 +328,67 @@ class BatchRunner:
                     f"Processing {len(files)} files...",
                     total=len(files)
                 )
+                retry_summary = process_work_queue(
+                    work_queue, self._process_work_item, self.max_workers,
+                    on_result, retry_manager=retry_manager, claim_func=claim_func
+                )
                 
-                # Process with thread pool
-                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    # Submit all tasks
-                    future_to_file = {}
-                    for file in files:
-                        if self.use_instance_pool:
-                            future = executor.submit(self._process_file_with_pool, file)
-                        else:
-                            future = executor.submit(self._process_file_direct, file)
-                        future_to_file[future] = file
-                    
-                    # Process results as they complete
-                    completed = 0
-                    last_update_time = time.time()
-                    last_percentage = 0
-                    
-                    for future in as_completed(future_to_file):
-                        file = future_to_file[future]
-                        
-                        try:
-                            success, elapsed, error = future.result(timeout=self.timeout + 30)
-                            
-                            if success:
-                                results["processed"] += 1
-                                self.state_manager.mark_completed(str(file.resolve()))
-                                logger.info(f"Processed {file.name} in {elapsed:.2f}s")
-                            else:
-                                results["failed"] += 1
-                                results["failed_files"].append(str(file.resolve()))
-                                self.state_manager.mark_failed(str(file.resolve()), error or "Unknown error")
-                                logger.error(f"Failed to process {file.name}: {error}")
-                        
-                        except Exception as e:
-                            results["failed"] += 1
-                            results["failed_files"].append(str(file.resolve()))
-                            self.state_manager.mark_failed(str(file.resolve()), str(e))
-                            logger.error(f"Exception processing {file.name}: {e}")
-                        
-                        # Update progress with rate limiting and smooth updates
-                        completed += 1
-                        current_time = time.time()
-                        current_percentage = int((completed / len(files)) * 100)
-                        
-                        # Update job manager immediately for each file
-                        if self.job_manager and self.job_id:
-                            self.job_manager.update_progress(self.job_id, {
-                                'total_files': len(files),
-                                'processed': results["processed"],
-                                'failed': results["failed"],
-                                'percentage': current_percentage,
-                                'current_file': file.name,
-                                'last_updated': datetime.now().isoformat()
-                            })
-                        
-                        # Only update progress bar if enough time has passed AND percentage has changed
-                        if (current_time - last_update_time >= 0.5 and 
-                            current_percentage != last_percentage):
-                            progress.update(task, completed=completed)
-                            last_update_time = current_time
-                            last_percentage = current_percentage
-                    
-                    # Final update to ensure 100%
-                    progress.update(task, completed=len(files))
-        
+                # Final update to ensure 100%
+                progress.update(task, completed=len(files))
         else:
-            # Process without progress bar
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                future_to_file = {}
-                for file in files:
-                    if self.use_instance_pool:
-                        future = executor.submit(self._process_file_with_pool, file)
-                    else:
-                        future = executor.submit(self._process_file_direct, file)
-                    future_to_file[future] = file
-                
-                for future in as_completed(future_to_file):
-                    file = future_to_file[future]
-                    
-                    try:
-                        success, elapsed, error = future.result(timeout=self.timeout + 30)
-                        
-                        if success:
-                            results["processed"] += 1
-                            self.state_manager.mark_completed(str(file.resolve()))
-                            logger.info(f"Processed {file.name} in {elapsed:.2f}s")
-                        else:
-                            results["failed"] += 1
-                            results["failed_files"].append(str(file.resolve()))
-                            self.state_manager.mark_failed(str(file.resolve()), error or "Unknown error")
-                            logger.error(f"Failed to process {file.name}: {error}")
-                    
-                    except Exception as e:
-                        results["failed"] += 1
-                        results["failed_files"].append(str(file.resolve()))
-                        self.state_manager.mark_failed(str(file.resolve()), str(e))
-                        logger.error(f"Exception processing {file.name}: {e}")
+            retry_summary = process_work_queue(
+                work_queue, self._process_work_item, self.max_workers,
+                on_result, retry_manager=retry_manager, claim_func=claim_func
+            )
+        
+        if retry_summary["retried"]:
+            results["retry_summary"] = retry_summary
+        if retry_summary["claimed_elsewhere"]:
+            results["claimed_elsewhere"] = retry_summary["claimed_elsewhere"]
         
         results["elapsed_time"] = time.time() - start_time
         results["throughput"] = results["processed"] / results["elapsed_time"] if results["elapsed_time"] > 0 else 0
         
         return results
     
+    def _process_distributed(self, files: List[InputRecord]) -> Dict[str, Any]:
+        """Process files alongside other nodes sharing the same directories
+        
+        Files are claimed through leases as workers reach them. Once this
+        node's queue is drained it keeps reclaiming files whose lease expired
+        (their node died) until every file is finished by some node.
+        """
+        start_time = time.time()
+        self.lease_manager.start()
+        poll_interval = self.config.get("lease_poll_interval", 10)
+        
+        results = self._process_with_progress(files)
+        results["total_files"] = len(files)
+        
+        while True:
+            remaining = self.lease_manager.unfinished(files)
+            if not remaining:
+                break
+            
+            claimable = self.lease_manager.claimable(remaining)
+            if not claimable:
+                # Other nodes still hold live leases on the remaining files
+                logger.debug(f"Waiting on {len(remaining)} files leased by other nodes")
+                time.sleep(poll_interval)
+                continue
+            
+            logger.info(f"Reclaiming {len(claimable)} files from expired leases")
+            reclaimed = self._process_with_progress(claimable)
+            for key in ("processed", "failed", "claimed_elsewhere"):
+                results[key] = results.get(key, 0) + reclaimed.get(key, 0)
+            results["failed_files"].extend(reclaimed["failed_files"])
+        
+        results["elapsed_time"] = time.time() - start_time
+        results["throughput"] = results["processed"] / results["elapsed_time"] if results["elapsed_time"] > 0 else 0
+        results["node_id"] = self.lease_manager.node_id
+        results["lease_stats"] = dict(self.lease_manager.stats)
+        return results
+    
     def run(self) -> Dict[str, Any]:
         """Run batch processing"""
         logger.info("Starting batch processing")
@@ -385,9 +413,17 @@ class BatchRunner:
         # TODO: Fix async health monitoring
         # self.health_monitor.start_monitoring()
         
+        # Prometheus endpoint, if a metrics port is configured
+        from ..monitoring.metrics import start_metrics_server
+        metrics = start_metrics_server(self.config, self.output_dir, workers=self.max_workers,
+                                       instance_pool=self.instance_pool,
+                                       health_monitor=self.health_monitor)
+        
         try:
             # Collect and filter files
             input_files = self._collect_input_files()
+            if metrics:
+                metrics.metrics.set_total_files(len(input_files))
             if not input_files:
                 return {
                     "success": False,
@@ -406,36 +442,21 @@ class BatchRunner:
                 }
             
             # Update state
+            self.state_manager.set_input_source(self.input_dir.resolve(), input_layout(self.config))
             self.state_manager.update_statistics(
                 total_files=len(input_files),
                 in_progress=len(pending_files)
             )
             
+            # Child-process usage is rolled up from this run's events
+            run_usage = RunUsage(self.output_dir, service_pids(self.server_manager))
+
             # Process files
-            results = self._process_with_progress(pending_files)
-            
-            # Handle retries if configured
-            if self.config.get("retry_max_attempts", 0) > 0 and results["failed_files"]:
-                logger.info(f"Retrying {len(results['failed_files'])} failed files...")
-                
-                # Create a process function for retry
-                def retry_process_func(file_path):
-                    file = Path(file_path)
-                    if self.use_instance_pool:
-                        return self._process_file_with_pool(file)
-                    else:
-                        return self._process_file_direct(file)
-                
-                retry_results = self.retry_manager.retry_failed_files(
-                    results["failed_files"], 
-                    retry_process_func
-                )
-                
-                # Update results
-                results["processed"] += retry_results["recovered"]
-                results["failed"] -= retry_results["recovered"]
-                results["failed_files"] = retry_results["still_failed"]
-                results["retry_summary"] = retry_results
+            if self.lease_manager:
+                results = self._process_distributed(pending_files)
+            else:
+                results = self._process_with_progress(pending_files)
+            results["resource_usage"] = run_usage.finish()
             
             # Final statistics
             self.state_manager.update_statistics(
@@ -452,6 +473,12 @@ class BatchRunner:
         finally:
             # Cleanup
             # self.health_monitor.stop_monitoring()
+            if metrics:
+                metrics.stop()
+            self.state_manager.flush()
+            self.worker_processors.close()
+            if self.lease_manager:
+                self.lease_manager.stop()
             if self.instance_pool:
                 logger.info("Shutting down MetaMap instance pool...")
                 self.instance_pool.shutdown()
@@ -469,15 +496,14 @@ class BatchRunner:
         """Resume interrupted processing"""
         state_manager = StateManager(output_dir)
         
-        # Find input directory from state
-        if state_manager._state.get("completed_files"):
-            first_file = Path(state_manager._state["completed_files"][0])
-            input_dir = first_file.parent
-        else:
+        # Find input directory (or corpus file) from state
+        input_dir = state_manager.get_input_source()
+        if not input_dir:
             return {
                 "success": False,
                 "error": "Cannot determine input directory from state"
             }
+        restore_input_layout(state_manager.get_input_layout())
         
         # Create runner and process
         runner = cls(str(input_dir), output_dir, config)
@@ -540,7 +566,8 @@ class BatchRunner:
         
         for file_path in list(failed_files.keys()):
             # Remove output file if exists
-            output_file = self.output_dir / f"{Path(file_path).name}.csv"
+            note_id = Path(file_path).name if os.path.isabs(file_path) else file_path
+            output_file = self.output_dir / f"{output_stem(note_id)}.csv"
             if output_file.exists():
                 try:
                     output_file.unlink()
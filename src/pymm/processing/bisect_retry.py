@@ -0,0 +1,285 @@
+"""Bisecting retry strategy for documents that time out in MetaMap
+
+Re-running a pathological note with the same timeout usually times out
+again. Instead, the note is split at a section or sentence boundary near its
+middle and both halves are retried in parallel. Halves that still time out
+are split again until the offending span is isolated; that span is either
+skipped or run once more with reduced options (no WSD, lower --prune).
+Concepts from all spans are merged back with positions shifted to the
+original document offsets.
+"""
+import os
+import re
+import shlex
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+from ..pymm import Metamap as PyMetaMap, MetamapStuck as MetamapTimeout
+from ..cmdexecutor import DEFAULT_METAMAP_OPTIONS
+from ..core.exceptions import MetamapStuck, ParseError
+
+logger = logging.getLogger(__name__)
+
+# Preferred split points, strongest first
+SECTION_BOUNDARY = re.compile(r'\n\s*\n|\n(?=[A-Z][A-Z0-9 /&()-]{2,}:)')
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;])\s+')
+LINE_BOUNDARY = re.compile(r'\n+')
+WORD_BOUNDARY = re.compile(r'\s+')
+BOUNDARY_PATTERNS = (SECTION_BOUNDARY, SENTENCE_BOUNDARY, LINE_BOUNDARY, WORD_BOUNDARY)
+
+WSD_OPTIONS = {'-y', '--word_sense_disambiguation'}
+
+
+@dataclass
+class SpanOutcome:
+    """How one span of a bisected document was handled"""
+    start: int
+    end: int
+    status: str  # 'processed', 'reduced' or 'skipped'
+    concepts: int = 0
+
+
+@dataclass
+class BisectResult:
+    """Merged result of a bisecting retry"""
+    concepts: List[Dict[str, Any]] = field(default_factory=list)
+    spans: List[SpanOutcome] = field(default_factory=list)
+
+    @property
+    def skipped_spans(self) -> List[SpanOutcome]:
+        return [s for s in self.spans if s.status == 'skipped']
+
+    @property
+    def reduced_spans(self) -> List[SpanOutcome]:
+        return [s for s in self.spans if s.status == 'reduced']
+
+
+def is_timeout_error(error: Optional[str]) -> bool:
+    """Check whether a recorded failure message describes a MetaMap timeout"""
+    if not error:
+        return False
+    error = error.lower()
+    return 'timeout' in error or 'timed out' in error or 'metamapstuck' in error
+
+
+def find_split_point(text: str, start: int, end: int) -> Optional[int]:
+    """Find a boundary near the middle of text[start:end]
+
+    Section breaks are preferred over sentence ends, then line breaks, then
+    any whitespace. Only boundaries in the middle half of the span are
+    considered so that both halves shrink substantially.
+
+    Returns:
+        Absolute offset of the split, or None if the span cannot be split
+    """
+    length = end - start
+    if length < 2:
+        return None
+
+    middle = start + length // 2
+    low = start + length // 4
+    high = end - length // 4
+
+    for pattern in BOUNDARY_PATTERNS:
+        best = None
+        for match in pattern.finditer(text, low, high):
+            # Split after the separator so the right half starts on content
+            point = match.end()
+            if start < point < end and (best is None or abs(point - middle) < abs(best - middle)):
+                best = point
+        if best is not None:
+            return best
+
+    return middle
+
+
+def shift_position(position: str, offset: int) -> str:
+    """Shift a 'start:length[;start:length]' position string by offset"""
+    if not position or not offset:
+        return position
+
+    shifted = []
+    for part in position.split(';'):
+        start, sep, length = part.partition(':')
+        try:
+            shifted.append(f"{int(start) + offset}{sep}{length}")
+        except ValueError:
+            shifted.append(part)
+    return ';'.join(shifted)
+
+
+def reduce_options(options: str, prune: int) -> str:
+    """Derive cheaper MetaMap options: drop WSD and lower --prune"""
+    tokens = shlex.split(options) if options else list(DEFAULT_METAMAP_OPTIONS)
+    reduced = []
+    found_prune = False
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in WSD_OPTIONS:
+            pass
+        elif token == '--prune' and i + 1 < len(tokens):
+            found_prune = True
+            try:
+                value = min(int(tokens[i + 1]), prune)
+            except ValueError:
+                value = prune
+            reduced.extend(['--prune', str(value)])
+            i += 1
+        elif token.startswith('--prune='):
+            found_prune = True
+            try:
+                value = min(int(token.split('=', 1)[1]), prune)
+            except ValueError:
+                value = prune
+            reduced.extend(['--prune', str(value)])
+        else:
+            reduced.append(token)
+        i += 1
+
+    if not found_prune:
+        reduced.extend(['--prune', str(prune)])
+
+    return ' '.join(reduced)
+
+
+class BisectingRetry:
+    """Retry a timed-out document by recursively bisecting it"""
+
+    def __init__(self, processor, config=None):
+        """
+        Args:
+            processor: FileProcessor providing the binary path, ports, options,
+                timeout and concept extraction
+            config: Optional PyMMConfig with bisect_* settings
+        """
+        self.processor = processor
+        get = config.get if config else (lambda key, default=None: default)
+
+        self.min_span_chars = int(get("bisect_min_span_chars", 200))
+        self.max_depth = int(get("bisect_max_depth", 6))
+        self.min_timeout = int(get("bisect_min_timeout", 30))
+        self.isolated_action = get("bisect_isolated_action", "reduce")  # 'reduce' or 'skip'
+        self.reduced_prune = int(get("bisect_reduced_prune", 10))
+
+        # Bound concurrent MetaMap runs; spans waiting for a slot hold nothing
+        self._slots = threading.BoundedSemaphore(int(get("bisect_max_parallel", 2)))
+
+        base_options = processor.metamap_options or os.environ.get("METAMAP_PROCESSING_OPTIONS", "")
+        if base_options:
+            base_options = processor._deduplicate_options(base_options)
+        self.options = base_options or None
+        self.reduced_options = reduce_options(base_options, self.reduced_prune)
+
+    def process_text(self, content: str, doc_id: str,
+                     assume_stuck: bool = True) -> BisectResult:
+        """Process content, bisecting around spans that time out
+
+        Args:
+            content: Full document text
+            doc_id: Identifier used in log messages
+            assume_stuck: Skip the whole-document attempt (it already timed out)
+        """
+        result = BisectResult()
+        if not content.strip():
+            return result
+
+        concepts, spans = self._process_span(
+            content, 0, len(content), depth=0, skip_attempt=assume_stuck)
+        result.concepts = concepts
+        result.spans = spans
+
+        skipped = result.skipped_spans
+        reduced = result.reduced_spans
+        logger.info(
+            f"Bisected {doc_id}: {len(spans)} spans, {len(concepts)} concepts, "
+            f"{len(reduced)} reduced, {len(skipped)} skipped")
+        for span in skipped:
+            logger.warning(f"{doc_id}: skipped span {span.start}-{span.end} "
+                           f"({span.end - span.start} chars) after repeated timeouts")
+        return result
+
+    def _span_timeout(self, span_length: int, doc_length: int) -> int:
+        """Scale the processor timeout down with the span size"""
+        fraction = span_length / doc_length if doc_length else 1.0
+        return max(self.min_timeout, int(self.processor.timeout * min(1.0, fraction * 1.5)))
+
+    def _server_ports(self) -> Tuple[int, int]:
+        """Tagger and WSD ports of the processor's bound pool instance, if any"""
+        source = self.processor.metamap_instance or self.processor
+        return source.tagger_port, source.wsd_port
+
+    def _run_metamap(self, text: str, timeout: int,
+                     options: Optional[str]) -> List[Dict[str, Any]]:
+        """Run MetaMap on one span with its own instance (own temp files)"""
+        tagger_port, wsd_port = self._server_ports()
+        with self._slots:
+            with PyMetaMap(self.processor.metamap_binary_path, debug=False,
+                           tagger_port=tagger_port, wsd_port=wsd_port,
+                           options=options) as mm:
+                try:
+                    mmos = mm.parse([text], timeout=timeout)
+                except (TimeoutError, MetamapTimeout):
+                    raise MetamapStuck()
+        if not mmos:
+            raise ParseError(f"span of {len(text)} chars", "MetaMap returned no results")
+
+        concepts = []
+        for mmo in mmos:
+            for concept in mmo:
+                concepts.append(self.processor._extract_concept_data(concept))
+        return concepts
+
+    def _shift(self, concepts: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+        for concept in concepts:
+            concept['position'] = shift_position(concept.get('position', ''), offset)
+        return concepts
+
+    def _process_span(self, content: str, start: int, end: int, depth: int,
+                      skip_attempt: bool = False) -> Tuple[List[Dict[str, Any]], List[SpanOutcome]]:
+        """Process content[start:end], recursing into halves on timeout"""
+        text = content[start:end]
+        if not text.strip():
+            return [], []
+
+        if not skip_attempt:
+            timeout = self._span_timeout(end - start, len(content))
+            try:
+                concepts = self._shift(self._run_metamap(text, timeout, self.options), start)
+                return concepts, [SpanOutcome(start, end, 'processed', len(concepts))]
+            except MetamapStuck:
+                logger.debug(f"Span {start}-{end} timed out after {timeout}s (depth {depth})")
+
+        split = None
+        if end - start > self.min_span_chars and depth < self.max_depth:
+            split = find_split_point(content, start, end)
+
+        if split is None:
+            return self._handle_isolated_span(content, start, end)
+
+        # Retry the halves in parallel: right half on a helper thread,
+        # left half on this one
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            right_future = executor.submit(self._process_span, content, split, end, depth + 1)
+            left_concepts, left_spans = self._process_span(content, start, split, depth + 1)
+            right_concepts, right_spans = right_future.result()
+
+        return left_concepts + right_concepts, left_spans + right_spans
+
+    def _handle_isolated_span(self, content: str, start: int,
+                              end: int) -> Tuple[List[Dict[str, Any]], List[SpanOutcome]]:
+        """Skip the offending span or run it with reduced options"""
+        if self.isolated_action == 'reduce':
+            timeout = max(self.min_timeout, self._span_timeout(end - start, len(content)))
+            try:
+                concepts = self._shift(
+                    self._run_metamap(content[start:end], timeout, self.reduced_options), start)
+                return concepts, [SpanOutcome(start, end, 'reduced', len(concepts))]
+            except MetamapStuck:
+                logger.debug(f"Span {start}-{end} timed out even with reduced options")
+
+        return [], [SpanOutcome(start, end, 'skipped')]
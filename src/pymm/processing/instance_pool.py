@@ -36,7 +36,9 @@ class MetaMapInstancePool:
         self.max_instances = max_instances
         self.instances = Queue(maxsize=max_instances)
         self.instance_count = 0
-        self.lock = threading.Lock()
+        self._free_ids = []  # Slots of discarded instances, reused first
+        # Reentrant: get_instance() holds the lock while calling _create_instance()
+        self.lock = threading.RLock()
         self.debug = config.get("debug", False)
         
         # Port management
@@ -49,6 +51,7 @@ class MetaMapInstancePool:
             "created": 0,
             "reused": 0,
             "errors": 0,
+            "discarded": 0,
             "active": 0
         }
         
@@ -57,7 +60,7 @@ class MetaMapInstancePool:
     def _create_instance(self) -> Tuple[int, PyMetaMap]:
         """Create a new MetaMap instance with unique ports"""
         with self.lock:
-            instance_id = self.instance_count
+            instance_id = self._free_ids.pop() if self._free_ids else self.instance_count
             self.instance_count += 1
             
             # Calculate unique ports for this instance
@@ -82,6 +85,8 @@ class MetaMapInstancePool:
             logger.error(f"Failed to create MetaMap instance: {e}")
             with self.lock:
                 self.stats["errors"] += 1
+                self.instance_count -= 1
+                self._free_ids.append(instance_id)
             raise
     
     def get_instance(self, timeout: float = 30.0) -> Tuple[int, PyMetaMap]:
@@ -133,6 +138,21 @@ class MetaMapInstancePool:
                 self.stats["active"] -= 1
             logger.warning(f"Could not return instance {instance_id} to pool")
     
+    def discard_instance(self, instance_id: int, instance: Optional[PyMetaMap] = None):
+        """Drop a broken instance and free its slot for a fresh one"""
+        if instance is not None:
+            try:
+                instance.close()
+            except Exception as e:
+                logger.debug(f"Error closing discarded instance {instance_id}: {e}")
+
+        with self.lock:
+            self.stats["active"] -= 1
+            self.stats["discarded"] += 1
+            self.instance_count -= 1
+            self._free_ids.append(instance_id)
+        logger.debug(f"Discarded instance {instance_id}")
+
     def get_stats(self) -> Dict[str, Any]:
         """Get pool statistics"""
         with self.lock:
@@ -141,6 +161,7 @@ class MetaMapInstancePool:
                 "created": self.stats["created"],
                 "reused": self.stats["reused"],
                 "errors": self.stats["errors"],
+                "discarded": self.stats["discarded"],
                 "active": self.stats["active"],
                 "available": self.instances.qsize()
             }
@@ -1,95 +1,532 @@
 """
 Java API Bridge for MetaMap processing
+
+Single files go to long-lived ``MetaMapWorker`` JVMs (one per pool slot)
+that take JSON-line requests on stdin and stream concepts back on stdout,
+so a note does not pay JVM start-up and classpath loading. See
+``java_api_impl/src/MetaMapWorker.java`` for the protocol and
+``java_worker_stub`` for a Python stand-in used in tests.
 """
 import os
 import sys
+import csv
 import json
+import time
+import shlex
+import shutil
+import hashlib
 import subprocess
 import tempfile
 import logging
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Any, Iterator, List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 import queue
 
 from ..core.config import Config
-from ..core.exceptions import PyMMError
+from ..core.exceptions import PyMMError, MetamapStuck
+from .worker import CSV_HEADER, START_MARKER_PREFIX, END_MARKER_PREFIX
 
 logger = logging.getLogger(__name__)
 
+# Seconds a JVM may take to connect to MetaMap and report ready
+WORKER_START_TIMEOUT = 120.0
+# Idle workers are pinged before reuse after this many seconds
+WORKER_HEALTH_INTERVAL = 60.0
+WORKER_PING_TIMEOUT = 10.0
+# Consecutive failed starts before a slot gives up
+WORKER_MAX_RESTARTS = 3
+
+GSON_JAR = "gson-2.8.9.jar"
+GSON_URL = "https://repo1.maven.org/maven2/com/google/code/gson/gson/2.8.9/gson-2.8.9.jar"
+API_JARS = ("MetaMapApi.jar", "metamap-api-2.0.jar", "prologbeans.jar")
+
+JAVA_IMPL_PATH = Path(__file__).parent.parent.parent.parent / "java_api_impl"
+# Compiled classes, one directory per build key
+JAVA_BUILD_ROOT = Path.home() / ".pymm" / "java-build"
+
+_CLASSPATH_SEPARATOR = ";" if sys.platform.startswith("win") else ":"
+
+
+def _find_javac(java_home: str = "") -> Optional[str]:
+    if java_home:
+        candidate = Path(java_home) / "bin" / ("javac.exe" if sys.platform.startswith("win") else "javac")
+        if candidate.exists():
+            return str(candidate)
+    return shutil.which("javac")
+
+
+@lru_cache(maxsize=None)
+def jdk_version(javac: Optional[str]) -> Optional[str]:
+    """Version of the JDK providing javac, looked up once per process
+
+    Read from the JDK's ``release`` file when there is one, so no JVM is
+    started; otherwise from ``javac -version``.
+    """
+    if not javac:
+        return None
+    release = Path(os.path.realpath(javac)).parent.parent / "release"
+    try:
+        for line in release.read_text().splitlines():
+            if line.startswith("JAVA_VERSION="):
+                return line.split("=", 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    try:
+        result = subprocess.run([javac, "-version"], capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"Could not run {javac} -version: {e}")
+        return None
+    return (result.stdout or result.stderr).strip() or None
+
+
+@lru_cache(maxsize=None)
+def resolve_jars(lib_path: str, metamap_path: str = "") -> Tuple[str, ...]:
+    """Jars of the Java API classpath that exist, resolved once per process"""
+    lib = Path(lib_path)
+    candidates = [lib / name for name in API_JARS]
+    gson_candidates = [lib / GSON_JAR]
+    if metamap_path:
+        gson_candidates.append(Path(metamap_path) / "src" / "javaapi" / "lib" / GSON_JAR)
+    gson = next((jar for jar in gson_candidates if jar.exists()), None)
+    if gson:
+        candidates.append(gson)
+    return tuple(str(jar) for jar in candidates if jar.exists())
+
+
+class JavaBuildCache:
+    """Compiled Java API classes keyed on sources, jars and JDK version
+
+    Classes live in ``JAVA_BUILD_ROOT/<key>`` where the key hashes every
+    ``*.java`` file, the classpath jars and the JDK version, so ``javac``
+    runs again only when one of them changes. Entry classes are compiled
+    on demand with ``-sourcepath`` (only what they reference) into a
+    scratch directory and moved into place, so concurrent builds never
+    expose half-written class files.
+    """
+
+    def __init__(self, src_path: Path, jars: Tuple[str, ...], javac: Optional[str],
+                 root: Path = JAVA_BUILD_ROOT):
+        self.src_path = Path(src_path)
+        self.jars = jars
+        self.javac = javac
+        self.root = Path(root)
+        self.key = self._compute_key()
+        self.classes_dir = self.root / self.key
+
+    def _compute_key(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"jdk={jdk_version(self.javac)}\n".encode())
+        for source in sorted(self.src_path.glob("*.java")):
+            digest.update(source.name.encode())
+            digest.update(hashlib.sha256(source.read_bytes()).digest())
+        for jar in self.jars:
+            stat = os.stat(jar)
+            digest.update(f"{Path(jar).name}:{stat.st_size}:{int(stat.st_mtime)}\n".encode())
+        return digest.hexdigest()[:16]
+
+    def _stamp(self, main_class: str) -> Path:
+        return self.classes_dir / f".built-{main_class}"
+
+    def is_built(self, main_class: str) -> bool:
+        return self._stamp(main_class).exists()
+
+    def build(self, main_classes: List[str]) -> bool:
+        """Compile the entry classes that are not built under the current key"""
+        missing = [name for name in main_classes if not self.is_built(name)]
+        if not missing:
+            return True
+        if not self.javac:
+            logger.error("javac not found; install a JDK or set JAVA_HOME")
+            return False
+        sources = [self.src_path / f"{name}.java" for name in missing]
+        absent = [source.name for source in sources if not source.exists()]
+        if absent:
+            logger.error(f"Java sources not found in {self.src_path}: {', '.join(absent)}")
+            return False
+
+        logger.info(f"Compiling Java sources: {', '.join(missing)}")
+        self.classes_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.root, prefix=".javac-") as scratch:
+            javac_cmd = [
+                self.javac,
+                "-cp", _CLASSPATH_SEPARATOR.join(self.jars),
+                "-sourcepath", str(self.src_path),
+                "-d", scratch,
+                "-Xlint:unchecked"
+            ] + [str(source) for source in sources]
+            try:
+                result = subprocess.run(javac_cmd, capture_output=True, text=True)
+            except OSError as e:
+                logger.error(f"Failed to compile Java sources: {e}")
+                return False
+            if result.returncode != 0:
+                logger.error(f"Java compilation failed: {result.stderr}")
+                return False
+
+            for class_file in Path(scratch).rglob("*.class"):
+                target = self.classes_dir / class_file.relative_to(scratch)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(class_file, target)
+
+        for name in missing:
+            self._stamp(name).touch()
+        logger.info(f"Java classes cached in {self.classes_dir}")
+        return True
+
+    def prune(self):
+        """Remove builds made under other keys"""
+        if not self.root.exists():
+            return
+        for path in self.root.iterdir():
+            if path.is_dir() and path.name != self.key and not path.name.startswith(".javac-"):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+@lru_cache(maxsize=None)
+def _build_cache(src_path: str, lib_path: str, metamap_path: str, java_home: str) -> JavaBuildCache:
+    return JavaBuildCache(Path(src_path), resolve_jars(lib_path, metamap_path), _find_javac(java_home))
+
+
+def prepare_java_api(config: Config, main_classes: Optional[List[str]] = None) -> Path:
+    """Download Gson and compile the Java API classes ahead of processing
+
+    Meant for install and setup time, so batches only ever reuse the
+    cached build. Other entry classes are still compiled on first use.
+    Returns the directory holding the classes.
+    """
+    lib_path = JAVA_IMPL_PATH / "lib"
+    jars = resolve_jars(str(lib_path), config.metamap_path or "")
+    if not any(Path(jar).name == GSON_JAR for jar in jars):
+        logger.info("Downloading Gson library...")
+        import urllib.request
+        lib_path.mkdir(parents=True, exist_ok=True)
+        try:
+            urllib.request.urlretrieve(GSON_URL, str(lib_path / GSON_JAR))
+        except OSError as e:
+            raise PyMMError(f"Could not download Gson: {e}")
+        resolve_jars.cache_clear()
+        _build_cache.cache_clear()
+
+    cache = _build_cache(str(JAVA_IMPL_PATH / "src"), str(lib_path),
+                         config.metamap_path or "", config.java_home or "")
+    if not cache.build(main_classes or ["MetaMapWorker"]):
+        raise PyMMError("Failed to compile Java sources")
+    cache.prune()
+    return cache.classes_dir
+
+
+class JavaWorkerError(PyMMError):
+    """A MetaMapWorker JVM died, failed to start or broke the protocol"""
+    pass
+
+
+class JavaWorker:
+    """One long-lived JVM speaking the MetaMapWorker JSON-lines protocol
+
+    Not thread-safe: a worker serves one request at a time and is handed
+    out by ``JavaWorkerPool``.
+    """
+
+    def __init__(self, command: List[str], slot: int = 0,
+                 start_timeout: float = WORKER_START_TIMEOUT):
+        self.command = command
+        self.slot = slot
+        self.start_timeout = start_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.requests = 0
+        self.starts = 0
+        self.last_used = 0.0
+        self._lines: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._next_id = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start the JVM and wait until it reports ready"""
+        self.stop()
+        self._lines = queue.Queue()
+        self.starts += 1
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                bufsize=1
+            )
+        except OSError as e:
+            raise JavaWorkerError(f"Cannot start Java worker {self.slot}: {e}")
+
+        threading.Thread(target=self._read_stdout, args=(self.process, self._lines),
+                         name=f"java-worker-{self.slot}", daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(self.process,),
+                         name=f"java-worker-{self.slot}-stderr", daemon=True).start()
+
+        message = self._next_message(self.start_timeout)
+        if message.get("event") != "ready":
+            self.stop()
+            raise JavaWorkerError(f"Java worker {self.slot} sent {message} instead of ready")
+        self.last_used = time.time()
+        logger.info(f"Java worker {self.slot} ready (pid {self.process.pid})")
+
+    def _read_stdout(self, process: subprocess.Popen, lines: queue.Queue):
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                lines.put(json.loads(line))
+            except ValueError:
+                logger.debug(f"Java worker {self.slot}: {line}")
+        lines.put(None)
+
+    def _read_stderr(self, process: subprocess.Popen):
+        for line in process.stderr:
+            if line.strip():
+                logger.debug(f"Java worker {self.slot} stderr: {line.rstrip()}")
+
+    def _next_message(self, timeout: Optional[float]) -> dict:
+        try:
+            message = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise MetamapStuck(f"Java worker {self.slot} timed out after {timeout}s")
+        if message is None:
+            code = self.process.poll() if self.process else None
+            self.stop()
+            raise JavaWorkerError(f"Java worker {self.slot} exited (status {code})")
+        return message
+
+    def stream(self, request: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Send a request and yield concepts as the worker produces them
+
+        Raises:
+            MetamapStuck: No complete answer within timeout; the JVM is killed
+            JavaWorkerError: The JVM died or reported an error
+        """
+        if not self.alive:
+            self.start()
+        self._next_id += 1
+        request_id = self._next_id
+        try:
+            self.process.stdin.write(json.dumps(dict(request, id=request_id)) + "\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            self.stop()
+            raise JavaWorkerError(f"Java worker {self.slot} is not accepting requests: {e}")
+
+        self.requests += 1
+        deadline = time.time() + timeout if timeout else None
+        try:
+            while True:
+                remaining = max(0.0, deadline - time.time()) if deadline else None
+                message = self._next_message(remaining)
+                if message.get("id") != request_id:
+                    # Left over from an earlier, abandoned request
+                    continue
+                if "concept" in message:
+                    yield message["concept"]
+                elif message.get("ok"):
+                    return
+                else:
+                    raise JavaWorkerError(message.get("error") or "Java worker request failed")
+        finally:
+            self.last_used = time.time()
+
+    def process_text(self, text: str, options: Optional[str] = None,
+                     timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        request = {"op": "text", "text": text}
+        if options:
+            request["options"] = options
+        return list(self.stream(request, timeout))
+
+    def process_file(self, path: str, options: Optional[str] = None,
+                     timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        request = {"op": "file", "path": str(Path(path).resolve())}
+        if options:
+            request["options"] = options
+        return list(self.stream(request, timeout))
+
+    def ping(self, timeout: float = WORKER_PING_TIMEOUT) -> bool:
+        """Health check: True if the running JVM answers in time"""
+        if not self.alive:
+            return False
+        try:
+            for _ in self.stream({"op": "ping"}, timeout):
+                pass
+            return True
+        except PyMMError as e:
+            logger.warning(f"Java worker {self.slot} failed health check: {e}")
+            return False
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the JVM to exit, killing it if it does not"""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            try:
+                process.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                process.stdin.flush()
+                process.stdin.close()
+                process.wait(timeout=timeout)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+
+
+class JavaWorkerPool:
+    """One JavaWorker per pool slot, started on first use
+
+    Workers that died are restarted when next handed out; idle workers are
+    pinged before reuse. A slot that fails to start ``max_restarts`` times
+    in a row raises instead of retrying forever.
+    """
+
+    def __init__(self, command_factory, size: int,
+                 health_interval: float = WORKER_HEALTH_INTERVAL,
+                 max_restarts: int = WORKER_MAX_RESTARTS):
+        self.size = size
+        self.health_interval = health_interval
+        self.max_restarts = max_restarts
+        self.workers = [JavaWorker(command_factory(slot), slot) for slot in range(size)]
+        self.restarts = 0
+        self._idle: "queue.Queue[JavaWorker]" = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+
+    def _ensure_running(self, worker: JavaWorker):
+        if worker.alive and time.time() - worker.last_used < self.health_interval:
+            return
+        if worker.alive and worker.ping():
+            return
+
+        failures = 0
+        while True:
+            if worker.starts:
+                self.restarts += 1
+                logger.info(f"Restarting Java worker {worker.slot}")
+            try:
+                worker.start()
+                return
+            except PyMMError as e:
+                failures += 1
+                if failures >= self.max_restarts:
+                    raise JavaWorkerError(f"Java worker {worker.slot} failed to start "
+                                          f"{failures} times: {e}")
+                time.sleep(min(2 ** failures, 10))
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[JavaWorker]:
+        """Check out a running worker for the duration of the block"""
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise JavaWorkerError(f"No Java worker free within {timeout}s")
+        try:
+            self._ensure_running(worker)
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+    def health_check(self) -> Dict[int, bool]:
+        """Ping idle workers, restarting any that do not answer"""
+        status = {}
+        checked = []
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            checked.append(worker)
+            if worker.starts and not worker.ping():
+                self.restarts += 1
+                logger.info(f"Restarting Java worker {worker.slot}")
+                try:
+                    worker.start()
+                except PyMMError as e:
+                    logger.error(f"Java worker {worker.slot} could not be restarted: {e}")
+            status[worker.slot] = worker.alive
+        for worker in checked:
+            self._idle.put(worker)
+        return status
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.size,
+            "running": sum(1 for w in self.workers if w.alive),
+            "requests": sum(w.requests for w in self.workers),
+            "restarts": self.restarts
+        }
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+def _write_concepts_csv(output_file: Path, filename: str, concepts: List[Dict[str, Any]]):
+    """Write concepts in the same CSV layout as FileProcessor"""
+    def joined(value):
+        return ",".join(str(v) for v in value) if isinstance(value, (list, tuple)) else (value or "")
+
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        f.write(f"{START_MARKER_PREFIX}{filename}\n")
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL, doublequote=True)
+        writer.writerow(CSV_HEADER)
+        for concept in concepts:
+            writer.writerow([
+                concept.get('cui', ''),
+                concept.get('score', ''),
+                concept.get('concept_name', ''),
+                concept.get('preferred_name', ''),
+                concept.get('phrase', ''),
+                joined(concept.get('sem_types')),
+                joined(concept.get('sources')),
+                concept.get('position', '')
+            ])
+        f.write(f"{END_MARKER_PREFIX}{filename}\n")
+
 
 class JavaAPIBridge:
     """Bridge between Python pymm and Java MetaMap API"""
     
     def __init__(self, config: Config):
         self.config = config
-        self.java_impl_path = Path(__file__).parent.parent.parent.parent / "java_api_impl"
+        self.java_impl_path = JAVA_IMPL_PATH
         self.lib_path = self.java_impl_path / "lib"
         self.src_path = self.java_impl_path / "src"
         self.output_path = self.java_impl_path / "output"
+        self.build = _build_cache(str(self.src_path), str(self.lib_path),
+                                  config.metamap_path or "", config.java_home or "")
         self.classpath = self._build_classpath()
-        self.compiled = False
+        self._workers: Optional[JavaWorkerPool] = None
+        self._workers_lock = threading.Lock()
         
     def _build_classpath(self) -> str:
-        """Build Java classpath"""
-        jars = [
-            self.lib_path / "MetaMapApi.jar",
-            self.lib_path / "metamap-api-2.0.jar",
-            self.lib_path / "prologbeans.jar",
-            # Add Gson for JSON support
-            Path(self.config.metamap_path) / "src" / "javaapi" / "lib" / "gson-2.8.9.jar"
-        ]
-        
-        # Add source path for compiled classes
-        paths = [str(self.src_path)] + [str(jar) for jar in jars if jar.exists()]
-        
-        # On Windows, use semicolon separator
-        separator = ";" if sys.platform.startswith("win") else ":"
-        return separator.join(paths)
+        """Build Java classpath: cached classes first, then the API jars"""
+        return _CLASSPATH_SEPARATOR.join([str(self.build.classes_dir)] + list(self.build.jars))
     
-    def compile_java_sources(self) -> bool:
-        """Compile Java source files"""
-        if self.compiled:
-            return True
-            
-        logger.info("Compiling Java sources...")
-        
-        # Download Gson if not present
-        gson_path = self.lib_path / "gson-2.8.9.jar"
-        if not gson_path.exists():
-            logger.info("Downloading Gson library...")
-            import urllib.request
-            gson_url = "https://repo1.maven.org/maven2/com/google/code/gson/gson/2.8.9/gson-2.8.9.jar"
-            urllib.request.urlretrieve(gson_url, str(gson_path))
-        
-        # Update classpath with Gson
-        self.classpath = self._build_classpath()
-        
-        # Find all Java files
-        java_files = list(self.src_path.glob("*.java"))
-        
-        # Compile command
-        javac_cmd = [
-            "javac",
-            "-cp", self.classpath,
-            "-d", str(self.src_path),
-            "-Xlint:unchecked"
-        ] + [str(f) for f in java_files]
+    def compile_java_sources(self, main_classes: Optional[List[str]] = None) -> bool:
+        """Make sure the given entry classes (default: all sources) are compiled
         
-        try:
-            result = subprocess.run(javac_cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                logger.error(f"Java compilation failed: {result.stderr}")
-                return False
-            
-            logger.info("Java sources compiled successfully")
-            self.compiled = True
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to compile Java sources: {e}")
+        Reuses the build cache, so javac only runs when sources, jars or the
+        JDK changed. Gson is not downloaded here; ``pymm setup --fix`` does
+        that at install time.
+        """
+        if main_classes is None:
+            main_classes = sorted(source.stem for source in self.src_path.glob("*.java"))
+        if not any(Path(jar).name == GSON_JAR for jar in self.build.jars):
+            logger.error(f"{GSON_JAR} not found; run 'pymm setup --fix' to download it")
             return False
+        return self.build.build(main_classes)
     
     def process_files(self, input_files: List[str], output_dir: str, 
                      options: Optional[str] = None, 
@@ -97,7 +534,7 @@ class JavaAPIBridge:
         """Process files using Java API"""
         
         # Ensure Java sources are compiled
-        if not self.compile_java_sources():
+        if not self.compile_java_sources(["MetaMapRunner"]):
             raise PyMMError("Failed to compile Java sources")
         
         # Create output directory
@@ -164,67 +601,100 @@ class JavaAPIBridge:
             logger.error(f"Java API processing failed: {e}")
             raise PyMMError(f"Java API processing failed: {e}")
     
+    def worker_command(self, slot: int) -> List[str]:
+        """Command line of the JVM worker for a pool slot
+
+        Slots are spread over the ``mmserver_instances`` MetaMap servers
+        listening on consecutive ports from ``mmserver_port_base``; with the
+        default of one server, all slots share it.
+        """
+        custom = getattr(self.config, "java_worker_command", None)
+        if custom:
+            return shlex.split(custom) if isinstance(custom, str) else list(custom)
+        
+        servers = max(1, int(getattr(self.config, "mmserver_instances", 1) or 1))
+        port = int(self.config.mmserver_port_base) + slot % servers
+        command = [
+            "java",
+            f"-Xmx{self.config.java_heap_size or '4G'}",
+            "-cp", self.classpath,
+            "MetaMapWorker",
+            "--port", str(port),
+            "--timeout", str(self.config.timeout)
+        ]
+        if self.config.custom_options:
+            command.extend(["--options", self.config.custom_options])
+        return command
+    
+    @property
+    def workers(self) -> JavaWorkerPool:
+        """Pool of persistent JVM workers, one per instance slot"""
+        if self._workers is None:
+            with self._workers_lock:
+                if self._workers is None:
+                    if not getattr(self.config, "java_worker_command", None) \
+                            and not self.compile_java_sources(["MetaMapWorker"]):
+                        raise PyMMError("Failed to compile Java sources")
+                    self._workers = JavaWorkerPool(self.worker_command,
+                                                   max(1, self.config.max_instances))
+        return self._workers
+    
+    def process_text(self, text: str, options: Optional[str] = None,
+                     timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Map text with a persistent JVM worker and return its concepts"""
+        with self.workers.acquire() as worker:
+            return worker.process_text(text, options, timeout or self.config.timeout)
+    
     def process_single_file(self, input_file: str, output_file: str,
                            options: Optional[str] = None) -> bool:
-        """Process a single file using Java API"""
+        """Process a single file using a persistent JVM worker
         
-        output_dir = Path(output_file).parent
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        results = self.process_files([input_file], str(output_dir), options, 1)
+        Raises:
+            MetamapStuck: The worker did not finish within the configured timeout
+        """
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Rename output file to match expected name
-        java_output = output_dir / (Path(input_file).name + ".csv")
-        if java_output.exists() and java_output != Path(output_file):
-            java_output.rename(output_file)
+        try:
+            with self.workers.acquire() as worker:
+                concepts = worker.process_file(input_file, options, self.config.timeout)
+        except JavaWorkerError as e:
+            logger.error(f"Java worker failed on {Path(input_file).name}: {e}")
+            return False
         
-        return input_file in results and results[input_file].get("status") == "success"
+        _write_concepts_csv(output_path, Path(input_file).name, concepts)
+        return True
     
-    def start_server_pool(self, num_servers: int = 4) -> List[int]:
-        """Start a pool of MetaMap servers"""
-        
-        if not self.compile_java_sources():
-            raise PyMMError("Failed to compile Java sources")
+    def process_record(self, record, output_file: str,
+                       options: Optional[str] = None) -> bool:
+        """Process one input record (e.g. a JSONL row) by sending its text
         
-        logger.info(f"Starting {num_servers} MetaMap servers...")
-        
-        # Create a temporary Java program to start servers
-        server_starter = f"""
-        public class ServerStarter {{
-            public static void main(String[] args) throws Exception {{
-                MetaMapServerManager manager = new MetaMapServerManager("{self.config.metamap_path}");
-                for (int i = 0; i < {num_servers}; i++) {{
-                    int port = manager.startServer();
-                    System.out.println("SERVER_PORT:" + port);
-                }}
-                // Keep running
-                Thread.sleep(Long.MAX_VALUE);
-            }}
-        }}
+        Raises:
+            MetamapStuck: The worker did not finish within the configured timeout
         """
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Write and compile server starter
-        starter_file = self.src_path / "ServerStarter.java"
-        starter_file.write_text(server_starter)
-        
-        compile_cmd = ["javac", "-cp", self.classpath, str(starter_file)]
-        subprocess.run(compile_cmd, check=True)
-        
-        # Run server starter
-        java_cmd = ["java", "-cp", self.classpath, "ServerStarter"]
-        process = subprocess.Popen(java_cmd, stdout=subprocess.PIPE, text=True)
-        
-        # Collect server ports
-        ports = []
-        for line in iter(process.stdout.readline, ''):
-            if line.startswith("SERVER_PORT:"):
-                port = int(line.split(":")[1])
-                ports.append(port)
-                if len(ports) >= num_servers:
-                    break
+        try:
+            concepts = self.process_text(record.read_text(), options)
+        except JavaWorkerError as e:
+            logger.error(f"Java worker failed on {record.name}: {e}")
+            return False
         
-        logger.info(f"Started servers on ports: {ports}")
-        return ports
+        _write_concepts_csv(output_path, record.name, concepts)
+        return True
+    
+    def health_check(self) -> Dict[int, bool]:
+        """Ping idle JVM workers, restarting unresponsive ones"""
+        if self._workers is None:
+            return {}
+        return self._workers.health_check()
+    
+    def close(self):
+        """Stop all JVM workers"""
+        if self._workers is not None:
+            self._workers.close()
+            self._workers = None
     
     def check_server_health(self, port: int) -> bool:
         """Check if a MetaMap server is healthy"""
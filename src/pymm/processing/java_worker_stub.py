@@ -0,0 +1,98 @@
+"""Stand-in for the MetaMapWorker JVM, for tests and dry runs
+
+Speaks the same JSON-lines protocol as ``java_api_impl/src/MetaMapWorker.java``
+without Java or MetaMap. Every word of four or more letters becomes one
+concept with a CUI derived from the word, so results are deterministic.
+Point the bridge at it with::
+
+    pymm config set java_worker_command "python -m pymm.processing.java_worker_stub"
+
+Options:
+    --delay SECONDS   sleep before answering each document request
+    --crash-on TEXT   exit without answering when a document contains TEXT
+"""
+import re
+import sys
+import json
+import time
+import zlib
+import argparse
+
+_WORD = re.compile(r"[A-Za-z]{4,}")
+
+
+def _concepts(text: str):
+    for match in _WORD.finditer(text):
+        word = match.group()
+        yield {
+            "cui": f"C{zlib.crc32(word.lower().encode()) % 10000000:07d}",
+            "score": -1000,
+            "concept_name": word,
+            "preferred_name": word.capitalize(),
+            "phrase": word,
+            "sem_types": ["stub"],
+            "sources": ["STUB"],
+            "position": f"{match.start()}:{len(word)}"
+        }
+
+
+def _send(message, flush=False):
+    sys.stdout.write(json.dumps(message) + "\n")
+    if flush:
+        sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--crash-on", default=None)
+    # Accept the real worker's arguments so the same command line works
+    parser.add_argument("--host")
+    parser.add_argument("--port")
+    parser.add_argument("--timeout")
+    parser.add_argument("--options")
+    args = parser.parse_args(argv)
+
+    _send({"event": "ready"}, flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            _send({"id": None, "ok": False, "error": f"Malformed request: {e}"}, flush=True)
+            continue
+
+        request_id, op = request.get("id"), request.get("op")
+        if op == "shutdown":
+            break
+        if op == "ping":
+            _send({"id": request_id, "ok": True, "concepts": 0}, flush=True)
+            continue
+
+        try:
+            if op == "file":
+                with open(request["path"], encoding="utf-8") as f:
+                    text = f.read()
+            elif op == "text":
+                text = request["text"]
+            else:
+                raise ValueError(f"Unknown op: {op}")
+        except (OSError, KeyError, ValueError) as e:
+            _send({"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}"}, flush=True)
+            continue
+
+        if args.crash_on and args.crash_on in text:
+            sys.exit(1)
+        if args.delay:
+            time.sleep(args.delay)
+
+        count = 0
+        for concept in _concepts(text):
+            _send({"id": request_id, "concept": concept})
+            count += 1
+        _send({"id": request_id, "ok": True, "concepts": count}, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Stand-in for the MetaMap binary, for tests and dry runs
+
+Takes MetaMap's command line (options, then input and output file) and
+writes ``--XMLf1``-style output that ``mmoparser`` reads, without MetaMap
+or its servers. Like MetaMap, every blank-line separated citation of the
+input gets one MMO; with ``--sldi`` every non-empty line is a citation. Every word of four or more letters becomes one concept
+with a CUI derived from the word, so results are deterministic and match
+``java_worker_stub``. Point pymm at it through a small wrapper script::
+
+    printf '#!/bin/sh\\nexec python -m pymm.processing.metamap_stub "$@"\\n' > metamap
+    chmod +x metamap
+    pymm config set metamap_binary_path "$PWD/metamap"
+
+Options (anywhere before the file names; MetaMap options are ignored):
+    --stub-delay SECONDS   sleep before answering each run
+    --stub-crash-on TEXT   exit with status 1 when the input contains TEXT
+"""
+import re
+import sys
+import time
+from xml.sax.saxutils import escape
+
+from .java_worker_stub import _concepts
+
+CITATION_BOUNDARY = re.compile(r'\n\s*\n')
+
+
+def _candidate(concept) -> str:
+    start, length = concept["position"].split(":")
+    return (
+        "<Candidate>"
+        f"<CandidateScore>{concept['score']}</CandidateScore>"
+        f"<CandidateCUI>{concept['cui']}</CandidateCUI>"
+        f"<CandidateMatched>{escape(concept['concept_name'])}</CandidateMatched>"
+        f"<CandidatePreferred>{escape(concept['preferred_name'])}</CandidatePreferred>"
+        "<SemTypes>" + "".join(f"<SemType>{s}</SemType>" for s in concept["sem_types"]) + "</SemTypes>"
+        "<Sources>" + "".join(f"<Source>{s}</Source>" for s in concept["sources"]) + "</Sources>"
+        f"<ConceptPIs><ConceptPI><StartPos>{start}</StartPos><Length>{length}</Length></ConceptPI></ConceptPIs>"
+        "</Candidate>"
+    )
+
+
+def _mmo(citation: str) -> str:
+    phrases = "".join(
+        f"<Phrase><PhraseText>{escape(concept['phrase'])}</PhraseText>"
+        f"<Mappings><Mapping><MappingCandidates>{_candidate(concept)}</MappingCandidates>"
+        "</Mapping></Mappings></Phrase>"
+        for concept in _concepts(citation))
+    return (f"<MMO><Utterances><Utterance><UttText>{escape(citation)}</UttText>"
+            f"<Phrases>{phrases}</Phrases></Utterance></Utterances></MMO>")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    delay, crash_on = 0.0, None
+    for flag in ("--stub-delay", "--stub-crash-on"):
+        if flag in argv:
+            index = argv.index(flag)
+            value = argv[index + 1]
+            del argv[index:index + 2]
+            if flag == "--stub-delay":
+                delay = float(value)
+            else:
+                crash_on = value
+    if len(argv) < 2:
+        sys.stderr.write("Usage: metamap_stub [OPTIONS] INPUT_FILE OUTPUT_FILE\n")
+        return 2
+
+    input_file, output_file = argv[-2:]
+    with open(input_file, encoding="utf-8") as f:
+        text = f.read()
+    if crash_on and crash_on in text:
+        return 1
+    if delay:
+        time.sleep(delay)
+
+    if "--sldi" in argv[:-2]:
+        citations = [line for line in text.split("\n") if line.strip()]
+    else:
+        citations = [c for c in CITATION_BOUNDARY.split(text) if c.strip()]
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<MMOs>')
+        f.writelines(_mmo(citation.strip("\n")) for citation in citations)
+        f.write("</MMOs>\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
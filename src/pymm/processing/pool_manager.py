@@ -1,7 +1,6 @@
 """Adaptive Pool Manager for PythonMetaMap"""
 import os
 import time
-import psutil
 import logging
 from typing import Dict, Any, Optional, List
 from pathlib import Path
@@ -10,6 +9,7 @@ from collections import deque
 from datetime import datetime
 
 from ..core.config import PyMMConfig
+from ..core.resources import get_resource_sampler
 
 logger = logging.getLogger(__name__)
 
@@ -25,25 +25,15 @@ class ResourceMetrics:
         self.last_update = None
         
     def update(self):
-        """Update metrics"""
+        """Update metrics from the latest shared resource sample"""
         try:
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            self.cpu_history.append(cpu_percent)
-            
-            # Memory usage
-            mem = psutil.virtual_memory()
-            self.memory_history.append(mem.percent)
-            
-            # IO stats
-            io = psutil.disk_io_counters()
-            if io:
-                self.io_history.append({
-                    'read_bytes': io.read_bytes,
-                    'write_bytes': io.write_bytes,
-                    'read_time': io.read_time,
-                    'write_time': io.write_time
-                })
+            sample = get_resource_sampler().latest()
+            self.cpu_history.append(sample.cpu_percent)
+            self.memory_history.append(sample.memory_percent)
+            self.io_history.append({
+                'read_rate': sample.disk_read_rate,
+                'write_rate': sample.disk_write_rate
+            })
             
             self.last_update = datetime.now()
             
@@ -64,16 +54,12 @@ class ResourceMetrics:
     
     def get_io_pressure(self) -> float:
         """Calculate IO pressure (0-100)"""
-        if len(self.io_history) < 2:
+        if not self.io_history:
             return 0.0
         
-        # Calculate IO rate
         recent = self.io_history[-1]
-        older = self.io_history[-2]
-        
-        time_diff = 1.0  # Approximate
-        read_rate = (recent['read_bytes'] - older['read_bytes']) / time_diff
-        write_rate = (recent['write_bytes'] - older['write_bytes']) / time_diff
+        read_rate = recent['read_rate']
+        write_rate = recent['write_rate']
         
         # Normalize to percentage (100MB/s = 100%)
         io_rate = (read_rate + write_rate) / (100 * 1024 * 1024)
@@ -85,6 +71,7 @@ class AdaptivePoolManager:
     
     def __init__(self, config: PyMMConfig):
         self.config = config
+        self.sampler = get_resource_sampler()
         self.metrics = ResourceMetrics()
         self.monitoring = False
         self.monitor_thread = None
@@ -109,7 +96,7 @@ class AdaptivePoolManager:
     def _calculate_max_workers(self) -> int:
         """Calculate maximum safe worker count"""
         cpu_count = os.cpu_count() or 4
-        mem_gb = psutil.virtual_memory().total / (1024**3)
+        mem_gb = self.sampler.latest().memory_total_gb
         
         # Base calculation
         cpu_based = max(1, cpu_count // 2)  # Half of CPU cores
@@ -131,19 +118,19 @@ class AdaptivePoolManager:
         
         # Get system info
         cpu_count = os.cpu_count() or 4
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        sample = self.sampler.latest()
+        cpu_percent = sample.cpu_percent
         
-        mem = psutil.virtual_memory()
-        mem_total_gb = mem.total / (1024**3)
-        mem_available_gb = mem.available / (1024**3)
-        mem_percent = mem.percent
+        mem_total_gb = sample.memory_total_gb
+        mem_available_gb = sample.memory_available_gb
+        mem_percent = sample.memory_percent
         
         # Calculate optimal workers
         optimal_workers = self._calculate_optimal_workers(cpu_percent, mem_percent)
         
         # Get disk info
-        disk = psutil.disk_usage('/')
-        disk_free_gb = disk.free / (1024**3)
+        disk = sample.disk('/')
+        disk_free_gb = disk.free / (1024**3) if disk else 0.0
         
         return {
             'system': {
@@ -171,7 +158,7 @@ class AdaptivePoolManager:
     def _calculate_optimal_workers(self, cpu_percent: float, mem_percent: float) -> int:
         """Calculate optimal worker count based on current system state"""
         cpu_count = os.cpu_count() or 4
-        mem_gb = psutil.virtual_memory().available / (1024**3)
+        mem_gb = self.sampler.latest().memory_available_gb
         
         # Base calculation
         if cpu_percent > 70 or mem_percent > 80:
@@ -211,12 +198,15 @@ class AdaptivePoolManager:
     def start_monitoring(self):
         """Start resource monitoring"""
         self.monitoring = True
+        self.sampler.acquire()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
         logger.info("Started adaptive pool monitoring")
     
     def stop_monitoring(self):
         """Stop monitoring"""
+        if self.monitoring:
+            self.sampler.release()
         self.monitoring = False
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2)
@@ -322,8 +312,9 @@ class AdaptivePoolManager:
         
         # Get current resources
         cpu_count = os.cpu_count() or 4
-        mem_available = psutil.virtual_memory().available / (1024**3)
-        current_cpu = psutil.cpu_percent(interval=0.1)
+        sample = self.sampler.latest()
+        mem_available = sample.memory_available_gb
+        current_cpu = sample.cpu_percent
         
         # Base calculation
         optimal = cpu_count // 4  # Conservative: 1 worker per 4 cores
@@ -376,7 +367,7 @@ class AdaptivePoolManager:
         """Recommend settings for a dataset"""
         # Get system info
         cpu_count = os.cpu_count() or 4
-        mem_gb = psutil.virtual_memory().total / (1024**3)
+        mem_gb = self.sampler.latest().memory_total_gb
         
         # Calculate recommendations
         recommendations = {
@@ -4,6 +4,7 @@ import logging
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from ..core.state import StateManager
+from .bisect_retry import is_timeout_error
 
 logger = logging.getLogger(__name__)
 
@@ -92,12 +93,24 @@ class RetryManager:
         
         return retryable
     
-    def retry_failed_files(self, failed_files: List[str], process_func) -> Dict[str, Any]:
+    def get_last_error(self, file_path: str) -> Optional[str]:
+        """Get the most recent recorded error for a file"""
+        with self.state_manager._lock:
+            retry_info = self.state_manager._state["retry_queue"].get(file_path)
+            if retry_info and retry_info.get("last_error"):
+                return retry_info["last_error"]
+            failed_info = self.state_manager._state["failed_files"].get(file_path)
+            return failed_info.get("error") if failed_info else None
+    
+    def retry_failed_files(self, failed_files: List[str], process_func,
+                           bisect_func=None) -> Dict[str, Any]:
         """Retry processing of failed files
         
         Args:
             failed_files: List of failed file paths
             process_func: Function to process a single file
+            bisect_func: Optional function used instead of process_func for
+                files whose last failure was a MetaMap timeout
             
         Returns:
             Dictionary with retry results
@@ -105,6 +118,7 @@ class RetryManager:
         results = {
             "attempted": 0,
             "recovered": 0,
+            "bisected": 0,
             "still_failed": [],
             "skipped": []
         }
@@ -124,9 +138,15 @@ class RetryManager:
             
             results["attempted"] += 1
             
+            # Timed-out files are bisected rather than re-run whole
+            retry_func = process_func
+            if bisect_func and is_timeout_error(self.get_last_error(file_path)):
+                retry_func = bisect_func
+                results["bisected"] += 1
+            
             try:
                 # Attempt to process the file
-                success, elapsed, error = process_func(file_path)
+                success, elapsed, error = retry_func(file_path)
                 
                 if success:
                     results["recovered"] += 1
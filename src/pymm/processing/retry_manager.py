@@ -1,10 +1,13 @@
 """Retry management with exponential backoff"""
 import time
 import logging
+import threading
 from dataclasses import dataclass, asdict
 from typing import Optional, Dict, Any
 from pathlib import Path
 
+from .bisect_retry import is_timeout_error
+
 @dataclass
 class RetryRecord:
     """Record of retry attempts for a file"""
@@ -24,7 +27,11 @@ class RetryRecord:
         return cls(**data)
 
 class RetryManager:
-    """Manages retry queue with exponential backoff"""
+    """Manages retry queue with exponential backoff
+
+    Thread-safe: work queue workers record attempts, failures and successes
+    concurrently, so the retry queue is only touched under a lock.
+    """
     
     def __init__(self, config, state_manager):
         self.config = config
@@ -34,6 +41,7 @@ class RetryManager:
         self.backoff_base = config.get("retry_backoff_base", 2)
         self.max_backoff = 3600  # 1 hour max
         self.logger = logging.getLogger("RetryManager")
+        self._lock = threading.RLock()
         self._load_retry_state()
     
     def _load_retry_state(self):
@@ -50,10 +58,10 @@ class RetryManager:
     
     def should_retry(self, file_path: str) -> bool:
         """Check if file should be retried"""
-        if file_path not in self.retry_queue:
+        with self._lock:
+            record = self.retry_queue.get(file_path)
+        if record is None:
             return True
-            
-        record = self.retry_queue[file_path]
         
         # Check max attempts
         if record.attempts >= self.max_attempts:
@@ -72,7 +80,9 @@ class RetryManager:
         """Get list of files ready for retry"""
         ready_files = []
         
-        for file_path, record in self.retry_queue.items():
+        with self._lock:
+            file_paths = list(self.retry_queue)
+        for file_path in file_paths:
             if self.should_retry(file_path):
                 ready_files.append(file_path)
                 
@@ -80,64 +90,143 @@ class RetryManager:
     
     def record_attempt(self, file_path: str):
         """Record that we're attempting to process a file"""
-        if file_path not in self.retry_queue:
-            self.retry_queue[file_path] = RetryRecord(file_path)
-            
-        record = self.retry_queue[file_path]
-        record.attempts += 1
-        record.last_attempt_time = time.time()
+        with self._lock:
+            if file_path not in self.retry_queue:
+                self.retry_queue[file_path] = RetryRecord(file_path)
+                
+            record = self.retry_queue[file_path]
+            record.attempts += 1
+            record.last_attempt_time = time.time()
         
         self.logger.info(f"{file_path}: Attempt {record.attempts}/{self.max_attempts}")
     
     def record_failure(self, file_path: str, error: str):
         """Record a processing failure"""
-        if file_path not in self.retry_queue:
-            self.retry_queue[file_path] = RetryRecord(file_path)
+        with self._lock:
+            if file_path not in self.retry_queue:
+                self.retry_queue[file_path] = RetryRecord(file_path)
+                
+            record = self.retry_queue[file_path]
+            record.last_error = str(error)[:500]  # Truncate long errors
+            record.last_attempt_time = time.time()
             
-        record = self.retry_queue[file_path]
-        record.last_error = str(error)[:500]  # Truncate long errors
-        record.last_attempt_time = time.time()
-        
-        # Calculate exponential backoff
-        backoff_seconds = min(
-            self.backoff_base ** record.attempts,
-            self.max_backoff
-        )
-        record.backoff_until = time.time() + backoff_seconds
+            # Calculate exponential backoff
+            backoff_seconds = min(
+                self.backoff_base ** record.attempts,
+                self.max_backoff
+            )
+            record.backoff_until = time.time() + backoff_seconds
+            
+            # Persist state
+            self._save_retry_state()
         
         self.logger.warning(
             f"{file_path}: Failed attempt {record.attempts}, "
             f"retry in {backoff_seconds}s. Error: {record.last_error}"
         )
-        
-        # Persist state
-        self._save_retry_state()
     
     def record_success(self, file_path: str):
         """Record successful processing"""
-        if file_path in self.retry_queue:
-            del self.retry_queue[file_path]
-            self.logger.info(f"{file_path}: Removed from retry queue after success")
+        with self._lock:
+            if self.retry_queue.pop(file_path, None) is None:
+                return
             self._save_retry_state()
+        self.logger.info(f"{file_path}: Removed from retry queue after success")
     
     def _save_retry_state(self):
         """Persist retry state"""
-        self.state_manager.add_to_retry_queue(
-            file_path=None,  # Not used in new implementation
-            attempt=0,       # Not used
-            error=""         # Not used
-        )
+        with self._lock:
+            retry_data = {
+                path: record.to_dict()
+                for path, record in self.retry_queue.items()
+            }
         
-        # Direct update of state
-        self.state_manager._state['retry_queue'] = {
-            path: record.to_dict()
-            for path, record in self.retry_queue.items()
+        # Direct update of state, under the state manager's own lock
+        with self.state_manager._lock:
+            self.state_manager._state['retry_queue'] = retry_data
+            self.state_manager.save()
+    
+    def schedule_retry(self, file_path: str, error: str) -> Optional[float]:
+        """Record a failure and decide whether the file gets another attempt
+        
+        Returns:
+            Seconds to back off before retrying, or None once attempts are exhausted
+        """
+        if self.max_attempts <= 0:
+            return None
+        
+        with self._lock:
+            self.record_failure(file_path, error)
+            record = self.retry_queue[file_path]
+            if record.attempts >= self.max_attempts:
+                return None
+            
+            return max(0.0, record.backoff_until - time.time())
+    
+    def get_last_error(self, file_path: str) -> Optional[str]:
+        """Get the most recent recorded error for a file"""
+        with self._lock:
+            record = self.retry_queue.get(file_path)
+        if record and record.last_error:
+            return record.last_error
+        
+        failed_info = self.state_manager._state.get('failed_files', {}).get(file_path)
+        return failed_info.get('error') if failed_info else None
+    
+    def retry_failed_files(self, failed_files: list, process_func,
+                           bisect_func=None) -> Dict[str, Any]:
+        """Retry each failed file once, honouring attempt limits and backoff
+        
+        Args:
+            failed_files: List of failed file paths
+            process_func: Function to process a single file
+            bisect_func: Optional function used instead of process_func for
+                files whose last failure was a MetaMap timeout
+            
+        Returns:
+            Dictionary with retry results
+        """
+        results = {
+            "attempted": 0,
+            "recovered": 0,
+            "bisected": 0,
+            "still_failed": [],
+            "skipped": []
         }
-        self.state_manager.save()
+        
+        for file_path in failed_files:
+            if not self.should_retry(file_path):
+                results["skipped"].append(file_path)
+                continue
+            
+            # Timed-out files are bisected rather than re-run whole
+            retry_func = process_func
+            if bisect_func and is_timeout_error(self.get_last_error(file_path)):
+                retry_func = bisect_func
+                results["bisected"] += 1
+            
+            self.record_attempt(file_path)
+            results["attempted"] += 1
+            
+            try:
+                success, elapsed, error = retry_func(file_path)
+            except Exception as e:
+                success, error = False, str(e)
+            
+            if success:
+                results["recovered"] += 1
+                self.record_success(file_path)
+            else:
+                results["still_failed"].append(file_path)
+                self.record_failure(file_path, error or "Unknown error")
+        
+        return results
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get retry queue statistics"""
-        total_files = len(self.retry_queue)
+        with self._lock:
+            records = list(self.retry_queue.values())
+        total_files = len(records)
         
         if not total_files:
             return {
@@ -151,7 +240,7 @@ class RetryManager:
         in_backoff = 0
         exhausted = 0
         
-        for record in self.retry_queue.values():
+        for record in records:
             if record.attempts >= self.max_attempts:
                 exhausted += 1
             elif record.backoff_until and time.time() < record.backoff_until:
@@ -164,37 +253,42 @@ class RetryManager:
             "ready_for_retry": ready,
             "in_backoff": in_backoff,
             "exhausted": exhausted,
-            "avg_attempts": sum(r.attempts for r in self.retry_queue.values()) / total_files
+            "avg_attempts": sum(r.attempts for r in records) / total_files
         }
     
     def clear_exhausted(self) -> int:
         """Remove files that have exhausted retry attempts"""
-        exhausted = [
-            path for path, record in self.retry_queue.items()
-            if record.attempts >= self.max_attempts
-        ]
-        
-        for path in exhausted:
-            del self.retry_queue[path]
+        with self._lock:
+            exhausted = [
+                path for path, record in self.retry_queue.items()
+                if record.attempts >= self.max_attempts
+            ]
             
+            for path in exhausted:
+                del self.retry_queue[path]
+                
+            if exhausted:
+                self._save_retry_state()
         if exhausted:
-            self._save_retry_state()
             self.logger.info(f"Cleared {len(exhausted)} exhausted files from retry queue")
             
         return len(exhausted)
     
     def reset_file(self, file_path: str):
         """Reset retry count for a specific file"""
-        if file_path in self.retry_queue:
+        with self._lock:
+            if file_path not in self.retry_queue:
+                return
             self.retry_queue[file_path] = RetryRecord(file_path)
             self._save_retry_state()
-            self.logger.info(f"Reset retry count for {file_path}")
+        self.logger.info(f"Reset retry count for {file_path}")
     
     def clear_queue(self):
         """Clear all files from the retry queue"""
-        count = len(self.retry_queue)
-        self.retry_queue.clear()
-        self._save_retry_state()
+        with self._lock:
+            count = len(self.retry_queue)
+            self.retry_queue.clear()
+            self._save_retry_state()
         self.logger.info(f"Cleared {count} files from retry queue")
         return count
     
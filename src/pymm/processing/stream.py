@@ -0,0 +1,385 @@
+"""Streaming annotation of in-memory notes
+
+``process_stream`` maps an iterable of ``(id, text)`` pairs and yields
+``(id, concepts)`` as soon as each note finishes, in completion order::
+
+    from pymm import process_stream
+
+    for note_id, concepts in process_stream(notes, workers=8):
+        ...
+
+Notes run through the same machinery as batch runs: pooled MetaMap
+instances (or persistent JVM workers with ``use_java_api``), the priority
+work queue with its retry lane, retries of timed-out notes by bisection,
+and a content cache so repeated texts are mapped once. At most
+``max_pending`` notes are read ahead of the consumer, so memory stays
+bounded however long the input is.
+"""
+import time
+import queue
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..core.config import PyMMConfig
+from ..core.exceptions import MetamapStuck
+from ..core.inputs import InputRecord
+from ..core.state import StateManager
+from .instance_pool import MetaMapInstancePool
+from .worker import FileProcessor, WorkerProcessorPool
+from .retry_manager import RetryManager
+from .work_queue import PriorityWorkQueue, WorkItem, process_work_queue
+from .bisect_retry import is_timeout_error
+
+logger = logging.getLogger(__name__)
+
+Concepts = List[Dict[str, Any]]
+
+_DONE = object()  # End of results marker
+
+
+class ContentCache:
+    """LRU cache of concepts keyed by a digest of MetaMap options and text"""
+
+    def __init__(self, max_entries: int = 1024, options: str = ""):
+        self.max_entries = max(0, int(max_entries))
+        self.options = options or ""
+        self._entries: 'OrderedDict[str, Concepts]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha1(self.options.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, text: str) -> Optional[Concepts]:
+        """Cached concepts for text (a copy), or None"""
+        if not self.max_entries:
+            return None
+        key = self.key(text)
+        with self._lock:
+            concepts = self._entries.get(key)
+            if concepts is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        return [dict(concept) for concept in concepts]
+
+    def put(self, text: str, concepts: Concepts):
+        if not self.max_entries:
+            return
+        key = self.key(text)
+        with self._lock:
+            self._entries[key] = [dict(concept) for concept in concepts]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class StreamProcessor:
+    """Annotate in-memory notes with warm MetaMap instances
+
+    One StreamProcessor can serve many ``process`` streams and ``annotate``
+    calls; instances, JVM workers and the cache are kept until ``close``.
+    Nothing is written to an output directory; worker logs, retry state and
+    the event log go to ``work_dir`` (a temporary directory by default).
+    """
+
+    def __init__(self, config: PyMMConfig = None, workers: Optional[int] = None,
+                 timeout: Optional[int] = None, max_pending: Optional[int] = None,
+                 cache_size: Optional[int] = None, work_dir: Optional[str] = None,
+                 start_servers: bool = False):
+        """
+        Args:
+            config: PyMMConfig instance
+            workers: Parallel notes (default: max_parallel_workers)
+            timeout: Seconds per MetaMap call (default: pymm_timeout)
+            max_pending: Notes read ahead of the consumer (default: 4 per worker)
+            cache_size: Content cache entries, 0 to disable (default: stream_cache_size)
+            work_dir: Directory for logs and retry state (default: temporary)
+            start_servers: Start the tagger and WSD servers if they are not running
+        """
+        self.config = config or PyMMConfig()
+        self.workers = max(1, int(workers or self.config.get("max_parallel_workers", 4)))
+        self.timeout = timeout or self.config.get("pymm_timeout", 300)
+        self.max_pending = max(1, int(max_pending or self.config.get(
+            "stream_max_pending", 4 * self.workers)))
+        self.options = self.config.get("metamap_processing_options", "") or ""
+        self.cache = ContentCache(
+            self.config.get("stream_cache_size", 1024) if cache_size is None else cache_size,
+            self.options)
+
+        self._own_work_dir = work_dir is None
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="pymm-stream-"))
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+        self.retry_manager = None
+        if self.config.get("retry_max_attempts", 0) > 0:
+            self.retry_manager = RetryManager(self.config, StateManager(str(self.work_dir)))
+
+        self.use_java_api = self.config.get("use_java_api", False)
+        self.java_bridge = None
+        if self.use_java_api:
+            from ..core.config import Config
+            from .java_bridge import JavaAPIBridge
+
+            bridge_config = Config.from_pymm_config(self.config)
+            bridge_config.java_api_path = self.config.get("java_api_path", "")
+            bridge_config.max_instances = self.workers
+            bridge_config.timeout = self.timeout
+            self.java_bridge = JavaAPIBridge(bridge_config)
+        elif start_servers:
+            self._ensure_servers()
+
+        self.instance_pool = None
+        if not self.use_java_api and self.config.get("use_instance_pool", True):
+            self.instance_pool = MetaMapInstancePool(self.config, max_instances=self.workers)
+        self.worker_processors = WorkerProcessorPool(
+            self._create_worker_processor, instance_pool=self.instance_pool)
+
+        self._closed = False
+        self.stats = {"processed": 0, "failed": 0, "cached": 0, "retried": 0}
+        self._stats_lock = threading.Lock()
+
+    def _ensure_servers(self):
+        """Start the tagger and WSD servers the binary path depends on"""
+        from ..server.manager import ServerManager
+
+        server_manager = ServerManager(self.config)
+        if not server_manager.is_tagger_server_running():
+            logger.info("Tagger server not running, starting MetaMap servers...")
+            if not server_manager.start_all():
+                logger.warning("Could not start MetaMap servers; notes may fail")
+
+    def _create_worker_processor(self, worker_id: int) -> FileProcessor:
+        """Create the FileProcessor owned by one worker thread"""
+        return FileProcessor(
+            self.config.get("metamap_binary_path"),
+            str(self.work_dir),
+            self.options,
+            self.timeout,
+            worker_id=worker_id,
+            config=self.config
+        )
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _map_text(self, text: str, name: str, bisect: bool = False) -> Concepts:
+        """Map one note with the calling thread's worker"""
+        if self.java_bridge is not None:
+            return self.java_bridge.process_text(text, self.options or None, self.timeout)
+
+        processor = self.worker_processors.get()
+        processor.timeout = self.timeout
+        try:
+            return processor.process_text(text, name, bisect=bisect)
+        except Exception:
+            # Timed out or crashed MetaMap instances are not reused
+            self.worker_processors.reset(processor)
+            raise
+
+    def _process_item(self, item: WorkItem, outputs: Dict[int, Concepts]) -> Tuple[bool, float, Optional[str]]:
+        """Work queue callback; concepts are left in outputs under the record's id()"""
+        record = item.record
+        start_time = time.time()
+        bisect = item.attempts > 0 and is_timeout_error(item.last_error)
+        try:
+            text = record.read_text()
+            concepts = self._map_text(text, record.name, bisect=bisect)
+        except MetamapStuck:
+            return False, time.time() - start_time, f"MetaMap timeout after {self.timeout}s"
+        except Exception as e:
+            return False, time.time() - start_time, f"{type(e).__name__}: {e}"
+
+        self.cache.put(text, concepts)
+        outputs[id(record)] = concepts
+        return True, time.time() - start_time, None
+
+    def annotate(self, text: str, note_id: str = "text", use_cache: bool = True) -> Concepts:
+        """Map a single note now, on the calling thread
+
+        With use_cache off the cache is not consulted (callers that already
+        looked the note up), but the result is still stored in it.
+
+        Raises:
+            MetamapStuck: MetaMap did not finish within the timeout
+        """
+        if use_cache:
+            concepts = self.cache.get(text)
+            if concepts is not None:
+                self._count("cached")
+                return concepts
+
+        concepts = self._map_text(text, note_id)
+        self.cache.put(text, concepts)
+        self._count("processed")
+        return concepts
+
+    def annotate_many(self, texts: List[str], name: str = "batch",
+                      use_cache: bool = True) -> List[Concepts]:
+        """Map several short notes now, with one MetaMap run for all of them
+
+        With the Java API, notes are sent to the JVM worker one by one.
+        A failure fails the whole batch; callers wanting per-note errors
+        can fall back to ``annotate``. use_cache works as in ``annotate``.
+        """
+        results: List[Optional[Concepts]] = (
+            [self.cache.get(text) for text in texts] if use_cache else [None] * len(texts))
+        missing = [index for index, concepts in enumerate(results) if concepts is None]
+        self._count("cached", len(texts) - len(missing))
+        if not missing:
+            return results
+
+        if self.java_bridge is not None:
+            mapped = [self._map_text(texts[index], name) for index in missing]
+        else:
+            processor = self.worker_processors.get()
+            processor.timeout = self.timeout
+            try:
+                mapped = processor.process_texts([texts[index] for index in missing], name)
+            except Exception:
+                self.worker_processors.reset(processor)
+                raise
+
+        for index, concepts in zip(missing, mapped):
+            self.cache.put(texts[index], concepts)
+            results[index] = concepts
+        self._count("processed", len(missing))
+        return results
+
+    def process(self, notes: Iterable[Tuple[Any, str]]) -> Iterator[Tuple[Any, Optional[Concepts]]]:
+        """Map (id, text) pairs, yielding (id, concepts) as each note finishes
+
+        Results come in completion order, not input order. A note that still
+        fails after its retries is yielded as (id, None) and logged. Closing
+        the generator early stops reading input and abandons queued notes.
+        """
+        if self._closed:
+            raise RuntimeError("StreamProcessor is closed")
+
+        work_queue = PriorityWorkQueue(
+            retry_weight=self.config.get("work_queue_retry_weight", 1),
+            new_weight=self.config.get("work_queue_new_weight", 1),
+            open_input=True)
+        results: queue.Queue = queue.Queue()
+        slots = threading.Semaphore(self.max_pending)
+        stop = threading.Event()
+        ids: Dict[int, Any] = {}  # id(record) -> caller's note id
+        outputs: Dict[int, Concepts] = {}
+        errors: List[BaseException] = []
+
+        def feed():
+            # Read input only as far as max_pending allows
+            try:
+                for note_id, text in notes:
+                    slots.acquire()
+                    if stop.is_set():
+                        return
+                    concepts = self.cache.get(text)
+                    if concepts is not None:
+                        self._count("cached")
+                        results.put((note_id, concepts))
+                        continue
+                    record = InputRecord.from_text(str(note_id), text)
+                    ids[id(record)] = note_id
+                    work_queue.put(record)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                work_queue.finish_input()
+
+        def record_result(item: WorkItem, success: bool, elapsed: float,
+                          error: Optional[str]):
+            key = id(item.record)
+            note_id = ids.pop(key)
+            concepts = outputs.pop(key, None)
+            if success:
+                self._count("processed")
+            else:
+                self._count("failed")
+                logger.error(f"Failed to process {item.record.name}: {error}")
+            results.put((note_id, concepts if success else None))
+
+        def drain():
+            try:
+                summary = process_work_queue(
+                    work_queue, lambda item: self._process_item(item, outputs),
+                    self.workers, record_result, retry_manager=self.retry_manager)
+                self._count("retried", summary["retried"])
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                results.put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="pymm-stream-feed", daemon=True)
+        drainer = threading.Thread(target=drain, name="pymm-stream-drain", daemon=True)
+        feeder.start()
+        drainer.start()
+
+        finished = False
+        try:
+            while True:
+                result = results.get()
+                if result is _DONE:
+                    finished = True
+                    break
+                slots.release()
+                yield result
+            feeder.join()
+            if errors:
+                raise errors[0]
+        finally:
+            if not finished:
+                # Abandoned by the consumer: stop reading input and let
+                # workers exit after the notes they are mapping
+                stop.set()
+                slots.release()
+                work_queue.close()
+                drainer.join()
+
+    def close(self):
+        """Release MetaMap instances and JVM workers and remove the work dir"""
+        if self._closed:
+            return
+        self._closed = True
+
+        # Hand worker-held instances back before shutting the pool
+        self.worker_processors.close()
+        if self.java_bridge is not None:
+            self.java_bridge.close()
+        if self.instance_pool is not None:
+            self.instance_pool.shutdown()
+        if self._own_work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def process_stream(notes: Iterable[Tuple[Any, str]], workers: Optional[int] = None,
+                   config: PyMMConfig = None, **kwargs) -> Iterator[Tuple[Any, Optional[Concepts]]]:
+    """Map (id, text) pairs, yielding (id, concepts) as each note finishes
+
+    A convenience wrapper that runs one ``StreamProcessor`` for the length
+    of the stream; keyword arguments (timeout, max_pending, cache_size,
+    work_dir, start_servers) are passed on to it.
+    """
+    with StreamProcessor(config, workers=workers, **kwargs) as processor:
+        yield from processor.process(notes)
@@ -11,6 +11,7 @@ This module consolidates all processing capabilities into a single, comprehensiv
 """
 import time
 import logging
+import csv
 import json
 import gc
 import subprocess
@@ -19,7 +20,6 @@ import threading
 import psutil
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Any, Iterator
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from collections import defaultdict, deque
 import os
@@ -32,17 +32,35 @@ from ..core.state import StateManager
 from ..core.job_manager import get_job_manager
 from ..core.file_tracker import UnifiedFileTracker
 from ..core.enhanced_state import AtomicStateManager
+from ..core.accounting import RunUsage, service_pids
+from ..core.events import get_event_log, STATUS_COMPLETED, STATUS_FAILED
+from ..core.tracing import span, configure_tracing
+from ..core.resources import get_resource_sampler
 from ..server.manager import ServerManager
 from ..server.health_check import HealthMonitor
 from .instance_pool import MetaMapInstancePool
-from .worker import FileProcessor
+from .worker import FileProcessor, WorkerProcessorPool, START_MARKER_PREFIX, END_MARKER_PREFIX
 from .retry_manager import RetryManager
+from .work_queue import WorkItem, build_work_queue, process_work_queue
+from .bisect_retry import is_timeout_error
 from .java_bridge import JavaAPIBridge
+from ..core.inputs import (InputRecord, as_input_record, collect_input_records, input_layout,
+                           restore_input_layout, stream_input_records)
 
 logger = logging.getLogger(__name__)
 console = Console()
 
 
+def _count_output_concepts(output_file: Path) -> int:
+    """Concept rows of an output CSV (markers and header are not counted)"""
+    with open(output_file, newline='', encoding='utf-8') as f:
+        lines = (line for line in f
+                 if not line.startswith((START_MARKER_PREFIX, END_MARKER_PREFIX)))
+        rows = csv.reader(lines)
+        next(rows, None)  # header
+        return sum(1 for row in rows if row)
+
+
 class ProcessingMode:
     """Processing mode enumeration"""
     STANDARD = "standard"
@@ -86,6 +104,9 @@ class UnifiedProcessor:
         self.timeout = self.config.get("pymm_timeout", 300)
         self.use_instance_pool = self.config.get("use_instance_pool", True)
         self.show_progress = self.config.get("progress_bar", True)
+        configure_tracing(self.config)
+        self.resource_sampler = get_resource_sampler()
+        self.resource_sampler.watch_disk(self.output_dir)
 
         # Advanced features flags based on mode - MUST BE DONE FIRST
         self._configure_features()
@@ -150,14 +171,19 @@ class UnifiedProcessor:
             logger.info("Java API mode enabled - will use optimized Java processing")
             # Create a Config instance for Enhanced JavaAPIBridge
             from ..core.config import Config
-            from .java_bridge_v2 import EnhancedJavaAPIBridge
             
             bridge_config = Config.from_pymm_config(self.config)
             bridge_config.java_api_path = self.java_api_path
             
             try:
-                self.java_bridge = EnhancedJavaAPIBridge(bridge_config)
-                logger.info("Enhanced Java API bridge initialized successfully")
+                try:
+                    from .java_bridge_v2 import EnhancedJavaAPIBridge
+                    self.java_bridge = EnhancedJavaAPIBridge(bridge_config)
+                    logger.info("Enhanced Java API bridge initialized successfully")
+                except ImportError:
+                    # Persistent JVM workers, one per instance slot
+                    self.java_bridge = JavaAPIBridge(bridge_config)
+                    logger.info("Java API bridge initialized with persistent JVM workers")
             except Exception as e:
                 logger.warning(f"Failed to initialize Enhanced Java API: {e}")
                 logger.info("Falling back to standard binary mode")
@@ -190,6 +216,12 @@ class UnifiedProcessor:
                 logger.info("Creating standard instance pool")
                 self.instance_pool = MetaMapInstancePool(self.config)
 
+        # Worker-affine FileProcessors, reused for every file a thread handles
+        self.worker_processors = WorkerProcessorPool(
+            self._create_worker_processor,
+            instance_pool=self.instance_pool if self.features.get("adaptive_pool") else None
+        )
+
         # Memory-efficient features (from optimized runner)
         if self.features.get("memory_streaming"):
             self.chunk_size = self._calculate_chunk_size()
@@ -451,7 +483,7 @@ class UnifiedProcessor:
     def _calculate_chunk_size(self) -> int:
         """Calculate optimal chunk size based on available memory"""
         try:
-            memory_gb = psutil.virtual_memory().available / (1024**3)
+            memory_gb = self.resource_sampler.latest().memory_available_gb
             if memory_gb < 4:
                 return 50
             elif memory_gb < 8:
@@ -494,14 +526,14 @@ class UnifiedProcessor:
             except Exception as e:
                 logger.error(f"Failed to save state: {e}")
 
-    def collect_input_files(self) -> List[Path]:
-        """Collect all input files to process
+    def collect_input_files(self) -> List[InputRecord]:
+        """Collect all input notes to process
 
         Uses appropriate method based on enabled features
         """
         if self.features.get("smart_selection") and self.file_tracker:
             # Use smart selection from file tracker
-            return self.file_tracker.get_unprocessed_files()
+            return [as_input_record(f) for f in self.file_tracker.get_unprocessed_files()]
 
         elif self.features.get("memory_streaming"):
             # Use streaming approach
@@ -511,93 +543,60 @@ class UnifiedProcessor:
             # Standard collection
             return self._collect_input_files_standard()
 
-    def _collect_input_files_standard(self) -> List[Path]:
-        """Standard file collection method"""
-        input_files = []
+    def _collect_input_files_standard(self) -> List[InputRecord]:
+        """Standard collection: note files and corpus records, sorted"""
+        return collect_input_records(self.input_dir, self.config)
 
-        if self.input_dir.is_file():
-            input_files.append(self.input_dir)
-        else:
-            # Collect all text files
-            for pattern in ['*.txt', '*.text', '*.input']:
-                input_files.extend(self.input_dir.glob(pattern))
+    def _discover_files_streaming(self) -> Iterator[InputRecord]:
+        """Stream notes without loading all into memory (from optimized runner)"""
 
-            # Also check for files without extension
-            for file in self.input_dir.iterdir():
-                if file.is_file() and file.suffix == '' and not file.name.startswith('.'):
-                    input_files.append(file)
+        def pending(records):
+            for record in records:
+                # Skip processed notes if tracking
+                if hasattr(
+                        self, 'processed_files') and record.output_stem in self.processed_files:
+                    continue
 
-        # Sort for consistent ordering
-        input_files.sort()
+                # Skip if output already exists
+                output_file = self.output_dir / f"{record.output_stem}.csv"
+                if output_file.exists() and output_file.stat().st_size > 100:
+                    if hasattr(self, 'processed_files'):
+                        self.processed_files.add(record.output_stem)
+                    continue
 
-        logger.info(f"Found {len(input_files)} input files")
-        return input_files
+                yield record
 
-    def _discover_files_streaming(self) -> Iterator[Path]:
-        """Stream files without loading all into memory (from optimized runner)"""
-        patterns = ['*.txt', '*.text', '*.input']
+        records = pending(stream_input_records(self.input_dir, self.config))
 
         # If using smart features, get file info for ordering
         if self.features.get("dynamic_workers"):
             file_info = []
 
-            for pattern in patterns:
-                try:
-                    for file in self.input_dir.glob(pattern):
-                        # Skip processed files if tracking
-                        if hasattr(
-                                self, 'processed_files') and file.stem in self.processed_files:
-                            continue
-
-                        # Skip if output already exists
-                        output_file = self.output_dir / f"{file.stem}.csv"
-                        if output_file.exists() and output_file.stat().st_size > 100:
-                            if hasattr(self, 'processed_files'):
-                                self.processed_files.add(file.stem)
-                            continue
-
-                        # Get file size
-                        try:
-                            size = file.stat().st_size
-                            # Skip empty or huge files
-                            if size == 0 or size > 100 * 1024 * 1024:  # 100MB limit
-                                logger.warning(
-                                    f"Skipping {file.name}: size {size}")
-                                self.stats["skipped"] += 1
-                                continue
-                            file_info.append((file, size))
-                        except Exception:
-                            file_info.append((file, 0))
-
-                except Exception as e:
-                    logger.error(f"Error discovering files: {e}")
+            try:
+                for record in records:
+                    size = record.size
+                    # Skip empty or huge notes
+                    if size is not None and (size == 0 or size > 100 * 1024 * 1024):  # 100MB limit
+                        logger.warning(
+                            f"Skipping {record.name}: size {size}")
+                        self.stats["skipped"] += 1
+                        continue
+                    file_info.append((record, size or 0))
+            except Exception as e:
+                logger.error(f"Error discovering files: {e}")
 
             # Sort by size (process smaller files first for better throughput)
             file_info.sort(key=lambda x: x[1])
 
             # Yield files
-            for file, _ in file_info:
-                yield file
+            for record, _ in file_info:
+                yield record
         else:
             # Simple streaming without size sorting
-            for pattern in patterns:
-                try:
-                    for file in self.input_dir.glob(pattern):
-                        # Skip processed files
-                        if hasattr(
-                                self, 'processed_files') and file.stem in self.processed_files:
-                            continue
-
-                        # Skip if output already exists
-                        output_file = self.output_dir / f"{file.stem}.csv"
-                        if output_file.exists() and output_file.stat().st_size > 100:
-                            if hasattr(self, 'processed_files'):
-                                self.processed_files.add(file.stem)
-                            continue
-
-                        yield file
-                except Exception as e:
-                    logger.error(f"Error discovering files: {e}")
+            try:
+                yield from records
+            except Exception as e:
+                logger.error(f"Error discovering files: {e}")
 
     def get_optimal_workers(self) -> int:
         """Calculate optimal worker count based on current system state"""
@@ -605,8 +604,9 @@ class UnifiedProcessor:
             return self.max_workers
 
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            memory_percent = psutil.virtual_memory().percent / 100
+            sample = self.resource_sampler.latest()
+            cpu_percent = sample.cpu_percent
+            memory_percent = sample.memory_percent / 100
 
             # Reduce workers if system is under load
             if memory_percent > self.memory_threshold:
@@ -619,8 +619,8 @@ class UnifiedProcessor:
         except Exception:
             return self.max_workers
 
-    def process_file(self, file: Path) -> Tuple[bool, float, Optional[str]]:
-        """Process a single file using appropriate method"""
+    def process_file(self, file: InputRecord) -> Tuple[bool, float, Optional[str]]:
+        """Process a single note using appropriate method"""
         
         # Use Java API if configured
         if self.java_bridge:
@@ -630,10 +630,11 @@ class UnifiedProcessor:
         else:
             return self._process_file_direct(file)
 
-    def _process_file_with_java_api(self, file: Path) -> Tuple[bool, float, Optional[str]]:
-        """Process file using Java API bridge"""
+    def _process_file_with_java_api(self, file: InputRecord) -> Tuple[bool, float, Optional[str]]:
+        """Process note using Java API bridge"""
+        file = as_input_record(file)
         start_time = time.time()
-        output_file = self.output_dir / f"{file.stem}.csv"
+        output_file = self.output_dir / f"{file.output_stem}.csv"
         
         try:
             logger.info(f"Processing {file.name} with Java API")
@@ -651,10 +652,17 @@ class UnifiedProcessor:
                 self.file_tracker.mark_file_started(file)
             
             # Process with Enhanced Java API
-            if hasattr(self.java_bridge, 'process_single_file_fast'):
+            if file.path is None:
+                # Corpus records have no file of their own; send the text
+                success = self.java_bridge.process_record(
+                    file,
+                    str(output_file),
+                    self.config.get("metamap_processing_options", "")
+                )
+            elif hasattr(self.java_bridge, 'process_single_file_fast'):
                 # Use enhanced fast processing
                 success = self.java_bridge.process_single_file_fast(
-                    str(file),
+                    str(file.path),
                     str(output_file),
                     options={
                         "topMappingOnly": self.features.get("java_optimizations", True),
@@ -664,7 +672,7 @@ class UnifiedProcessor:
             else:
                 # Fallback to standard Java API
                 success = self.java_bridge.process_single_file(
-                    str(file),
+                    str(file.path),
                     str(output_file),
                     self.config.get("metamap_processing_options", "")
                 )
@@ -677,29 +685,22 @@ class UnifiedProcessor:
                     logger.warning(f"Java API reported success but output file not found: {output_file}")
                     success = False
                     error = "Output file not created"
-                else:
-                    # Check if file has actual content (more than just header)
-                    with open(output_file, 'r') as f:
-                        lines = f.readlines()
-                        if len(lines) <= 1:
-                            logger.warning(f"Output file exists but contains no concepts: {output_file}")
-                            # For files with no medical content, this might be valid
-                            # But log it for debugging
-                            logger.info(f"File processed in {processing_time:.2f}s with 0 concepts")
                 
+                concepts_count = _count_output_concepts(output_file) if output_file.exists() else 0
+                if success and concepts_count == 0:
+                    # For files with no medical content, this might be valid
+                    # But log it for debugging
+                    logger.warning(f"Output file exists but contains no concepts: {output_file}")
+                    logger.info(f"File processed in {processing_time:.2f}s with 0 concepts")
+
                 # Mark as completed
                 if self.file_tracker:
-                    # Count concepts in output
-                    concepts_count = 0
-                    if output_file.exists():
-                        with open(output_file, 'r') as f:
-                            concepts_count = sum(1 for line in f) - 1  # Minus header
-                    
                     self.file_tracker.mark_file_completed(
                         file, 
                         concepts_found=concepts_count,
                         processing_time=processing_time
                     )
+                self._publish_java_event(file, output_file, STATUS_COMPLETED, concepts_count, start_time)
                 
                 self.stats["processed"] += 1
                 return True, processing_time, None
@@ -716,6 +717,7 @@ class UnifiedProcessor:
                 
                 if self.file_tracker:
                     self.file_tracker.mark_file_failed(file, error)
+                self._publish_java_event(file, output_file, STATUS_FAILED, 0, start_time, error)
                 self.stats["failed"] += 1
                 return False, processing_time, error
                 
@@ -734,79 +736,96 @@ class UnifiedProcessor:
             
             if self.file_tracker:
                 self.file_tracker.mark_file_failed(file, error)
+            self._publish_java_event(file, output_file, STATUS_FAILED, 0, start_time, error)
             self.stats["failed"] += 1
             return False, time.time() - start_time, error
 
-    def _process_file_with_pool(
-            self, file: Path) -> Tuple[bool, float, Optional[str]]:
-        """Process file using instance pool"""
-        instance_id = None
-        mm_instance = None
-        start_time = time.time()
-
+    def _publish_java_event(self, file: InputRecord, output_file: Path, status: str,
+                            concepts: int, start_time: float, error: Optional[str] = None):
+        """Report a note finished by the Java API on the event log, like FileProcessor does"""
         try:
-            # Check system resources if health monitoring enabled
-            if self.features.get("health_monitoring"):
-                memory_percent = psutil.virtual_memory().percent
-                if memory_percent > 90:
-                    time.sleep(5)
-                    gc.collect()
-
-            # Get instance from pool
-            instance_id, mm_instance = self.instance_pool.get_instance()
-
-            # Calculate timeout based on file size if dynamic
-            file_size = file.stat().st_size
-            timeout = self._calculate_timeout(file_size) if self.features.get(
-                "dynamic_workers") else self.timeout
-
-            # Create processor
-            processor = FileProcessor(
-                self.config.get("metamap_binary_path"),
-                str(self.output_dir),
-                self.config.get("metamap_processing_options", ""),
-                timeout,
-                metamap_instance=mm_instance,
-                state_manager=self.state_manager if not self.features.get("memory_streaming") else None,
-                file_tracker=self.file_tracker,
-                config=self.config
-            )
-
-            # Process the file
-            success, elapsed, error = processor.process_file(str(file))
-
-            # Update statistics
-            if success:
-                self.stats["bytes_processed"] += file_size
-                if hasattr(processor, 'concepts_found'):
-                    self.stats["concepts_found"] += processor.concepts_found
-
-            # Record performance if tracking
-            if self.features.get("dynamic_workers") and success:
-                self.performance_history.append(elapsed)
-
-            return success, elapsed, error
-
-        finally:
-            # Return instance to pool
-            if instance_id is not None:
-                self.instance_pool.release_instance(
-                    instance_id, mm_instance if 'mm_instance' in locals() else None)
-
-    def _process_file_direct(
-            self, file: Path) -> Tuple[bool, float, Optional[str]]:
-        """Process file without instance pool"""
-        processor = FileProcessor(
+            size = output_file.stat().st_size
+        except OSError:
+            size = 0
+        get_event_log(self.output_dir).publish(file.name, status, concepts=concepts, bytes=size,
+                                               elapsed=time.time() - start_time, error=error)
+
+    def _create_worker_processor(self, worker_id: int) -> FileProcessor:
+        """Create the FileProcessor owned by one worker thread"""
+        return FileProcessor(
             self.config.get("metamap_binary_path"),
             str(self.output_dir),
             self.config.get("metamap_processing_options", ""),
             self.timeout,
+            worker_id=worker_id,
             state_manager=self.state_manager if not self.features.get("memory_streaming") else None,
             file_tracker=self.file_tracker,
             config=self.config
         )
 
-        return processor.process_file(str(file))
+    def _run_worker_processor(
+            self, file: InputRecord, timeout: int,
+            bisect: bool = False) -> Tuple[bool, float, Optional[str]]:
+        """Process file with the calling thread's processor, resetting it on errors"""
+        processor = self.worker_processors.get()
+        processor.timeout = timeout
+
+        try:
+            success, elapsed, error = processor.process_file(file, bisect=bisect)
+        except Exception:
+            self.worker_processors.reset(processor)
+            raise
+
+        if success:
+            self.stats["concepts_found"] += processor.concepts_found
+        else:
+            # Timed out or crashed MetaMap instances are not reused
+            self.worker_processors.reset(processor)
+
+        return success, elapsed, error
+
+    def _process_file_with_pool(
+            self, file: InputRecord) -> Tuple[bool, float, Optional[str]]:
+        """Process file using the worker's pooled instance"""
+        # Back off while memory is nearly exhausted, reading the shared
+        # sampler so the common case costs no system calls
+        if self.features.get("health_monitoring"):
+            sample = self.resource_sampler.latest()
+            if sample.memory_percent > 90:
+                gc.collect()
+                deadline = time.time() + 5
+                while sample.memory_percent > 90 and time.time() < deadline:
+                    sample = self.resource_sampler.wait(deadline - time.time())
+
+        # Calculate timeout based on file size if dynamic
+        file_size = file.size or 0
+        timeout = self._calculate_timeout(file_size) if self.features.get(
+            "dynamic_workers") else self.timeout
+
+        success, elapsed, error = self._run_worker_processor(file, timeout)
+
+        # Update statistics
+        if success:
+            self.stats["bytes_processed"] += file_size
+
+        # Record performance if tracking
+        if self.features.get("dynamic_workers") and success:
+            self.performance_history.append(elapsed)
+
+        return success, elapsed, error
+
+    def _process_file_direct(
+            self, file: InputRecord) -> Tuple[bool, float, Optional[str]]:
+        """Process file without instance pool"""
+        return self._run_worker_processor(file, self.timeout)
+
+    def _retry_file_bisecting(
+            self, file: InputRecord) -> Tuple[bool, float, Optional[str]]:
+        """Retry a timed-out file by bisecting it around the offending span"""
+        if self.java_bridge:
+            # The Java API processes whole files only
+            return self.process_file(file)
+        return self._run_worker_processor(file, self.timeout, bisect=True)
 
     def _calculate_timeout(self, file_size: int) -> int:
         """Dynamically calculate timeout based on file size"""
@@ -935,7 +954,52 @@ class UnifiedProcessor:
 
         return validation
 
-    def process_with_progress(self, files: List[Path]) -> Dict[str, Any]:
+    def _process_work_item(
+            self, item: WorkItem) -> Tuple[bool, float, Optional[str]]:
+        """Process one queued file; retries of timed-out files are bisected"""
+        if item.attempts > 0 and is_timeout_error(item.last_error):
+            return self._retry_file_bisecting(item.record)
+        return self.process_file(item.record)
+
+    def _process_queue(self, files: List[InputRecord], results: Dict[str, Any],
+                       on_result=None) -> Dict[str, Any]:
+        """Process files through the priority work queue, updating results
+
+        Failed files are retried from the queue's retry lane as soon as their
+        backoff expires, so retries finish within the same pass.
+        """
+        retry_manager = self.retry_manager if self.config.get(
+            "retry_max_attempts", 0) > 0 else None
+
+        def record(item: WorkItem, success: bool, elapsed: float,
+                   error: Optional[str]):
+            file = item.record
+            if success:
+                results["processed"] += 1
+                self._mark_completed(file)
+                logger.info(f"Processed {file.name} in {elapsed:.2f}s")
+            else:
+                results["failed"] += 1
+                results["failed_files"].append(file.note_id)
+                self._mark_failed(file, error)
+                logger.error(f"Failed to process {file.name}: {error}")
+
+            if on_result:
+                on_result(item, success)
+
+        retry_summary = process_work_queue(
+            build_work_queue(files, self.config),
+            self._process_work_item,
+            self.get_optimal_workers(),
+            record,
+            retry_manager=retry_manager
+        )
+
+        if retry_summary["retried"]:
+            results["retry_summary"] = retry_summary
+        return results
+
+    def process_with_progress(self, files: List[InputRecord]) -> Dict[str, Any]:
         """Process files with progress tracking"""
         results = {
             "success": True,
@@ -974,83 +1038,23 @@ class UnifiedProcessor:
                     total=len(files)
                 )
 
-                # Get optimal workers
-                workers = self.get_optimal_workers()
-
-                # Process with thread pool
-                with ThreadPoolExecutor(max_workers=workers) as executor:
-                    future_to_file = {}
-                    for file in files:
-                        future = executor.submit(self.process_file, file)
-                        future_to_file[future] = file
-
-                    # Process results
-                    for future in as_completed(future_to_file):
-                        file = future_to_file[future]
-
-                        try:
-                            success, elapsed, error = future.result(
-                                timeout=self.timeout + 30)
-
-                            if success:
-                                results["processed"] += 1
-                                self._mark_completed(file)
-                                logger.info(
-                                    f"Processed {file.name} in {elapsed:.2f}s")
-                            else:
-                                results["failed"] += 1
-                                results["failed_files"].append(
-                                    str(file.resolve()))
-                                self._mark_failed(file, error)
-                                logger.error(
-                                    f"Failed to process {file.name}: {error}")
-
-                        except Exception as e:
-                            results["failed"] += 1
-                            results["failed_files"].append(str(file.resolve()))
-                            self._mark_failed(file, str(e))
-                            logger.error(
-                                f"Exception processing {file.name}: {e}")
-
-                        progress.update(task, advance=1)
-
-                        # Update job manager
-                        if self.job_manager and self.job_id:
-                            self.job_manager.update_progress(self.job_id, {
-                                'total_files': len(files),
-                                'processed': results["processed"],
-                                'failed': results["failed"],
-                                'percentage': int((results["processed"] + results["failed"]) / len(files) * 100)
-                            })
+                def on_result(item: WorkItem, success: bool):
+                    progress.update(task, advance=1)
 
-        else:
-            # Process without progress bar
-            workers = self.get_optimal_workers()
-            with ThreadPoolExecutor(max_workers=workers) as executor:
-                future_to_file = {}
-                for file in files:
-                    future = executor.submit(self.process_file, file)
-                    future_to_file[future] = file
+                    # Update job manager
+                    if self.job_manager and self.job_id:
+                        self.job_manager.update_progress(self.job_id, {
+                            'total_files': len(files),
+                            'processed': results["processed"],
+                            'failed': results["failed"],
+                            'percentage': int((results["processed"] + results["failed"]) / len(files) * 100)
+                        })
 
-                for future in as_completed(future_to_file):
-                    file = future_to_file[future]
+                self._process_queue(files, results, on_result)
 
-                    try:
-                        success, elapsed, error = future.result(
-                            timeout=self.timeout + 30)
-
-                        if success:
-                            results["processed"] += 1
-                            self._mark_completed(file)
-                        else:
-                            results["failed"] += 1
-                            results["failed_files"].append(str(file.resolve()))
-                            self._mark_failed(file, error)
-
-                    except Exception as e:
-                        results["failed"] += 1
-                        results["failed_files"].append(str(file.resolve()))
-                        self._mark_failed(file, str(e))
+        else:
+            # Process without progress bar
+            self._process_queue(files, results)
 
         results["elapsed_time"] = time.time() - start_time
         results["throughput"] = results["processed"] / \
@@ -1058,7 +1062,7 @@ class UnifiedProcessor:
 
         return results
 
-    def _process_chunked(self, files: List[Path]) -> Dict[str, Any]:
+    def _process_chunked(self, files: List[InputRecord]) -> Dict[str, Any]:
         """Process files in chunks (from chunked runner)"""
         results = {
             "success": True,
@@ -1086,6 +1090,12 @@ class UnifiedProcessor:
             results["processed"] += chunk_results["processed"]
             results["failed"] += chunk_results["failed"]
             results["failed_files"].extend(chunk_results["failed_files"])
+            if "retry_summary" in chunk_results:
+                summary = results.setdefault(
+                    "retry_summary", {"retried": 0, "recovered": 0, "still_failed": []})
+                summary["retried"] += chunk_results["retry_summary"]["retried"]
+                summary["recovered"] += chunk_results["retry_summary"]["recovered"]
+                summary["still_failed"].extend(chunk_results["retry_summary"]["still_failed"])
 
             # Save state after each chunk
             if self.features.get("memory_streaming"):
@@ -1105,7 +1115,7 @@ class UnifiedProcessor:
         return results
 
     def _process_chunk(
-            self, files: List[Path], chunk_num: int) -> Dict[str, Any]:
+            self, files: List[InputRecord], chunk_num: int) -> Dict[str, Any]:
         """Process a single chunk of files"""
         results = {
             "processed": 0,
@@ -1113,41 +1123,14 @@ class UnifiedProcessor:
             "failed_files": []
         }
 
-        # Get optimal workers for this chunk
-        workers = self.get_optimal_workers()
-
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            future_to_file = {}
-            for file in files:
-                future = executor.submit(self.process_file, file)
-                future_to_file[future] = file
-
-            for future in as_completed(future_to_file):
-                file = future_to_file[future]
-
-                try:
-                    success, elapsed, error = future.result(
-                        timeout=self.timeout + 30)
-
-                    if success:
-                        results["processed"] += 1
-                        self._mark_completed(file)
-                    else:
-                        results["failed"] += 1
-                        results["failed_files"].append(str(file.resolve()))
-                        self._mark_failed(file, error)
-
-                except Exception as e:
-                    results["failed"] += 1
-                    results["failed_files"].append(str(file.resolve()))
-                    self._mark_failed(file, str(e))
+        self._process_queue(files, results)
 
         logger.info(
             f"Chunk {chunk_num} complete: {results['processed']} processed, {results['failed']} failed")
         return results
     
-    def _process_batch_with_java_api(self, files: List[Path]) -> Dict[str, Any]:
-        """Process a batch of files using the Java API bridge"""
+    def _process_batch_with_java_api(self, files: List[InputRecord]) -> Dict[str, Any]:
+        """Process a batch of note files using the Java API bridge"""
         results = {
             "success": True,
             "processed": 0,
@@ -1157,8 +1140,9 @@ class UnifiedProcessor:
         
         try:
             # Prepare file paths and output paths
-            input_paths = [str(f) for f in files]
-            output_paths = [str(self.output_dir / f"{f.stem}.csv") for f in files]
+            records = {str(f.path): f for f in files}
+            input_paths = list(records)
+            output_paths = [str(self.output_dir / f"{f.output_stem}.csv") for f in files]
             
             # Call Java API batch processing
             batch_results = self.java_bridge.process_batch_fast(
@@ -1175,13 +1159,13 @@ class UnifiedProcessor:
             # Process results
             if batch_results and "results" in batch_results:
                 for file_path, result in batch_results["results"].items():
-                    file = Path(file_path)
+                    file = records.get(file_path) or as_input_record(file_path)
                     if result.get("status") == "success":
                         results["processed"] += 1
                         self._mark_completed(file)
                     else:
                         results["failed"] += 1
-                        results["failed_files"].append(str(file))
+                        results["failed_files"].append(file.note_id)
                         self._mark_failed(file, result.get("error", "Unknown error"))
             
             # Update success based on results
@@ -1192,13 +1176,13 @@ class UnifiedProcessor:
             # Mark all files as failed
             for file in files:
                 results["failed"] += 1
-                results["failed_files"].append(str(file))
+                results["failed_files"].append(file.note_id)
                 self._mark_failed(file, str(e))
             results["success"] = False
             
         return results
 
-    def _process_with_monitoring(self, files: List[Path]) -> Dict[str, Any]:
+    def _process_with_monitoring(self, files: List[InputRecord]) -> Dict[str, Any]:
         """Process files with live monitoring (from monitored runner)"""
         # Initialize monitor
         from ..monitoring.unified_monitor import UnifiedMonitor
@@ -1218,22 +1202,21 @@ class UnifiedProcessor:
 
         return results
 
-    def _mark_completed(self, file: Path):
-        """Mark file as completed"""
-        file_str = str(file.resolve())
-
+    def _mark_completed(self, file: InputRecord):
+        """Mark note as completed"""
         # Update state manager
         if self.state_manager:
-            self.state_manager.mark_completed(file_str)
+            with span("save_state", document=file.name):
+                self.state_manager.mark_completed(file.note_id)
 
         # Update lightweight state
         if hasattr(self, 'processed_files'):
-            self.processed_files.add(file.stem)
+            self.processed_files.add(file.output_stem)
 
         # Update file tracker
         if self.file_tracker:
             try:
-                output_file = self.output_dir / f"{file.stem}.csv"
+                output_file = self.output_dir / f"{file.output_stem}.csv"
                 if output_file.exists():
                     # Count concepts if possible
                     concepts = 0
@@ -1248,17 +1231,16 @@ class UnifiedProcessor:
             except BaseException:
                 pass
 
-    def _mark_failed(self, file: Path, error: str):
-        """Mark file as failed"""
-        file_str = str(file.resolve())
-
+    def _mark_failed(self, file: InputRecord, error: str):
+        """Mark note as failed"""
         # Update state manager
         if self.state_manager:
-            self.state_manager.mark_failed(file_str, error)
+            with span("save_state", document=file.name):
+                self.state_manager.mark_failed(file.note_id, error)
 
         # Update lightweight state
         if hasattr(self, 'failed_files'):
-            self.failed_files.add(file.stem)
+            self.failed_files.add(file.output_stem)
 
         # Update file tracker
         if self.file_tracker:
@@ -1270,13 +1252,19 @@ class UnifiedProcessor:
     def _perform_health_check(self):
         """Perform system health check"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            memory_percent = psutil.virtual_memory().percent
-            disk_usage = psutil.disk_usage(str(self.output_dir)).percent
+            sample = self.resource_sampler.latest()
+            cpu_percent = sample.cpu_percent
+            memory_percent = sample.memory_percent
+            disk = sample.disk(self.output_dir)
+            disk_usage = disk.percent if disk else 0.0
 
             logger.info(
                 f"System health: CPU {cpu_percent:.1f}%, RAM {memory_percent:.1f}%, Disk {disk_usage:.1f}%")
 
+            # Restart JVM workers that stopped answering
+            if self.java_bridge and hasattr(self.java_bridge, 'health_check'):
+                self.java_bridge.health_check()
+
             # Adjust workers if needed
             if self.features.get("dynamic_workers"):
                 if memory_percent > 90 or cpu_percent > 95:
@@ -1421,11 +1409,26 @@ class UnifiedProcessor:
                     self.use_instance_pool = False
                     self.instance_pool = None
 
+        if self.features.get("adaptive_pool"):
+            self.worker_processors.instance_pool = self.instance_pool
+
+        # Resource readings for the health checks below come from the
+        # shared sampler thread
+        self.resource_sampler.acquire()
+
+        # Prometheus endpoint, if a metrics port is configured
+        from ..monitoring.metrics import start_metrics_server
+        metrics = start_metrics_server(self.config, self.output_dir, workers=self.max_workers,
+                                       instance_pool=self.instance_pool,
+                                       health_monitor=self.health_monitor)
+
         try:
             # Collect files
             logger.info(f"Collecting input files from: {self.input_dir}")
             input_files = self.collect_input_files()
             logger.info(f"Found {len(input_files)} total input files")
+            if metrics:
+                metrics.metrics.set_total_files(len(input_files))
             
             if not input_files:
                 logger.warning(f"No input files found in {self.input_dir}")
@@ -1450,33 +1453,19 @@ class UnifiedProcessor:
                     "throughput": 0
                 }
 
+            if self.state_manager:
+                self.state_manager.set_input_source(self.input_dir.resolve(), input_layout(self.config))
+
             # Update statistics
             self.stats["total_files"] = len(input_files)
             self.stats["start_time"] = time.time()
 
+            # Child-process usage is rolled up from this run's events
+            run_usage = RunUsage(self.output_dir, service_pids(self.server_manager))
+
             # Process files
             results = self.process_with_progress(pending_files)
-
-            # Handle retries if configured
-            if (self.config.get("retry_max_attempts", 0) > 0 and 
-                "failed_files" in results and 
-                results.get("failed_files") and 
-                len(results["failed_files"]) > 0):
-                logger.info(
-                    f"Retrying {len(results['failed_files'])} failed files...")
-
-                retry_results = self.retry_manager.retry_failed_files(
-                    results["failed_files"],
-                    lambda file_path: self.process_file(Path(file_path))
-                )
-
-                # Update results
-                results["processed"] += retry_results["recovered"]
-                results["failed"] -= retry_results["recovered"]
-                results["failed_files"] = retry_results["still_failed"]
-                results["retry_summary"] = retry_results
-            elif self.config.get("retry_max_attempts", 0) > 0:
-                logger.debug("No failed files to retry")
+            results["resource_usage"] = run_usage.finish()
 
             # Final statistics
             self.stats["end_time"] = time.time()
@@ -1498,7 +1487,18 @@ class UnifiedProcessor:
             return results
 
         finally:
-            # Cleanup
+            if metrics:
+                metrics.stop()
+            self.resource_sampler.release()
+            if self.state_manager:
+                self.state_manager.flush()
+
+            # Cleanup - hand worker-held instances back before shutting the pool
+            self.worker_processors.close()
+
+            if self.java_bridge and hasattr(self.java_bridge, 'close'):
+                self.java_bridge.close()
+
             if self.instance_pool:
                 logger.info("Shutting down instance pool...")
                 self.instance_pool.shutdown()
@@ -1523,28 +1523,26 @@ class UnifiedProcessor:
                     self.job_manager.complete_job(
                         self.job_id, "Process terminated unexpectedly")
 
-    def _filter_pending_files(self, input_files: List[Path]) -> List[Path]:
-        """Filter out already processed files"""
+    def _filter_pending_files(self, input_files: List[InputRecord]) -> List[InputRecord]:
+        """Filter out already processed notes"""
         pending = []
 
         for file in input_files:
-            # Check various tracking methods
-            file_str = str(file.resolve())
-
-            # Check state manager
-            if self.state_manager and self.state_manager.is_completed(
-                    file_str):
-                logger.debug(f"Skipping completed file: {file}")
+            # Check state manager (older states list resolved file paths)
+            if self.state_manager and (
+                    self.state_manager.is_completed(file.note_id) or
+                    (file.path and self.state_manager.is_completed(str(file.path.resolve())))):
+                logger.debug(f"Skipping completed note: {file.note_id}")
                 continue
 
             # Check lightweight state
             if hasattr(
                     self,
-                    'processed_files') and file.stem in self.processed_files:
+                    'processed_files') and file.output_stem in self.processed_files:
                 continue
 
             # Check if output exists and is valid
-            output_file = self.output_dir / f"{file.stem}.csv"
+            output_file = self.output_dir / f"{file.output_stem}.csv"
             if output_file.exists() and output_file.stat().st_size > 100:
                 # Verify it has proper end marker
                 try:
@@ -1553,11 +1551,11 @@ class UnifiedProcessor:
                         if lines and "META_BATCH_END" in lines[-1]:
                             # Mark as completed
                             if self.state_manager:
-                                self.state_manager.mark_completed(file_str)
+                                self.state_manager.mark_completed(file.note_id)
                             if hasattr(self, 'processed_files'):
-                                self.processed_files.add(file.stem)
+                                self.processed_files.add(file.output_stem)
                             logger.debug(
-                                f"Skipping file with valid output: {file}")
+                                f"Skipping note with valid output: {file.note_id}")
                             continue
                 except BaseException:
                     pass
@@ -1574,21 +1572,20 @@ class UnifiedProcessor:
         config = config or PyMMConfig()
         state_manager = StateManager(output_dir)
 
-        # Find input directory from state
-        if state_manager._state.get("completed_files"):
-            first_file = Path(state_manager._state["completed_files"][0])
-            input_dir = first_file.parent
-        else:
+        # Find input directory (or corpus file) from state
+        input_dir = state_manager.get_input_source()
+        if not input_dir:
             return {
                 "success": False,
                 "error": "Cannot determine input directory from state"
             }
+        restore_input_layout(state_manager.get_input_layout())
 
         # Create processor and run
         processor = cls(str(input_dir), output_dir, config, mode)
         return processor.run()
 
-    def get_interactive_options(self) -> Tuple[List[Path], str]:
+    def get_interactive_options(self) -> Tuple[List[InputRecord], str]:
         """Get interactive processing options (for smart mode)"""
         if not self.features.get("smart_selection") or not self.file_tracker:
             # Just return all pending files
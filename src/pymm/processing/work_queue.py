@@ -0,0 +1,351 @@
+"""Priority work queue with retry lanes for batch processing
+
+Thread and process runners feed notes through one ``PriorityWorkQueue``
+with three lanes:
+
+- ``priority``: files the user asked to process first
+- ``retry``: failed files, each held back until its backoff expires
+- ``new``: everything else
+
+Failed files are re-queued as soon as they fail and are interleaved with
+new work once their backoff expires, so a run ends when all work (retries
+included) is done instead of running retries as a second serial pass.
+Process runners keep the queue in the parent process and hand items to
+their pool one at a time (``process_work_queue_in_processes``).
+"""
+import heapq
+import time
+import fnmatch
+import itertools
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Any
+
+from ..core.inputs import InputRecord, as_input_record
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LANE = "priority"
+RETRY_LANE = "retry"
+NEW_LANE = "new"
+
+
+@dataclass
+class WorkItem:
+    """A note moving through the work queue"""
+    record: InputRecord
+    lane: str = NEW_LANE
+    attempts: int = 0  # Retries made so far
+    last_error: Optional[str] = None
+    ready_at: float = 0.0
+    output: Any = None  # Extra result of the last attempt (process runners)
+
+    @property
+    def path(self) -> Optional[Path]:
+        """File holding the note, if the note is a file of its own"""
+        return self.record.path
+
+
+class PriorityWorkQueue:
+    """Thread-safe work queue with priority, retry and new lanes
+
+    The priority lane is always served first. Ready retries and new files
+    share the remaining slots by weighted round robin so that neither lane
+    starves the other. ``get`` blocks while retries are backing off and
+    returns None once every lane is empty and no item is in flight.
+
+    With ``open_input`` the queue is fed while it is being drained (e.g. by
+    ``process_stream``): ``get`` keeps waiting for new items until
+    ``finish_input`` is called.
+    """
+
+    def __init__(self, retry_weight: int = 1, new_weight: int = 1,
+                 open_input: bool = False):
+        self._cond = threading.Condition()
+        self._input_open = open_input
+        self._priority: deque = deque()
+        self._new: deque = deque()
+        self._retries: List[Tuple[float, int, WorkItem]] = []  # heap on ready_at
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._closed = False
+
+        # Round-robin schedule for the shared lanes, e.g. [retry, new, new]
+        self._schedule = [RETRY_LANE] * max(1, int(retry_weight)) + \
+                         [NEW_LANE] * max(1, int(new_weight))
+        self._turn = 0
+
+        self.stats = {"queued": 0, "retries_queued": 0, "served": 0}
+
+    def put(self, record, lane: str = NEW_LANE):
+        """Queue a note (record or file path) on the priority or new lane"""
+        item = WorkItem(as_input_record(record), lane=lane)
+        with self._cond:
+            if lane == PRIORITY_LANE:
+                self._priority.append(item)
+            else:
+                item.lane = NEW_LANE
+                self._new.append(item)
+            self.stats["queued"] += 1
+            self._cond.notify()
+
+    def put_retry(self, item: WorkItem, delay: float = 0.0):
+        """Re-queue a failed item once delay seconds have passed"""
+        with self._cond:
+            item.lane = RETRY_LANE
+            item.ready_at = time.time() + max(0.0, delay)
+            heapq.heappush(self._retries, (item.ready_at, next(self._seq), item))
+            self.stats["retries_queued"] += 1
+            self._cond.notify()
+
+    def prioritize(self, record) -> bool:
+        """Move a queued new note (record or file path) to the priority lane"""
+        note_id = as_input_record(record).note_id
+        with self._cond:
+            for item in self._new:
+                if item.record.note_id == note_id:
+                    self._new.remove(item)
+                    item.lane = PRIORITY_LANE
+                    self._priority.append(item)
+                    return True
+        return False
+
+    def _pop_ready(self) -> Optional[WorkItem]:
+        if self._priority:
+            return self._priority.popleft()
+
+        retry_ready = bool(self._retries) and self._retries[0][0] <= time.time()
+        for _ in range(len(self._schedule)):
+            lane = self._schedule[self._turn]
+            self._turn = (self._turn + 1) % len(self._schedule)
+            if lane == RETRY_LANE and retry_ready:
+                return heapq.heappop(self._retries)[2]
+            if lane == NEW_LANE and self._new:
+                return self._new.popleft()
+        return None
+
+    def get(self) -> Optional[WorkItem]:
+        """Take the next ready item, or None when the queue is drained or closed
+
+        Every item returned must be acknowledged with ``task_done`` (after
+        any ``put_retry`` for it) so the queue knows when work is finished.
+        """
+        with self._cond:
+            while not self._closed:
+                item = self._pop_ready()
+                if item is not None:
+                    self._in_flight += 1
+                    self.stats["served"] += 1
+                    return item
+
+                if not self._retries and self._in_flight == 0 and not self._input_open:
+                    return None
+
+                # Sleep until the next retry becomes ready or other work arrives
+                timeout = None
+                if self._retries:
+                    timeout = max(0.0, self._retries[0][0] - time.time())
+                self._cond.wait(timeout)
+            return None
+
+    def task_done(self):
+        """Acknowledge an item returned by ``get``"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def finish_input(self):
+        """Signal that no more items will be put; ``get`` returns None once drained"""
+        with self._cond:
+            self._input_open = False
+            self._cond.notify_all()
+
+    def close(self):
+        """Stop handing out work; blocked ``get`` calls return None"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def pending(self) -> Dict[str, int]:
+        """Number of items waiting in each lane and in flight"""
+        with self._cond:
+            return {
+                PRIORITY_LANE: len(self._priority),
+                RETRY_LANE: len(self._retries),
+                NEW_LANE: len(self._new),
+                "in_flight": self._in_flight
+            }
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._priority) + len(self._retries) + len(self._new) + self._in_flight
+
+
+def is_priority_file(file, patterns: Iterable[str]) -> bool:
+    """Check a note against user priority patterns (note ids, paths or globs)"""
+    record = as_input_record(file)
+    name, full = record.note_id, record.source
+    for pattern in patterns:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(full, pattern):
+            return True
+    return False
+
+
+def build_work_queue(files: Iterable, config=None) -> PriorityWorkQueue:
+    """Create a work queue for notes, honouring the priority_files config
+
+    Config keys:
+        priority_files: names, paths or glob patterns to process first
+        work_queue_retry_weight / work_queue_new_weight: round-robin shares
+            of ready retries and new files
+    """
+    get = config.get if config else (lambda key, default=None: default)
+
+    work_queue = PriorityWorkQueue(
+        retry_weight=get("work_queue_retry_weight", 1),
+        new_weight=get("work_queue_new_weight", 1)
+    )
+
+    patterns = get("priority_files", []) or []
+    if isinstance(patterns, str):
+        patterns = [p.strip() for p in patterns.split(',') if p.strip()]
+
+    for file in files:
+        if patterns and is_priority_file(file, patterns):
+            work_queue.put(file, PRIORITY_LANE)
+        else:
+            work_queue.put(file)
+
+    return work_queue
+
+
+def process_work_queue(work_queue: PriorityWorkQueue,
+                       process_func: Callable[[WorkItem], Tuple[bool, float, Optional[str]]],
+                       workers: int,
+                       on_result: Callable[[WorkItem, bool, float, Optional[str]], None],
+                       retry_manager=None,
+                       claim_func: Optional[Callable[[WorkItem], bool]] = None) -> Dict[str, Any]:
+    """Drain a work queue with a fixed set of worker threads
+
+    Failed items are handed to ``retry_manager.schedule_retry``; if it grants
+    another attempt the item goes back on the retry lane with the returned
+    backoff, otherwise ``on_result`` reports the final failure. ``on_result``
+    is only called for final outcomes and calls are serialized.
+
+    Args:
+        work_queue: Queue to drain
+        process_func: Processes one WorkItem, returning (success, elapsed, error)
+        workers: Number of worker threads
+        on_result: Callback for the final outcome of each note
+        retry_manager: Optional RetryManager deciding retries and backoff
+        claim_func: Optional check run before an item's first attempt;
+            items it rejects (e.g. leased by another node) are dropped
+
+    Returns:
+        Dictionary with retry statistics
+    """
+    summary = {"retried": 0, "recovered": 0, "still_failed": [], "claimed_elsewhere": 0}
+    result_lock = threading.Lock()
+
+    def worker_loop():
+        while True:
+            item = work_queue.get()
+            if item is None:
+                return
+
+            reported = False
+            try:
+                if claim_func and not item.attempts and not claim_func(item):
+                    with result_lock:
+                        summary["claimed_elsewhere"] += 1
+                    continue
+
+                note_id = item.record.note_id
+                if item.attempts and retry_manager:
+                    retry_manager.record_attempt(note_id)
+
+                try:
+                    success, elapsed, error = process_func(item)
+                except Exception as e:
+                    success, elapsed, error = False, 0.0, str(e)
+
+                if not success and retry_manager:
+                    delay = retry_manager.schedule_retry(note_id, error or "Unknown error")
+                    if delay is not None:
+                        item.attempts += 1
+                        item.last_error = error
+                        with result_lock:
+                            summary["retried"] += 1
+                        logger.info(f"Requeued {item.record.name} for retry in {delay:.0f}s")
+                        work_queue.put_retry(item, delay)
+                        reported = True
+                        continue
+
+                if success and item.attempts and retry_manager:
+                    retry_manager.record_success(note_id)
+
+                with result_lock:
+                    if item.attempts:
+                        if success:
+                            summary["recovered"] += 1
+                        else:
+                            summary["still_failed"].append(note_id)
+                    reported = True
+                    on_result(item, success, elapsed, error)
+            except Exception as e:
+                logger.error(f"Work queue error on {item.record.source}: {e}")
+                if not reported:
+                    # Never drop a note silently; report it as failed
+                    with result_lock:
+                        try:
+                            on_result(item, False, 0.0, f"Work queue error: {e}")
+                        except Exception as report_error:
+                            logger.error(f"Could not report {item.record.source}: {report_error}")
+            finally:
+                work_queue.task_done()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(worker_loop) for _ in range(max(1, workers))]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            work_queue.close()
+            raise
+
+    return summary
+
+
+def process_work_queue_in_processes(work_queue: PriorityWorkQueue,
+                                    task: Callable[[WorkItem], Tuple[bool, float, Optional[str], Any]],
+                                    workers: int,
+                                    on_result: Callable[[WorkItem, bool, float, Optional[str]], None],
+                                    retry_manager=None) -> Dict[str, Any]:
+    """Drain a work queue with a pool of worker processes
+
+    The queue stays in this process: one dispatcher thread per worker
+    process takes the next ready item, runs ``task`` on it in the pool and
+    waits for the result, so lanes and retries behave exactly as in
+    ``process_work_queue``.
+
+    Args:
+        task: Picklable (module-level or ``functools.partial``) function run
+            in a worker process with the WorkItem, returning
+            (success, elapsed, error, output); output is stored on the
+            item as ``item.output`` before ``on_result`` sees it
+        workers: Number of worker processes
+
+    Returns:
+        Dictionary with retry statistics (see process_work_queue)
+    """
+    workers = max(1, workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def run_in_pool(item: WorkItem) -> Tuple[bool, float, Optional[str]]:
+            success, elapsed, error, item.output = executor.submit(task, item).result()
+            return success, elapsed, error
+
+        return process_work_queue(work_queue, run_in_pool, workers, on_result, retry_manager)
@@ -1,14 +1,22 @@
 """Individual file processing worker"""
 import os
+import re
 import csv
 import time
 import logging
 import socket
+import threading
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Callable
 
-from ..pymm import Metamap as PyMetaMap
+from ..pymm import Metamap as PyMetaMap, MetamapStuck as MetamapTimeout
 from ..core.exceptions import MetamapStuck, ParseError
+from ..core.worker_logging import get_log_pipeline
+from ..core.events import get_event_log, STATUS_COMPLETED, STATUS_FAILED
+from ..core.tracing import span, configure_tracing
+from ..core.accounting import track_child_usage
+from ..core.inputs import InputRecord, as_input_record, output_stem
+from .bisect_retry import BisectingRetry
 
 # CSV output configuration
 CSV_HEADER = [
@@ -25,6 +33,11 @@ CSV_HEADER = [
 START_MARKER_PREFIX = "META_BATCH_START_NOTE_ID:"
 END_MARKER_PREFIX = "META_BATCH_END_NOTE_ID:"
 
+# A blank line ends a MetaMap citation, and with --sldi (in the default
+# options) so does every line break. Batched notes are flattened to one
+# line; a space per break keeps concept positions matching the original text
+LINE_BREAKS = re.compile(r'[\r\n]')
+
 
 class FileProcessor:
     """Handles processing of individual files through MetaMap"""
@@ -44,51 +57,141 @@ class FileProcessor:
         self.state_manager = state_manager  # For tracking concepts
         self.file_tracker = file_tracker  # For unified tracking
         self.config = config  # Configuration object
+        self.instance_id = None  # Pool slot of metamap_instance, if pooled
+        self.concepts_found = 0  # Concepts found in the last processed file
+        self.last_bisect_result = None  # Span outcomes of the last bisecting retry
+        self.last_usage = None  # MetaMap child-process usage of the last processed file
+        self._environment_ready = False
+        self.event_log = get_event_log(self.output_dir)  # Per-file events for monitors
+        configure_tracing(config)  # Stage spans, when a trace file is configured
         self.logger = logging.getLogger(f"FileProcessor-{worker_id}")
 
         # Setup file logging for this worker
         self._setup_logging()
 
     def _setup_logging(self):
-        """Setup file logging for this worker"""
-        log_dir = self.output_dir / "logs"
+        """Route this worker's logger through the shared logging pipeline
+
+        All workers share one writer thread per log directory, so creating
+        many processors does not accumulate file handlers.
+        """
         try:
-            log_dir.mkdir(parents=True, exist_ok=True)
+            pipeline = get_log_pipeline(self.output_dir / "logs", self.config)
+            pipeline.attach(self.logger, self.worker_id)
         except Exception as e:
             # If we can't create logs dir, skip file logging
-            self.logger.warning(f"Could not create log directory: {e}")
-            return
+            self.logger.warning(f"Could not set up worker log file: {e}")
 
-        # Create worker-specific log file
-        log_file = log_dir / f"worker_{self.worker_id}.log"
+    def bind_instance(self, instance_id: Optional[int], metamap_instance):
+        """Attach a pooled MetaMap instance that this processor keeps using"""
+        self.instance_id = instance_id
+        self.metamap_instance = metamap_instance
 
-        # Create file handler
-        handler = logging.FileHandler(log_file)
-        handler.setLevel(logging.DEBUG)
+    def reset(self) -> Tuple[Optional[int], Any]:
+        """Drop per-file state and the bound instance after an error
 
-        # Create formatter
-        formatter = logging.Formatter(
-            '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
-        )
-        handler.setFormatter(formatter)
-
-        # Add handler to logger
-        self.logger.addHandler(handler)
-        self.logger.setLevel(logging.DEBUG)
+        Returns:
+            The (instance_id, metamap_instance) that was bound, so the caller
+            can hand it back to (or discard it from) its pool
+        """
+        binding = (self.instance_id, self.metamap_instance)
+        self.instance_id = None
+        self.metamap_instance = None
+        self.concepts_found = 0
+        return binding
 
     def process_file(
-            self, input_file_path: str) -> Tuple[bool, float, Optional[str]]:
-        """Process a single file through MetaMap
+            self, input_file_path,
+            bisect: bool = False) -> Tuple[bool, float, Optional[str]]:
+        """Process a single note through MetaMap
 
         Args:
-            input_file_path: Path to input text file
+            input_file_path: Path to input text file, or an InputRecord
+            bisect: Retry mode for files that timed out before - split the
+                document around the offending span instead of re-running it whole
 
         Returns:
             Tuple of (success, processing_time, error_message)
         """
+        record = as_input_record(input_file_path)
+
+        with track_child_usage() as usage, \
+                span("process_file", document=record.name, size=record.size,
+                     instance_id=self.instance_id, worker=self.worker_id, bisect=bisect) as file_span:
+            self.last_usage = usage
+            success, processing_time, error = self._process_file(record, bisect)
+            file_span.set(success=success, concepts=self.concepts_found, error=error,
+                          cpu_seconds=round(usage.cpu_seconds, 3), peak_rss=usage.peak_rss)
+        return success, processing_time, error
+
+    def process_text(self, text: str, name: str = "text",
+                     bisect: bool = False) -> List[Dict[str, Any]]:
+        """Map text through MetaMap and return its concepts
+
+        Unlike ``process_file`` nothing is written or tracked, and errors
+        (e.g. ``MetamapStuck`` on timeout) propagate to the caller.
+
+        Args:
+            text: Note text
+            name: Note name, for logs and trace spans
+            bisect: Split the text around spans that time out (see process_file)
+        """
+        self.concepts_found = 0
+        with track_child_usage() as usage, \
+                span("process_text", document=name, size=len(text),
+                     instance_id=self.instance_id, worker=self.worker_id, bisect=bisect) as text_span:
+            self.last_usage = usage
+            content = text.strip()
+            concepts = self._process_content(content, name, bisect=bisect) if content else []
+            self.concepts_found = len(concepts)
+            text_span.set(concepts=len(concepts), cpu_seconds=round(usage.cpu_seconds, 3),
+                          peak_rss=usage.peak_rss)
+        return concepts
+
+    def process_texts(self, texts: List[str], name: str = "batch") -> List[List[Dict[str, Any]]]:
+        """Map several short notes with a single MetaMap run
+
+        MetaMap starts once for the whole batch instead of once per note.
+        Each note is flattened to one line (keeping character offsets) and
+        written as its own citation, which MetaMap answers with one MMO with
+        or without ``--sldi``.
+
+        Returns:
+            The concepts of each note, in the order of texts
+
+        Raises:
+            ParseError: MetaMap did not return one result per note
+        """
+        results: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        notes = [(index, LINE_BREAKS.sub(" ", text.strip()))
+                 for index, text in enumerate(texts) if text.strip()]
+        self.concepts_found = 0
+        if not notes:
+            return results
+
+        with track_child_usage() as usage, \
+                span("process_texts", document=name, notes=len(notes),
+                     size=sum(len(note) for _, note in notes),
+                     instance_id=self.instance_id, worker=self.worker_id) as batch_span:
+            self.last_usage = usage
+            mmos = self._parse_mmos([f"{note}\n" for _, note in notes], name)
+            if len(mmos) != len(notes):
+                raise ParseError(name, f"MetaMap returned {len(mmos)} results for {len(notes)} notes")
+
+            with span("extract_concepts"):
+                for (index, _), mmo in zip(notes, mmos):
+                    results[index] = [self._extract_concept_data(concept) for concept in mmo]
+            self.concepts_found = sum(len(concepts) for concepts in results)
+            batch_span.set(concepts=self.concepts_found, cpu_seconds=round(usage.cpu_seconds, 3),
+                           peak_rss=usage.peak_rss)
+        return results
+
+    def _process_file(self, input_path: InputRecord,
+                      bisect: bool) -> Tuple[bool, float, Optional[str]]:
+        """Process a single note; see process_file"""
         start_time = time.time()
-        input_path = Path(input_file_path)
-        output_path = self._get_output_path(input_path.name)
+        output_path = self._get_output_path(input_path.note_id)
+        self.concepts_found = 0
 
         # Mark file as in progress in unified tracker
         if self.file_tracker:
@@ -96,22 +199,27 @@ class FileProcessor:
 
         try:
             # Read input file
-            content = self._read_input_file(input_path)
+            with span("read_input"):
+                content = self._read_input_file(input_path)
             if not content:
-                self._write_empty_output(output_path, input_path.name)
+                with span("write_output"):
+                    self._write_empty_output(output_path, input_path.name)
                 # Mark as completed with 0 concepts
                 if self.file_tracker:
                     self.file_tracker.mark_file_completed(
                         input_path, concepts_found=0, processing_time=time.time() - start_time)
+                self._publish_event(input_path, output_path, STATUS_COMPLETED, 0, start_time)
                 return True, time.time() - start_time, None
 
             # Process through MetaMap
             try:
-                concepts = self._process_content(content, input_path.name)
+                with span("metamap", chars=len(content)) as metamap_span:
+                    concepts = self._process_content(content, input_path.name, bisect=bisect)
+                    metamap_span.set(concepts=len(concepts))
             except Exception as e:
                 # Mark as failed in both trackers
                 if self.state_manager:
-                    self.state_manager.mark_failed(str(input_path), str(e))
+                    self.state_manager.mark_failed(input_path.note_id, str(e))
                 if self.file_tracker:
                     self.file_tracker.mark_file_failed(input_path, str(e))
 
@@ -119,12 +227,15 @@ class FileProcessor:
                 raise
 
             # Write output
-            self._write_output(output_path, input_path.name, concepts)
+            with span("write_output", concepts=len(concepts)):
+                self._write_output(output_path, input_path.name, concepts)
+            self.concepts_found = len(concepts)
 
             # Track concepts if state manager is available
             if self.state_manager and concepts:
                 try:
-                    self.state_manager.track_concepts(concepts)
+                    with span("track_concepts"):
+                        self.state_manager.track_concepts(concepts)
                 except Exception as e:
                     # Log error but don't fail the file processing
                     self.logger.error(
@@ -136,8 +247,10 @@ class FileProcessor:
 
             # Mark as completed in unified tracker
             if self.file_tracker:
-                self.file_tracker.mark_file_completed(
-                    input_path, concepts_found=len(concepts), processing_time=processing_time)
+                with span("update_tracker"):
+                    self.file_tracker.mark_file_completed(
+                        input_path, concepts_found=len(concepts), processing_time=processing_time)
+            self._publish_event(input_path, output_path, STATUS_COMPLETED, len(concepts), start_time)
 
             return True, processing_time, None
 
@@ -147,6 +260,7 @@ class FileProcessor:
             # Mark as failed in unified tracker
             if self.file_tracker:
                 self.file_tracker.mark_file_failed(input_path, error_msg)
+            self._publish_event(input_path, output_path, STATUS_FAILED, 0, start_time, error_msg)
             return False, time.time() - start_time, error_msg
 
         except ParseError as e:
@@ -155,6 +269,7 @@ class FileProcessor:
             # Mark as failed in unified tracker
             if self.file_tracker:
                 self.file_tracker.mark_file_failed(input_path, error_msg)
+            self._publish_event(input_path, output_path, STATUS_FAILED, 0, start_time, error_msg)
             return False, time.time() - start_time, error_msg
 
         except Exception as e:
@@ -164,22 +279,32 @@ class FileProcessor:
             # Mark as failed in unified tracker
             if self.file_tracker:
                 self.file_tracker.mark_file_failed(input_path, error_msg)
+            self._publish_event(input_path, output_path, STATUS_FAILED, 0, start_time, error_msg)
             return False, time.time() - start_time, error_msg
 
-    def _get_output_path(self, input_basename: str) -> Path:
-        """Get output CSV path for input file"""
-        stem = input_basename[:-
-                              4] if input_basename.lower().endswith(".txt") else input_basename
-        return self.output_dir / f"{stem}.csv"
-
-    def _read_input_file(self, input_path: Path) -> str:
-        """Read and validate input file"""
+    def _publish_event(self, input_path: InputRecord, output_path: Path, status: str,
+                       concepts: int, start_time: float, error: Optional[str] = None):
+        """Report a finished file on the output directory's event log"""
+        try:
+            size = output_path.stat().st_size
+        except OSError:
+            size = 0
+        usage = self.last_usage
+        self.event_log.publish(input_path.name, status, concepts=concepts, bytes=size,
+                               elapsed=time.time() - start_time, worker=self.worker_id,
+                               error=error, instance=self.instance_id,
+                               usage=usage.to_dict() if usage and usage.processes else None)
+
+    def _get_output_path(self, note_id: str) -> Path:
+        """Get output CSV path for a note"""
+        return self.output_dir / f"{output_stem(note_id)}.csv"
+
+    def _read_input_file(self, input_path: InputRecord) -> str:
+        """Read and validate input note"""
         try:
-            with open(input_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-            return content
+            return input_path.read_text().strip()
         except Exception as e:
-            raise ParseError(str(input_path), f"Failed to read file: {e}")
+            raise ParseError(input_path.source, f"Failed to read file: {e}")
     
     def _process_chunked_content(self, content: str, filename: str, chunk_size: int) -> List[Dict[str, Any]]:
         """Process large content in chunks to avoid timeouts"""
@@ -234,9 +359,13 @@ class FileProcessor:
         finally:
             self.timeout = original_timeout
 
-    def _process_content(self, content: str,
-                         filename: str) -> List[Dict[str, Any]]:
+    def _process_content(self, content: str, filename: str,
+                         bisect: bool = False) -> List[Dict[str, Any]]:
         """Process content through MetaMap"""
+        if bisect:
+            self.last_bisect_result = BisectingRetry(self, self.config).process_text(content, filename)
+            return self.last_bisect_result.concepts
+
         # Check if content needs chunking (> 5000 chars)
         chunk_size = self.config.get("chunk_size", 5000) if self.config else 5000
         if self.config and self.config.get("chunked_processing", False) and len(content) > chunk_size:
@@ -244,10 +373,11 @@ class FileProcessor:
         
         return self._process_content_raw(content, filename)
     
-    def _process_content_raw(self, content: str,
-                         filename: str) -> List[Dict[str, Any]]:
-        """Raw content processing without chunking"""
-        
+    def _prepare_environment(self):
+        """Export MetaMap environment variables (once per processor)"""
+        if self._environment_ready:
+            return
+
         # Set environment for MetaMap options
         if self.metamap_options:
             os.environ["METAMAP_PROCESSING_OPTIONS"] = self._deduplicate_options(
@@ -297,60 +427,49 @@ mutex_set_max 1000000
                         except Exception as e:
                             self.logger.warning(f"Could not create DB_CONFIG in {db_dir}: {e}")
 
-        # Use provided instance or create new one
-        if self.metamap_instance:
-            # Use provided instance (assumes it was created with correct ports)
-            mm = self.metamap_instance
-            try:
-                # Parse content
-                mmos = mm.parse([content], timeout=self.timeout)
-
-                if not mmos:
-                    self.logger.warning(f"No concepts found in {filename}")
-                    return []
+        self._environment_ready = True
 
-                # Extract concepts
-                concepts = []
-                for mmo in mmos:
-                    for concept in mmo:
-                        concepts.append(self._extract_concept_data(concept))
-
-                return concepts
+    def _process_content_raw(self, content: str,
+                         filename: str) -> List[Dict[str, Any]]:
+        """Raw content processing without chunking"""
+        mmos = self._parse_mmos([content], filename)
 
-            except TimeoutError:
-                raise MetamapStuck()
-            except Exception as e:
-                if "connection" in str(e).lower():
-                    raise ParseError(filename, f"Server connection error: {e}")
-                raise
-        else:
-            # Create new instance with context manager and custom ports
-            with PyMetaMap(self.metamap_binary_path, debug=False,
-                           tagger_port=self.tagger_port, wsd_port=self.wsd_port) as mm:
-                try:
-                    # Parse content
-                    mmos = mm.parse([content], timeout=self.timeout)
+        # Extract concepts
+        with span("extract_concepts"):
+            return [self._extract_concept_data(concept) for mmo in mmos for concept in mmo]
 
-                    if not mmos:
-                        self.logger.warning(f"No concepts found in {filename}")
-                        return []
+    def _parse_mmos(self, sentences: List[str], filename: str) -> list:
+        """Run MetaMap on the given input lines and return its MMOs
 
-                    # Extract concepts
-                    concepts = []
-                    for mmo in mmos:
-                        for concept in mmo:
-                            concepts.append(
-                                self._extract_concept_data(concept))
+        Raises:
+            ParseError: MetaMap returned no MMOs for non-empty input. MetaMap
+                answers every citation, even one without concepts, so this
+                means it crashed (``Metamap.parse`` reports that as ``[]``)
+        """
+        self._prepare_environment()
 
-                    return concepts
+        try:
+            if self.metamap_instance:
+                # Use provided instance (assumes it was created with correct ports)
+                mmos = list(self.metamap_instance.parse(sentences, timeout=self.timeout) or [])
+            else:
+                # Create new instance with context manager and custom ports
+                with span("start_metamap"):
+                    mm = PyMetaMap(self.metamap_binary_path, debug=False,
+                                   tagger_port=self.tagger_port, wsd_port=self.wsd_port)
+                with mm:
+                    mmos = list(mm.parse(sentences, timeout=self.timeout) or [])
+
+        except (TimeoutError, MetamapTimeout):
+            raise MetamapStuck()
+        except Exception as e:
+            if "connection" in str(e).lower():
+                raise ParseError(filename, f"Server connection error: {e}")
+            raise
 
-                except TimeoutError:
-                    raise MetamapStuck()
-                except Exception as e:
-                    if "connection" in str(e).lower():
-                        raise ParseError(
-                            filename, f"Server connection error: {e}")
-                    raise
+        if not mmos and any(sentence.strip() for sentence in sentences):
+            raise ParseError(filename, "MetaMap returned no results (see the MetaMap log for a crash)")
+        return mmos
 
     def _extract_concept_data(self, concept) -> Dict[str, Any]:
         """Extract concept data into dictionary matching Java API format"""
@@ -478,6 +597,130 @@ mutex_set_max 1000000
             f.write(f"# Error: {error}\n")
 
 
+class WorkerProcessorPool:
+    """Worker-affine FileProcessor registry
+
+    Each worker thread gets one FileProcessor the first time it asks for one
+    and reuses it for every file it processes, so path setup, logging and
+    environment preparation happen once per worker instead of once per file.
+    When an instance pool is given, the processor checks out one MetaMap
+    instance and keeps it until reset() or close().
+
+    Processors left behind by finished threads (e.g. when a new
+    ThreadPoolExecutor is started for the next chunk) are adopted by new
+    threads together with their instance. Each process keeps its own
+    registry, so process-based runners get one processor per process.
+    """
+
+    def __init__(self, processor_factory: Callable[[int], FileProcessor],
+                 instance_pool=None, acquire_timeout: float = 30.0):
+        """
+        Args:
+            processor_factory: Creates a FileProcessor for a worker id
+            instance_pool: Optional MetaMapInstancePool to bind instances from
+            acquire_timeout: Seconds to wait for a free pooled instance
+        """
+        self.processor_factory = processor_factory
+        self.instance_pool = instance_pool
+        self.acquire_timeout = acquire_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owners: Dict[int, threading.Thread] = {}  # worker_id -> thread
+        self._processors: Dict[int, FileProcessor] = {}
+        self._unpooled = set()  # worker ids that found the pool exhausted
+        self._next_worker_id = 0
+        self.logger = logging.getLogger(__name__)
+
+    def get(self) -> FileProcessor:
+        """Get the calling thread's processor, creating it on first use"""
+        processor = getattr(self._local, 'processor', None)
+        if processor is None:
+            processor = self._claim_processor()
+            self._local.processor = processor
+
+        if self.instance_pool is not None and processor.metamap_instance is None:
+            with self._lock:
+                unpooled = processor.worker_id in self._unpooled
+            if not unpooled:
+                self._bind_pooled_instance(processor)
+
+        return processor
+
+    def _bind_pooled_instance(self, processor: FileProcessor):
+        """Check out a pooled instance for processor, or mark it unpooled"""
+        # The wait for an instance happens outside the registry lock
+        try:
+            instance_id, mm_instance = self.instance_pool.get_instance(
+                timeout=self.acquire_timeout)
+            processor.bind_instance(instance_id, mm_instance)
+        except TimeoutError:
+            # More workers than pooled instances; run this worker
+            # without a pooled instance until it is reset
+            with self._lock:
+                self._unpooled.add(processor.worker_id)
+            self.logger.warning(
+                f"No pooled MetaMap instance for worker {processor.worker_id}, "
+                f"running unpooled")
+
+    def _claim_processor(self) -> FileProcessor:
+        """Adopt an orphaned processor or create a new one for this thread"""
+        current = threading.current_thread()
+
+        with self._lock:
+            for worker_id, owner in self._owners.items():
+                if not owner.is_alive():
+                    self._owners[worker_id] = current
+                    return self._processors[worker_id]
+
+            worker_id = self._next_worker_id
+            self._next_worker_id += 1
+
+        processor = self.processor_factory(worker_id)
+        with self._lock:
+            self._owners[worker_id] = current
+            self._processors[worker_id] = processor
+        return processor
+
+    def reset(self, processor: Optional[FileProcessor] = None):
+        """Reset a processor after an error
+
+        The bound instance is discarded rather than returned to the pool, so
+        the next file on this worker starts with a fresh MetaMap instance.
+        """
+        processor = processor or getattr(self._local, 'processor', None)
+        if processor is None:
+            return
+
+        instance_id, mm_instance = processor.reset()
+        with self._lock:
+            self._unpooled.discard(processor.worker_id)
+
+        if self.instance_pool is not None and instance_id is not None:
+            if hasattr(self.instance_pool, 'discard_instance'):
+                self.instance_pool.discard_instance(instance_id, mm_instance)
+            else:
+                self.instance_pool.release_instance(instance_id, None)
+
+    def close(self):
+        """Return all bound instances to the pool and forget processors"""
+        with self._lock:
+            processors = list(self._processors.values())
+            self._processors.clear()
+            self._owners.clear()
+            self._unpooled.clear()
+
+        for processor in processors:
+            instance_id, mm_instance = processor.reset()
+            if self.instance_pool is not None and instance_id is not None:
+                self.instance_pool.release_instance(instance_id, mm_instance)
+
+        self._local = threading.local()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._processors)
+
+
 def check_server_status() -> Dict[str, bool]:
     """Check if MetaMap servers are running"""
     return {
@@ -6,6 +6,7 @@ import os
 import logging
 from .cmdexecutor import MetamapCommand
 from .mmoparser import parse
+from .core.tracing import span
 from os.path import exists, dirname, abspath
 import tempfile
 from os import remove
@@ -26,7 +27,7 @@ class MetamapStuck(Exception):
 class Metamap:
     """ MetaMap Concept Extractor """
 
-    def __init__(self, metamap_path, debug=False, tagger_port=1795, wsd_port=5554):
+    def __init__(self, metamap_path, debug=False, tagger_port=1795, wsd_port=5554, options=None):
         """ MetaMap Wrapper parameters
 
         Args:
@@ -34,6 +35,7 @@ class Metamap:
             debug (boolean): Debug On/Off
             tagger_port (int): Port for tagger server
             wsd_port (int): Port for WSD server
+            options (str): Explicit MetaMap options (default: from environment)
         """
         self.metamap_path = metamap_path
         self.debug = debug
@@ -43,7 +45,7 @@ class Metamap:
         
         self.metamap_command = MetamapCommand(self.metamap_path,
                 self.input_file, self.output_file, self.debug,
-                tagger_port=tagger_port, wsd_port=wsd_port)
+                tagger_port=tagger_port, wsd_port=wsd_port, options=options)
         logger.info(f"Using MetaMap with tagger port {tagger_port}, WSD port {wsd_port}")
         if debug:
             print(f"Using MetaMap with tagger port {tagger_port}, WSD port {wsd_port}")
@@ -73,6 +75,11 @@ class Metamap:
             return False
 
 
+    @property
+    def usage(self):
+        """CPU, peak RSS and I/O of all MetaMap runs of this instance"""
+        return self.metamap_command.usage
+
     def _get_temp_files(self):
         TEMP_DIR = None
 
@@ -110,7 +117,7 @@ class Metamap:
             return [] # Return empty list for empty input
 
         try:
-            with open(self.input_file, mode="w", encoding="utf-8") as fp: # Ensure utf-8 writing
+            with span("write_input"), open(self.input_file, mode="w", encoding="utf-8") as fp: # Ensure utf-8 writing
                 for sentence in sentences:
                     fp.write(f"{sentence}\n") # Use f-string and ensure newline
         except IOError as e:
@@ -118,9 +125,11 @@ class Metamap:
             return None # Indicate failure
 
         try:
-            self.metamap_command.execute(timeout=timeout)
+            with span("metamap_exec", timeout=timeout):
+                self.metamap_command.execute(timeout=timeout)
             # The parse function in mmoparser can handle ExpatError and return an empty MMOS
-            return parse(self.output_file)
+            with span("parse_xml"):
+                return parse(self.output_file)
         except TimeoutExpired:
             logger.error(f"Execution of MetaMap command timed out after {timeout} seconds.")
             if self.debug:
@@ -0,0 +1,558 @@
+"""Local annotation service: MetaMap over HTTP with warm instances
+
+``pymm serve`` keeps a ``StreamProcessor`` (pooled MetaMap instances or
+JVM workers, content cache) and the tagger/WSD servers running, so other
+services can get concepts for single notes without starting MetaMap
+themselves::
+
+    POST /annotate        {"text": "...", "id": "n1", "timeout": 30}
+    POST /annotate/batch  {"notes": [{"id": "n1", "text": "..."}, ...], "timeout": 120}
+    GET  /health
+    GET  /metrics         (Prometheus text format)
+
+Requests wait in a bounded queue; a full queue answers 503 and a request
+whose result is not ready within its timeout answers 504. When all workers
+are busy, small requests that arrive together are micro-batched: a worker
+waits up to ``batch_window`` seconds for more and maps them with a single
+MetaMap run, so MetaMap starts once per batch instead of once per note.
+"""
+import json
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..core.config import PyMMConfig
+from ..core.exceptions import PyMMError, MetamapStuck
+from ..monitoring.metrics import MetricsRegistry, CONTENT_TYPE, STAGE_BUCKETS
+from ..processing.stream import StreamProcessor, Concepts
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+WARM_UP_TEXT = "heart attack"
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class ServiceBusy(PyMMError):
+    """The request queue is full or the service is shutting down"""
+    pass
+
+
+@dataclass
+class _Request:
+    note_id: str
+    text: str
+    future: Future = field(default_factory=Future)
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class ServiceMetrics:
+    """Request, queue, batch and cache metrics of an annotation service"""
+
+    def __init__(self, service: 'AnnotationService'):
+        self.service = service
+        self.registry = MetricsRegistry()
+        registry = self.registry
+
+        self.requests = registry.counter(
+            "pymm_service_requests_total", "HTTP requests by endpoint and status", ["endpoint", "status"])
+        self.request_seconds = registry.histogram(
+            "pymm_service_request_duration_seconds", "Wall time per HTTP request", ["endpoint"],
+            buckets=STAGE_BUCKETS)
+        self.queue_wait = registry.histogram(
+            "pymm_service_queue_wait_seconds", "Time notes waited for a worker", buckets=STAGE_BUCKETS)
+        self.batch_size = registry.histogram(
+            "pymm_service_batch_size", "Notes mapped per MetaMap run", buckets=BATCH_SIZE_BUCKETS)
+        self.notes = registry.counter(
+            "pymm_service_notes_total", "Notes answered by outcome", ["outcome"])
+        self.queue_depth = registry.gauge(
+            "pymm_service_queue_depth", "Notes waiting for a worker")
+        self.busy_workers = registry.gauge(
+            "pymm_service_busy_workers", "Workers currently mapping notes")
+        self.cache_entries = registry.gauge(
+            "pymm_service_cache_entries", "Entries in the content cache")
+        self.cache_lookups = registry.counter(
+            "pymm_service_cache_lookups_total", "Content cache lookups by result", ["result"])
+        self._cache_seen = {"hits": 0, "misses": 0}
+
+        registry.add_collector(self._collect)
+
+    def _collect(self):
+        service = self.service
+        self.queue_depth.set(service.queued)
+        self.busy_workers.set(service.busy)
+        cache = service.processor.cache
+        self.cache_entries.set(len(cache))
+        for key, result in (("hits", "hit"), ("misses", "miss")):
+            value = cache.stats[key]
+            self.cache_lookups.inc(value - self._cache_seen[key], result=result)
+            self._cache_seen[key] = value
+
+
+class AnnotationService:
+    """Queue, micro-batch and answer annotation requests with warm MetaMap
+
+    Config keys (overridden by the matching arguments):
+        service_request_timeout: seconds a request waits for its result (60)
+        service_batch_window: seconds to wait for more small requests (0.01)
+        service_max_batch: most notes mapped by one MetaMap run (8)
+        service_batch_chars: notes longer than this are never batched (2000)
+        service_max_queue: notes allowed to wait for a worker (256)
+    """
+
+    def __init__(self, config: PyMMConfig = None, workers: Optional[int] = None,
+                 timeout: Optional[int] = None, request_timeout: Optional[float] = None,
+                 batch_window: Optional[float] = None, max_batch: Optional[int] = None,
+                 max_queue: Optional[int] = None, cache_size: Optional[int] = None,
+                 start_servers: bool = True, server_pool: bool = False):
+        """
+        Args:
+            config: PyMMConfig instance
+            workers: Parallel MetaMap runs (default: max_parallel_workers)
+            timeout: Seconds per MetaMap run (default: pymm_timeout)
+            request_timeout: Default seconds a request waits for its result
+            batch_window: Seconds a worker waits to fill a micro-batch
+            max_batch: Most notes per micro-batch (1 disables batching)
+            max_queue: Notes allowed to wait for a worker
+            cache_size: Content cache entries, 0 to disable
+            start_servers: Start the tagger and WSD servers if they are not running
+            server_pool: Start one tagger/WSD server pair per worker instead
+        """
+        self.config = config or PyMMConfig()
+        get = self.config.get
+        self.request_timeout = float(request_timeout or get("service_request_timeout", 60))
+        self.batch_window = float(get("service_batch_window", 0.01) if batch_window is None else batch_window)
+        self.max_batch = max(1, int(max_batch or get("service_max_batch", 8)))
+        self.batch_chars = int(get("service_batch_chars", 2000))
+        max_queue = max(1, int(max_queue or get("service_max_queue", 256)))
+
+        use_server_pool = server_pool and start_servers and not get("use_java_api", False)
+        self.processor = StreamProcessor(self.config, workers=workers, timeout=timeout,
+                                         cache_size=cache_size,
+                                         start_servers=start_servers and not use_server_pool)
+        if use_server_pool:
+            self._start_server_pool()
+
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.metrics = ServiceMetrics(self)
+
+    def _start_server_pool(self):
+        """Start a tagger/WSD server pair on each pooled instance's ports"""
+        from .scaled_manager import ScaledServerManager
+
+        binary = Path(self.config.get("metamap_binary_path", ""))
+        manager = ScaledServerManager(str(binary.parent.parent.parent), {
+            "tagger_port_base": self.config.get("tagger_port", 1795),
+            "wsd_port_base": self.config.get("wsd_port", 5554)
+        })
+        ports = manager.start_server_pool(self.processor.workers)
+        logger.info(f"Server pool ready: tagger {ports['tagger']}, WSD {ports['wsd']}")
+
+    @property
+    def workers(self) -> int:
+        return self.processor.workers
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def busy(self) -> int:
+        return self._busy
+
+    def start(self) -> 'AnnotationService':
+        """Start the worker threads"""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"pymm-serve-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def warm_up(self) -> bool:
+        """Map a short text so MetaMap and its servers are ready for the first request"""
+        try:
+            self.annotate(WARM_UP_TEXT, "warm-up", use_cache=False)
+            return True
+        except Exception as e:
+            logger.warning(f"Warm-up annotation failed: {e}")
+            return False
+
+    def submit(self, text: str, note_id: str = "text", wait: Optional[float] = None,
+               use_cache: bool = True) -> Future:
+        """Queue a note and return a Future of its concepts
+
+        Args:
+            wait: Seconds to wait for room in the queue (default: fail at once)
+
+        Raises:
+            ServiceBusy: The queue is full or the service is stopping
+        """
+        if self._stopping.is_set():
+            raise ServiceBusy("Service is shutting down")
+        if use_cache:
+            concepts = self.processor.cache.get(text)
+            if concepts is not None:
+                self.metrics.notes.inc(outcome="cached")
+                future = Future()
+                future.set_result(concepts)
+                return future
+
+        request = _Request(str(note_id), text)
+        try:
+            self._queue.put(request, block=wait is not None, timeout=wait)
+        except queue.Full:
+            raise ServiceBusy(f"Request queue is full ({self._queue.maxsize} notes waiting)")
+        return request.future
+
+    def annotate(self, text: str, note_id: str = "text", timeout: Optional[float] = None,
+                 use_cache: bool = True) -> Concepts:
+        """Concepts of one note, waiting at most timeout seconds
+
+        Raises:
+            ServiceBusy: The queue is full
+            TimeoutError: No result within the timeout (the note is dropped
+                if no worker has picked it up yet)
+        """
+        future = self.submit(text, note_id, use_cache=use_cache)
+        try:
+            return future.result(timeout or self.request_timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    def annotate_batch(self, notes: Iterable[Tuple[Any, str]],
+                       timeout: Optional[float] = None) -> List[Tuple[Any, Optional[Concepts], Optional[str]]]:
+        """Map (id, text) pairs, returning (id, concepts, error) in input order
+
+        Notes are queued like single requests (waiting for room in the
+        queue), so concurrent small requests and batch notes share workers
+        and micro-batches. Notes without a result by the deadline get an error.
+        """
+        deadline = time.monotonic() + (timeout or self.request_timeout)
+        pending: List[Tuple[Any, Optional[Future], Optional[str]]] = []
+        for note_id, text in notes:
+            try:
+                future = self.submit(text, note_id, wait=max(0.0, deadline - time.monotonic()))
+                pending.append((note_id, future, None))
+            except ServiceBusy as e:
+                pending.append((note_id, None, str(e)))
+
+        results = []
+        for note_id, future, error in pending:
+            if future is None:
+                results.append((note_id, None, error))
+                continue
+            try:
+                results.append((note_id, future.result(max(0.0, deadline - time.monotonic())), None))
+            except FutureTimeout:
+                future.cancel()
+                results.append((note_id, None, "Timed out waiting for a result"))
+            except Exception as e:
+                results.append((note_id, None, _error_message(e)))
+        return results
+
+    def _worker_loop(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            with self._busy_lock:
+                self._busy += 1
+            stop = False
+            try:
+                batch, stop = self._gather(request)
+                if batch:
+                    self._run_batch(batch)
+            except Exception as e:
+                logger.error(f"Annotation worker error: {e}")
+            finally:
+                with self._busy_lock:
+                    self._busy -= 1
+            if stop:
+                return
+
+    def _gather(self, first: _Request) -> Tuple[List[_Request], bool]:
+        """Build a micro-batch around a request; returns (batch, stop worker)"""
+        batch = [first] if first.future.set_running_or_notify_cancel() else []
+        if self.max_batch <= 1 or len(first.text) > self.batch_chars:
+            return batch, False
+
+        # Waiting only pays off when no idle worker would take the next note
+        wait = self.batch_window if self._busy >= self.workers else 0.0
+        deadline = time.monotonic() + wait
+        chars = len(first.text)
+        while len(batch) < self.max_batch:
+            try:
+                request = self._queue.get(timeout=max(0.0, deadline - time.monotonic())) \
+                    if wait else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            if len(request.text) > self.batch_chars or chars + len(request.text) > self.batch_chars * self.max_batch:
+                # Too large to share a run; map it on its own right after
+                if batch:
+                    self._run_batch(batch)
+                return [request], False
+            batch.append(request)
+            chars += len(request.text)
+        return batch, False
+
+    def _run_batch(self, batch: List[_Request]):
+        started = time.monotonic()
+        for request in batch:
+            self.metrics.queue_wait.observe(started - request.enqueued)
+        self.metrics.batch_size.observe(len(batch))
+
+        # submit() already looked these notes up in the cache
+        if len(batch) > 1:
+            try:
+                results = self.processor.annotate_many(
+                    [request.text for request in batch], name=f"batch-{batch[0].note_id}",
+                    use_cache=False)
+            except Exception as e:
+                logger.warning(f"Batch of {len(batch)} notes failed ({e}); mapping them one by one")
+            else:
+                for request, concepts in zip(batch, results):
+                    self.metrics.notes.inc(outcome="mapped")
+                    request.future.set_result(concepts)
+                return
+
+        for request in batch:
+            try:
+                concepts = self.processor.annotate(request.text, request.note_id, use_cache=False)
+            except Exception as e:
+                self.metrics.notes.inc(outcome="failed")
+                logger.error(f"Failed to annotate {request.note_id}: {_error_message(e)}")
+                request.future.set_exception(e)
+            else:
+                self.metrics.notes.inc(outcome="mapped")
+                request.future.set_result(concepts)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "stopping" if self._stopping.is_set() else "ok",
+            "workers": self.workers,
+            "busy": self._busy,
+            "queued": self.queued,
+            "cache_entries": len(self.processor.cache),
+            "stats": dict(self.processor.stats)
+        }
+
+    def stop(self):
+        """Fail queued notes, let workers finish their batch and release MetaMap"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None and request.future.set_running_or_notify_cancel():
+                request.future.set_exception(ServiceBusy("Service is shutting down"))
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.processor.close()
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, MetamapStuck):
+        return f"MetaMap timeout: {error}" if str(error) else "MetaMap timeout"
+    return f"{type(error).__name__}: {error}"
+
+
+class _AnnotationHandler(BaseHTTPRequestHandler):
+    service: AnnotationService = None
+    max_body: int = 10 * 1024 * 1024
+    protocol_version = "HTTP/1.1"  # keep-alive for callers sending many requests
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        self._send(status, json.dumps(payload).encode('utf-8'), "application/json")
+
+    def _body_length(self) -> Optional[int]:
+        """Declared body length, or None if the body cannot be skipped safely"""
+        if self.headers.get("Transfer-Encoding"):
+            return None
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return None
+        return length if 0 <= length <= self.max_body else None
+
+    def _discard_body(self):
+        """Skip the body of a request answered without reading it
+
+        On a keep-alive connection an unread body would be parsed as the
+        next request; bodies that cannot be skipped close the connection.
+        """
+        length = self._body_length()
+        if length is None:
+            self.close_connection = True
+        elif length:
+            self.rfile.read(length)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = self._body_length()
+        if length is None:
+            self.close_connection = True
+            if self.headers.get("Transfer-Encoding"):
+                raise _HTTPError(411, "Content-Length required")
+            raise _HTTPError(413, f"Request body over {self.max_body} bytes or bad Content-Length")
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise _HTTPError(400, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise _HTTPError(400, "Request body must be a JSON object")
+        return payload
+
+    def _observe(self, endpoint: str, status: int, started: float):
+        metrics = self.service.metrics
+        metrics.requests.inc(endpoint=endpoint, status=str(status))
+        metrics.request_seconds.observe(time.monotonic() - started, endpoint=endpoint)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == "/health":
+            self._send_json(200, self.service.health())
+        elif path == "/metrics":
+            self._send(200, self.service.metrics.registry.render().encode('utf-8'), CONTENT_TYPE)
+        else:
+            self._send_json(404, {"error": f"Unknown path: {path}"})
+
+    def do_POST(self):
+        started = time.monotonic()
+        path = self.path.split('?', 1)[0]
+        handlers = {"/annotate": self._annotate, "/annotate/batch": self._annotate_batch}
+        if path not in handlers:
+            self._discard_body()
+            self._send_json(404, {"error": f"Unknown path: {path}"})
+            return
+
+        try:
+            status, payload = handlers[path](self._read_json(), started)
+        except _HTTPError as e:
+            status, payload = e.status, {"error": e.message}
+        except ServiceBusy as e:
+            status, payload = 503, {"error": str(e)}
+        except FutureTimeout:
+            status, payload = 504, {"error": "Timed out waiting for a result"}
+        except MetamapStuck as e:
+            status, payload = 504, {"error": _error_message(e)}
+        except Exception as e:
+            logger.exception(f"Error handling {path}")
+            status, payload = 500, {"error": _error_message(e)}
+        self._send_json(status, payload)
+        self._observe(path, status, started)
+
+    def _annotate(self, payload: Dict[str, Any], started: float) -> Tuple[int, Dict[str, Any]]:
+        text = payload.get("text")
+        if not isinstance(text, str):
+            raise _HTTPError(400, "'text' must be a string")
+        note_id = str(payload.get("id", "text"))
+        concepts = self.service.annotate(text, note_id, timeout=_timeout(payload))
+        return 200, {"id": payload.get("id"), "concepts": concepts,
+                     "elapsed": round(time.monotonic() - started, 6)}
+
+    def _annotate_batch(self, payload: Dict[str, Any], started: float) -> Tuple[int, Dict[str, Any]]:
+        notes = payload.get("notes")
+        if not isinstance(notes, list):
+            raise _HTTPError(400, "'notes' must be a list")
+        pairs = []
+        for index, note in enumerate(notes):
+            if isinstance(note, str):
+                pairs.append((index, note))
+            elif isinstance(note, dict) and isinstance(note.get("text"), str):
+                pairs.append((note.get("id", index), note["text"]))
+            else:
+                raise _HTTPError(400, f"Note {index} must be a string or an object with 'text'")
+
+        results = []
+        for note_id, concepts, error in self.service.annotate_batch(pairs, timeout=_timeout(payload)):
+            result = {"id": note_id, "concepts": concepts}
+            if error:
+                result["error"] = error
+            results.append(result)
+        return 200, {"results": results, "elapsed": round(time.monotonic() - started, 6)}
+
+    def log_message(self, format, *args):
+        logger.debug(f"serve {self.address_string()} {format % args}")
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _timeout(payload: Dict[str, Any]) -> Optional[float]:
+    value = payload.get("timeout")
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise _HTTPError(400, "'timeout' must be a number of seconds")
+    if value <= 0:
+        raise _HTTPError(400, "'timeout' must be positive")
+    return value
+
+
+class AnnotationServer:
+    """HTTP front end of an AnnotationService"""
+
+    def __init__(self, service: AnnotationService, port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+        handler = type('AnnotationHandler', (_AnnotationHandler,), {'service': service})
+        self.service = service
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'AnnotationServer':
+        """Serve from a daemon thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="pymm-serve-http", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving MetaMap annotation on {self.url}")
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until ``stop`` (or Ctrl+C)"""
+        logger.info(f"Serving MetaMap annotation on {self.url}")
+        self.httpd.serve_forever()
+
+    def stop(self):
+        """Stop accepting requests, then stop the service"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+        self.httpd.server_close()
+        self.service.stop()
@@ -28,6 +28,7 @@ class SetupVerifier:
             'dependencies': self._check_dependencies(),
             'metamap_installation': self._check_metamap_installation(),
             'java_setup': self._check_java_setup(),
+            'java_api': self._check_java_api(),
             'server_scripts': self._check_server_scripts(),
             'directories': self._check_directories(),
             'permissions': self._check_permissions(),
@@ -163,6 +164,32 @@ class SetupVerifier:
             
         return result
     
+    def _check_java_api(self) -> Dict[str, any]:
+        """Check that the Java API classes are built for this JDK"""
+        from ..core.config import Config, PyMMConfig
+        
+        try:
+            from ..processing.java_bridge import JavaAPIBridge, GSON_JAR
+            bridge = JavaAPIBridge(Config.from_pymm_config(PyMMConfig()))
+        except Exception as e:
+            self.warnings.append(f"Could not check the Java API build: {e}")
+            return {'is_valid': False}
+        
+        result = {
+            'classes_dir': str(bridge.build.classes_dir),
+            'gson': any(Path(jar).name == GSON_JAR for jar in bridge.build.jars),
+            'is_built': bridge.build.is_built('MetaMapWorker'),
+        }
+        result['is_valid'] = result['gson'] and result['is_built']
+        
+        # Only needed for the Java API backend, so never an issue
+        if not result['gson']:
+            self.warnings.append(f"{GSON_JAR} is missing for the Java API")
+        elif not result['is_built']:
+            self.warnings.append("Java API classes are not built for the current sources and JDK")
+            
+        return result
+    
     def _check_server_scripts(self) -> Dict[str, any]:
         """Check MetaMap server scripts"""
         from ..install_metamap import META_INSTALL_DIR
@@ -314,6 +341,17 @@ class SetupVerifier:
                         fixes.append(f"Made {script.name} executable")
                 except Exception as e:
                     logger.warning(f"Could not fix permissions: {e}")
+        
+        # Download Gson and build the Java API classes now rather than
+        # on the first batch that uses the Java API
+        if shutil.which('javac'):
+            try:
+                from ..core.config import Config, PyMMConfig
+                from ..processing.java_bridge import prepare_java_api
+                classes_dir = prepare_java_api(Config.from_pymm_config(PyMMConfig()))
+                fixes.append(f"Built Java API classes in {classes_dir}")
+            except Exception as e:
+                logger.warning(f"Could not build Java API classes: {e}")
                     
         return fixes
     